@@ -0,0 +1,60 @@
+import json
+import sys
+import timeit
+
+import numpy as np
+
+from frigate.test.test_video import (
+    generate_motion_boxes,
+    get_cluster_candidates_reference,
+)
+from frigate.video import get_cluster_candidates
+
+# pass a json file with a list of motion boxes per frame to benchmark
+# recorded boxes, otherwise boxes like the ones foliage produces are generated
+frame_shape = (1080, 1920)
+min_region = 320
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1]) as f:
+        frames = [[tuple(box) for box in boxes] for boxes in json.load(f)]
+    fixtures = {"recorded": frames}
+else:
+    rng = np.random.default_rng(0)
+    fixtures = {
+        f"{count} boxes": [
+            generate_motion_boxes(rng, frame_shape, count) for _ in range(20)
+        ]
+        for count in [10, 50, 100, 200]
+    }
+
+for name, frames in fixtures.items():
+    for frame_boxes in frames:
+        assert sorted(
+            get_cluster_candidates(frame_shape, min_region, frame_boxes)
+        ) == sorted(
+            get_cluster_candidates_reference(frame_shape, min_region, frame_boxes)
+        )
+
+    results = {}
+
+    for label, function in [
+        ("python", get_cluster_candidates_reference),
+        ("numpy", get_cluster_candidates),
+    ]:
+        elapsed = min(
+            timeit.repeat(
+                lambda: [
+                    function(frame_shape, min_region, frame_boxes)
+                    for frame_boxes in frames
+                ],
+                number=1,
+                repeat=5,
+            )
+        )
+        results[label] = elapsed / len(frames) * 1000
+
+    print(
+        f"{name}: python {results['python']:.2f}ms numpy {results['numpy']:.2f}ms "
+        f"per frame ({results['python'] / results['numpy']:.1f}x)"
+    )
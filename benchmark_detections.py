@@ -0,0 +1,82 @@
+import json
+import sys
+import timeit
+
+import numpy as np
+
+from frigate.config import DetectConfig
+from frigate.test.test_video import (
+    generate_raw_detections,
+    get_frame_detections,
+    get_frame_detections_reference,
+)
+
+# pass a json file with the regions and raw detector output of each frame as
+# {"regions": [[x_min, y_min, x_max, y_max], ...], "raw": [[[class, score,
+# y_min, x_min, y_max, x_max], ...], ...]} to replay recorded detections,
+# otherwise detections of overlapping regions are generated
+frame_shape = (1080, 1920)
+detect_config = DetectConfig(width=frame_shape[1], height=frame_shape[0])
+labels = {0: "person", 1: "car", 2: "dog", 3: "unknown", 4: "unknown", 5: "cat"}
+objects_to_track = ["person", "car", "dog"]
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1]) as f:
+        frames = [
+            (frame["regions"], np.array(frame["raw"], dtype=np.float32))
+            for frame in json.load(f)
+        ]
+    labels = {i: str(i) for i in range(256)} | labels
+    fixtures = {"recorded": frames}
+else:
+    rng = np.random.default_rng(0)
+    fixtures = {
+        f"{regions} regions": [
+            generate_raw_detections(rng, frame_shape, regions, 12) for _ in range(20)
+        ]
+        for regions in [1, 4, 10, 20]
+    }
+
+for name, frames in fixtures.items():
+    for regions, raw_detections in frames:
+        args = (
+            detect_config,
+            regions,
+            raw_detections,
+            labels,
+            [],
+            objects_to_track,
+            {},
+        )
+        assert get_frame_detections(*args) == get_frame_detections_reference(*args)
+
+    results = {}
+
+    for label, function in [
+        ("tuples", get_frame_detections_reference),
+        ("records", get_frame_detections),
+    ]:
+        elapsed = min(
+            timeit.repeat(
+                lambda: [
+                    function(
+                        detect_config,
+                        regions,
+                        raw_detections,
+                        labels,
+                        [],
+                        objects_to_track,
+                        {},
+                    )
+                    for regions, raw_detections in frames
+                ],
+                number=1,
+                repeat=5,
+            )
+        )
+        results[label] = elapsed / len(frames) * 1000
+
+    print(
+        f"{name}: tuples {results['tuples']:.2f}ms records {results['records']:.2f}ms "
+        f"per frame ({results['tuples'] / results['records']:.1f}x)"
+    )
@@ -0,0 +1,102 @@
+import asyncio
+import glob
+import os
+import shutil
+import subprocess as sp
+import sys
+import tempfile
+import timeit
+
+import cv2
+import numpy as np
+
+from frigate.record.mp4 import faststart, get_duration, read_top_level_boxes
+from frigate.util.services import get_video_properties
+
+# segments from the recording cache, a synthetic one is written if none are given
+# python benchmark_faststart.py /tmp/cache/*.mp4
+segments = [path for arg in sys.argv[1:] for path in glob.glob(arg)]
+output_dir = tempfile.mkdtemp()
+
+if not segments:
+    path = os.path.join(output_dir, "front-20231001120000.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (1280, 720))
+
+    for i in range(100):
+        frame = np.random.randint(0, 255, (720, 1280, 3), np.uint8)
+        writer.write(frame)
+
+    writer.release()
+    segments = [path]
+
+has_ffmpeg = shutil.which("ffmpeg") is not None
+
+
+def remux(path):
+    faststart(path, os.path.join(output_dir, "remuxed.mp4"))
+    return get_duration(path)
+
+
+def subprocess_remux(path):
+    sp.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-y",
+            "-i",
+            path,
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            os.path.join(output_dir, "ffmpeg.mp4"),
+        ],
+        stderr=sp.DEVNULL,
+        check=True,
+    )
+    return asyncio.run(get_video_properties(path, get_duration=True))["duration"]
+
+
+def read_frames(path):
+    video = cv2.VideoCapture(path)
+    frames = []
+
+    while True:
+        ret, frame = video.read()
+
+        if not ret:
+            return frames
+
+        frames.append(frame)
+
+
+for path in segments:
+    print(f"{path}: {os.path.getsize(path) / pow(2, 20):.1f} MiB")
+    remuxed = os.path.join(output_dir, "remuxed.mp4")
+    duration = remux(path)
+
+    # validate the remuxed segment
+    with open(remuxed, "rb") as file:
+        types = [box.type for box in read_top_level_boxes(file)]
+
+    assert types.index(b"moov") < types.index(b"mdat"), types
+    assert get_duration(remuxed) == duration
+    assert all(
+        np.array_equal(a, b) for a, b in zip(read_frames(path), read_frames(remuxed))
+    )
+
+    runs = 20
+    new_time = timeit.timeit(lambda: remux(path), number=runs) / runs
+    print(f"  in process: {new_time * 1000:.2f}ms (duration {duration:.2f}s)")
+
+    if has_ffmpeg:
+        ffmpeg_duration = subprocess_remux(path)
+        old_time = timeit.timeit(lambda: subprocess_remux(path), number=runs) / runs
+        print(
+            f"  subprocess: {old_time * 1000:.2f}ms (duration {float(ffmpeg_duration):.2f}s)"
+        )
+        print(f"  speedup: {old_time / new_time:.1f}x")
+    else:
+        print("  subprocess: ffmpeg is not installed, skipped")
+
+shutil.rmtree(output_dir)
@@ -1,13 +1,19 @@
 import datetime
 import multiprocessing as mp
 import os
+import timeit
+from collections import defaultdict
 
 import cv2
 import numpy as np
+from scipy.ndimage import gaussian_filter
 
 from frigate.config import MotionConfig
-from frigate.motion.improved_motion import ImprovedMotionDetector
-from frigate.util import create_mask
+from frigate.motion.improved_motion import (
+    ImprovedMotionDetector,
+    get_histogram_percentile,
+)
+from frigate.util.image import create_mask
 
 # get info on the video
 # cap = cv2.VideoCapture("debug/front_cam_2023_05_23_08_41__2023_05_23_08_43.mp4")
@@ -83,6 +89,78 @@ improved_motion_detector_2 = ImprovedMotionDetector(
 )
 improved_motion_detector_2.save_images = save_images
 
+# the default and fast paths with the same config to time and compare them
+current_motion_detector, fast_motion_detector = [
+    ImprovedMotionDetector(
+        frame_shape=frame_shape,
+        config=motion_config_1,
+        fps=fps,
+        improve_contrast=mp.Value("i", motion_config_1.improve_contrast),
+        threshold=mp.Value("i", motion_config_1.threshold),
+        contour_area=mp.Value("i", motion_config_1.contour_area),
+        name=name,
+        fast_path=fast_path,
+    )
+    for name, fast_path in [("current", False), ("fast", True)]
+]
+stage_times = defaultdict(float)
+detect_times = defaultdict(float)
+
+
+def time_stage(name, function):
+    stage_times[name] += min(timeit.repeat(function, number=1, repeat=3))
+
+
+def time_stages(gray):
+    """Time each stage of both paths on the same resized frame."""
+    detector = fast_motion_detector
+    resized = cv2.resize(
+        gray,
+        dsize=(detector.motion_frame_size[1], detector.motion_frame_size[0]),
+        interpolation=detector.interpolation,
+    )
+    avg_min, avg_max = np.mean(detector.contrast_values, axis=0)
+    lut = detector.get_contrast_lut(avg_min, avg_max)
+    dst = np.zeros_like(resized)
+
+    time_stage(
+        "current percentiles",
+        lambda: (np.percentile(resized, 4), np.percentile(resized, 96)),
+    )
+    time_stage(
+        "fast percentiles",
+        lambda: [
+            get_histogram_percentile(
+                np.cumsum(
+                    cv2.calcHist([resized], [0], None, [256], [0, 256])
+                    .ravel()
+                    .astype(np.int64)
+                ),
+                p,
+            )
+            for p in (4, 96)
+        ],
+    )
+    time_stage(
+        "current contrast",
+        lambda: (
+            ((np.clip(resized, avg_min, avg_max) - avg_min) / (avg_max - avg_min))
+            * 255
+        ).astype(np.uint8),
+    )
+    time_stage("fast contrast", lambda: cv2.LUT(resized, lut, dst=dst))
+    time_stage("current blur", lambda: gaussian_filter(resized, sigma=1, radius=1))
+    time_stage("fast blur", lambda: detector.blur_fast(resized))
+    time_stage(
+        "current background", lambda: cv2.convertScaleAbs(detector.avg_frame)
+    )
+    # only runs when the average changes
+    time_stage(
+        "fast background",
+        lambda: cv2.convertScaleAbs(detector.avg_frame, dst=dst),
+    )
+
+
 # read and process frames
 ret, frame = cap.read()
 frame_counter = 1
@@ -95,6 +173,20 @@ while ret:
     start_frame = datetime.datetime.now().timestamp()
     improved_motion_detector_2.detect(yuv_frame)
 
+    time_stages(yuv_frame[0:height, 0:width])
+    results = {}
+
+    for detector in [current_motion_detector, fast_motion_detector]:
+        start = timeit.default_timer()
+        results[detector.name] = detector.detect(yuv_frame)
+        detect_times[detector.name] += timeit.default_timer() - start
+
+    # the fast path has to come up with the same motion and background
+    assert results["current"] == results["fast"]
+    assert np.array_equal(
+        current_motion_detector.avg_frame, fast_motion_detector.avg_frame
+    )
+
     default_frame = f"debug/frames/default-{frame_counter}.jpg"
     compare_frame = f"debug/frames/compare-{frame_counter}.jpg"
     if os.path.exists(default_frame) and os.path.exists(compare_frame):
@@ -116,3 +208,12 @@ while ret:
     ret, frame = cap.read()
 
 cap.release()
+
+frames = frame_counter - 1
+print(f"{frames} frames")
+
+for name, elapsed in stage_times.items():
+    print(f"{name}: {elapsed / frames * 1000:.3f}ms per frame")
+
+for name, elapsed in detect_times.items():
+    print(f"{name} detect: {elapsed / frames * 1000:.3f}ms per frame")
@@ -0,0 +1,176 @@
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from peewee_migrate import Router
+from playhouse.sqlite_ext import SqliteExtDatabase
+
+from frigate.config import RetainModeEnum
+from frigate.models import Event, Recordings
+from frigate.record.retention import (
+    delete_recordings,
+    get_expired_recordings,
+    iter_recordings,
+    summarize_recordings,
+)
+
+# synthetic recordings table, 10 second segments of a few cameras back to back
+# python benchmark_retention.py 5000000
+recording_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+cameras = ["front", "back", "side", "garage", "driveway"]
+output_dir = tempfile.mkdtemp()
+db_path = os.path.join(output_dir, "frigate.db")
+
+del logging.getLogger("peewee_migrate").handlers[:]
+db = SqliteExtDatabase(db_path, pragmas={"journal_mode": "wal"})
+Router(db).run()
+db.bind([Event, Recordings])
+
+random.seed(0)
+start = 1_600_000_000
+per_camera = recording_count // len(cameras)
+expire_date = start + per_camera * 10 * 0.8
+
+with db.atomic():
+    for camera in cameras:
+        rows = (
+            (
+                f"{camera}-{i}",
+                camera,
+                f"/media/frigate/recordings/{camera}/{i}.mp4",
+                start + i * 10,
+                start + i * 10 + 10,
+                random.random() < 0.5 and random.randint(1, 100) or 0,
+                random.random() < 0.2 and random.randint(1, 5) or 0,
+            )
+            for i in range(per_camera)
+        )
+        db.cursor().executemany(
+            "insert into recordings (id, camera, path, start_time, end_time, duration, motion, objects, segment_size) "
+            "values (?, ?, ?, ?, ?, 10, ?, ?, 2)",
+            rows,
+        )
+
+        # an event of up to 5 minutes roughly every 20 minutes
+        events = []
+
+        for i in range(0, per_camera * 10, 1200):
+            event_start = start + i + random.randint(0, 600)
+            events.append(
+                (
+                    f"{camera}-event-{i}",
+                    camera,
+                    event_start,
+                    event_start + random.randint(5, 300),
+                )
+            )
+
+        db.cursor().executemany(
+            "insert into event (id, label, camera, start_time, end_time, zones, thumbnail, has_clip, has_snapshot, retain_indefinitely, data) "
+            "values (?, 'person', ?, ?, ?, '[]', '', 1, 1, 0, '{}')",
+            events,
+        )
+
+print(f"{recording_count} recordings, {Event.select().count()} events")
+
+
+def nested_loop(camera, mode):
+    """The expiry as it was done in python before the retention queries."""
+    recordings = (
+        Recordings.select()
+        .where(Recordings.camera == camera, Recordings.end_time < expire_date)
+        .order_by(Recordings.start_time)
+    )
+    events = (
+        Event.select()
+        .where(
+            Event.camera == camera, Event.start_time < expire_date, Event.has_clip
+        )
+        .order_by(Event.start_time)
+        .objects()
+    )
+    event_start = 0
+    deleted = set()
+
+    for recording in recordings.objects().iterator():
+        keep = False
+
+        for idx in range(event_start, len(events)):
+            event = events[idx]
+
+            if event.start_time > recording.end_time:
+                keep = False
+                break
+
+            if event.end_time is None or event.end_time >= recording.start_time:
+                keep = True
+                break
+
+            if event.end_time < recording.start_time:
+                event_start = idx
+
+        if (
+            not keep
+            or (mode == RetainModeEnum.motion and recording.motion == 0)
+            or (mode == RetainModeEnum.active_objects and recording.objects == 0)
+        ):
+            deleted.add(recording.id)
+
+    return deleted
+
+
+sql, params = get_expired_recordings(cameras[0], expire_date, RetainModeEnum.motion)
+plan = db.execute_sql(f"explain query plan {sql}", params).fetchall()
+print("query plan:")
+
+for row in plan:
+    print(f"  {row[-1]}")
+
+for mode in RetainModeEnum:
+    old_time = 0
+    new_time = 0
+    summary_time = 0
+    total = 0
+
+    for camera in cameras:
+        begin = time.perf_counter()
+        expected = nested_loop(camera, mode)
+        old_time += time.perf_counter() - begin
+
+        query = get_expired_recordings(camera, expire_date, mode)
+        begin = time.perf_counter()
+        expired = {id for id, _, _ in iter_recordings(query)}
+        new_time += time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        summary = summarize_recordings(query)
+        summary_time += time.perf_counter() - begin
+
+        assert expired == expected, (camera, mode, len(expired ^ expected))
+        assert summary["recordings"] == len(expected)
+        total += len(expected)
+
+    print(f"{mode.value}: {total} expired recordings")
+    print(f"  nested loop: {old_time:.2f}s")
+    print(f"  query: {new_time:.2f}s (dry run {summary_time:.2f}s)")
+    print(f"  speedup: {old_time / new_time:.1f}x")
+
+# stream the deletes of one camera, the files don't exist so this is the db side
+query = get_expired_recordings(cameras[0], expire_date, RetainModeEnum.all)
+begin = time.perf_counter()
+
+with ThreadPoolExecutor(max_workers=8) as executor:
+    deleted = delete_recordings(iter_recordings(query), executor)
+
+print(f"deleted {deleted} recordings in {time.perf_counter() - begin:.2f}s")
+
+db.close()
+
+for file in os.listdir(output_dir):
+    os.remove(os.path.join(output_dir, file))
+
+os.rmdir(output_dir)
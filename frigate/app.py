@@ -6,8 +6,6 @@ import shutil
 import signal
 import sys
 import traceback
-import cv2
-import numpy as np
 from multiprocessing import Queue
 from multiprocessing.synchronize import Event as MpEvent
 from types import FrameType
@@ -29,6 +27,8 @@ from frigate.const import (
     CONFIG_DIR,
     DEFAULT_DB_PATH,
     EXPORT_DIR,
+    FRAME_RESULT_SLOTS,
+    FRAME_RING_SLOTS,
     MODEL_CACHE_DIR,
     RECORD_DIR,
     FACES_DIR,
@@ -38,11 +38,12 @@ from frigate.events.cleanup import EventCleanup
 from frigate.events.external import ExternalEventProcessor
 from frigate.events.maintainer import EventProcessor
 from frigate.face import FaceProcessor
+from frigate.face_trainer import run_face_trainer
+from frigate.frame_results import RESULT_DTYPE, FrameResultRing
 from frigate.http import create_app
-from frigate.util.image import calculate_gray_face_region
 from frigate.log import log_process, root_configurer
 from frigate.models import Event, Face, FaceLabel, Recordings, RecordingsToDelete, Timeline
-from frigate.object_detection import ObjectDetectProcess
+from frigate.object_detection import DetectionScheduler, ObjectDetectProcess
 from frigate.face_detection import FaceDetectProcess
 from frigate.object_processing import TrackedObjectProcessor
 from frigate.output import output_frames
@@ -55,6 +56,7 @@ from frigate.stats import StatsEmitter, stats_init
 from frigate.storage import StorageMaintainer
 from frigate.timeline import TimelineProcessor
 from frigate.types import CameraMetricsTypes, FeatureMetricsTypes, PTZMetricsTypes
+from frigate.util.image import RingFrameManager
 from frigate.version import VERSION
 from frigate.video import capture_camera, track_camera
 from frigate.watchdog import FrigateWatchdog
@@ -80,6 +82,7 @@ class FrigateApp:
         self.feature_metrics: dict[str, FeatureMetricsTypes] = {}
         self.ptz_metrics: dict[str, PTZMetricsTypes] = {}
         self.processes: dict[str, int] = {}
+        self.face_model_version = mp.Value("i", 0)
 
     def set_environment_vars(self) -> None:
         for key, value in self.config.environment_vars.items():
@@ -102,82 +105,19 @@ class FrigateApp:
                 logger.debug(f"Skipping directory: {d}")
 
     def checkEmbeddings(self):
-        faceeembeddingsmissing = 0
-
-        selected_columns = [
-            Face.id,
-            Face.label_id,
-            Face.data,
-        ]
-
-        faces = (
-            Face.select(*selected_columns)
-        )
-
-        for f in faces:
-            if f.data.get("embeddings") is None:
-                faceeembeddingsmissing = faceeembeddingsmissing + 1
-
-        logger.info(f"{faceeembeddingsmissing} of {len(faces)} Faces Missing Embeddings")
-
-    def getImagesAndLabels(self):
-        faceSamples=[]
-        ids = []
-
-        selected_columns = [
-            Face.id,
-            Face.label_id,
-            Face.data,
-        ]
-
-        faces = (
-            Face.select(*selected_columns)
+        total = Face.select().count()
+        faceeembeddingsmissing = (
+            Face.select().where(Face.embeddings.is_null()).count()
         )
 
-        for f in faces:
-            if (f.label_id != None) and (f.label_id >= 0):
-                image = np.load(FACES_DIR + "/" + f.id + ".npy")
-                gray_frame = cv2.cvtColor(image, cv2.COLOR_YUV2GRAY_I420)
-                height, width = gray_frame.shape
-                x_min, y_min, x_max, y_max = calculate_gray_face_region(width, height, self.config.model.width, self.config.model.height)
-                # [rows,columns] [ymin:ymax,xmin:xmax]
-                gray_face = cv2.resize(gray_frame[y_min:y_max,x_min:x_max],
-                                        dsize=(360, 360),
-                                        interpolation=cv2.INTER_CUBIC,
-                                        )
-                gray_face = cv2.equalizeHist(gray_face)
-
-                faceSamples.append(gray_face)
-                ids.append(f.label_id)
-
-        return faceSamples,ids
+        logger.info(f"{faceeembeddingsmissing} of {total} Faces Missing Embeddings")
 
     def train_faces(self) -> None:
-        logger.info("Training Faces Started")
-
+        # the opencv recognizers are trained by the face trainer process
         if "DOODS" in self.config.model.face_recognition_model:
+            logger.info("Training Faces Started")
             self.checkEmbeddings()
-        else:
-            faces,ids = self.getImagesAndLabels()
-            # Fisher and Eigen needs at least 2 ids
-            if len(np.unique(ids)) < 2:
-                self.config.model.face_recognition_model = "LBPH"
-            if self.config.model.face_recognition_model == "LBPH":
-                logger.info("Face Recognition LBPH")
-                recognizer = cv2.face.LBPHFaceRecognizer_create()
-            if self.config.model.face_recognition_model == "Fisher":
-                logger.info("Face Recognition Fisher")
-                recognizer = cv2.face.FisherFaceRecognizer_create()
-            if self.config.model.face_recognition_model == "Eigen":
-                logger.info("Face Recognition Eigen")
-                recognizer = cv2.face.EigenFaceRecognizer_create()
-            if len(faces) > 0:
-                recognizer.train(faces, np.array(ids))
-            logger.info(f"Training {len(faces)} Faces")
-            # Save the model into /facerecognition_default.yml
-            recognizer.write("/facerecognition_default.yml")
-
-        logger.info("Training Faces Completed")
+            logger.info("Training Faces Completed")
 
     def init_logger(self) -> None:
         self.log_process = mp.Process(
@@ -239,6 +179,15 @@ class FrigateApp:
                     self.config.cameras[camera_name].motion.contour_area,
                 ),
                 "detection_fps": mp.Value("d", 0.0),  # type: ignore[typeddict-item]
+                # issue https://github.com/python/typeshed/issues/8799
+                # from mypy 0.981 onwards
+                "detection_skip_ratio": mp.Value("d", 0.0),  # type: ignore[typeddict-item]
+                # issue https://github.com/python/typeshed/issues/8799
+                # from mypy 0.981 onwards
+                "detection_wait": mp.Value("d", 0.0),  # type: ignore[typeddict-item]
+                # issue https://github.com/python/typeshed/issues/8799
+                # from mypy 0.981 onwards
+                "detection_dropped": mp.Value("i", 0),  # type: ignore[typeddict-item]
                 "facedetection_fps": mp.Value("d", 0.0),  # type: ignore[typeddict-item]
                 # issue https://github.com/python/typeshed/issues/8799
                 # from mypy 0.981 onwards
@@ -251,7 +200,12 @@ class FrigateApp:
                 "ffmpeg_pid": mp.Value("i", 0),  # type: ignore[typeddict-item]
                 # issue https://github.com/python/typeshed/issues/8799
                 # from mypy 0.981 onwards
+                "record_ffmpeg_pid": mp.Value("i", 0),  # type: ignore[typeddict-item]
+                # issue https://github.com/python/typeshed/issues/8799
+                # from mypy 0.981 onwards
                 "frame_queue": mp.Queue(maxsize=2),
+                "face_index_queue": mp.Queue(),
+                "face_model_version": self.face_model_version,
                 "capture_process": None,
                 "process": None,
             }
@@ -327,9 +281,32 @@ class FrigateApp:
         # Queue for face events
         self.face_queue: Queue = mp.Queue()
 
+        # Queue for faces the opencv recognizers need to learn
+        self.face_training_queue: Optional[Queue] = (
+            None
+            if "DOODS" in self.config.model.face_recognition_model
+            else mp.Queue()
+        )
+
         # Queue for inter process communication
         self.inter_process_queue: Queue = mp.Queue()
 
+    def init_frame_ring(self) -> None:
+        # frames are written to these slots instead of a new shm segment each
+        self.frame_ring = RingFrameManager(
+            {
+                name: camera.frame_shape_yuv
+                for name, camera in self.config.cameras.items()
+                if camera.enabled
+            },
+            FRAME_RING_SLOTS,
+        )
+        # tracked objects of each frame are read from here by every process
+        self.frame_results = FrameResultRing(
+            [name for name, camera in self.config.cameras.items() if camera.enabled],
+            FRAME_RESULT_SLOTS,
+        )
+
     def init_database(self) -> None:
         def vacuum_db(db: SqliteExtDatabase) -> None:
             db.execute_sql("VACUUM;")
@@ -396,7 +373,12 @@ class FrigateApp:
                 self.inter_process_queue,
                 self.object_recordings_info_queue,
                 self.audio_recordings_info_queue,
+                self.frame_results,
                 self.feature_metrics,
+                {
+                    name: metrics["record_ffmpeg_pid"]
+                    for name, metrics in self.camera_metrics.items()
+                },
             ),
         )
         recording_process.daemon = True
@@ -405,6 +387,25 @@ class FrigateApp:
         self.processes["recording"] = recording_process.pid or 0
         logger.info(f"Recording process started: {recording_process.pid}")
 
+    def init_face_trainer(self) -> None:
+        if self.face_training_queue is None:
+            return
+
+        face_trainer_process = mp.Process(
+            target=run_face_trainer,
+            name="face_trainer",
+            args=(
+                self.config,
+                self.face_training_queue,
+                self.face_model_version,
+            ),
+        )
+        face_trainer_process.daemon = True
+        self.face_trainer_process = face_trainer_process
+        face_trainer_process.start()
+        self.processes["face_trainer"] = face_trainer_process.pid or 0
+        logger.info(f"Face trainer process started: {face_trainer_process.pid}")
+
     def bind_database(self) -> None:
         """Bind db to the main process."""
         # NOTE: all db accessing processes need to be created before the db can be bound to the main process
@@ -462,7 +463,12 @@ class FrigateApp:
 
     def init_stats(self) -> None:
         self.stats_tracking = stats_init(
-            self.config, self.camera_metrics, self.detectors, self.facedetectors, self.processes
+            self.config,
+            self.camera_metrics,
+            self.detectors,
+            self.facedetectors,
+            self.processes,
+            self.frame_ring,
         )
 
     def init_external_event_processor(self) -> None:
@@ -513,9 +519,11 @@ class FrigateApp:
         )
 
     def start_detectors(self) -> None:
-        for name in self.config.cameras.keys():
+        for name, camera_config in self.config.cameras.items():
             self.detection_out_events[name] = mp.Event()
             self.facedetection_out_events[name] = mp.Event()
+            # one input slot and one output block per region in a batch
+            max_batch = camera_config.detect.max_regions_per_batch
 
             try:
                 largest_frame = max(
@@ -527,14 +535,14 @@ class FrigateApp:
                 shm_in = mp.shared_memory.SharedMemory(
                     name=name,
                     create=True,
-                    size=largest_frame,
+                    size=largest_frame * max_batch,
                 )
             except FileExistsError:
                 shm_in = mp.shared_memory.SharedMemory(name=name)
 
             try:
                 shm_out = mp.shared_memory.SharedMemory(
-                    name=f"out-{name}", create=True, size=20 * 6 * 4
+                    name=f"out-{name}", create=True, size=max_batch * 20 * 6 * 4
                 )
             except FileExistsError:
                 shm_out = mp.shared_memory.SharedMemory(name=f"out-{name}")
@@ -552,14 +560,16 @@ class FrigateApp:
                 shm_in = mp.shared_memory.SharedMemory(
                     name=f"face{name}",
                     create=True,
-                    size=largest_frame,
+                    size=largest_frame * max_batch,
                 )
             except FileExistsError:
                 shm_in = mp.shared_memory.SharedMemory(name=f"face{name}")
 
             try:
                 shm_out = mp.shared_memory.SharedMemory(
-                    name=f"out-face{name}", create=True, size=20 * 134 * 4
+                    name=f"out-face{name}",
+                    create=True,
+                    size=max_batch * 20 * 134 * 4,
                 )
             except FileExistsError:
                 shm_out = mp.shared_memory.SharedMemory(name=f"out-face{name}")
@@ -621,9 +631,10 @@ class FrigateApp:
         self.facedetection_shms.append(shm_out)
 
         for name, detector_config in self.config.detectors.items():
+            # each detector gets its own queue, the scheduler decides the order
             self.detectors[name] = ObjectDetectProcess(
                 name,
-                self.detection_queue,
+                mp.Queue(),
                 self.detection_out_events,
                 detector_config,
             )
@@ -636,6 +647,17 @@ class FrigateApp:
                 facedetector_config,
             )
 
+    def start_detection_scheduler(self) -> None:
+        self.detection_scheduler = DetectionScheduler(
+            self.config,
+            self.detection_queue,
+            self.detectors,
+            self.detection_out_events,
+            self.camera_metrics,
+            self.stop_event,
+        )
+        self.detection_scheduler.start()
+
     def start_ptz_autotracker(self) -> None:
         self.ptz_autotracker_thread = PtzAutoTrackerThread(
             self.config,
@@ -655,6 +677,8 @@ class FrigateApp:
             self.video_output_queue,
             self.object_recordings_info_queue,
             self.ptz_autotracker_thread,
+            self.frame_ring,
+            self.frame_results,
             self.stop_event,
         )
         self.detected_frames_processor.start()
@@ -665,6 +689,8 @@ class FrigateApp:
             name="output_processor",
             args=(
                 self.config,
+                self.frame_ring,
+                self.frame_results,
                 self.video_output_queue,
             ),
         )
@@ -693,6 +719,8 @@ class FrigateApp:
                     self.facedetection_queue,
                     self.facedetection_out_events[name],
                     self.detected_frames_queue,
+                    self.frame_ring,
+                    self.frame_results,
                     self.camera_metrics[name],
                     self.ptz_metrics[name],
                     self.face_queue,
@@ -712,7 +740,7 @@ class FrigateApp:
             capture_process = mp.Process(
                 target=capture_camera,
                 name=f"camera_capture:{name}",
-                args=(name, config, self.camera_metrics[name]),
+                args=(name, config, self.frame_ring, self.camera_metrics[name]),
             )
             capture_process.daemon = True
             self.camera_metrics[name]["capture_process"] = capture_process
@@ -743,8 +771,22 @@ class FrigateApp:
         self.timeline_processor.start()
 
     def start_face_processor(self) -> None:
+        # only the DOODS recognizers search the embedding index
+        face_index_queues = (
+            {
+                name: metrics["face_index_queue"]
+                for name, metrics in self.camera_metrics.items()
+                if self.config.cameras[name].enabled
+            }
+            if "DOODS" in self.config.model.face_recognition_model
+            else {}
+        )
         self.face_processor = FaceProcessor(
-            self.config, self.face_queue, self.stop_event
+            self.config,
+            self.face_queue,
+            face_index_queues,
+            self.face_training_queue,
+            self.stop_event,
         )
         self.face_processor.start()
 
@@ -790,7 +832,18 @@ class FrigateApp:
 
         for _, camera in self.config.cameras.items():
             min_req_shm += round(
-                (camera.detect.width * camera.detect.height * 1.5 * 9 + 270480)
+                (
+                    camera.detect.width * camera.detect.height * 1.5 * FRAME_RING_SLOTS
+                    + RESULT_DTYPE.itemsize * FRAME_RESULT_SLOTS
+                    + 270480 * camera.detect.max_regions_per_batch
+                    + (
+                        self.config.model.face_detection_width
+                        * self.config.model.face_detection_height
+                        * 3
+                        + 20 * 134 * 4
+                    )
+                    * camera.detect.max_regions_per_batch
+                )
                 / 1048576,
                 1,
             )
@@ -827,9 +880,11 @@ class FrigateApp:
             self.set_environment_vars()
             self.set_log_levels()
             self.init_queues()
+            self.init_frame_ring()
             self.init_database()
             self.init_onvif()
             self.init_recording_manager()
+            self.init_face_trainer()
             self.init_go2rtc()
             self.init_self()
             self.bind_database()
@@ -842,6 +897,7 @@ class FrigateApp:
             sys.exit(1)
         self.train_faces()
         self.start_detectors()
+        self.start_detection_scheduler()
         self.start_video_output_processor()
         self.start_ptz_autotracker()
         self.start_detected_frames_processor()
@@ -878,6 +934,8 @@ class FrigateApp:
         logger.info("Stopping...")
         self.stop_event.set()
 
+        self.detection_scheduler.join()
+
         for detector in self.detectors.values():
             detector.stop()
 
@@ -886,13 +944,20 @@ class FrigateApp:
 
         # Empty the detection queue and set the events for all requests
         while not self.detection_queue.empty():
-            connection_id = self.detection_queue.get(timeout=1)
+            connection_id, *_ = self.detection_queue.get(timeout=1)
             self.detection_out_events[connection_id].set()
         self.detection_queue.close()
         self.detection_queue.join_thread()
 
+        for detector in self.detectors.values():
+            while not detector.detection_queue.empty():
+                connection_id, _ = detector.detection_queue.get(timeout=1)
+                self.detection_out_events[connection_id].set()
+            detector.detection_queue.close()
+            detector.detection_queue.join_thread()
+
         while not self.facedetection_queue.empty():
-            connection_id = self.facedetection_queue.get(timeout=1)
+            connection_id, _ = self.facedetection_queue.get(timeout=1)
             self.facedetection_out_events[connection_id].set()
         self.facedetection_queue.close()
         self.facedetection_queue.join_thread()
@@ -917,6 +982,9 @@ class FrigateApp:
             shm.close()
             shm.unlink()
 
+        self.frame_ring.unlink()
+        self.frame_results.unlink()
+
         for queue in [
             self.event_queue,
             self.event_processed_queue,
@@ -926,6 +994,7 @@ class FrigateApp:
             self.audio_recordings_info_queue,
             self.log_queue,
             self.inter_process_queue,
+            self.face_training_queue,
         ]:
             if queue is not None:
                 while not queue.empty():
@@ -170,6 +170,11 @@ class RetainModeEnum(str, Enum):
     active_objects = "active_objects"
 
 
+class SyncModeEnum(str, Enum):
+    incremental = "incremental"
+    full = "full"
+
+
 class RetainConfig(FrigateBaseModel):
     default: float = Field(default=10, title="Default retention period.")
     mode: RetainModeEnum = Field(default=RetainModeEnum.motion, title="Retain mode.")
@@ -203,6 +208,10 @@ class RecordConfig(FrigateBaseModel):
     sync_on_startup: bool = Field(
         default=False, title="Sync recordings with disk on startup."
     )
+    sync_mode: SyncModeEnum = Field(
+        default=SyncModeEnum.incremental,
+        title="Mode for syncing recordings with disk.",
+    )
     expire_interval: int = Field(
         default=60,
         title="Number of minutes to wait between cleanup runs.",
@@ -229,6 +238,9 @@ class MotionConfig(FrigateBaseModel):
         default=0.8, title="Lightning detection threshold (0.3-1.0).", ge=0.3, le=1.0
     )
     improve_contrast: bool = Field(default=True, title="Improve Contrast")
+    fast_path: bool = Field(
+        default=False, title="Use the optimized motion detection path."
+    )
     contour_area: Optional[int] = Field(default=10, title="Contour Area")
     delta_alpha: float = Field(default=0.2, title="Delta Alpha")
     frame_alpha: float = Field(default=0.01, title="Frame Alpha")
@@ -295,6 +307,48 @@ class StationaryConfig(FrigateBaseModel):
     )
 
 
+class AdaptiveDetectConfig(FrigateBaseModel):
+    enabled: bool = Field(
+        default=False, title="Skip detection on frames where every track is stable."
+    )
+    min_fps: float = Field(
+        default=1.0,
+        gt=0,
+        title="Frames per second to run detection on while every track is stable.",
+    )
+    max_fps: Optional[float] = Field(
+        default=None,
+        gt=0,
+        title="Maximum frames per second to run detection on, defaults to the detect fps.",
+    )
+    min_score: float = Field(
+        default=0.7,
+        ge=0,
+        le=1,
+        title="Minimum score of a track for it to be considered stable.",
+    )
+
+
+class SweepConfig(FrigateBaseModel):
+    enabled: bool = Field(
+        default=False, title="Periodically scan the whole frame one tile at a time."
+    )
+    fps: float = Field(
+        default=1.0, gt=0, title="Number of tiles per second to run detection on."
+    )
+    tile_size: Optional[int] = Field(
+        default=None,
+        ge=4,
+        title="Size of the tiles, defaults to the model input size.",
+    )
+    overlap: float = Field(
+        default=0.1,
+        ge=0,
+        le=0.5,
+        title="Share of a tile that overlaps its neighbours.",
+    )
+
+
 class DetectConfig(FrigateBaseModel):
     height: Optional[int] = Field(title="Height of the stream for the detect role.")
     width: Optional[int] = Field(title="Width of the stream for the detect role.")
@@ -312,6 +366,29 @@ class DetectConfig(FrigateBaseModel):
     annotation_offset: int = Field(
         default=0, title="Milliseconds to offset detect annotations by."
     )
+    max_regions_per_batch: int = Field(
+        default=8,
+        ge=1,
+        title="Maximum number of regions sent to the detector in a single request.",
+    )
+    weight: float = Field(
+        default=1.0,
+        gt=0,
+        title="Share of detector time given to this camera when the detectors are busy.",
+    )
+    max_queue_age: float = Field(
+        default=1.0,
+        gt=0,
+        title="Maximum seconds a detection request can wait before it is dropped.",
+    )
+    adaptive: AdaptiveDetectConfig = Field(
+        default_factory=AdaptiveDetectConfig,
+        title="Adaptive detection rate config.",
+    )
+    sweep: SweepConfig = Field(
+        default_factory=SweepConfig,
+        title="Tiled full frame sweep config.",
+    )
 
 
 class FilterConfig(FrigateBaseModel):
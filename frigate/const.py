@@ -8,6 +8,16 @@ EXPORT_DIR = f"{BASE_DIR}/exports"
 FACES_DIR = f"{BASE_DIR}/faces"
 BIRDSEYE_PIPE = "/tmp/cache/birdseye"
 CACHE_DIR = "/tmp/cache"
+# frames each camera can have in flight between capture and output
+FRAME_RING_SLOTS = 10
+# frames captured since a slot was written after which it is taken back from
+# a consumer that never released it, when every other slot is in use too
+FRAME_RING_RECLAIM_FRAMES = 100
+# frame results each camera keeps for the processes reading them, the
+# recording maintainer reads them every few seconds
+FRAME_RESULT_SLOTS = 600
+# tracked objects each frame result holds in fixed records
+FRAME_RESULT_MAX_OBJECTS = 32
 YAML_EXT = (".yaml", ".yml")
 FRIGATE_LOCALHOST = "http://127.0.0.1:5000"
 PLUS_ENV_VAR = "PLUS_API_KEY"
@@ -6,6 +6,9 @@ logger = logging.getLogger(__name__)
 
 class DetectionApi(ABC):
     type_key: str
+    # plugins whose model has a batch dimension set this and implement
+    # detect_raw_batch, all others have each region run one at a time
+    supports_batch: bool = False
 
     @abstractmethod
     def __init__(self, detector_config):
@@ -14,3 +17,7 @@ class DetectionApi(ABC):
     @abstractmethod
     def detect_raw(self, tensor_input):
         pass
+
+    def detect_raw_batch(self, tensor_input):
+        """Takes a (N, height, width, 3) tensor and returns (N, 20, 6) detections."""
+        raise NotImplementedError
@@ -82,6 +82,15 @@ class ModelConfig(BaseModel):
     face_recognition_min_score: Optional[float] = Field(
         default=0.5, title="Face Recognition Minimum detection confidence for object to be counted."
     )
+    face_recognition_skip_score: float = Field(
+        default=0.9, title="Face Recognition score above which a tracked person is not checked again until the re-check interval."
+    )
+    face_recognition_recheck_interval: float = Field(
+        default=5.0, title="Face Recognition seconds before a confidently recognized person is checked again."
+    )
+    face_recognition_improvement_factor: float = Field(
+        default=1.2, title="Face Recognition factor a face has to be larger or sharper by to be recognized again for a confidently recognized person."
+    )
     face_training_camera: Optional[str] = Field(default="Any", title="Face Training Camera.")
     face_training_unknown_only: Optional[bool] = Field(default=True, title="Face Training unknown faces only.")
 
@@ -0,0 +1,77 @@
+"""Cache of the latest encoded camera frames served by the api."""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+
+class EncodedFrameCache:
+    """Encoded images of the latest frame of each camera.
+
+    Entries are keyed by camera and encode options and hold the frame time
+    they were encoded from, so every client asking for the same frame with
+    the same options shares one encode. Clients that ask while it is being
+    encoded wait for it instead of encoding the frame themselves. The encode
+    function returns the time of the frame it actually encoded with the image,
+    which is newer than the one asked for when a frame came in meanwhile.
+    """
+
+    def __init__(self, max_entries_per_camera: int = 32) -> None:
+        self.max_entries_per_camera = max_entries_per_camera
+        self.lock = threading.Lock()
+        # camera -> key -> (frame time, image)
+        self.entries: dict[str, OrderedDict[Hashable, tuple[float, bytes]]] = {}
+        # held while an entry is encoded
+        self.encode_locks: dict[tuple[str, Hashable], threading.Lock] = {}
+
+    def lookup(self, camera: str, key: Hashable, frame_time: float) -> Optional[bytes]:
+        with self.lock:
+            entries = self.entries.get(camera)
+
+            if entries is None or key not in entries:
+                return None
+
+            entries.move_to_end(key)
+            cached_time, image = entries[key]
+            return image if cached_time == frame_time else None
+
+    def get(
+        self,
+        camera: str,
+        key: Hashable,
+        frame_time: float,
+        encode: Callable[[], Optional[tuple[float, bytes]]],
+    ) -> Optional[bytes]:
+        """Return the image of a frame, encoding it if it is not cached."""
+        image = self.lookup(camera, key, frame_time)
+
+        if image is not None:
+            return image
+
+        with self.lock:
+            encode_lock = self.encode_locks.setdefault((camera, key), threading.Lock())
+
+        with encode_lock:
+            # another client could have encoded it in the meantime
+            image = self.lookup(camera, key, frame_time)
+
+            if image is not None:
+                return image
+
+            encoded = encode()
+
+            if encoded is None:
+                return None
+
+            encoded_time, image = encoded
+
+            with self.lock:
+                entries = self.entries.setdefault(camera, OrderedDict())
+                entries[key] = (encoded_time, image)
+                entries.move_to_end(key)
+
+                while len(entries) > self.max_entries_per_camera:
+                    evicted, _ = entries.popitem(last=False)
+                    self.encode_locks.pop((camera, evicted), None)
+
+        return image
@@ -3,17 +3,26 @@ import json
 import logging
 import queue
 import threading
+import time
 from multiprocessing import Queue
 from multiprocessing.synchronize import Event as MpEvent
+from typing import Optional
+
 import numpy as np
 
 from frigate.config import FrigateConfig
 from frigate.events.maintainer import EventTypeEnum
+from frigate.face_index import FaceUpdateTypeEnum, embeddings_to_blob
+from frigate.face_store import FaceCropStore
 from frigate.models import Face
 from frigate.util.builtin import to_relative_box
 
 logger = logging.getLogger(__name__)
 
+# seconds between compactions of the face store, deleted faces leave their
+# bytes in it until then
+FACE_STORE_COMPACT_INTERVAL = 3600
+
 face_capture = False
 
 class FaceProcessor(threading.Thread):
@@ -23,16 +32,29 @@ class FaceProcessor(threading.Thread):
         self,
         config: FrigateConfig,
         queue: Queue,
+        face_index_queues: dict[str, Queue],
+        face_training_queue: Optional[Queue],
         stop_event: MpEvent,
     ) -> None:
         threading.Thread.__init__(self)
         self.name = "face_processor"
         self.config = config
         self.queue = queue
+        self.face_index_queues = face_index_queues
+        self.face_training_queue = face_training_queue
         self.stop_event = stop_event
+        # this is the only thread that writes to the face store
+        self.face_store = FaceCropStore()
 
     def run(self) -> None:
+        self.face_store.import_npy_faces()
+        next_compaction = time.monotonic()
+
         while not self.stop_event.is_set():
+            if time.monotonic() >= next_compaction:
+                self.compact_face_store()
+                next_compaction = time.monotonic() + FACE_STORE_COMPACT_INTERVAL
+
             try:
                 (
                     type,
@@ -40,31 +62,59 @@ class FaceProcessor(threading.Thread):
                     label_id,
                     capture_time,
                     embeddings,
+                    crop,
                 ) = self.queue.get(timeout=1)
             except queue.Empty:
                 continue
 
-            if type == "face":
+            if type == FaceUpdateTypeEnum.face:
                 self.handle_face(
-                    id, label_id, capture_time, embeddings
+                    id, label_id, capture_time, embeddings, crop
                 )
 
+            # every other update type has already been written to the DB
+            # by the api, the camera face indexes only need to be told
+            self.publish_index_update(type, id, label_id, embeddings)
+
+            if self.face_training_queue is not None:
+                self.face_training_queue.put((type, id, label_id))
+
+        self.face_store.close()
+
+    def compact_face_store(self) -> None:
+        try:
+            self.face_store.compact()
+        except OSError as e:
+            logger.warning(f"Unable to compact the face store: {e}")
+
     def handle_face(
         self,
         id: str,
         label_id: int,
         capture_time,
         embeddings,
+        crop: np.ndarray,
     ) -> None:
         """Handle face detection."""
 
-        embeddings_str = ' '.join(str(e) for e in embeddings)
+        embeddings_blob, embeddings_norm = embeddings_to_blob(embeddings)
 
         face_entry = {
             Face.id: id,
             Face.label_id: label_id,
             Face.capture_time: capture_time,
-            Face.data: { "embeddings": embeddings_str },
+            Face.embeddings: embeddings_blob,
+            Face.embeddings_norm: embeddings_norm,
+            Face.data: {},
         }
+        face_entry.update(self.face_store.append(crop))
+
+        Face.insert(face_entry).execute()
+
+    def publish_index_update(self, type, id: str, label_id: int, embeddings) -> None:
+        """Forward a face change to the embedding index of every camera."""
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
 
-        Face.insert(face_entry).execute()
\ No newline at end of file
+        for index_queue in self.face_index_queues.values():
+            index_queue.put((type, id, label_id, embeddings))
@@ -0,0 +1,113 @@
+"""Cache of face recognition results per tracked object."""
+
+import logging
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FaceRecognitionCache:
+    """Decide when the face of a tracked object is looked at again.
+
+    An object is confident once its best recognition result, or its sub
+    label, scores at or above skip_score. The face of a confident object is
+    only detected again after recheck_interval, and a face found in the
+    meantime is only recognized again when it is larger or sharper than the
+    face the cached result came from by improvement_factor. Entries are
+    keyed by the tracked object id and evicted by the tracker when the
+    object is deregistered.
+    """
+
+    def __init__(
+        self, skip_score: float, recheck_interval: float, improvement_factor: float
+    ) -> None:
+        self.skip_score = skip_score
+        self.recheck_interval = recheck_interval
+        self.improvement_factor = improvement_factor
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.check_times: dict[str, float] = {}
+
+    @classmethod
+    def from_model_config(cls, model_config) -> "FaceRecognitionCache":
+        return cls(
+            model_config.face_recognition_skip_score,
+            model_config.face_recognition_recheck_interval,
+            model_config.face_recognition_improvement_factor,
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, object_id: str) -> Optional[dict[str, Any]]:
+        return self.entries.get(object_id)
+
+    def is_confident(self, object_id: str, sub_label_score: float = 0) -> bool:
+        entry = self.entries.get(object_id)
+
+        return (sub_label_score or 0) >= self.skip_score or (
+            entry is not None and entry["score"] >= self.skip_score
+        )
+
+    def check_due(
+        self, object_id: str, sub_label_score: float, frame_time: float
+    ) -> bool:
+        """Check if the face of an object needs to be detected on this frame."""
+        if not self.is_confident(object_id, sub_label_score):
+            return True
+
+        last_check = self.check_times.get(object_id)
+
+        return last_check is None or frame_time - last_check >= self.recheck_interval
+
+    def checked(self, object_id: str, frame_time: float) -> None:
+        self.check_times[object_id] = frame_time
+
+    def needs_recognition(
+        self, object_id: str, area: int, sharpness: Callable[[], float]
+    ) -> bool:
+        """Check if a face of the object has to be recognized.
+
+        The sharpness is only computed once a larger face alone isn't enough
+        to decide.
+        """
+        if not self.is_confident(object_id):
+            return True
+
+        entry = self.entries[object_id]
+
+        return (
+            area > entry["area"] * self.improvement_factor
+            or sharpness() > entry["sharpness"] * self.improvement_factor
+        )
+
+    def update(
+        self,
+        object_id: str,
+        label_id: int,
+        label: str,
+        score: float,
+        area: int,
+        sharpness: float,
+        timestamp: float,
+    ) -> None:
+        """Keep the result if it is the best one seen for the object so far."""
+        entry = self.entries.get(object_id)
+
+        if entry is not None and entry["score"] > score:
+            # remember the better face so it is not recognized again
+            entry["area"] = max(entry["area"], area)
+            entry["sharpness"] = max(entry["sharpness"], sharpness)
+            return
+
+        self.entries[object_id] = {
+            "label_id": label_id,
+            "label": label,
+            "score": score,
+            "area": area,
+            "sharpness": sharpness,
+            "timestamp": timestamp,
+        }
+
+    def evict(self, object_id: str) -> None:
+        self.entries.pop(object_id, None)
+        self.check_times.pop(object_id, None)
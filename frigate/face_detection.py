@@ -66,6 +66,31 @@ class LocalFaceDetector(ObjectDetector):
         logger.info(f"Face Detect Time: {elapsed}ms Timeout: {timeout}")
         return raw_detections, timeout
 
+    def detect_raw_batch(self, tensor_input):
+        """Run a (N, height, width, 3) batch and return (N, 20, 134) detections."""
+        if not self.detect_api.supports_batch:
+            detections = np.zeros((len(tensor_input), 20, 134), np.float32)
+            timeout = False
+
+            for i in range(len(tensor_input)):
+                detections[i], region_timeout = self.detect_raw(tensor_input[i : i + 1])
+                timeout = timeout or region_timeout
+
+            return detections, timeout
+
+        if self.input_transform:
+            tensor_input = np.transpose(tensor_input, self.input_transform)
+        start = time.monotonic_ns()
+        raw_detections, timeout = self.detect_api.detect_raw_batch(
+            tensor_input=tensor_input
+        )
+        stop = time.monotonic_ns()
+        elapsed = round((stop - start) / 1000000, 0)
+        logger.info(
+            f"Face Detect Time: {elapsed}ms Batch: {len(tensor_input)} Timeout: {timeout}"
+        )
+        return raw_detections, timeout
+
 
 def run_detector(
     name: str,
@@ -96,32 +121,42 @@ def run_detector(
     outputs = {}
     for name in out_events.keys():
         out_shm = mp.shared_memory.SharedMemory(name=f"out-face{name}", create=False)
-        out_np = np.ndarray((20, 134), dtype=np.float32, buffer=out_shm.buf)
-        outputs[name] = {"shm": out_shm, "np": out_np}
+        outputs[name] = {"shm": out_shm}
 
     while not stop_event.is_set():
         try:
-            connection_id = detection_queue.get(timeout=1)
+            connection_id, batch_size = detection_queue.get(timeout=1)
         except queue.Empty:
             continue
 
-        input_frame = frame_manager.get(
+        input_frames = frame_manager.get(
             f"face{connection_id}",
-            (1, detector_config.model.face_detection_height, detector_config.model.face_detection_width, 3),
+            (
+                batch_size,
+                detector_config.model.face_detection_height,
+                detector_config.model.face_detection_width,
+                3,
+            ),
         )
 
-        if input_frame is None:
+        if input_frames is None:
             continue
 
         # detect and send the output
         start.value = datetime.datetime.now().timestamp()
-        detections, timeout = object_detector.detect_raw(input_frame)
+        detections, timeout = object_detector.detect_raw_batch(input_frames)
         duration = datetime.datetime.now().timestamp() - start.value
-        outputs[connection_id]["np"][:] = detections[:]
+        out_np = np.ndarray(
+            (batch_size, 20, 134),
+            dtype=np.float32,
+            buffer=outputs[connection_id]["shm"].buf,
+        )
+        out_np[:] = detections[:]
         out_events[connection_id].set()
         start.value = 0.0
 
-        avg_speed.value = (avg_speed.value * 9 + duration) / 10
+        # track the speed per crop so it is comparable across batch sizes
+        avg_speed.value = (avg_speed.value * 9 + duration / batch_size) / 10
 
         if timeout == True:
             time.sleep(detector_config.model.face_recognition_pause_on_timeout)
@@ -179,16 +214,26 @@ class FaceDetectProcess:
         self.detect_process.start()
 
 class RemoteFaceDetector:
-    def __init__(self, name, labels, detection_queue, event, model_config, stop_event):
+    def __init__(
+        self,
+        name,
+        labels,
+        detection_queue,
+        event,
+        model_config,
+        stop_event,
+        max_batch=1,
+    ):
         self.labels = labels
         self.name = name
         self.fps = EventsPerSecond()
         self.detection_queue = detection_queue
         self.event = event
         self.stop_event = stop_event
+        self.max_batch = max_batch
         self.shm = mp.shared_memory.SharedMemory(name=f"face{self.name}", create=False)
         self.np_shm = np.ndarray(
-            (1, model_config.face_detection_height, model_config.face_detection_width, 3),
+            (max_batch, model_config.face_detection_height, model_config.face_detection_width, 3),
             dtype=np.uint8,
             buffer=self.shm.buf,
         )
@@ -196,7 +241,9 @@ class RemoteFaceDetector:
         self.out_shm = mp.shared_memory.SharedMemory(
             name=f"out-face{self.name}", create=False
         )
-        self.out_np_shm = np.ndarray((20, 134), dtype=np.float32, buffer=self.out_shm.buf)
+        self.out_np_shm = np.ndarray(
+            (max_batch, 20, 134), dtype=np.float32, buffer=self.out_shm.buf
+        )
 
     def detect(self, tensor_input, threshold=0.4):
         detections = []
@@ -205,29 +252,63 @@ class RemoteFaceDetector:
             return detections
 
         # copy input to shared memory
-        self.np_shm[:] = tensor_input[:]
+        self.np_shm[0:1] = tensor_input[:]
         self.event.clear()
-        self.detection_queue.put(self.name)
+        self.detection_queue.put((self.name, 1))
         result = self.event.wait(timeout=5.0)
 
         # if it timed out
         if result is None:
             return detections
 
-        for d in self.out_np_shm:
+        detections = self.parse_detections(self.out_np_shm[0], threshold)
+        self.fps.update()
+        return detections
+
+    def detect_batch(self, tensor_inputs, threshold=0.4):
+        """Detect faces in several crops with one request per max_batch crops."""
+        batch_detections = []
+
+        for batch_start in range(0, len(tensor_inputs), self.max_batch):
+            batch = tensor_inputs[batch_start : batch_start + self.max_batch]
+
+            if self.stop_event.is_set():
+                batch_detections.extend([[] for _ in batch])
+                continue
+
+            # copy inputs to their slots in shared memory
+            for i, tensor_input in enumerate(batch):
+                self.np_shm[i : i + 1] = tensor_input[:]
+
+            self.event.clear()
+            self.detection_queue.put((self.name, len(batch)))
+
+            # if it timed out
+            if not self.event.wait(timeout=5.0):
+                batch_detections.extend([[] for _ in batch])
+                continue
+
+            for i in range(len(batch)):
+                batch_detections.append(
+                    self.parse_detections(self.out_np_shm[i], threshold)
+                )
+                self.fps.update()
+
+        return batch_detections
+
+    def parse_detections(self, raw_detections, threshold):
+        detections = []
+
+        for d in raw_detections:
             if d[1] < threshold:
                 break
             entry = []
             entry.append(self.labels[int(d[0])])
             entry.append(float(d[1]))
             entry.append((d[2], d[3], d[4], d[5]))
-            result = []
-            for x in range(128): 
-                result.append(d[x+6])
-            entry.append(result)
+            entry.append(list(d[6:134]))
             detections.append(entry)
 
-        self.fps.update()
         return detections
 
     def cleanup(self):
@@ -0,0 +1,249 @@
+"""In-memory index of labelled face embeddings."""
+
+import logging
+import queue
+from enum import Enum
+from multiprocessing import Queue
+from typing import Optional
+
+import numpy as np
+
+from frigate.models import Face
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_SIZE = 128
+
+
+class FaceUpdateTypeEnum(str, Enum):
+    # a new face was captured or imported
+    face = "face"
+    # the label of an existing face changed
+    label = "label"
+    # the embeddings of an existing face were recomputed
+    embeddings = "embeddings"
+    # the face was removed
+    delete = "delete"
+    # every face should be trained again
+    retrain = "retrain"
+
+
+def embeddings_to_blob(embeddings) -> tuple[bytes, float]:
+    """Pack embeddings as float32 bytes for the face table along with the norm."""
+    vector = np.asarray(embeddings, dtype=np.float32).reshape(-1)
+    return vector.tobytes(), float(np.linalg.norm(vector))
+
+
+def load_face_embeddings() -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Bulk load every stored embedding straight from the blob column.
+
+    Returns the face ids, label ids, an (N, 128) float32 embeddings array and
+    the stored norm of each row.
+    """
+    rows = (
+        Face.select(Face.id, Face.label_id, Face.embeddings, Face.embeddings_norm)
+        .where(Face.embeddings.is_null(False), Face.label_id.is_null(False))
+        .tuples()
+    )
+
+    face_ids = []
+    label_ids = []
+    blobs = []
+    norms = []
+
+    for face_id, label_id, blob, norm in rows:
+        if len(blob) != EMBEDDING_SIZE * 4:
+            logger.warning(f"Ignoring face {face_id} with malformed embeddings")
+            continue
+
+        face_ids.append(face_id)
+        label_ids.append(label_id)
+        blobs.append(blob)
+        norms.append(
+            norm
+            if norm is not None
+            else float(np.linalg.norm(np.frombuffer(blob, dtype=np.float32)))
+        )
+
+    embeddings = (
+        np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(-1, EMBEDDING_SIZE)
+        if blobs
+        else np.zeros((0, EMBEDDING_SIZE), dtype=np.float32)
+    )
+
+    return (
+        face_ids,
+        np.array(label_ids, dtype=np.int32),
+        embeddings,
+        np.array(norms, dtype=np.float32),
+    )
+
+
+class FaceEmbeddingIndex:
+    """Hold every face embedding as one contiguous normalized float32 matrix.
+
+    Rows with a label id below 0 (Not Set) are kept so that labelling a face
+    later only needs the new label id, but they are never returned by search.
+    """
+
+    def __init__(self, update_queue: Optional[Queue] = None) -> None:
+        self.update_queue = update_queue
+        self.size = 0
+        self.face_ids: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.matrix = np.zeros((0, EMBEDDING_SIZE), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.label_ids = np.zeros(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def load(self) -> None:
+        """Populate the index from every face in the database."""
+        face_ids, label_ids, embeddings, norms = load_face_embeddings()
+
+        self.size = 0
+        self._reserve(len(face_ids))
+        self.size = len(face_ids)
+        self.face_ids = face_ids
+        self.rows = {face_id: row for row, face_id in enumerate(face_ids)}
+        safe_norms = np.where(norms > 0, norms, 1)
+        self.matrix[: self.size] = embeddings / safe_norms[:, None]
+        self.norms[: self.size] = norms
+        self.label_ids[: self.size] = label_ids
+
+        logger.debug(f"Loaded {self.size} face embeddings into the index")
+
+    def refresh(self) -> int:
+        """Apply pending updates from the update queue without blocking."""
+        if self.update_queue is None:
+            return 0
+
+        applied = 0
+
+        while True:
+            try:
+                (update_type, face_id, label_id, embeddings) = self.update_queue.get(
+                    False
+                )
+            except queue.Empty:
+                break
+
+            if update_type == FaceUpdateTypeEnum.delete:
+                self.remove(face_id)
+            elif update_type == FaceUpdateTypeEnum.label:
+                self.set_label(face_id, label_id)
+            elif embeddings is not None:
+                self.upsert(face_id, label_id, embeddings)
+
+            applied += 1
+
+        return applied
+
+    def upsert(self, face_id: str, label_id: int, embeddings) -> None:
+        """Add a face to the index or replace its embeddings."""
+        vector = np.asarray(embeddings, dtype=np.float32).reshape(-1)
+
+        if vector.shape[0] != EMBEDDING_SIZE:
+            logger.warning(
+                f"Ignoring face {face_id} with {vector.shape[0]} embedding values"
+            )
+            return
+
+        row = self.rows.get(face_id)
+
+        if row is None:
+            self._reserve(self.size + 1)
+            row = self.size
+            self.size += 1
+            self.rows[face_id] = row
+            self.face_ids.append(face_id)
+
+        norm = float(np.linalg.norm(vector))
+        self.matrix[row] = vector / norm if norm > 0 else vector
+        self.norms[row] = norm
+        self.label_ids[row] = -1 if label_id is None else label_id
+
+    def set_label(self, face_id: str, label_id: int) -> None:
+        row = self.rows.get(face_id)
+
+        if row is not None:
+            self.label_ids[row] = -1 if label_id is None else label_id
+
+    def remove(self, face_id: str) -> None:
+        """Remove a face by moving the last row into its place."""
+        row = self.rows.pop(face_id, None)
+
+        if row is None:
+            return
+
+        last = self.size - 1
+
+        if row != last:
+            moved_id = self.face_ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.norms[row] = self.norms[last]
+            self.label_ids[row] = self.label_ids[last]
+            self.face_ids[row] = moved_id
+            self.rows[moved_id] = row
+
+        self.face_ids.pop()
+        self.size = last
+
+    def search(self, embeddings) -> tuple[int, float, int, float]:
+        """Find the closest labelled faces to the given embeddings.
+
+        Returns (eu label id, min euclidean distance, cos label id, max cosine
+        similarity). A label id of -1 means no labelled face matched.
+        """
+        min_eu = 1000000.0
+        min_eu_label_id = -1
+        max_cos = 0.0
+        max_cos_label_id = -1
+
+        query = np.asarray(embeddings, dtype=np.float32).reshape(-1)
+        query_norm = float(np.linalg.norm(query))
+
+        if self.size == 0 or query_norm == 0:
+            return min_eu_label_id, min_eu, max_cos_label_id, max_cos
+
+        labelled = self.label_ids[: self.size] >= 0
+
+        if not labelled.any():
+            return min_eu_label_id, min_eu, max_cos_label_id, max_cos
+
+        # a single matrix multiply gives the cosine similarity for every face,
+        # the euclidean distance is derived from it using the stored norms
+        cos = self.matrix[: self.size] @ (query / query_norm)
+        cos = np.where(labelled, cos, -np.inf)
+        norms = self.norms[: self.size]
+        eu_squared = norms * norms + query_norm * query_norm - 2 * norms * query_norm * cos
+        eu_squared = np.where(labelled, eu_squared, np.inf)
+
+        eu_row = int(np.argmin(eu_squared))
+        min_eu = float(np.sqrt(max(eu_squared[eu_row], 0.0)))
+        min_eu_label_id = int(self.label_ids[eu_row])
+
+        cos_row = int(np.argmax(cos))
+
+        if cos[cos_row] > 0:
+            max_cos = float(cos[cos_row])
+            max_cos_label_id = int(self.label_ids[cos_row])
+
+        return min_eu_label_id, min_eu, max_cos_label_id, max_cos
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow the backing arrays geometrically to fit capacity rows."""
+        if capacity <= self.matrix.shape[0]:
+            return
+
+        new_capacity = max(capacity, self.matrix.shape[0] * 2, 64)
+        matrix = np.zeros((new_capacity, EMBEDDING_SIZE), dtype=np.float32)
+        norms = np.zeros(new_capacity, dtype=np.float32)
+        label_ids = np.full(new_capacity, -1, dtype=np.int32)
+        matrix[: self.size] = self.matrix[: self.size]
+        norms[: self.size] = self.norms[: self.size]
+        label_ids[: self.size] = self.label_ids[: self.size]
+        self.matrix = matrix
+        self.norms = norms
+        self.label_ids = label_ids
@@ -0,0 +1,194 @@
+"""Cache of preprocessed face samples for training the face recognizers."""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from frigate.const import MODEL_CACHE_DIR
+from frigate.face_store import FaceCropStore
+from frigate.util.image import calculate_gray_face_region
+
+logger = logging.getLogger(__name__)
+
+FACE_SAMPLES_DIR = f"{MODEL_CACHE_DIR}/face_samples"
+SAMPLE_SIZE = 360
+SAMPLE_BYTES = SAMPLE_SIZE * SAMPLE_SIZE
+
+
+def prepare_face_sample(
+    image: np.ndarray, width_crop: float, height_crop: float
+) -> np.ndarray:
+    """Prepare a stored face crop the same way process_frames does."""
+    gray_frame = cv2.cvtColor(image, cv2.COLOR_YUV2GRAY_I420)
+    height, width = gray_frame.shape
+    x_min, y_min, x_max, y_max = calculate_gray_face_region(
+        width, height, width_crop, height_crop
+    )
+    # [rows,columns] [ymin:ymax,xmin:xmax]
+    gray_face = cv2.resize(
+        gray_frame[y_min:y_max, x_min:x_max],
+        dsize=(SAMPLE_SIZE, SAMPLE_SIZE),
+        interpolation=cv2.INTER_CUBIC,
+    )
+    return cv2.equalizeHist(gray_face)
+
+
+class FaceSampleCache:
+    """Equalized 360x360 face samples in one memory mapped file.
+
+    Samples are appended to samples.u8 and their face ids to ids.txt in the
+    same order, in a directory per crop setting so a crop change starts a
+    new cache. Faces missing from the cache are prepared on a thread pool,
+    the opencv and numpy calls release the GIL so they run in parallel.
+    """
+
+    def __init__(
+        self,
+        width_crop: float,
+        height_crop: float,
+        cache_dir: str = FACE_SAMPLES_DIR,
+        load_crop: Optional[Callable[[str], Optional[np.ndarray]]] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        self.width_crop = width_crop
+        self.height_crop = height_crop
+        self.load_crop = load_crop or FaceCropStore().load_id
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.cache_dir = os.path.join(cache_dir, f"{width_crop:.3f}x{height_crop:.3f}")
+        self.samples_path = os.path.join(self.cache_dir, "samples.u8")
+        self.ids_path = os.path.join(self.cache_dir, "ids.txt")
+        self.rows: dict[str, int] = {}
+        self.samples = np.zeros((0, SAMPLE_SIZE, SAMPLE_SIZE), dtype=np.uint8)
+        self.consistent = True
+        self.open()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def open(self) -> None:
+        """Map the cache files, ignoring a sample or id written without the other."""
+        self.rows = {}
+        self.samples = np.zeros((0, SAMPLE_SIZE, SAMPLE_SIZE), dtype=np.uint8)
+        self.consistent = True
+
+        if not os.path.exists(self.ids_path) or not os.path.exists(
+            self.samples_path
+        ):
+            self.consistent = not os.path.exists(
+                self.ids_path
+            ) and not os.path.exists(self.samples_path)
+            return
+
+        with open(self.ids_path) as f:
+            face_ids = f.read().splitlines()
+
+        samples_size = os.path.getsize(self.samples_path)
+        count = min(len(face_ids), samples_size // SAMPLE_BYTES)
+        self.consistent = (
+            len(face_ids) == count and samples_size == count * SAMPLE_BYTES
+        )
+
+        if count == 0:
+            return
+
+        self.samples = np.memmap(
+            self.samples_path,
+            dtype=np.uint8,
+            mode="r",
+            shape=(count, SAMPLE_SIZE, SAMPLE_SIZE),
+        )
+        self.rows = {face_id: row for row, face_id in enumerate(face_ids[:count])}
+
+    def load(
+        self, face_ids: list[str], prune: bool = False
+    ) -> tuple[list[str], list[np.ndarray]]:
+        """Get the samples of the given faces, preparing any that are missing.
+
+        Returns the face ids that have a sample and their samples in the same
+        order. With prune, samples of faces that were not asked for are
+        removed from the cache.
+        """
+        missing = [face_id for face_id in dict.fromkeys(face_ids) if face_id not in self.rows]
+
+        if missing:
+            self.append(missing)
+
+        if prune and len(self.rows) > len(set(face_ids) & self.rows.keys()):
+            self.compact(face_ids)
+
+        found = [face_id for face_id in face_ids if face_id in self.rows]
+        return found, [self.samples[self.rows[face_id]] for face_id in found]
+
+    def append(self, face_ids: list[str]) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            samples = list(executor.map(self.prepare, face_ids))
+
+        prepared = [
+            (face_id, sample)
+            for face_id, sample in zip(face_ids, samples)
+            if sample is not None
+        ]
+
+        if not prepared:
+            return
+
+        if not self.consistent:
+            self.trim()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # samples are written before their ids so a partial write is ignored
+        with open(self.samples_path, "ab") as f:
+            for _, sample in prepared:
+                f.write(np.ascontiguousarray(sample, dtype=np.uint8).tobytes())
+
+        with open(self.ids_path, "a") as f:
+            f.write("".join(f"{face_id}\n" for face_id, _ in prepared))
+
+        logger.debug(f"Added {len(prepared)} face samples to the cache")
+        self.open()
+
+    def prepare(self, face_id: str) -> Optional[np.ndarray]:
+        crop = self.load_crop(face_id)
+
+        if crop is None:
+            logger.warning(f"Unable to load face sample {face_id}")
+            return None
+
+        return prepare_face_sample(crop, self.width_crop, self.height_crop)
+
+    def trim(self) -> None:
+        """Drop anything past the last complete sample and id pair."""
+        count = len(self.rows)
+
+        if os.path.exists(self.samples_path):
+            with open(self.samples_path, "ab") as f:
+                f.truncate(count * SAMPLE_BYTES)
+
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, "w") as f:
+                f.write("".join(f"{face_id}\n" for face_id in self.rows))
+
+    def compact(self, face_ids: list[str]) -> None:
+        """Rewrite the cache with only the given faces."""
+        keep = [face_id for face_id in dict.fromkeys(face_ids) if face_id in self.rows]
+        samples_temp = f"{self.samples_path}.tmp"
+        ids_temp = f"{self.ids_path}.tmp"
+
+        with open(samples_temp, "wb") as f:
+            for face_id in keep:
+                f.write(self.samples[self.rows[face_id]].tobytes())
+
+        with open(ids_temp, "w") as f:
+            f.write("".join(f"{face_id}\n" for face_id in keep))
+
+        # the memmap has to be released before its file is replaced
+        self.samples = np.zeros((0, SAMPLE_SIZE, SAMPLE_SIZE), dtype=np.uint8)
+        self.rows = {}
+        os.replace(samples_temp, self.samples_path)
+        os.replace(ids_temp, self.ids_path)
+        self.open()
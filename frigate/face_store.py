@@ -0,0 +1,234 @@
+"""Store face crops in append-only segment files."""
+
+import logging
+import mmap
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+from peewee import fn
+
+from frigate.const import FACES_DIR
+from frigate.models import Face
+
+logger = logging.getLogger(__name__)
+
+FACE_STORE_DIR = f"{FACES_DIR}/store"
+SEGMENT_SIZE = 256 * 1024 * 1024
+# sealed segments are rewritten once this share of their bytes is deleted faces
+COMPACT_DEAD_RATIO = 0.5
+
+
+class FaceCropStore:
+    """Append face crops to numbered segment files and read them back with mmap.
+
+    A crop is stored as its raw uint8 bytes, the Face row keeps the segment,
+    offset and shape so reads are a view into the mapped segment without
+    copying. Only one instance should write, any number can read. Deleting a
+    face leaves its bytes behind, compact() moves the faces that are left out
+    of mostly deleted segments.
+    """
+
+    def __init__(
+        self,
+        store_dir: str = FACE_STORE_DIR,
+        segment_size: int = SEGMENT_SIZE,
+        faces_dir: str = FACES_DIR,
+    ) -> None:
+        self.store_dir = store_dir
+        self.segment_size = segment_size
+        self.faces_dir = faces_dir
+        self.lock = threading.Lock()
+        self.maps: dict[int, mmap.mmap] = {}
+        self.segment: Optional[int] = None
+        self.segment_file = None
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.store_dir, f"{segment:05d}.bin")
+
+    def append(self, crop: np.ndarray) -> dict:
+        """Write a crop and return the Face fields that locate it."""
+        data = np.ascontiguousarray(crop, dtype=np.uint8)
+
+        if self.segment_file is None:
+            self.open_segment()
+
+        if self.segment_file.tell() > 0 and (
+            self.segment_file.tell() + data.nbytes > self.segment_size
+        ):
+            self.segment_file.close()
+            self.segment += 1
+            self.segment_file = open(self.segment_path(self.segment), "ab")
+
+        offset = self.segment_file.tell()
+        self.segment_file.write(data.tobytes())
+        # readers map the file so the crop has to be there before the row is
+        self.segment_file.flush()
+
+        return {
+            Face.crop_segment: self.segment,
+            Face.crop_offset: offset,
+            Face.crop_height: data.shape[0],
+            Face.crop_width: data.shape[1],
+        }
+
+    def open_segment(self) -> None:
+        os.makedirs(self.store_dir, exist_ok=True)
+        segments = [
+            int(name.split(".")[0])
+            for name in os.listdir(self.store_dir)
+            if name.endswith(".bin")
+        ]
+        self.segment = max(segments, default=0)
+        self.segment_file = open(self.segment_path(self.segment), "ab")
+
+    def read(self, segment: int, offset: int, height: int, width: int) -> np.ndarray:
+        """Return a read only view of a crop in its mapped segment."""
+        size = height * width
+
+        with self.lock:
+            segment_map = self.maps.get(segment)
+
+            # the segment grew since it was mapped, the old map is left to be
+            # released with the last crop that is still viewing it
+            if segment_map is None or len(segment_map) < offset + size:
+                with open(self.segment_path(segment), "rb") as f:
+                    segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+                self.maps[segment] = segment_map
+                self.drop_removed_maps()
+
+        return np.frombuffer(
+            segment_map, dtype=np.uint8, count=size, offset=offset
+        ).reshape(height, width)
+
+    def drop_removed_maps(self) -> None:
+        """Forget maps of compacted segments so their disk space is released."""
+        for segment in list(self.maps):
+            if not os.path.exists(self.segment_path(segment)):
+                del self.maps[segment]
+
+    def compact(self, dead_ratio: float = COMPACT_DEAD_RATIO) -> int:
+        """Move the faces out of sealed segments that are mostly deleted faces.
+
+        Must only be called by the writer. Returns the number of bytes freed.
+        """
+        if self.segment_file is None:
+            self.open_segment()
+
+        live_bytes = {
+            segment: size
+            for segment, size in Face.select(
+                Face.crop_segment, fn.SUM(Face.crop_height * Face.crop_width)
+            )
+            .where(Face.crop_segment < self.segment)
+            .group_by(Face.crop_segment)
+            .tuples()
+        }
+        freed = 0
+
+        for name in sorted(os.listdir(self.store_dir)):
+            if not name.endswith(".bin"):
+                continue
+
+            segment = int(name.split(".")[0])
+
+            if segment >= self.segment:
+                continue
+
+            size = os.path.getsize(self.segment_path(segment))
+            live = live_bytes.get(segment, 0)
+
+            if size - live < size * dead_ratio:
+                continue
+
+            for face in Face.select(
+                Face.id,
+                Face.crop_segment,
+                Face.crop_offset,
+                Face.crop_height,
+                Face.crop_width,
+            ).where(Face.crop_segment == segment):
+                crop = self.load(face)
+
+                if crop is None:
+                    continue
+
+                Face.update(self.append(crop)).where(
+                    Face.id == face.id, Face.crop_segment == segment
+                ).execute()
+
+            with self.lock:
+                self.maps.pop(segment, None)
+
+            os.remove(self.segment_path(segment))
+            freed += size - live
+
+        if freed > 0:
+            logger.info(f"Compacted the face store, freed {freed} bytes")
+
+        return freed
+
+    def load(self, face: Face, retry: bool = True) -> Optional[np.ndarray]:
+        """Get the crop of a face, falling back to a .npy file not imported yet."""
+        if face.crop_segment is not None:
+            try:
+                return self.read(
+                    face.crop_segment,
+                    face.crop_offset,
+                    face.crop_height,
+                    face.crop_width,
+                )
+            except FileNotFoundError as e:
+                # compaction moved the face after its row was read
+                if retry:
+                    return self.load_id(face.id, retry=False)
+
+                logger.warning(f"Unable to read face {face.id} from the store: {e}")
+                return None
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unable to read face {face.id} from the store: {e}")
+                return None
+
+        try:
+            return np.load(f"{self.faces_dir}/{face.id}.npy")
+        except (OSError, ValueError):
+            return None
+
+    def load_id(self, face_id: str, retry: bool = True) -> Optional[np.ndarray]:
+        try:
+            face = Face.get(Face.id == face_id)
+        except Face.DoesNotExist:
+            return None
+
+        return self.load(face, retry)
+
+    def import_npy_faces(self) -> int:
+        """Move every face still saved as a .npy file into the store."""
+        imported = 0
+
+        for face in Face.select(Face.id).where(Face.crop_segment.is_null()):
+            path = f"{self.faces_dir}/{face.id}.npy"
+
+            try:
+                crop = np.load(path)
+            except (OSError, ValueError):
+                continue
+
+            Face.update(self.append(crop)).where(Face.id == face.id).execute()
+            os.remove(path)
+            imported += 1
+
+        if imported > 0:
+            logger.info(f"Imported {imported} face crops into the face store")
+
+        return imported
+
+    def close(self) -> None:
+        if self.segment_file is not None:
+            self.segment_file.close()
+            self.segment_file = None
+
+        with self.lock:
+            self.maps = {}
@@ -0,0 +1,181 @@
+"""Cache of encoded face images served by the api."""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from frigate.const import MODEL_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+FACE_THUMBNAILS_DIR = f"{MODEL_CACHE_DIR}/face_thumbnails"
+
+
+class FaceThumbnailCache:
+    """Size bounded LRU of encoded face images in memory and on disk.
+
+    Entries are keyed by face id, variant and format. The memory tier holds
+    the most recently served images, the disk tier keeps them across
+    restarts. Both evict the least recently used entries when they go over
+    their size, and every entry of a face is dropped when it is deleted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = FACE_THUMBNAILS_DIR,
+        max_memory_bytes: int = 32 * 1024 * 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.lock = threading.Lock()
+        # key -> (etag, image)
+        self.memory: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self.memory_bytes = 0
+        # key -> size of the file
+        self.disk: OrderedDict[str, int] = OrderedDict()
+        self.disk_bytes = 0
+        self.load_disk_index()
+
+    @staticmethod
+    def key(face_id: str, variant: str, format: str) -> str:
+        return f"{face_id}.{variant}.{format}"
+
+    @staticmethod
+    def etag(image: bytes) -> str:
+        return hashlib.md5(image).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load_disk_index(self) -> None:
+        """Index the files already on disk, oldest first."""
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        entries = []
+
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+
+    def get(
+        self, face_id: str, variant: str, format: str
+    ) -> Optional[tuple[str, bytes]]:
+        """Return the etag and image of a cached entry."""
+        key = self.key(face_id, variant, format)
+
+        with self.lock:
+            cached = self.memory.get(key)
+
+            if key in self.disk:
+                self.disk.move_to_end(key)
+
+            if cached is not None:
+                self.memory.move_to_end(key)
+                return cached
+
+            if key not in self.disk:
+                return None
+
+        try:
+            with open(self.path(key), "rb") as f:
+                image = f.read()
+        except OSError:
+            with self.lock:
+                self.disk_bytes -= self.disk.pop(key, 0)
+
+            return None
+
+        cached = (self.etag(image), image)
+
+        with self.lock:
+            self.add_to_memory(key, cached)
+
+        return cached
+
+    def put(
+        self, face_id: str, variant: str, format: str, image: bytes
+    ) -> tuple[str, bytes]:
+        """Cache an image and return its etag and the image."""
+        key = self.key(face_id, variant, format)
+        cached = (self.etag(image), image)
+
+        with self.lock:
+            self.add_to_memory(key, cached)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{self.path(key)}.tmp"
+
+            with open(temp_path, "wb") as f:
+                f.write(image)
+
+            os.replace(temp_path, self.path(key))
+        except OSError as e:
+            logger.debug(f"Unable to write face thumbnail {key} to disk: {e}")
+            return cached
+
+        with self.lock:
+            self.disk_bytes += len(image) - self.disk.pop(key, 0)
+            self.disk[key] = len(image)
+            evicted = self.evict_disk()
+
+        for evicted_key in evicted:
+            try:
+                os.remove(self.path(evicted_key))
+            except OSError:
+                pass
+
+        return cached
+
+    def invalidate(self, face_id: str) -> None:
+        """Drop every cached image of a face."""
+        prefix = f"{face_id}."
+
+        with self.lock:
+            for key in [key for key in self.memory if key.startswith(prefix)]:
+                self.memory_bytes -= len(self.memory.pop(key)[1])
+
+            removed = [key for key in self.disk if key.startswith(prefix)]
+
+            for key in removed:
+                self.disk_bytes -= self.disk.pop(key)
+
+        for key in removed:
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def add_to_memory(self, key: str, cached: tuple[str, bytes]) -> None:
+        previous = self.memory.pop(key, None)
+
+        if previous is not None:
+            self.memory_bytes -= len(previous[1])
+
+        self.memory[key] = cached
+        self.memory_bytes += len(cached[1])
+
+        while self.memory_bytes > self.max_memory_bytes and self.memory:
+            _, (_, image) = self.memory.popitem(last=False)
+            self.memory_bytes -= len(image)
+
+    def evict_disk(self) -> list[str]:
+        evicted = []
+
+        while self.disk_bytes > self.max_disk_bytes and self.disk:
+            key, size = self.disk.popitem(last=False)
+            self.disk_bytes -= size
+            evicted.append(key)
+
+        return evicted
@@ -0,0 +1,217 @@
+"""Train the OpenCV face recognizers in the background."""
+
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+from types import FrameType
+from typing import Optional
+
+import cv2
+import numpy as np
+from playhouse.sqliteq import SqliteQueueDatabase
+from setproctitle import setproctitle
+
+from frigate.config import FrigateConfig
+from frigate.face_index import FaceUpdateTypeEnum
+from frigate.face_samples import FaceSampleCache
+from frigate.models import Face
+from frigate.util.services import listen
+
+logger = logging.getLogger(__name__)
+
+# node written at the root of the model file by each recognizer type
+RECOGNIZER_NODES = {
+    "opencv_lbphfaces": "LBPH",
+    "opencv_fisherfaces": "Fisher",
+    "opencv_eigenfaces": "Eigen",
+}
+
+
+def face_model_path(version: int) -> str:
+    return f"/facerecognition_{version}.yml"
+
+
+def create_face_recognizer(model: str):
+    if model == "Fisher":
+        return cv2.face.FisherFaceRecognizer_create()
+
+    if model == "Eigen":
+        return cv2.face.EigenFaceRecognizer_create()
+
+    return cv2.face.LBPHFaceRecognizer_create()
+
+
+def read_face_recognizer(path: str):
+    """Create the recognizer type the model file was written by and load it."""
+    storage = cv2.FileStorage(path, cv2.FILE_STORAGE_READ)
+    model = "LBPH"
+
+    for node, node_model in RECOGNIZER_NODES.items():
+        if not storage.getNode(node).empty():
+            model = node_model
+            break
+
+    storage.release()
+    recognizer = create_face_recognizer(model)
+    recognizer.read(path)
+    return recognizer
+
+
+class FaceTrainer:
+    """Keep a face recognizer up to date with the labelled faces.
+
+    LBPH models are extended with the faces that were labelled since the last
+    update. Fisher and Eigen can not be extended, and no model can forget a
+    face, so any other change retrains the model from every labelled face.
+    """
+
+    def __init__(
+        self, config: FrigateConfig, samples: Optional[FaceSampleCache] = None
+    ) -> None:
+        self.config = config
+        self.samples = (
+            samples
+            if samples is not None
+            else FaceSampleCache(
+                config.model.face_recognition_width_crop,
+                config.model.face_recognition_height_crop,
+            )
+        )
+        self.recognizer = None
+        self.model: Optional[str] = None
+        # face id -> label id of every face the model was trained with
+        self.trained: dict[str, int] = {}
+
+    def train(self) -> None:
+        labels = dict(
+            Face.select(Face.id, Face.label_id)
+            .where(Face.label_id >= 0)
+            .order_by(Face.capture_time)
+            .tuples()
+        )
+        face_ids, faces = self.samples.load(list(labels.keys()), prune=True)
+        ids = [labels[face_id] for face_id in face_ids]
+
+        self.model = self.config.model.face_recognition_model
+
+        # Fisher and Eigen needs at least 2 ids
+        if len(np.unique(ids)) < 2:
+            self.model = "LBPH"
+
+        self.recognizer = create_face_recognizer(self.model)
+
+        if len(faces) > 0:
+            self.recognizer.train(faces, np.array(ids))
+
+        self.trained = dict(zip(face_ids, ids))
+        logger.info(f"Trained {self.model} face recognition with {len(faces)} faces")
+
+    def apply_updates(self, updates: list[tuple]) -> bool:
+        """Bring the model up to date with face updates, return True if it changed."""
+        retrain = self.recognizer is None
+        new_faces: dict[str, int] = {}
+
+        for update_type, face_id, label_id in updates:
+            if update_type == FaceUpdateTypeEnum.retrain:
+                retrain = True
+            elif update_type == FaceUpdateTypeEnum.delete:
+                new_faces.pop(face_id, None)
+                retrain = retrain or face_id in self.trained
+            elif face_id in self.trained:
+                retrain = retrain or self.trained[face_id] != label_id
+            elif label_id is not None and label_id >= 0:
+                new_faces[face_id] = label_id
+            else:
+                new_faces.pop(face_id, None)
+
+        # only LBPH can learn new faces without starting over
+        if new_faces and self.config.model.face_recognition_model != "LBPH":
+            retrain = True
+
+        if retrain:
+            self.train()
+            return True
+
+        face_ids, faces = self.samples.load(list(new_faces.keys()))
+
+        if not faces:
+            return False
+
+        ids = [new_faces[face_id] for face_id in face_ids]
+        self.trained.update(zip(face_ids, ids))
+
+        self.recognizer.update(faces, np.array(ids))
+        logger.info(f"Updated LBPH face recognition with {len(faces)} faces")
+        return True
+
+    def write(self, version: int) -> None:
+        """Write the model as the given version and remove older versions."""
+        path = face_model_path(version)
+        temp_path = f"{path}.tmp.yml"
+        self.recognizer.write(temp_path)
+        os.replace(temp_path, path)
+
+        # the previous version may still be loading in a camera process
+        old_path = face_model_path(version - 2)
+
+        if version > 1 and os.path.exists(old_path):
+            os.remove(old_path)
+
+
+def run_face_trainer(
+    config: FrigateConfig,
+    training_queue: mp.Queue,
+    model_version,
+) -> None:
+    stop_event = mp.Event()
+
+    def receiveSignal(signalNumber: int, frame: Optional[FrameType]) -> None:
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, receiveSignal)
+    signal.signal(signal.SIGINT, receiveSignal)
+
+    threading.current_thread().name = "process:face_trainer"
+    setproctitle("frigate.face_trainer")
+    listen()
+
+    db = SqliteQueueDatabase(
+        config.database.path,
+        pragmas={
+            "auto_vacuum": "FULL",  # Does not defragment database
+            "cache_size": -512 * 1000,  # 512MB of cache
+            "synchronous": "NORMAL",  # Safe when using WAL https://www.sqlite.org/pragma.html#pragma_synchronous
+        },
+        timeout=60,
+    )
+    db.bind([Face])
+
+    trainer = FaceTrainer(config)
+    trainer.train()
+    version = model_version.value + 1
+    trainer.write(version)
+    model_version.value = version
+
+    while not stop_event.is_set():
+        try:
+            updates = [training_queue.get(timeout=1)]
+        except queue.Empty:
+            continue
+
+        # labelling usually happens in bursts, wait for the rest of it
+        while True:
+            try:
+                updates.append(training_queue.get(timeout=0.5))
+            except queue.Empty:
+                break
+
+        if trainer.apply_updates(updates):
+            version += 1
+            trainer.write(version)
+            model_version.value = version
+
+    db.stop()
+    logger.info("Exiting face trainer...")
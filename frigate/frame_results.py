@@ -0,0 +1,283 @@
+"""Per frame tracking results shared between processes in a binary layout."""
+
+from multiprocessing import shared_memory
+from typing import Any, Optional
+
+import numpy as np
+
+from frigate.const import FRAME_RESULT_MAX_OBJECTS, FRAME_RESULT_SLOTS
+from frigate.util.image import area
+
+# numeric fields every tracked object has, as (name, dtype, length)
+OBJECT_FIELDS = [
+    ("score", np.float64, 1),
+    ("box", np.int64, 4),
+    ("area", np.int64, 1),
+    ("ratio", np.float64, 1),
+    ("region", np.int64, 4),
+    ("frame_time", np.float64, 1),
+    ("start_time", np.float64, 1),
+    ("centroid", np.int64, 2),
+    ("estimate", np.int64, 4),
+    ("motionless_count", np.int64, 1),
+    ("position_changes", np.int64, 1),
+]
+
+OBJECT_DTYPE = np.dtype(
+    [("used", np.bool_)]
+    + [
+        (name, dtype) if length == 1 else (name, dtype, (length,))
+        for name, dtype, length in OBJECT_FIELDS
+    ]
+)
+
+RESULT_DTYPE = np.dtype(
+    [
+        # -1 while the camera is writing the slot
+        ("generation", np.int64),
+        ("frame_time", np.float64),
+        ("motion_box_count", np.int64),
+        ("motion_area", np.int64),
+        # filled in by the tracked object processor
+        ("active_count", np.int64),
+        ("moving_count", np.int64),
+        ("objects", OBJECT_DTYPE, (FRAME_RESULT_MAX_OBJECTS,)),
+    ]
+)
+
+
+class FrameResultRing:
+    """Ring of binary frame results in shared memory for each camera.
+
+    The camera process writes the tracked objects of a frame into the next
+    slot, the tracked object processor adds the counts it works out and the
+    output and recording processes read them from the same slot. A result is
+    passed around as the generation it was written with, a slot that was
+    written again since then is not returned.
+    """
+
+    def __init__(self, cameras: list[str], slots: int = FRAME_RESULT_SLOTS) -> None:
+        self.slots = slots
+        self.shms: dict[str, shared_memory.SharedMemory] = {}
+        self.results: dict[str, np.ndarray] = {}
+
+        for camera in cameras:
+            name = f"{camera}-results"
+            size = slots * RESULT_DTYPE.itemsize
+
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # left behind by a previous run that did not exit cleanly
+                shm = shared_memory.SharedMemory(name=name)
+
+                if shm.size < size:
+                    shm.close()
+                    shm.unlink()
+                    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+            self.shms[camera] = shm
+            self.results[camera] = np.ndarray(
+                (slots,), dtype=RESULT_DTYPE, buffer=shm.buf
+            )
+            self.results[camera]["generation"] = -1
+
+    def slot(self, camera: str, result_ref: int) -> np.ndarray:
+        return self.results[camera][result_ref % self.slots]
+
+    def get(self, camera: str, result_ref: int) -> Optional[np.ndarray]:
+        """Copy of a result, None if its slot was written again."""
+        result = self.slot(camera, result_ref)
+
+        if result["generation"] != result_ref:
+            return None
+
+        copy = result.copy()
+
+        # the slot could have been written while it was copied
+        if result["generation"] != result_ref:
+            return None
+
+        return copy
+
+    def get_counts(
+        self, camera: str, result_ref: int
+    ) -> Optional[tuple[int, int, int, int]]:
+        """Motion box count, motion area, active and moving object counts."""
+        result = self.slot(camera, result_ref)
+
+        if result["generation"] != result_ref:
+            return None
+
+        counts = (
+            int(result["motion_box_count"]),
+            int(result["motion_area"]),
+            int(result["active_count"]),
+            int(result["moving_count"]),
+        )
+
+        if result["generation"] != result_ref:
+            return None
+
+        return counts
+
+    def set_counts(
+        self, camera: str, result_ref: int, active_count: int, moving_count: int
+    ) -> None:
+        result = self.slot(camera, result_ref)
+
+        if result["generation"] == result_ref:
+            result["active_count"] = active_count
+            result["moving_count"] = moving_count
+
+    def close(self) -> None:
+        self.results = {}
+
+        for shm in self.shms.values():
+            try:
+                shm.close()
+            except BufferError:
+                # a result is still in use, it is unmapped when the process exits
+                pass
+
+    def unlink(self) -> None:
+        self.close()
+
+        for shm in self.shms.values():
+            shm.unlink()
+
+        self.shms = {}
+
+
+class FrameResultWriter:
+    """Writes the tracked objects of a camera into its result ring.
+
+    Each object keeps the same row while it is tracked. Everything that is
+    not a fixed numeric field, like the id, label, sub label and attributes,
+    is returned as the changes since the previous result so only what
+    changed has to be sent along with the result reference. Objects that
+    do not fit in the rows are returned whole.
+    """
+
+    def __init__(self, frame_results: FrameResultRing, camera: str) -> None:
+        self.frame_results = frame_results
+        self.camera = camera
+        self.generation = -1
+        self.rows: dict[str, int] = {}
+        # the last values of the other fields sent for each row
+        self.sent: dict[int, dict[str, Any]] = {}
+
+    def write(
+        self, frame_time: float, tracked_objects: dict[str, dict], motion_boxes
+    ) -> tuple[int, dict[int, dict[str, Any]], dict[str, dict]]:
+        """Write a frame and return its reference, changes and overflow."""
+        # free the rows of objects that are gone
+        for object_id in [i for i in self.rows if i not in tracked_objects]:
+            self.sent.pop(self.rows.pop(object_id), None)
+
+        free_rows = iter(
+            sorted(set(range(FRAME_RESULT_MAX_OBJECTS)) - set(self.rows.values()))
+        )
+        rows = []
+        objects = []
+        overflow = {}
+
+        for object_id, obj in tracked_objects.items():
+            row = self.rows.get(object_id)
+
+            if row is None:
+                row = next(free_rows, None)
+
+                if row is None or any(
+                    field not in obj for field, _, _ in OBJECT_FIELDS
+                ):
+                    overflow[object_id] = obj
+                    continue
+
+                self.rows[object_id] = row
+
+            rows.append(row)
+            objects.append(obj)
+
+        self.generation += 1
+        result = self.frame_results.slot(self.camera, self.generation)
+        result["generation"] = -1
+        result["frame_time"] = frame_time
+        result["motion_box_count"] = len(motion_boxes)
+        result["motion_area"] = sum(area(box) for box in motion_boxes)
+        result["active_count"] = 0
+        result["moving_count"] = 0
+
+        records = result["objects"]
+        records["used"] = False
+
+        if rows:
+            records["used"][rows] = True
+
+            for field, _, _ in OBJECT_FIELDS:
+                records[field][rows] = [obj[field] for obj in objects]
+
+        changes = {}
+
+        for row, obj in zip(rows, objects):
+            sent = self.sent.setdefault(row, {})
+            changed = {
+                key: value
+                for key, value in obj.items()
+                if key not in records.dtype.names
+                and (key not in sent or sent[key] != value)
+            }
+
+            if changed:
+                sent.update(changed)
+                changes[row] = changed
+
+        result["generation"] = self.generation
+        return self.generation, changes, overflow
+
+
+class FrameResultReader:
+    """Turns the results of a camera back into tracked object dicts.
+
+    Results have to be read in the order they were written since the
+    changes only hold what changed since the previous one.
+    """
+
+    def __init__(self, frame_results: FrameResultRing, camera: str) -> None:
+        self.frame_results = frame_results
+        self.camera = camera
+        self.fields: dict[int, dict[str, Any]] = {}
+
+    def read(
+        self,
+        result_ref: int,
+        changes: dict[int, dict[str, Any]],
+        overflow: dict[str, dict],
+    ) -> Optional[dict[str, dict]]:
+        for row, changed in changes.items():
+            # a new object in a row starts over
+            if "id" in changed:
+                self.fields[row] = {}
+
+            self.fields.setdefault(row, {}).update(changed)
+
+        result = self.frame_results.get(self.camera, result_ref)
+
+        if result is None:
+            return None
+
+        records = result["objects"]
+        rows = np.flatnonzero(records["used"])
+        values = [records[field][rows].tolist() for field, _, _ in OBJECT_FIELDS]
+        tracked_objects = {}
+
+        for row, row_values in zip(rows.tolist(), zip(*values)):
+            obj = {
+                field: tuple(value) if isinstance(value, list) else value
+                for (field, _, _), value in zip(OBJECT_FIELDS, row_values)
+            }
+            obj.update(self.fields[row])
+            tracked_objects[obj["id"]] = obj
+
+        tracked_objects.update(overflow)
+        return tracked_objects
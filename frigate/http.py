@@ -42,6 +42,9 @@ from frigate.const import (
     RECORD_DIR,
 )
 from frigate.events.external import ExternalEventProcessor
+from frigate.face_index import FaceUpdateTypeEnum, embeddings_to_blob
+from frigate.face_store import FaceCropStore
+from frigate.face_thumbnails import FaceThumbnailCache
 from frigate.models import Event, Face, FaceLabel, Recordings, Timeline
 from frigate.object_processing import TrackedObject
 from frigate.plus import PlusApi
@@ -67,6 +70,9 @@ logger = logging.getLogger(__name__)
 
 bp = Blueprint("frigate", __name__)
 
+# seconds an mjpeg stream waits for a new frame before sending the last one again
+MJPEG_FRAME_TIMEOUT = 1
+
 
 def create_app(
     frigate_config,
@@ -102,6 +108,8 @@ def create_app(
     app.external_processor = external_processor
     app.plus_api = plus_api
     app.face_queue = face_queue
+    app.face_store = FaceCropStore()
+    app.face_thumbnails = FaceThumbnailCache()
     app.facedetection_queue = facedetection_queue
     app.faceresult_connection = faceresult_connection
     app.stop_event = stop_event
@@ -459,7 +467,9 @@ def set_sub_label(id):
 def face(id):
     logger.info("/faces/<id>")
     try:
-        return model_to_dict(Face.get(Face.id == id))
+        return model_to_dict(
+            Face.get(Face.id == id), exclude=[Face.embeddings]
+        )
     except DoesNotExist:
         return "Face not found", 404
 
@@ -494,6 +504,9 @@ def faces_set_label(id):
     face.label_id = labelid
 
     face.save()
+    current_app.face_queue.put(
+        (FaceUpdateTypeEnum.label, face.id, labelid, None, None, None)
+    )
     return make_response(
         jsonify(
             {
@@ -578,6 +591,9 @@ def delete_facelabel(id):
         if f.label_id == int(id):
             f.label_id = -1
             f.save()
+            current_app.face_queue.put(
+                (FaceUpdateTypeEnum.label, f.id, -1, None, None, None)
+            )
 
     return make_response(
         jsonify({"success": True, "message": "FaceLabel " + id + " deleted"}), 200
@@ -865,11 +881,17 @@ def delete_face(id):
             jsonify({"success": False, "message": "Face " + id + " not found"}), 404
         )
 
-    media_name = f"{face.id}"
-    media = Path(f"{os.path.join(FACES_DIR, media_name)}.npy")
-    media.unlink(missing_ok=True)
+    # faces in the store are reclaimed when the face processor compacts it
+    if face.crop_segment is None:
+        media = Path(f"{os.path.join(FACES_DIR, face.id)}.npy")
+        media.unlink(missing_ok=True)
+
+    current_app.face_thumbnails.invalidate(face.id)
 
     face.delete_instance()
+    current_app.face_queue.put(
+        (FaceUpdateTypeEnum.delete, face.id, None, None, None, None)
+    )
     return make_response(
         jsonify({"success": True, "message": "Face " + id + " deleted"}), 200
     )
@@ -877,145 +899,171 @@ def delete_face(id):
 
 @bp.route("/faces/<id>/thumbnail.jpg")
 def face_thumbnail(id, max_cache_age=2592000):
-    format = request.args.get("format", "ios")
+    # anything else is served the same as ios
+    format = "android" if request.args.get("format") == "android" else "ios"
     thumbnail_bytes = None
-    try:
-        face = Face.get(Face.id == id)
-    except DoesNotExist:
-        return "Face not found", 404
+    cached = current_app.face_thumbnails.get(id, "thumbnail", format)
 
-    try:
-        image = np.load(FACES_DIR + "/" + face.id + ".npy")
-    except:
-        return "Event not found", 404
+    if cached is None:
+        try:
+            face = Face.get(Face.id == id)
+        except DoesNotExist:
+            return "Face not found", 404
 
-    if image is None:
-        return "Event not found", 404
+        image = current_app.face_store.load(face)
 
-    try:
-        best_frame = cv2.cvtColor(
-            image,
-            cv2.COLOR_YUV2BGR_I420,
-        )
-    except KeyError:
-        return "Event not found", 404
+        if image is None:
+            return "Event not found", 404
 
+        try:
+            best_frame = cv2.cvtColor(
+                image,
+                cv2.COLOR_YUV2BGR_I420,
+            )
+        except KeyError:
+            return "Event not found", 404
 
-    best_frame = cv2.resize(
-        best_frame, dsize=(175, 175), interpolation=cv2.INTER_AREA
-    )
 
-    ret, jpg = cv2.imencode(
-        ".jpg", best_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70]
-    )
+        best_frame = cv2.resize(
+            best_frame, dsize=(175, 175), interpolation=cv2.INTER_AREA
+        )
+
+        ret, jpg = cv2.imencode(
+            ".jpg", best_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70]
+        )
     
-    thumbnail_bytes = jpg.tobytes()
+        thumbnail_bytes = jpg.tobytes()
 
-    if thumbnail_bytes is None:
-        return "Event not found", 404
+        if thumbnail_bytes is None:
+            return "Event not found", 404
 
-    # android notifications prefer a 2:1 ratio
-    if format == "android":
-        jpg_as_np = np.frombuffer(thumbnail_bytes, dtype=np.uint8)
-        img = cv2.imdecode(jpg_as_np, flags=1)
-        thumbnail = cv2.copyMakeBorder(
-            img,
-            0,
-            0,
-            int(img.shape[1] * 0.5),
-            int(img.shape[1] * 0.5),
-            cv2.BORDER_CONSTANT,
-            (0, 0, 0),
+        # android notifications prefer a 2:1 ratio
+        if format == "android":
+            jpg_as_np = np.frombuffer(thumbnail_bytes, dtype=np.uint8)
+            img = cv2.imdecode(jpg_as_np, flags=1)
+            thumbnail = cv2.copyMakeBorder(
+                img,
+                0,
+                0,
+                int(img.shape[1] * 0.5),
+                int(img.shape[1] * 0.5),
+                cv2.BORDER_CONSTANT,
+                (0, 0, 0),
+            )
+            ret, jpg = cv2.imencode(".jpg", thumbnail, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+            thumbnail_bytes = jpg.tobytes()
+
+        cached = current_app.face_thumbnails.put(
+            id, "thumbnail", format, thumbnail_bytes
         )
-        ret, jpg = cv2.imencode(".jpg", thumbnail, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-        thumbnail_bytes = jpg.tobytes()
 
+    etag, thumbnail_bytes = cached
     response = make_response(thumbnail_bytes)
     response.headers["Content-Type"] = "image/jpeg"
     response.headers["Cache-Control"] = f"private, max-age={max_cache_age}"
-    return response
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @bp.route("/faces/<id>/dectector_thumbnail.jpg")
 def face_dectector_thumbnail(id):
-    format = request.args.get("format", "ios")
+    # anything else is served the same as ios
+    format = "android" if request.args.get("format") == "android" else "ios"
     thumbnail_bytes = None
-    try:
-        face = Face.get(Face.id == id)
-    except DoesNotExist:
-        return "Face not found", 404
+    model_config = current_app.frigate_config.model
 
-    try:
-        image = np.load(FACES_DIR + "/" + face.id + ".npy")
-    except:
-        return "Event not found", 404
+    # the image depends on how the recognizer is configured
+    if "DOODS" in model_config.face_recognition_model:
+        variant = "detector-colour"
+    else:
+        variant = (
+            f"detector-{model_config.face_recognition_width_crop}"
+            f"x{model_config.face_recognition_height_crop}"
+        )
 
-    if image is None:
-        return "Event not found", 404
+    cached = current_app.face_thumbnails.get(id, variant, format)
 
-    if "DOODS" in current_app.frigate_config.model.face_recognition_model:
+    if cached is None:
         try:
-            best_frame = cv2.cvtColor(
-                image,
-                cv2.COLOR_YUV2BGR_I420,
-            )
-        except KeyError:
+            face = Face.get(Face.id == id)
+        except DoesNotExist:
+            return "Face not found", 404
+
+        image = current_app.face_store.load(face)
+
+        if image is None:
             return "Event not found", 404
 
-        best_frame = cv2.resize(
-            best_frame, dsize=(175, 175), interpolation=cv2.INTER_AREA
-        )
-    else:
-        try:
-            best_frame = cv2.cvtColor(
-                image,
-                cv2.COLOR_YUV2GRAY_I420,
+        if "DOODS" in current_app.frigate_config.model.face_recognition_model:
+            try:
+                best_frame = cv2.cvtColor(
+                    image,
+                    cv2.COLOR_YUV2BGR_I420,
+                )
+            except KeyError:
+                return "Event not found", 404
+
+            best_frame = cv2.resize(
+                best_frame, dsize=(175, 175), interpolation=cv2.INTER_AREA
             )
-        except KeyError:
-            return "Event not found", 404
+        else:
+            try:
+                best_frame = cv2.cvtColor(
+                    image,
+                    cv2.COLOR_YUV2GRAY_I420,
+                )
+            except KeyError:
+                return "Event not found", 404
 
-        height, width = best_frame.shape
+            height, width = best_frame.shape
 
-        #logger.error(f"Gray Crop{current_app.frigate_config.model.face_recognition_width_crop}")
-        #logger.error(f"Gray Crop{current_app.frigate_config.model.face_recognition_height_crop}")
+            #logger.error(f"Gray Crop{current_app.frigate_config.model.face_recognition_width_crop}")
+            #logger.error(f"Gray Crop{current_app.frigate_config.model.face_recognition_height_crop}")
 
-        x_min, y_min, x_max, y_max = calculate_gray_face_region(width, height, current_app.frigate_config.model.face_recognition_width_crop, current_app.frigate_config.model.face_recognition_height_crop)
+            x_min, y_min, x_max, y_max = calculate_gray_face_region(width, height, current_app.frigate_config.model.face_recognition_width_crop, current_app.frigate_config.model.face_recognition_height_crop)
 
-        best_frame = cv2.resize(
-            best_frame[y_min:y_max,x_min:x_max], dsize=(175, 175), interpolation=cv2.INTER_CUBIC
-        )
+            best_frame = cv2.resize(
+                best_frame[y_min:y_max,x_min:x_max], dsize=(175, 175), interpolation=cv2.INTER_CUBIC
+            )
 
-        best_frame = cv2.equalizeHist(best_frame)
+            best_frame = cv2.equalizeHist(best_frame)
 
-    ret, jpg = cv2.imencode(
-        ".jpg", best_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70]
-    )
+        ret, jpg = cv2.imencode(
+            ".jpg", best_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70]
+        )
     
-    thumbnail_bytes = jpg.tobytes()
+        thumbnail_bytes = jpg.tobytes()
 
-    if thumbnail_bytes is None:
-        return "Event not found", 404
+        if thumbnail_bytes is None:
+            return "Event not found", 404
 
-    # android notifications prefer a 2:1 ratio
-    if format == "android":
-        jpg_as_np = np.frombuffer(thumbnail_bytes, dtype=np.uint8)
-        img = cv2.imdecode(jpg_as_np, flags=1)
-        thumbnail = cv2.copyMakeBorder(
-            img,
-            0,
-            0,
-            int(img.shape[1] * 0.5),
-            int(img.shape[1] * 0.5),
-            cv2.BORDER_CONSTANT,
-            (0, 0, 0),
+        # android notifications prefer a 2:1 ratio
+        if format == "android":
+            jpg_as_np = np.frombuffer(thumbnail_bytes, dtype=np.uint8)
+            img = cv2.imdecode(jpg_as_np, flags=1)
+            thumbnail = cv2.copyMakeBorder(
+                img,
+                0,
+                0,
+                int(img.shape[1] * 0.5),
+                int(img.shape[1] * 0.5),
+                cv2.BORDER_CONSTANT,
+                (0, 0, 0),
+            )
+            ret, jpg = cv2.imencode(".jpg", thumbnail, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+            thumbnail_bytes = jpg.tobytes()
+
+        cached = current_app.face_thumbnails.put(
+            id, variant, format, thumbnail_bytes
         )
-        ret, jpg = cv2.imencode(".jpg", thumbnail, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-        thumbnail_bytes = jpg.tobytes()
 
+    etag, thumbnail_bytes = cached
     response = make_response(thumbnail_bytes)
     response.headers["Content-Type"] = "image/jpeg"
-    response.headers["Cache-Control"] = "no-store"
-    return response
+    # revalidated as the image changes with the recognizer config
+    response.headers["Cache-Control"] = "no-cache"
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 
@@ -1544,11 +1592,10 @@ def faces_import(id):
                     int(id),
                     now,
                     raw_face_detection[6],
+                    frame,
                 )
             )
 
-        np.save(FACES_DIR + "/" + face_id, frame);
-
     if ".npy" in file.filename:
         logger.error("numpy")
 
@@ -1567,38 +1614,44 @@ def faces_import(id):
 
 @bp.route("/faces/<id>/picture.png")
 def face_picture(id):
-    try:
-        face = Face.get(Face.id == id)
-    except DoesNotExist:
-        return "Face not found", 404
+    cached = current_app.face_thumbnails.get(id, "picture", "png")
 
-    try:
-        image = np.load(FACES_DIR + "/" + id + ".npy")
-    except:
-        return "Event not found", 404
+    if cached is None:
+        try:
+            face = Face.get(Face.id == id)
+        except DoesNotExist:
+            return "Face not found", 404
 
-    if image is None:
-        return "Event not found", 404
+        image = current_app.face_store.load(face)
 
-    try:
-        colour_frame = cv2.cvtColor(
-            image,
-            cv2.COLOR_YUV2BGR_I420,
+        if image is None:
+            return "Event not found", 404
+
+        try:
+            colour_frame = cv2.cvtColor(
+                image,
+                cv2.COLOR_YUV2BGR_I420,
+            )
+        except KeyError:
+            return "Event not found", 404
+
+        ret, png = cv2.imencode(
+            ".png", colour_frame
         )
-    except KeyError:
-        return "Event not found", 404
 
-    ret, png = cv2.imencode(
-        ".png", colour_frame
-    )
+        cached = current_app.face_thumbnails.put(
+            id, "picture", "png", png.tobytes()
+        )
 
-    response = make_response(png.tobytes())
+    etag, png_bytes = cached
+    response = make_response(png_bytes)
     response.headers["Content-Type"] = "image/png"
     response.headers["Cache-Control"] = "private, max-age=31536000"
     response.headers[
         "Content-Disposition"
     ] = f"attachment; filename=face-{id}.png"
-    return response
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 @bp.route("/faces/forceretrain", methods=["POST"])
 def faces_forceretrain():
@@ -1608,6 +1661,10 @@ def faces_forceretrain():
             Face.id,
             Face.label_id,
             Face.capture_time,
+            Face.crop_segment,
+            Face.crop_offset,
+            Face.crop_height,
+            Face.crop_width,
             Face.data,
         ]
 
@@ -1617,7 +1674,10 @@ def faces_forceretrain():
 
         for f in faces:
             if f.label_id != None:
-                frame = np.load(FACES_DIR + "/" + f.id + ".npy")
+                frame = current_app.face_store.load(f)
+
+                if frame is None:
+                    continue
 
                 height, width = frame.shape
                 height = height / 3 * 2
@@ -1627,19 +1687,27 @@ def faces_forceretrain():
                 raw_face_detections = import_face_detect(current_app.frigate_config, frame, current_app.facedetection_queue, current_app.faceresult_connection, current_app.stop_event, height, width)
 
                 for raw_face_detection in raw_face_detections:
-                    embeddings_str = ' '.join(str(e) for e in raw_face_detection[6])
-                    f.data = { "embeddings": embeddings_str }
+                    f.embeddings, f.embeddings_norm = embeddings_to_blob(
+                        raw_face_detection[6]
+                    )
                     f.save()
+                    current_app.face_queue.put(
+                        (
+                            FaceUpdateTypeEnum.embeddings,
+                            f.id,
+                            f.label_id,
+                            None,
+                            raw_face_detection[6],
+                            None,
+                        )
+                    )
 
                 time.sleep(0.1)
     else:
-        try:
-            restart_frigate()
-        except Exception as e:
-            logging.error(f"Error restarting Frigate: {e}")
-            return make_response(
-                jsonify({"success": True, "message": "Unable to force retrain."}), 400
-            )
+        # the face trainer retrains and the cameras pick up the new model
+        current_app.face_queue.put(
+            (FaceUpdateTypeEnum.retrain, None, None, None, None, None)
+        )
 
     return make_response(
         jsonify(
@@ -1885,18 +1953,33 @@ def latest_frame(camera_name):
     resize_quality = request.args.get("quality", default=70, type=int)
 
     if camera_name in current_app.frigate_config.cameras:
-        frame = current_app.detected_frames_processor.get_current_frame(
-            camera_name, draw_options
-        )
-        retry_interval = float(
-            current_app.frigate_config.cameras.get(camera_name).ffmpeg.retry_interval
-            or 10
-        )
+        camera_config = current_app.frigate_config.cameras[camera_name]
+        retry_interval = float(camera_config.ffmpeg.retry_interval or 10)
+        height = request.args.get("h", type=int)
+        jpg = None
 
-        if frame is None or datetime.now().timestamp() > (
+        if datetime.now().timestamp() <= (
             current_app.detected_frames_processor.get_current_frame_time(camera_name)
             + retry_interval
         ):
+            if height is not None:
+                frame_height, frame_width = camera_config.frame_shape
+                width = int(height * frame_width / frame_height)
+
+                if height < 1 or width < 1:
+                    return (
+                        "Invalid height / width requested :: {} / {}".format(
+                            height, width
+                        ),
+                        400,
+                    )
+
+            # clients asking for the same frame share one encode
+            jpg = current_app.detected_frames_processor.get_current_jpg(
+                camera_name, height, resize_quality, draw_options
+            )
+
+        if jpg is None:
             if current_app.camera_error_image is None:
                 error_image = glob.glob("/opt/frigate/frigate/images/camera-error.jpg")
 
@@ -1907,24 +1990,28 @@ def latest_frame(camera_name):
 
             frame = current_app.camera_error_image
 
-        height = int(request.args.get("h", str(frame.shape[0])))
-        width = int(height * frame.shape[1] / frame.shape[0])
+            if frame is None:
+                return "Unable to get valid frame from {}".format(camera_name), 500
 
-        if frame is None:
-            return "Unable to get valid frame from {}".format(camera_name), 500
+            height = height or frame.shape[0]
+            width = int(height * frame.shape[1] / frame.shape[0])
 
-        if height < 1 or width < 1:
-            return (
-                "Invalid height / width requested :: {} / {}".format(height, width),
-                400,
+            if height < 1 or width < 1:
+                return (
+                    "Invalid height / width requested :: {} / {}".format(height, width),
+                    400,
+                )
+
+            frame = cv2.resize(
+                frame, dsize=(width, height), interpolation=cv2.INTER_AREA
             )
 
-        frame = cv2.resize(frame, dsize=(width, height), interpolation=cv2.INTER_AREA)
+            ret, jpg = cv2.imencode(
+                ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), resize_quality]
+            )
+            jpg = jpg.tobytes()
 
-        ret, jpg = cv2.imencode(
-            ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), resize_quality]
-        )
-        response = make_response(jpg.tobytes())
+        response = make_response(jpg)
         response.headers["Content-Type"] = "image/jpeg"
         response.headers["Cache-Control"] = "no-store"
         return response
@@ -2371,20 +2458,29 @@ def export_recording(camera_name: str, start_time, end_time):
 
 
 def imagestream(detected_frames_processor, camera_name, fps, height, draw_options):
+    frame_time = 0.0
+    last_sent = 0.0
+
     while True:
         # max out at specified FPS
-        time.sleep(1 / fps)
-        frame = detected_frames_processor.get_current_frame(camera_name, draw_options)
-        if frame is None:
-            frame = np.zeros((height, int(height * 16 / 9), 3), np.uint8)
+        time.sleep(max(0, last_sent + 1 / fps - time.monotonic()))
+        # wait for a new frame, the last one is sent again if none comes in
+        frame_time = detected_frames_processor.wait_for_frame(
+            camera_name, frame_time, MJPEG_FRAME_TIMEOUT
+        )
+        last_sent = time.monotonic()
+        jpg = detected_frames_processor.get_current_jpg(
+            camera_name, height, 70, draw_options, cv2.INTER_LINEAR
+        )
 
-        width = int(height * frame.shape[1] / frame.shape[0])
-        frame = cv2.resize(frame, dsize=(width, height), interpolation=cv2.INTER_LINEAR)
+        if jpg is None:
+            frame = np.zeros((height, int(height * 16 / 9), 3), np.uint8)
+            ret, jpg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+            jpg = jpg.tobytes()
 
-        ret, jpg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
         yield (
             b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + jpg.tobytes() + b"\r\n\r\n"
+            b"Content-Type: image/jpeg\r\n\r\n" + jpg + b"\r\n\r\n"
         )
 
 
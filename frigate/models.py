@@ -1,4 +1,5 @@
 from peewee import (
+    BlobField,
     BooleanField,
     CharField,
     DateTimeField,
@@ -51,6 +52,13 @@ class Face(Model):  # type: ignore[misc]
     id = CharField(null=False, primary_key=True, max_length=30)
     label_id = IntegerField(null=False)
     capture_time = DateTimeField()
+    embeddings = BlobField(null=True)  # packed float32 values
+    embeddings_norm = FloatField(null=True)
+    # location of the crop in the face store, null until it is imported
+    crop_segment = IntegerField(null=True)
+    crop_offset = IntegerField(null=True)
+    crop_height = IntegerField(null=True)
+    crop_width = IntegerField(null=True)
     data = JSONField()  # ex: for expansion, etc.
 
 class FaceLabel(Model):  # type: ignore[misc]
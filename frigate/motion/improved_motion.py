@@ -1,3 +1,5 @@
+import math
+
 import cv2
 import imutils
 import numpy as np
@@ -6,6 +8,28 @@ from scipy.ndimage import gaussian_filter
 from frigate.config import MotionConfig
 from frigate.motion import MotionDetector
 
+IDENTITY_KERNEL = np.ones((1, 1), np.float64)
+
+
+def get_histogram_percentile(cumulative: np.ndarray, percentile: float) -> int:
+    """Same value as np.percentile(frame, percentile).astype(np.uint8) of a uint8
+    frame, taken from the cumulative histogram of the frame."""
+    count = int(cumulative[-1])
+    virtual_index = (count - 1) * (percentile / 100)
+    previous_index = math.floor(virtual_index)
+    next_index = min(previous_index + 1, count - 1)
+    gamma = virtual_index - previous_index
+    # the value at an index of the sorted frame is the first bin that goes past it
+    previous_value = int(np.searchsorted(cumulative, previous_index, side="right"))
+    next_value = int(np.searchsorted(cumulative, next_index, side="right"))
+    diff = next_value - previous_value
+
+    # interpolate the way numpy does
+    if gamma >= 0.5:
+        return int(next_value - diff * (1 - gamma))
+
+    return int(previous_value + diff * gamma)
+
 
 class ImprovedMotionDetector(MotionDetector):
     def __init__(
@@ -20,6 +44,7 @@ class ImprovedMotionDetector(MotionDetector):
         blur_radius=1,
         interpolation=cv2.INTER_NEAREST,
         contrast_frame_history=50,
+        fast_path=False,
     ):
         self.name = name
         self.config = config
@@ -48,11 +73,52 @@ class ImprovedMotionDetector(MotionDetector):
         self.contrast_values = np.zeros((contrast_frame_history, 2), np.uint8)
         self.contrast_values[:, 1:2] = 255
         self.contrast_values_index = 0
+        self.fast_path = fast_path
 
-    def detect(self, frame):
-        motion_boxes = []
+        if self.fast_path:
+            # the frames of each stage are written into these instead of new arrays
+            self.resized_frame = np.zeros(self.motion_frame_size, np.uint8)
+            self.blur_kernel = cv2.getGaussianKernel(blur_radius * 2 + 1, 1, cv2.CV_64F)
+            self.blur_sums = np.zeros(self.motion_frame_size, np.float64)
+            self.half_blurred_frame = np.zeros(self.motion_frame_size, np.uint8)
+            self.blurred_frame = np.zeros(self.motion_frame_size, np.uint8)
+            self.frame_delta = np.zeros(self.motion_frame_size, np.uint8)
+            # the average frame as uint8, updated whenever the average changes
+            self.avg_frame_uint8 = cv2.convertScaleAbs(self.avg_frame)
+            # or'ed into the frame to set the masked pixels to 255
+            self.mask_fill = np.zeros(self.motion_frame_size, np.uint8)
+            self.mask_fill[self.mask] = 255
+            self.contrast_lut = np.zeros(256, np.uint8)
+            self.contrast_lut_bounds = None
 
-        gray = frame[0 : self.frame_shape[0], 0 : self.frame_shape[1]]
+    def update_contrast_values(self, minval, maxval) -> tuple[float, float]:
+        # keep track of the last 50 contrast values
+        self.contrast_values[self.contrast_values_index] = [minval, maxval]
+        self.contrast_values_index += 1
+        if self.contrast_values_index == len(self.contrast_values):
+            self.contrast_values_index = 0
+
+        return np.mean(self.contrast_values, axis=0)
+
+    def get_contrast_lut(self, avg_min, avg_max) -> np.ndarray:
+        """Lookup table that improves contrast the same way as prepare_frame."""
+        if self.contrast_lut_bounds != (avg_min, avg_max):
+            values = np.arange(256, dtype=np.uint8)
+            values = np.clip(values, avg_min, avg_max)
+            self.contrast_lut[:] = (
+                ((values - avg_min) / (avg_max - avg_min)) * 255
+            ).astype(np.uint8)
+            self.contrast_lut_bounds = (avg_min, avg_max)
+
+        return self.contrast_lut
+
+    def prepare_frame(self, gray) -> tuple[np.ndarray, list[np.ndarray]]:
+        """Resize, improve contrast, mask and blur a frame.
+
+        Returns the blurred frame and the frame after each stage when images
+        are saved.
+        """
+        saved_frames = []
 
         # resize frame
         resized_frame = cv2.resize(
@@ -62,7 +128,7 @@ class ImprovedMotionDetector(MotionDetector):
         )
 
         if self.save_images:
-            resized_saved = resized_frame.copy()
+            saved_frames.append(resized_frame.copy())
 
         # Improve contrast
         if self.improve_contrast.value:
@@ -71,13 +137,7 @@ class ImprovedMotionDetector(MotionDetector):
             maxval = np.percentile(resized_frame, 96).astype(np.uint8)
             # skip contrast calcs if the image is a single color
             if minval < maxval:
-                # keep track of the last 50 contrast values
-                self.contrast_values[self.contrast_values_index] = [minval, maxval]
-                self.contrast_values_index += 1
-                if self.contrast_values_index == len(self.contrast_values):
-                    self.contrast_values_index = 0
-
-                avg_min, avg_max = np.mean(self.contrast_values, axis=0)
+                avg_min, avg_max = self.update_contrast_values(minval, maxval)
 
                 resized_frame = np.clip(resized_frame, avg_min, avg_max)
                 resized_frame = (
@@ -85,7 +145,7 @@ class ImprovedMotionDetector(MotionDetector):
                 ).astype(np.uint8)
 
         if self.save_images:
-            contrasted_saved = resized_frame.copy()
+            saved_frames.append(resized_frame.copy())
 
         # mask frame
         # this has to come after contrast improvement
@@ -94,12 +154,113 @@ class ImprovedMotionDetector(MotionDetector):
         resized_frame = gaussian_filter(resized_frame, sigma=1, radius=self.blur_radius)
 
         if self.save_images:
-            blurred_saved = resized_frame.copy()
+            saved_frames.append(resized_frame.copy())
+
+        return resized_frame, saved_frames
+
+    def prepare_frame_fast(self, gray) -> tuple[np.ndarray, list[np.ndarray]]:
+        """Same stages as prepare_frame written into preallocated frames.
+
+        The contrast percentiles come from a histogram, the contrast from a
+        lookup table and the blur from opencv, giving the same frame.
+        """
+        saved_frames = []
+        resized_frame = self.resized_frame
+
+        cv2.resize(
+            gray,
+            dsize=(self.motion_frame_size[1], self.motion_frame_size[0]),
+            dst=resized_frame,
+            interpolation=self.interpolation,
+        )
+
+        if self.save_images:
+            saved_frames.append(resized_frame.copy())
+
+        if self.improve_contrast.value:
+            cumulative = np.cumsum(
+                cv2.calcHist([resized_frame], [0], None, [256], [0, 256])
+                .ravel()
+                .astype(np.int64)
+            )
+            minval = get_histogram_percentile(cumulative, 4)
+            maxval = get_histogram_percentile(cumulative, 96)
+            # skip contrast calcs if the image is a single color
+            if minval < maxval:
+                avg_min, avg_max = self.update_contrast_values(minval, maxval)
+                cv2.LUT(
+                    resized_frame,
+                    self.get_contrast_lut(avg_min, avg_max),
+                    dst=resized_frame,
+                )
+
+        if self.save_images:
+            saved_frames.append(resized_frame.copy())
+
+        # mask frame
+        # this has to come after contrast improvement
+        cv2.bitwise_or(resized_frame, self.mask_fill, dst=resized_frame)
+
+        self.blur_fast(resized_frame)
+
+        if self.save_images:
+            saved_frames.append(self.blurred_frame.copy())
+
+        return self.blurred_frame, saved_frames
+
+    def blur_fast(self, frame) -> np.ndarray:
+        """Blur a frame into the blurred frame the same way as gaussian_filter."""
+        # blur down the columns and then along the rows, truncating to uint8
+        # after each pass like scipy's gaussian_filter does
+        cv2.sepFilter2D(
+            frame,
+            cv2.CV_64F,
+            IDENTITY_KERNEL,
+            self.blur_kernel,
+            dst=self.blur_sums,
+            borderType=cv2.BORDER_REFLECT,
+        )
+        np.copyto(self.half_blurred_frame, self.blur_sums, casting="unsafe")
+        cv2.sepFilter2D(
+            self.half_blurred_frame,
+            cv2.CV_64F,
+            self.blur_kernel,
+            IDENTITY_KERNEL,
+            dst=self.blur_sums,
+            borderType=cv2.BORDER_REFLECT,
+        )
+        np.copyto(self.blurred_frame, self.blur_sums, casting="unsafe")
+        return self.blurred_frame
+
+    def update_average(self, resized_frame) -> None:
+        cv2.accumulateWeighted(
+            resized_frame,
+            self.avg_frame,
+            0.2 if self.calibrating else self.config.frame_alpha,
+        )
+
+        if self.fast_path:
+            cv2.convertScaleAbs(self.avg_frame, dst=self.avg_frame_uint8)
+
+    def detect(self, frame):
+        motion_boxes = []
+
+        gray = frame[0 : self.frame_shape[0], 0 : self.frame_shape[1]]
+
+        if self.fast_path:
+            resized_frame, saved_frames = self.prepare_frame_fast(gray)
+        else:
+            resized_frame, saved_frames = self.prepare_frame(gray)
 
         if self.save_images or self.calibrating:
             self.frame_counter += 1
         # compare to average
-        frameDelta = cv2.absdiff(resized_frame, cv2.convertScaleAbs(self.avg_frame))
+        if self.fast_path:
+            frameDelta = cv2.absdiff(
+                resized_frame, self.avg_frame_uint8, dst=self.frame_delta
+            )
+        else:
+            frameDelta = cv2.absdiff(resized_frame, cv2.convertScaleAbs(self.avg_frame))
 
         # compute the threshold image for the current frame
         thresh = cv2.threshold(
@@ -155,9 +316,7 @@ class ImprovedMotionDetector(MotionDetector):
                     2,
                 )
             frames = [
-                cv2.cvtColor(resized_saved, cv2.COLOR_GRAY2BGR),
-                cv2.cvtColor(contrasted_saved, cv2.COLOR_GRAY2BGR),
-                cv2.cvtColor(blurred_saved, cv2.COLOR_GRAY2BGR),
+                *[cv2.cvtColor(f, cv2.COLOR_GRAY2BGR) for f in saved_frames],
                 cv2.cvtColor(frameDelta, cv2.COLOR_GRAY2BGR),
                 cv2.cvtColor(thresh, cv2.COLOR_GRAY2BGR),
                 thresh_dilated,
@@ -173,18 +332,10 @@ class ImprovedMotionDetector(MotionDetector):
             self.motion_frame_count += 1
             if self.motion_frame_count >= 10:
                 # only average in the current frame if the difference persists for a bit
-                cv2.accumulateWeighted(
-                    resized_frame,
-                    self.avg_frame,
-                    0.2 if self.calibrating else self.config.frame_alpha,
-                )
+                self.update_average(resized_frame)
         else:
             # when no motion, just keep averaging the frames together
-            cv2.accumulateWeighted(
-                resized_frame,
-                self.avg_frame,
-                0.2 if self.calibrating else self.config.frame_alpha,
-            )
+            self.update_average(resized_frame)
             self.motion_frame_count = 0
 
         return motion_boxes
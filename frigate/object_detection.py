@@ -7,6 +7,8 @@ import queue
 import signal
 import threading
 from abc import ABC, abstractmethod
+from collections import deque
+from typing import Optional
 
 import numpy as np
 from setproctitle import setproctitle
@@ -80,6 +82,31 @@ class LocalObjectDetector(ObjectDetector):
         logger.info(f"Detect Time: {elapsed}ms Timeout: {timeout}")
         return raw_detections, timeout
 
+    def detect_raw_batch(self, tensor_input):
+        """Run a (N, height, width, 3) batch and return (N, 20, 6) detections."""
+        if not self.detect_api.supports_batch:
+            detections = np.zeros((len(tensor_input), 20, 6), np.float32)
+            timeout = False
+
+            for i in range(len(tensor_input)):
+                detections[i], region_timeout = self.detect_raw(tensor_input[i : i + 1])
+                timeout = timeout or region_timeout
+
+            return detections, timeout
+
+        if self.input_transform:
+            tensor_input = np.transpose(tensor_input, self.input_transform)
+        start = time.monotonic_ns()
+        raw_detections, timeout = self.detect_api.detect_raw_batch(
+            tensor_input=tensor_input
+        )
+        stop = time.monotonic_ns()
+        elapsed = round((stop - start) / 1000000, 0)
+        logger.info(
+            f"Detect Time: {elapsed}ms Batch: {len(tensor_input)} Timeout: {timeout}"
+        )
+        return raw_detections, timeout
+
 
 def run_detector(
     name: str,
@@ -87,6 +114,8 @@ def run_detector(
     out_events: dict[str, mp.Event],
     avg_speed,
     start,
+    pending_requests,
+    pending_regions,
     detector_config,
 ):
     threading.current_thread().name = f"detector:{name}"
@@ -110,35 +139,51 @@ def run_detector(
     outputs = {}
     for name in out_events.keys():
         out_shm = mp.shared_memory.SharedMemory(name=f"out-{name}", create=False)
-        out_np = np.ndarray((20, 6), dtype=np.float32, buffer=out_shm.buf)
-        outputs[name] = {"shm": out_shm, "np": out_np}
+        outputs[name] = {"shm": out_shm}
 
     while not stop_event.is_set():
         try:
-            connection_id = detection_queue.get(timeout=1)
+            connection_id, batch_size = detection_queue.get(timeout=1)
         except queue.Empty:
             continue
-        input_frame = frame_manager.get(
+        input_frames = frame_manager.get(
             connection_id,
-            (1, detector_config.model.height, detector_config.model.width, 3),
+            (batch_size, detector_config.model.height, detector_config.model.width, 3),
         )
 
-        if input_frame is None:
+        if input_frames is None:
+            release_pending(pending_requests, pending_regions, batch_size)
             continue
 
         # detect and send the output
         start.value = datetime.datetime.now().timestamp()
-        detections, timeout = object_detector.detect_raw(input_frame)
+        detections, timeout = object_detector.detect_raw_batch(input_frames)
         duration = datetime.datetime.now().timestamp() - start.value
-        outputs[connection_id]["np"][:] = detections[:]
+        out_np = np.ndarray(
+            (batch_size, 20, 6),
+            dtype=np.float32,
+            buffer=outputs[connection_id]["shm"].buf,
+        )
+        out_np[:] = detections[:]
         out_events[connection_id].set()
         start.value = 0.0
+        release_pending(pending_requests, pending_regions, batch_size)
 
-        avg_speed.value = (avg_speed.value * 9 + duration) / 10
+        # track the speed per region so it is comparable across batch sizes
+        avg_speed.value = (avg_speed.value * 9 + duration / batch_size) / 10
 
     logger.info("Exited detection process...")
 
 
+def release_pending(pending_requests, pending_regions, batch_size: int) -> None:
+    """Tell the scheduler a request dispatched to this detector is done."""
+    with pending_requests.get_lock():
+        pending_requests.value = max(pending_requests.value - 1, 0)
+
+    with pending_regions.get_lock():
+        pending_regions.value = max(pending_regions.value - batch_size, 0)
+
+
 class ObjectDetectProcess:
     def __init__(
         self,
@@ -152,6 +197,8 @@ class ObjectDetectProcess:
         self.detection_queue = detection_queue
         self.avg_inference_speed = mp.Value("d", 0.01)
         self.detection_start = mp.Value("d", 0.0)
+        self.pending_requests = mp.Value("i", 0)
+        self.pending_regions = mp.Value("i", 0)
         self.detect_process = None
         self.detector_config = detector_config
         self.start_or_restart()
@@ -173,6 +220,9 @@ class ObjectDetectProcess:
         self.detection_start.value = 0.0
         if (self.detect_process is not None) and self.detect_process.is_alive():
             self.stop()
+        # requests sent to a stuck process are lost, the cameras time them out
+        self.pending_requests.value = 0
+        self.pending_regions.value = 0
         self.detect_process = mp.Process(
             target=run_detector,
             name=f"detector:{self.name}",
@@ -182,31 +232,269 @@ class ObjectDetectProcess:
                 self.out_events,
                 self.avg_inference_speed,
                 self.detection_start,
+                self.pending_requests,
+                self.pending_regions,
                 self.detector_config,
             ),
         )
         self.detect_process.daemon = True
         self.detect_process.start()
 
+    def estimated_finish(self, batch_size: int) -> float:
+        """Seconds until a new request of batch_size regions would be done."""
+        return (
+            self.pending_regions.value + batch_size
+        ) * self.avg_inference_speed.value
+
+    def dispatch(self, connection_id: str, batch_size: int) -> None:
+        with self.pending_requests.get_lock():
+            self.pending_requests.value += 1
+
+        with self.pending_regions.get_lock():
+            self.pending_regions.value += batch_size
+
+        self.detection_queue.put((connection_id, batch_size))
+
+
+class FairRequestQueue:
+    """Per camera request queues served by weighted fair queuing.
+
+    Every camera has a virtual time that advances by the number of regions it
+    was served divided by its weight. The camera with the lowest virtual time
+    is served next, so a camera sending many regions only delays the others
+    in proportion to its weight. A camera that was idle starts again from the
+    current virtual time instead of spending credit it built up while idle.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[dict[str, float]] = None,
+        max_queue_ages: Optional[dict[str, float]] = None,
+        default_max_queue_age: float = 1.0,
+    ) -> None:
+        self.weights = weights or {}
+        self.max_queue_ages = max_queue_ages or {}
+        self.default_max_queue_age = default_max_queue_age
+        self.requests: dict[str, deque] = {}
+        self.virtual_times: dict[str, float] = {}
+        self.virtual_time = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(requests) for requests in self.requests.values())
+
+    def put(self, connection_id: str, batch_size: int, requested: float) -> None:
+        requests = self.requests.setdefault(connection_id, deque())
+
+        if not requests:
+            self.virtual_times[connection_id] = max(
+                self.virtual_times.get(connection_id, 0.0), self.virtual_time
+            )
+
+        requests.append((batch_size, requested))
+
+    def pop(self) -> Optional[tuple[str, int, float]]:
+        """Return (connection_id, batch_size, requested) of the next request."""
+        waiting = [
+            connection_id
+            for connection_id, requests in self.requests.items()
+            if requests
+        ]
+
+        if not waiting:
+            return None
+
+        connection_id = min(waiting, key=lambda c: self.virtual_times[c])
+        batch_size, requested = self.requests[connection_id].popleft()
+        self.virtual_time = self.virtual_times[connection_id]
+        self.virtual_times[connection_id] += batch_size / self.weights.get(
+            connection_id, 1.0
+        )
+        return connection_id, batch_size, requested
+
+    def pop_stale(self, now: float) -> list[tuple[str, int, float]]:
+        """Remove and return the requests that waited longer than their max age."""
+        stale = []
+
+        for connection_id, requests in self.requests.items():
+            max_age = self.max_queue_ages.get(
+                connection_id, self.default_max_queue_age
+            )
+
+            while requests and now - requests[0][1] > max_age:
+                batch_size, requested = requests.popleft()
+                stale.append((connection_id, batch_size, requested))
+
+        return stale
+
+    def pop_all(self) -> list[tuple[str, int, float]]:
+        requests = []
+
+        while (request := self.pop()) is not None:
+            requests.append(request)
+
+        return requests
+
+
+class DetectionScheduler(threading.Thread):
+    """Hand detection requests from every camera to the detector processes.
+
+    Requests are queued per camera in a FairRequestQueue and each one goes to
+    the detector expected to finish it first. Detectors are only given
+    max_in_flight requests at a time so the order is decided here rather than
+    by the detector queues. Requests older than the camera's max queue age are
+    dropped and answered with no detections so the camera can move on.
+    """
+
+    def __init__(
+        self,
+        config,
+        detection_queue: mp.Queue,
+        detectors: dict[str, ObjectDetectProcess],
+        out_events: dict[str, mp.Event],
+        camera_metrics: dict,
+        stop_event: mp.Event,
+        max_in_flight: int = 2,
+    ) -> None:
+        threading.Thread.__init__(self)
+        self.name = "detection_scheduler"
+        self.detection_queue = detection_queue
+        self.detectors = detectors
+        self.out_events = out_events
+        self.camera_metrics = camera_metrics
+        self.stop_event = stop_event
+        self.max_in_flight = max_in_flight
+        self.requests = FairRequestQueue(
+            {name: camera.detect.weight for name, camera in config.cameras.items()},
+            {
+                name: camera.detect.max_queue_age
+                for name, camera in config.cameras.items()
+            },
+        )
+        self.outputs: dict[str, mp.shared_memory.SharedMemory] = {}
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            # only block for long when there is nothing left to hand out
+            self.receive(timeout=0.005 if len(self.requests) else 1)
+            now = datetime.datetime.now().timestamp()
+
+            for connection_id, batch_size, requested in self.requests.pop_stale(now):
+                logger.debug(
+                    f"Dropping detection request for {connection_id} after {now - requested:.2f}s"
+                )
+                self.update_metrics(connection_id, now - requested, dropped=True)
+                self.respond_empty(connection_id, batch_size)
+
+            self.dispatch(now)
+
+        # release every camera still waiting on a request
+        for connection_id, batch_size, _ in self.requests.pop_all():
+            self.respond_empty(connection_id, batch_size)
+
+        for shm in self.outputs.values():
+            shm.close()
+
+        logger.info("Exiting detection scheduler...")
+
+    def receive(self, timeout: float) -> None:
+        # requests are aged from when the camera queued them, not from when
+        # they are read here, so a backlog in the queue counts towards it
+        try:
+            connection_id, batch_size, requested = self.detection_queue.get(
+                timeout=timeout
+            )
+        except queue.Empty:
+            return
+
+        self.requests.put(connection_id, batch_size, requested)
+
+        # pick up everything else already waiting before deciding the order
+        while True:
+            try:
+                (
+                    connection_id,
+                    batch_size,
+                    requested,
+                ) = self.detection_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            self.requests.put(connection_id, batch_size, requested)
+
+    def dispatch(self, now: float) -> None:
+        while len(self.requests):
+            available = [
+                detector
+                for detector in self.detectors.values()
+                if detector.pending_requests.value < self.max_in_flight
+            ]
+
+            if not available:
+                return
+
+            connection_id, batch_size, requested = self.requests.pop()
+            detector = min(available, key=lambda d: d.estimated_finish(batch_size))
+            detector.dispatch(connection_id, batch_size)
+            self.update_metrics(connection_id, now - requested)
+
+    def update_metrics(self, connection_id: str, wait: float, dropped=False) -> None:
+        metrics = self.camera_metrics.get(connection_id)
+
+        if metrics is None:
+            return
+
+        metrics["detection_wait"].value = (
+            metrics["detection_wait"].value * 9 + wait
+        ) / 10
+
+        if dropped:
+            metrics["detection_dropped"].value += 1
+
+    def respond_empty(self, connection_id: str, batch_size: int) -> None:
+        if connection_id not in self.outputs:
+            self.outputs[connection_id] = mp.shared_memory.SharedMemory(
+                name=f"out-{connection_id}", create=False
+            )
+
+        out_np = np.ndarray(
+            (batch_size, 20, 6),
+            dtype=np.float32,
+            buffer=self.outputs[connection_id].buf,
+        )
+        out_np[:] = 0
+        self.out_events[connection_id].set()
+
 
 class RemoteObjectDetector:
-    def __init__(self, name, labels, detection_queue, event, model_config, stop_event):
+    def __init__(
+        self,
+        name,
+        labels,
+        detection_queue,
+        event,
+        model_config,
+        stop_event,
+        max_batch=1,
+    ):
         self.labels = labels
         self.name = name
         self.fps = EventsPerSecond()
         self.detection_queue = detection_queue
         self.event = event
         self.stop_event = stop_event
+        self.max_batch = max_batch
         self.shm = mp.shared_memory.SharedMemory(name=self.name, create=False)
         self.np_shm = np.ndarray(
-            (1, model_config.height, model_config.width, 3),
+            (max_batch, model_config.height, model_config.width, 3),
             dtype=np.uint8,
             buffer=self.shm.buf,
         )
         self.out_shm = mp.shared_memory.SharedMemory(
             name=f"out-{self.name}", create=False
         )
-        self.out_np_shm = np.ndarray((20, 6), dtype=np.float32, buffer=self.out_shm.buf)
+        self.out_np_shm = np.ndarray(
+            (max_batch, 20, 6), dtype=np.float32, buffer=self.out_shm.buf
+        )
 
     def detect(self, tensor_input, threshold=0.4):
         detections = []
@@ -215,23 +503,72 @@ class RemoteObjectDetector:
             return detections
 
         # copy input to shared memory
-        self.np_shm[:] = tensor_input[:]
+        self.np_shm[0:1] = tensor_input[:]
         self.event.clear()
-        self.detection_queue.put(self.name)
+        self.detection_queue.put((self.name, 1, datetime.datetime.now().timestamp()))
         result = self.event.wait(timeout=5.0)
 
         # if it timed out
         if result is None:
             return detections
 
-        for d in self.out_np_shm:
+        detections = self.parse_detections(self.out_np_shm[0], threshold)
+        self.fps.update()
+        return detections
+
+    def detect_batch(self, tensor_inputs, threshold=0.4):
+        """Detect objects in several regions with one request per max_batch regions."""
+        return [
+            self.parse_detections(raw_detections, threshold)
+            for raw_detections in self.detect_batch_raw(tensor_inputs)
+        ]
+
+    def detect_batch_raw(self, tensor_inputs) -> np.ndarray:
+        """Detect objects in several regions and return the (N, 20, 6) raw output.
+
+        Regions that could not be detected because of a timeout or shutdown
+        have no detections.
+        """
+        raw_detections = np.zeros((len(tensor_inputs), 20, 6), dtype=np.float32)
+
+        for batch_start in range(0, len(tensor_inputs), self.max_batch):
+            batch = tensor_inputs[batch_start : batch_start + self.max_batch]
+
+            if self.stop_event.is_set():
+                continue
+
+            # copy inputs to their slots in shared memory
+            for i, tensor_input in enumerate(batch):
+                self.np_shm[i : i + 1] = tensor_input[:]
+
+            self.event.clear()
+            self.detection_queue.put(
+                (self.name, len(batch), datetime.datetime.now().timestamp())
+            )
+
+            # if it timed out
+            if not self.event.wait(timeout=5.0):
+                continue
+
+            raw_detections[batch_start : batch_start + len(batch)] = self.out_np_shm[
+                : len(batch)
+            ]
+
+            for _ in batch:
+                self.fps.update()
+
+        return raw_detections
+
+    def parse_detections(self, raw_detections, threshold):
+        detections = []
+
+        for d in raw_detections:
             if d[1] < threshold:
                 break
             detections.append(
                 (self.labels[int(d[0])], float(d[1]), (d[2], d[3], d[4], d[5]))
             )
 
-        self.fps.update()
         return detections
 
     def cleanup(self):
@@ -7,7 +7,7 @@ import queue
 import threading
 from collections import Counter, defaultdict
 from statistics import median
-from typing import Callable
+from typing import Callable, Optional
 
 import cv2
 import numpy as np
@@ -21,9 +21,12 @@ from frigate.config import (
     SnapshotsConfig,
 )
 from frigate.const import CLIPS_DIR
+from frigate.encoded_frames import EncodedFrameCache
 from frigate.events.maintainer import EventTypeEnum
+from frigate.frame_results import FrameResultReader, FrameResultRing
 from frigate.ptz.autotrack import PtzAutoTrackerThread
 from frigate.util.image import (
+    RingFrameManager,
     SharedMemoryFrameManager,
     area,
     calculate_region,
@@ -463,13 +466,13 @@ class CameraState:
         self,
         name,
         config: FrigateConfig,
-        frame_manager: SharedMemoryFrameManager,
+        frame_ring: RingFrameManager,
         ptz_autotracker_thread: PtzAutoTrackerThread,
     ):
         self.name = name
         self.config = config
         self.camera_config = config.cameras[name]
-        self.frame_manager = frame_manager
+        self.frame_ring = frame_ring
         self.best_objects: dict[str, TrackedObject] = {}
         self.object_counts = defaultdict(int)
         self.tracked_objects: dict[str, TrackedObject] = {}
@@ -477,14 +480,28 @@ class CameraState:
         self.zone_objects = defaultdict(list)
         self._current_frame = np.zeros(self.camera_config.frame_shape_yuv, np.uint8)
         self.current_frame_lock = threading.Lock()
+        # notified whenever a new frame becomes the current frame
+        self.new_frame = threading.Condition(self.current_frame_lock)
         self.current_frame_time = 0.0
         self.motion_boxes = []
         self.regions = []
-        self.previous_frame_id = None
+        self.previous_frame_ref = None
         self.callbacks = defaultdict(list)
         self.ptz_autotracker_thread = ptz_autotracker_thread
 
+    def wait_for_frame(self, frame_time: float, timeout: float) -> float:
+        """Wait for a frame newer than frame_time and return the current time."""
+        with self.new_frame:
+            self.new_frame.wait_for(
+                lambda: self.current_frame_time != frame_time, timeout
+            )
+            return self.current_frame_time
+
     def get_current_frame(self, draw_options={}):
+        return self.get_current_frame_and_time(draw_options)[0]
+
+    def get_current_frame_and_time(self, draw_options={}) -> tuple[np.ndarray, float]:
+        """Returns the current frame with the time it was taken under one lock."""
         with self.current_frame_lock:
             frame_copy = np.copy(self._current_frame)
             frame_time = self.current_frame_time
@@ -652,7 +669,7 @@ class CameraState:
                 position=self.camera_config.timestamp_style.position,
             )
 
-        return frame_copy
+        return frame_copy, frame_time
 
     def finished(self, obj_id):
         del self.tracked_objects[obj_id]
@@ -660,12 +677,17 @@ class CameraState:
     def on(self, event_type: str, callback: Callable[[dict], None]):
         self.callbacks[event_type].append(callback)
 
-    def update(self, frame_time, current_detections, motion_boxes, regions):
-        # get the new frame
-        frame_id = f"{self.name}{frame_time}"
-        current_frame = self.frame_manager.get(
-            frame_id, self.camera_config.frame_shape_yuv
-        )
+    def update(
+        self, frame_time, frame_ref, current_detections, motion_boxes, regions
+    ):
+        # hold the new frame until the next one replaces it
+        if not self.frame_ring.retain(self.name, frame_ref):
+            logger.warning(
+                f"{self.name}: frame {frame_time} was reused before it was processed."
+            )
+            return
+
+        current_frame = self.frame_ring.get(self.name, frame_ref)
 
         tracked_objects = self.tracked_objects.copy()
         current_ids = set(current_detections.keys())
@@ -822,9 +844,10 @@ class CameraState:
             self.motion_boxes = motion_boxes
             self.regions = regions
             self._current_frame = current_frame
-            if self.previous_frame_id is not None:
-                self.frame_manager.close(self.previous_frame_id)
-            self.previous_frame_id = frame_id
+            if self.previous_frame_ref is not None:
+                self.frame_ring.release(self.name, self.previous_frame_ref)
+            self.previous_frame_ref = frame_ref
+            self.new_frame.notify_all()
 
 
 class TrackedObjectProcessor(threading.Thread):
@@ -838,6 +861,8 @@ class TrackedObjectProcessor(threading.Thread):
         video_output_queue,
         recordings_info_queue,
         ptz_autotracker_thread,
+        frame_ring: RingFrameManager,
+        frame_results: FrameResultRing,
         stop_event,
     ):
         threading.Thread.__init__(self)
@@ -851,6 +876,14 @@ class TrackedObjectProcessor(threading.Thread):
         self.recordings_info_queue = recordings_info_queue
         self.stop_event = stop_event
         self.camera_states: dict[str, CameraState] = {}
+        self.frame_ring = frame_ring
+        self.frame_results = frame_results
+        self.encoded_frames = EncodedFrameCache()
+        self.frame_result_readers = {
+            camera: FrameResultReader(frame_results, camera)
+            for camera in config.cameras.keys()
+        }
+        # only used for the birdseye restream frame
         self.frame_manager = SharedMemoryFrameManager()
         self.last_motion_detected: dict[str, float] = {}
         self.ptz_autotracker_thread = ptz_autotracker_thread
@@ -969,7 +1002,7 @@ class TrackedObjectProcessor(threading.Thread):
 
         for camera in self.config.cameras.keys():
             camera_state = CameraState(
-                camera, self.config, self.frame_manager, self.ptz_autotracker_thread
+                camera, self.config, self.frame_ring, self.ptz_autotracker_thread
             )
             camera_state.on("start", start)
             camera_state.on("autotrack", autotrack)
@@ -1113,51 +1146,107 @@ class TrackedObjectProcessor(threading.Thread):
         """Returns the latest frame time for a given camera."""
         return self.camera_states[camera].current_frame_time
 
+    def wait_for_frame(self, camera, frame_time: float, timeout: float) -> float:
+        """Returns the frame time once a camera has a newer frame or on timeout."""
+        return self.camera_states[camera].wait_for_frame(frame_time, timeout)
+
+    def get_current_jpg(
+        self,
+        camera,
+        height: Optional[int] = None,
+        quality: int = 70,
+        draw_options={},
+        interpolation: int = cv2.INTER_AREA,
+    ) -> Optional[bytes]:
+        """Returns the latest frame of a camera as a jpg.
+
+        The jpg is encoded once per frame for the same options and shared by
+        every client asking for it.
+        """
+        frame_time = self.get_current_frame_time(camera)
+        key = (height, quality, interpolation, tuple(sorted(draw_options.items())))
+
+        def encode() -> Optional[tuple[float, bytes]]:
+            # the frame could have changed since frame_time was read, the jpg
+            # is cached under the time of the frame that was encoded
+            frame, encoded_time = self.camera_states[camera].get_current_frame_and_time(
+                draw_options
+            )
+
+            if height is not None and height != frame.shape[0]:
+                width = int(height * frame.shape[1] / frame.shape[0])
+                frame = cv2.resize(
+                    frame, dsize=(width, height), interpolation=interpolation
+                )
+
+            ret, jpg = cv2.imencode(
+                ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+            )
+            return (encoded_time, jpg.tobytes()) if ret else None
+
+        return self.encoded_frames.get(camera, key, frame_time, encode)
+
     def run(self):
         while not self.stop_event.is_set():
             try:
                 (
                     camera,
                     frame_time,
-                    current_tracked_objects,
+                    frame_ref,
+                    result_ref,
+                    changes,
+                    overflow,
                     motion_boxes,
                     regions,
                 ) = self.tracked_objects_queue.get(True, 1)
             except queue.Empty:
                 continue
 
+            current_tracked_objects = self.frame_result_readers[camera].read(
+                result_ref, changes, overflow
+            )
+
+            if current_tracked_objects is None:
+                logger.warning(
+                    f"{camera}: result of frame {frame_time} was reused before it was processed."
+                )
+                self.frame_ring.release(camera, frame_ref)
+                continue
+
             camera_state = self.camera_states[camera]
 
             camera_state.update(
-                frame_time, current_tracked_objects, motion_boxes, regions
+                frame_time, frame_ref, current_tracked_objects, motion_boxes, regions
             )
 
             self.update_mqtt_motion(camera, frame_time, motion_boxes)
 
-            tracked_objects = [
-                o.to_dict() for o in camera_state.tracked_objects.values()
-            ]
-
-            self.video_output_queue.put(
-                (
-                    camera,
-                    frame_time,
-                    tracked_objects,
-                    motion_boxes,
-                    regions,
-                )
+            # the output and recording processes read these counts from the
+            # frame result instead of getting a copy of every object
+            stationary_threshold = self.config.cameras[
+                camera
+            ].detect.stationary.threshold
+            self.frame_results.set_counts(
+                camera,
+                result_ref,
+                sum(
+                    1
+                    for o in camera_state.tracked_objects.values()
+                    if not o.false_positive
+                    and o.obj_data["motionless_count"] == 0
+                ),
+                sum(
+                    1
+                    for o in camera_state.tracked_objects.values()
+                    if o.obj_data["motionless_count"] <= stationary_threshold
+                ),
             )
 
+            # the output process releases the frame once it is done with it
+            self.video_output_queue.put((camera, frame_time, frame_ref, result_ref))
+
             # send info on this frame to the recordings maintainer
-            self.recordings_info_queue.put(
-                (
-                    camera,
-                    frame_time,
-                    tracked_objects,
-                    motion_boxes,
-                    regions,
-                )
-            )
+            self.recordings_info_queue.put((camera, frame_time, result_ref))
 
             # update zone counts for each label
             # for each zone in the current camera
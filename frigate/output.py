@@ -1,4 +1,5 @@
 import datetime
+import functools
 import glob
 import logging
 import math
@@ -8,6 +9,7 @@ import queue
 import signal
 import subprocess as sp
 import threading
+import time
 import traceback
 from wsgiref.simple_server import make_server
 
@@ -24,7 +26,9 @@ from ws4py.websocket import WebSocket
 
 from frigate.config import BirdseyeModeEnum, FrigateConfig
 from frigate.const import BASE_DIR, BIRDSEYE_PIPE
+from frigate.frame_results import FrameResultRing
 from frigate.util.image import (
+    RingFrameManager,
     SharedMemoryFrameManager,
     copy_yuv_to_position,
     get_yuv_crop,
@@ -32,6 +36,9 @@ from frigate.util.image import (
 
 logger = logging.getLogger(__name__)
 
+# seconds a live view converter keeps running after its last viewer left
+CONVERTER_IDLE_TIMEOUT = 30
+
 
 def get_standard_aspect_ratio(width, height) -> tuple[int, int]:
     """Ensure that only standard aspect ratios are used."""
@@ -184,28 +191,81 @@ class FFMpegConverter:
             self.process.communicate()
 
 
+class JsmpegSubscribers:
+    """Websockets watching each live view stream, keyed by camera.
+
+    The websockets add and remove themselves when they connect and
+    disconnect so the output loop can check for viewers without going
+    through every connected websocket.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.websockets: dict[str, set[WebSocket]] = {}
+        # when the last viewer of a camera left
+        self.idle_since: dict[str, float] = {}
+
+    def add(self, camera: str, websocket: WebSocket) -> None:
+        with self.lock:
+            self.websockets.setdefault(camera, set()).add(websocket)
+            self.idle_since.pop(camera, None)
+
+    def remove(self, camera: str, websocket: WebSocket) -> None:
+        with self.lock:
+            websockets = self.websockets.get(camera)
+
+            if websockets is None or websocket not in websockets:
+                return
+
+            websockets.remove(websocket)
+
+            if not websockets:
+                del self.websockets[camera]
+                self.idle_since[camera] = time.monotonic()
+
+    def has(self, camera: str) -> bool:
+        return camera in self.websockets
+
+    def get(self, camera: str) -> list[WebSocket]:
+        with self.lock:
+            return list(self.websockets.get(camera, ()))
+
+    def idle_for(self, camera: str) -> float:
+        """Seconds since the last viewer of a camera left."""
+        with self.lock:
+            if camera in self.websockets:
+                return 0
+
+            return time.monotonic() - self.idle_since.get(camera, 0)
+
+
+class JsmpegWebSocket(WebSocket):
+    def __init__(self, subscribers: JsmpegSubscribers, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subscribers = subscribers
+        self.camera = self.environ["PATH_INFO"].lstrip("/")
+
+    def opened(self) -> None:
+        self.subscribers.add(self.camera, self)
+
+    def closed(self, code, reason=None) -> None:
+        self.subscribers.remove(self.camera, self)
+
+
 class BroadcastThread(threading.Thread):
-    def __init__(self, camera, converter, websocket_server, stop_event):
+    def __init__(self, camera, converter, subscribers, stop_event):
         super(BroadcastThread, self).__init__()
         self.camera = camera
         self.converter = converter
-        self.websocket_server = websocket_server
+        self.subscribers = subscribers
         self.stop_event = stop_event
 
     def run(self):
         while not self.stop_event.is_set():
             buf = self.converter.read(65536)
             if buf:
-                manager = self.websocket_server.manager
-                with manager.lock:
-                    websockets = manager.websockets.copy()
-                    ws_iter = iter(websockets.values())
-
-                for ws in ws_iter:
-                    if (
-                        not ws.terminated
-                        and ws.environ["PATH_INFO"] == f"/{self.camera}"
-                    ):
+                for ws in self.subscribers.get(self.camera):
+                    if not ws.terminated:
                         try:
                             ws.send(buf, binary=True)
                         except ValueError:
@@ -216,21 +276,113 @@ class BroadcastThread(threading.Thread):
                 break
 
 
+class JsmpegConverters:
+    """Live view converters that only run while a stream is watched.
+
+    The converter of a camera is started for its first viewer and stopped
+    once nobody watched it for the idle timeout. The birdseye converter
+    keeps running when birdseye is restreamed.
+    """
+
+    def __init__(
+        self,
+        config: FrigateConfig,
+        subscribers: JsmpegSubscribers,
+        stop_event: mp.Event,
+        idle_timeout: int = CONVERTER_IDLE_TIMEOUT,
+    ) -> None:
+        self.config = config
+        self.subscribers = subscribers
+        self.stop_event = stop_event
+        self.idle_timeout = idle_timeout
+        self.converters: dict[str, FFMpegConverter] = {}
+        self.broadcasters: dict[str, BroadcastThread] = {}
+        self.always_on = (
+            {"birdseye"}
+            if config.birdseye.enabled and config.birdseye.restream
+            else set()
+        )
+
+        for camera in self.always_on:
+            self.start(camera)
+
+    def create_converter(self, camera: str) -> FFMpegConverter:
+        if camera == "birdseye":
+            return FFMpegConverter(
+                self.config.birdseye.width,
+                self.config.birdseye.height,
+                self.config.birdseye.width,
+                self.config.birdseye.height,
+                self.config.birdseye.quality,
+                self.config.birdseye.restream,
+            )
+
+        cam_config = self.config.cameras[camera]
+        width = int(
+            cam_config.live.height
+            * (cam_config.frame_shape[1] / cam_config.frame_shape[0])
+        )
+        return FFMpegConverter(
+            cam_config.frame_shape[1],
+            cam_config.frame_shape[0],
+            width,
+            cam_config.live.height,
+            cam_config.live.quality,
+        )
+
+    def start(self, camera: str) -> None:
+        logger.debug(f"Starting the live view converter for {camera}")
+        self.converters[camera] = self.create_converter(camera)
+        self.broadcasters[camera] = BroadcastThread(
+            camera, self.converters[camera], self.subscribers, self.stop_event
+        )
+        self.broadcasters[camera].start()
+
+    def stop(self, camera: str) -> None:
+        logger.debug(f"Stopping the live view converter for {camera}")
+        self.converters.pop(camera).exit()
+        self.broadcasters.pop(camera).join()
+
+    def is_active(self, camera: str) -> bool:
+        return camera in self.always_on or self.subscribers.has(camera)
+
+    def write(self, camera: str, frame: bytes) -> None:
+        """Send a frame to the converter of a camera, starting it if needed."""
+        if camera not in self.converters:
+            self.start(camera)
+
+        self.converters[camera].write(frame)
+
+    def stop_idle(self) -> None:
+        for camera in list(self.converters.keys()):
+            if (
+                camera not in self.always_on
+                and self.subscribers.idle_for(camera) > self.idle_timeout
+            ):
+                self.stop(camera)
+
+    def exit(self) -> None:
+        for camera in list(self.converters.keys()):
+            self.stop(camera)
+
+
 class BirdsEyeFrameManager:
     def __init__(
         self,
         config: FrigateConfig,
-        frame_manager: SharedMemoryFrameManager,
+        frame_ring: RingFrameManager,
         stop_event: mp.Event,
     ):
         self.config = config
         self.mode = config.birdseye.mode
-        self.frame_manager = frame_manager
+        self.frame_ring = frame_ring
         width = config.birdseye.width
         height = config.birdseye.height
         self.frame_shape = (height, width)
         self.yuv_shape = (height * 3 // 2, width)
         self.frame = np.ndarray(self.yuv_shape, dtype=np.uint8)
+        # the canvas as bytes for the converter and restream without a copy
+        self.frame_buffer = memoryview(self.frame).cast("B")
         self.canvas = Canvas(width, height)
         self.stop_event = stop_event
 
@@ -282,6 +434,8 @@ class BirdsEyeFrameManager:
                 "dimensions": [settings.detect.width, settings.detect.height],
                 "last_active_frame": 0.0,
                 "current_frame": 0.0,
+                "current_frame_ref": None,
+                # frame time of the frame last copied into the camera's tile
                 "layout_frame": 0.0,
                 "channel_dims": {
                     "y": y,
@@ -300,21 +454,25 @@ class BirdsEyeFrameManager:
         logger.debug("Clearing the birdseye frame")
         self.frame[:] = self.blank_frame
 
-    def copy_to_position(self, position, camera=None, frame_time=None):
+        for cam_data in self.cameras.values():
+            cam_data["layout_frame"] = 0.0
+
+    def copy_to_position(self, position, camera=None, frame_time=None) -> bool:
         if camera is None:
             frame = None
             channel_dims = None
         else:
-            try:
-                frame = self.frame_manager.get(
-                    f"{camera}{frame_time}", self.config.cameras[camera].frame_shape_yuv
-                )
-            except FileNotFoundError:
-                # TODO: better frame management would prevent this edge case
-                logger.warning(
-                    f"Unable to copy frame {camera}{frame_time} to birdseye."
-                )
-                return
+            frame_ref = self.cameras[camera]["current_frame_ref"]
+            frame = (
+                self.frame_ring.get(camera, frame_ref)
+                if frame_ref is not None
+                else None
+            )
+
+            # the output process only holds the latest frame of each camera
+            if frame is None:
+                logger.debug(f"Unable to copy frame {camera}{frame_time} to birdseye.")
+                return False
             channel_dims = self.cameras[camera]["channel_dims"]
 
         copy_yuv_to_position(
@@ -324,6 +482,7 @@ class BirdsEyeFrameManager:
             frame,
             channel_dims,
         )
+        return True
 
     def camera_active(self, mode, object_box_count, motion_box_count):
         if mode == BirdseyeModeEnum.continuous:
@@ -360,8 +519,8 @@ class BirdsEyeFrameManager:
                 self.clear_frame()
                 return True
 
-        # check if we need to reset the layout because there is a different number of cameras
-        reset_layout = len(self.active_cameras) - len(active_cameras) != 0
+        # the layout is kept until a camera becomes active or inactive
+        reset_layout = self.active_cameras != active_cameras
 
         # reset the layout if it needs to be different
         if reset_layout:
@@ -431,13 +590,21 @@ class BirdsEyeFrameManager:
 
                 self.camera_layout = layout_candidate
 
+        updated_frame = reset_layout
+
+        # only copy the cameras that have a new frame since their tile was drawn
         for row in self.camera_layout:
-            for position in row:
-                self.copy_to_position(
-                    position[1], position[0], self.cameras[position[0]]["current_frame"]
-                )
+            for camera, position in row:
+                cam_data = self.cameras[camera]
 
-        return True
+                if cam_data["layout_frame"] == cam_data["current_frame"]:
+                    continue
+
+                if self.copy_to_position(position, camera, cam_data["current_frame"]):
+                    cam_data["layout_frame"] = cam_data["current_frame"]
+                    updated_frame = True
+
+        return updated_frame
 
     def calculate_layout(self, cameras_to_add: list[str], coefficient) -> tuple[any]:
         """Calculate the optimal layout for 2+ cameras."""
@@ -558,7 +725,9 @@ class BirdsEyeFrameManager:
         else:
             return standard_candidate_layout
 
-    def update(self, camera, object_count, motion_count, frame_time, frame) -> bool:
+    def update(
+        self, camera, object_count, motion_count, frame_time, frame_ref
+    ) -> bool:
         # don't process if birdseye is disabled for this camera
         camera_config = self.config.cameras[camera].birdseye
         if not camera_config.enabled:
@@ -566,6 +735,7 @@ class BirdsEyeFrameManager:
 
         # update the last active frame for the camera
         self.cameras[camera]["current_frame"] = frame_time
+        self.cameras[camera]["current_frame_ref"] = frame_ref
         if self.camera_active(camera_config.mode, object_count, motion_count):
             self.cameras[camera]["last_active_frame"] = frame_time
 
@@ -590,7 +760,12 @@ class BirdsEyeFrameManager:
         return False
 
 
-def output_frames(config: FrigateConfig, video_output_queue):
+def output_frames(
+    config: FrigateConfig,
+    frame_ring: RingFrameManager,
+    frame_results: FrameResultRing,
+    video_output_queue,
+):
     threading.current_thread().name = "output"
     setproctitle("frigate.output")
 
@@ -607,54 +782,24 @@ def output_frames(config: FrigateConfig, video_output_queue):
 
     # start a websocket server on 8082
     WebSocketWSGIHandler.http_version = "1.1"
+    subscribers = JsmpegSubscribers()
     websocket_server = make_server(
         "127.0.0.1",
         8082,
         server_class=WSGIServer,
         handler_class=WebSocketWSGIRequestHandler,
-        app=WebSocketWSGIApplication(handler_cls=WebSocket),
+        app=WebSocketWSGIApplication(
+            handler_cls=functools.partial(JsmpegWebSocket, subscribers)
+        ),
     )
     websocket_server.initialize_websockets_manager()
     websocket_thread = threading.Thread(target=websocket_server.serve_forever)
-
-    converters = {}
-    broadcasters = {}
-
-    for camera, cam_config in config.cameras.items():
-        width = int(
-            cam_config.live.height
-            * (cam_config.frame_shape[1] / cam_config.frame_shape[0])
-        )
-        converters[camera] = FFMpegConverter(
-            cam_config.frame_shape[1],
-            cam_config.frame_shape[0],
-            width,
-            cam_config.live.height,
-            cam_config.live.quality,
-        )
-        broadcasters[camera] = BroadcastThread(
-            camera, converters[camera], websocket_server, stop_event
-        )
-
-    if config.birdseye.enabled:
-        converters["birdseye"] = FFMpegConverter(
-            config.birdseye.width,
-            config.birdseye.height,
-            config.birdseye.width,
-            config.birdseye.height,
-            config.birdseye.quality,
-            config.birdseye.restream,
-        )
-        broadcasters["birdseye"] = BroadcastThread(
-            "birdseye", converters["birdseye"], websocket_server, stop_event
-        )
-
     websocket_thread.start()
 
-    for t in broadcasters.values():
-        t.start()
+    converters = JsmpegConverters(config, subscribers, stop_event)
+    last_idle_check = time.monotonic()
 
-    birdseye_manager = BirdsEyeFrameManager(config, frame_manager, stop_event)
+    birdseye_manager = BirdsEyeFrameManager(config, frame_ring, stop_event)
 
     if config.birdseye.restream:
         birdseye_buffer = frame_manager.create(
@@ -663,71 +808,56 @@ def output_frames(config: FrigateConfig, video_output_queue):
         )
 
     while not stop_event.is_set():
+        if time.monotonic() - last_idle_check > 1:
+            last_idle_check = time.monotonic()
+            converters.stop_idle()
+
         try:
-            (
-                camera,
-                frame_time,
-                current_tracked_objects,
-                motion_boxes,
-                regions,
-            ) = video_output_queue.get(True, 1)
+            camera, frame_time, frame_ref, result_ref = video_output_queue.get(True, 1)
         except queue.Empty:
             continue
 
-        frame_id = f"{camera}{frame_time}"
+        frame = frame_ring.get(camera, frame_ref)
 
-        frame = frame_manager.get(frame_id, config.cameras[camera].frame_shape_yuv)
+        if frame is None:
+            continue
 
         # send camera frame to ffmpeg process if websockets are connected
-        if any(
-            ws.environ["PATH_INFO"].endswith(camera) for ws in websocket_server.manager
-        ):
-            # write to the converter for the camera if clients are listening to the specific camera
-            converters[camera].write(frame.tobytes())
-
-        if config.birdseye.enabled and (
-            config.birdseye.restream
-            or any(
-                ws.environ["PATH_INFO"].endswith("birdseye")
-                for ws in websocket_server.manager
-            )
-        ):
+        if converters.is_active(camera):
+            converters.write(camera, frame.tobytes())
+
+        if config.birdseye.enabled and converters.is_active("birdseye"):
+            # a result that was already reused counts as no activity
+            motion_box_count, _, _, moving_count = frame_results.get_counts(
+                camera, result_ref
+            ) or (0, 0, 0, 0)
+
             if birdseye_manager.update(
                 camera,
-                len([o for o in current_tracked_objects if not o["stationary"]]),
-                len(motion_boxes),
+                moving_count,
+                motion_box_count,
                 frame_time,
-                frame,
+                frame_ref,
             ):
-                frame_bytes = birdseye_manager.frame.tobytes()
+                frame_buffer = birdseye_manager.frame_buffer
 
                 if config.birdseye.restream:
-                    birdseye_buffer[:] = frame_bytes
+                    birdseye_buffer[:] = frame_buffer
 
-                converters["birdseye"].write(frame_bytes)
+                converters.write("birdseye", frame_buffer)
 
+        # the latest frame of each camera is kept for birdseye
         if camera in previous_frames:
-            frame_manager.delete(f"{camera}{previous_frames[camera]}")
+            frame_ring.release(camera, previous_frames[camera])
 
-        previous_frames[camera] = frame_time
+        previous_frames[camera] = frame_ref
 
     while not video_output_queue.empty():
-        (
-            camera,
-            frame_time,
-            current_tracked_objects,
-            motion_boxes,
-            regions,
-        ) = video_output_queue.get(True, 10)
-
-        frame_id = f"{camera}{frame_time}"
-        frame = frame_manager.get(frame_id, config.cameras[camera].frame_shape_yuv)
-        frame_manager.delete(frame_id)
-
-    for c in converters.values():
-        c.exit()
-    for b in broadcasters.values():
-        b.join()
+        camera, frame_time, frame_ref, result_ref = video_output_queue.get(True, 10)
+
+        frame_ring.release(camera, frame_ref)
+
+    converters.exit()
     websocket_server.manager.close_all()
     websocket_server.manager.stop()
     websocket_server.manager.join()
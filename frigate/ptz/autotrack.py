@@ -16,7 +16,7 @@ from norfair.camera_motion import MotionEstimator, TranslationTransformationGett
 from frigate.config import CameraConfig, FrigateConfig
 from frigate.ptz.onvif import OnvifController
 from frigate.types import PTZMetricsTypes
-from frigate.util.image import SharedMemoryFrameManager, intersection_over_union
+from frigate.util.image import intersection_over_union
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +39,6 @@ class PtzMotionEstimator:
     def __init__(
         self, config: CameraConfig, ptz_metrics: dict[str, PTZMetricsTypes]
     ) -> None:
-        self.frame_manager = SharedMemoryFrameManager()
         self.norfair_motion_estimator = None
         self.camera_config = config
         self.coord_transformations = None
@@ -50,7 +49,7 @@ class PtzMotionEstimator:
         self.ptz_metrics["ptz_reset"].set()
         logger.debug(f"Motion estimator init for cam: {config.name}")
 
-    def motion_estimator(self, detections, frame_time, camera_name):
+    def motion_estimator(self, detections, frame_time, camera_name, yuv_frame):
         # If we've just started up or returned to our preset, reset motion estimator for new tracking session
         if self.ptz_metrics["ptz_reset"].is_set():
             self.ptz_metrics["ptz_reset"].clear()
@@ -70,11 +69,6 @@ class PtzMotionEstimator:
                 f"Motion estimator running for {camera_name} - frame time: {frame_time}, {self.ptz_start_time.value}, {self.ptz_stop_time.value}"
             )
 
-            frame_id = f"{camera_name}{frame_time}"
-            yuv_frame = self.frame_manager.get(
-                frame_id, self.camera_config.frame_shape_yuv
-            )
-
             frame = cv2.cvtColor(yuv_frame, cv2.COLOR_YUV2GRAY_I420)
 
             # mask out detections for better motion estimation
@@ -95,8 +89,6 @@ class PtzMotionEstimator:
                 frame, mask
             )
 
-            self.frame_manager.close(frame_id)
-
             logger.debug(
                 f"Motion estimator transformation: {self.coord_transformations.rel_to_abs((0,0))}"
             )
@@ -5,14 +5,33 @@ import itertools
 import logging
 import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing.synchronize import Event as MpEvent
 from pathlib import Path
 
 from peewee import DatabaseError, chunked
 
-from frigate.config import FrigateConfig, RetainModeEnum
+from frigate.config import FrigateConfig, SyncModeEnum
 from frigate.const import CACHE_DIR, RECORD_DIR
-from frigate.models import Event, Recordings, RecordingsToDelete
+from frigate.models import Recordings, RecordingsToDelete
+from frigate.record.retention import (
+    RETENTION_UNLINK_WORKERS,
+    delete_recordings,
+    get_expired_recordings,
+    get_removed_camera_recordings,
+    iter_recordings,
+    summarize_recordings,
+)
+from frigate.record.sync import (
+    MANIFEST_SETTLE_SECONDS,
+    RECORDINGS_MANIFEST,
+    SYNC_SCAN_WORKERS,
+    find_hour_directories,
+    get_hour_start,
+    load_manifest,
+    save_manifest,
+    scan_directory,
+)
 from frigate.record.util import remove_empty_directories
 
 logger = logging.getLogger(__name__)
@@ -39,161 +58,180 @@ class RecordingCleanup(threading.Thread):
                     pass
                 p.unlink(missing_ok=True)
 
-    def expire_recordings(self) -> None:
-        """Delete recordings based on retention config."""
+    def expire_recordings(self, dry_run: bool = False) -> dict[str, dict[str, int]]:
+        """Delete recordings based on retention config.
+
+        The recordings to delete are worked out by the database and streamed
+        from a cursor, so only a batch of them is in memory at a time. With
+        dry_run nothing is deleted and the number of recordings and bytes
+        that would be freed are returned for each camera instead.
+        """
         logger.debug("Start expire recordings.")
-        logger.debug("Start deleted cameras.")
+        expired: dict[str, tuple[str, list]] = {}
+
         # Handle deleted cameras
         expire_days = self.config.record.retain.days
         expire_before = (
             datetime.datetime.now() - datetime.timedelta(days=expire_days)
         ).timestamp()
-        no_camera_recordings: Recordings = Recordings.select().where(
-            Recordings.camera.not_in(list(self.config.cameras.keys())),
-            Recordings.end_time < expire_before,
+        expired["removed cameras"] = get_removed_camera_recordings(
+            list(self.config.cameras.keys()), expire_before
         )
 
-        deleted_recordings = set()
-        for recording in no_camera_recordings:
-            Path(recording.path).unlink(missing_ok=True)
-            deleted_recordings.add(recording.id)
-
-        logger.debug(f"Expiring {len(deleted_recordings)} recordings")
-        # delete up to 100,000 at a time
-        max_deletes = 100000
-        deleted_recordings_list = list(deleted_recordings)
-        for i in range(0, len(deleted_recordings_list), max_deletes):
-            Recordings.delete().where(
-                Recordings.id << deleted_recordings_list[i : i + max_deletes]
-            ).execute()
-        logger.debug("End deleted cameras.")
-
-        logger.debug("Start all cameras.")
         for camera, config in self.config.cameras.items():
-            logger.debug(f"Start camera: {camera}.")
             # Get the timestamp for cutoff of retained days
             expire_days = config.record.retain.days
             expire_date = (
                 datetime.datetime.now() - datetime.timedelta(days=expire_days)
             ).timestamp()
-
-            # Get recordings to check for expiration
-            recordings: Recordings = (
-                Recordings.select()
-                .where(
-                    Recordings.camera == camera,
-                    Recordings.end_time < expire_date,
-                )
-                .order_by(Recordings.start_time)
+            expired[camera] = get_expired_recordings(
+                camera, expire_date, config.record.events.retain.mode
             )
 
-            # Get all the events to check against
-            events: Event = (
-                Event.select()
-                .where(
-                    Event.camera == camera,
-                    # need to ensure segments for all events starting
-                    # before the expire date are included
-                    Event.start_time < expire_date,
-                    Event.has_clip,
+        summary = {}
+
+        if dry_run:
+            for camera, query in expired.items():
+                summary[camera] = summarize_recordings(query)
+                logger.info(
+                    f"{camera}: {summary[camera]['recordings']} recordings would be expired, freeing {summary[camera]['bytes']} bytes."
                 )
-                .order_by(Event.start_time)
-                .objects()
-            )
 
-            # loop over recordings and see if they overlap with any non-expired events
-            # TODO: expire segments based on segment stats according to config
-            event_start = 0
-            deleted_recordings = set()
-            for recording in recordings.objects().iterator():
-                keep = False
-                # Now look for a reason to keep this recording segment
-                for idx in range(event_start, len(events)):
-                    event = events[idx]
-
-                    # if the event starts in the future, stop checking events
-                    # and let this recording segment expire
-                    if event.start_time > recording.end_time:
-                        keep = False
-                        break
-
-                    # if the event is in progress or ends after the recording starts, keep it
-                    # and stop looking at events
-                    if event.end_time is None or event.end_time >= recording.start_time:
-                        keep = True
-                        break
-
-                    # if the event ends before this recording segment starts, skip
-                    # this event and check the next event for an overlap.
-                    # since the events and recordings are sorted, we can skip events
-                    # that end before the previous recording segment started on future segments
-                    if event.end_time < recording.start_time:
-                        event_start = idx
-
-                # Delete recordings outside of the retention window or based on the retention mode
-                if (
-                    not keep
-                    or (
-                        config.record.events.retain.mode == RetainModeEnum.motion
-                        and recording.motion == 0
-                    )
-                    or (
-                        config.record.events.retain.mode
-                        == RetainModeEnum.active_objects
-                        and recording.objects == 0
-                    )
-                ):
-                    Path(recording.path).unlink(missing_ok=True)
-                    deleted_recordings.add(recording.id)
-
-            logger.debug(f"Expiring {len(deleted_recordings)} recordings")
-            # delete up to 100,000 at a time
-            max_deletes = 100000
-            deleted_recordings_list = list(deleted_recordings)
-            for i in range(0, len(deleted_recordings_list), max_deletes):
-                Recordings.delete().where(
-                    Recordings.id << deleted_recordings_list[i : i + max_deletes]
-                ).execute()
-
-            logger.debug(f"End camera: {camera}.")
-
-        logger.debug("End all cameras.")
+            return summary
+
+        with ThreadPoolExecutor(max_workers=RETENTION_UNLINK_WORKERS) as executor:
+            for camera, query in expired.items():
+                logger.debug(f"Start camera: {camera}.")
+                deleted = delete_recordings(iter_recordings(query), executor)
+                logger.debug(f"Expired {deleted} recordings")
+                logger.debug(f"End camera: {camera}.")
+
         logger.debug("End expire recordings.")
+        return summary
 
     def sync_recordings(self) -> None:
-        """Check the db for stale recordings entries that don't exist in the filesystem."""
+        """Check the db for stale recordings entries that don't exist in the filesystem.
+
+        In incremental mode only the hour directories whose mtime changed since
+        the last sync are listed, and only the recordings of those hours are
+        checked. The directories seen are kept in a manifest next to the
+        database. Without a manifest, or in full mode, every directory and
+        every recording is checked.
+        """
         logger.debug("Start sync recordings.")
+        manifest_path = os.path.join(
+            os.path.dirname(self.config.database.path), RECORDINGS_MANIFEST
+        )
+        manifest = None
+
+        if self.config.record.sync_mode == SyncModeEnum.incremental:
+            manifest = load_manifest(manifest_path)
+
+            if manifest is None:
+                logger.info("No recordings manifest, syncing all recordings.")
+
+        scan_start = datetime.datetime.now().timestamp()
+
+        with ThreadPoolExecutor(max_workers=SYNC_SCAN_WORKERS) as executor:
+            directories = find_hour_directories(RECORD_DIR, executor)
+            changed = [
+                directory
+                for directory, mtime in directories.items()
+                if manifest is None
+                or manifest.get(directory, {}).get("mtime") != mtime
+            ]
+            files = dict(
+                zip(
+                    changed,
+                    executor.map(
+                        lambda directory: scan_directory(
+                            os.path.join(RECORD_DIR, directory)
+                        ),
+                        changed,
+                    ),
+                )
+            )
+
+        if manifest is None:
+            recordings = Recordings.select(Recordings.id, Recordings.path).iterator()
+        else:
+            # removed directories are checked too, all their recordings are gone
+            removed = [
+                directory for directory in manifest if directory not in directories
+            ]
+            recordings = self.get_hour_recordings(changed + removed)
+            logger.debug(
+                f"Checking {len(changed)} changed and {len(removed)} removed directories"
+            )
 
-        # get all recordings in the db
-        recordings = Recordings.select(Recordings.id, Recordings.path)
+        recordings_to_delete = []
 
-        # get all recordings files on disk and put them in a set
-        files_on_disk = {
-            os.path.join(root, file)
-            for root, _, files in os.walk(RECORD_DIR)
-            for file in files
-        }
+        for recording in recordings:
+            directory = os.path.relpath(os.path.dirname(recording.path), RECORD_DIR)
 
-        # Use pagination to process records in chunks
-        page_size = 1000
-        num_pages = (recordings.count() + page_size - 1) // page_size
-        recordings_to_delete = set()
+            if directory in files:
+                missing = recording.path not in files[directory]
+            elif get_hour_start(directory) is not None:
+                missing = directory not in directories
+            else:
+                missing = not os.path.exists(recording.path)
 
-        for page in range(num_pages):
-            for recording in recordings.paginate(page, page_size):
-                if recording.path not in files_on_disk:
-                    recordings_to_delete.add(recording.id)
+            if missing:
+                recordings_to_delete.append(recording.id)
 
-        # convert back to list of dictionaries for insertion
-        recordings_to_delete = [
-            {"id": recording_id} for recording_id in recordings_to_delete
-        ]
+        if not self.delete_missing_recordings(recordings_to_delete):
+            return
+
+        if self.config.record.sync_mode == SyncModeEnum.incremental:
+            new_manifest = {
+                directory: entry
+                for directory, entry in (manifest or {}).items()
+                if directory in directories
+            }
+
+            settled = (scan_start - MANIFEST_SETTLE_SECONDS) * 1e9
+
+            for directory in changed:
+                if directories[directory] > settled:
+                    new_manifest.pop(directory, None)
+                    continue
+
+                new_manifest[directory] = {
+                    "mtime": directories[directory],
+                    "files": len(files[directory]),
+                    "bytes": sum(files[directory].values()),
+                }
+
+            save_manifest(manifest_path, new_manifest)
+
+        logger.debug("End sync recordings.")
 
-        if len(recordings_to_delete) / max(1, recordings.count()) > 0.5:
+    def get_hour_recordings(self, directories: list[str]) -> list[Recordings]:
+        """Recordings in the hours of the given date/hour/camera directories."""
+        hours = {get_hour_start(directory) for directory in directories} - {None}
+        recordings = []
+
+        # by start time only so the start time index is used, the camera
+        # is part of the directory the recordings are matched against
+        for hour in sorted(hours):
+            recordings.extend(
+                Recordings.select(Recordings.id, Recordings.path).where(
+                    Recordings.start_time >= hour,
+                    Recordings.start_time < hour + 3600,
+                )
+            )
+
+        return recordings
+
+    def delete_missing_recordings(self, recordings_to_delete: list[str]) -> bool:
+        """Delete the recordings with missing files, False if it was aborted."""
+        recordings_count = Recordings.select().count()
+
+        if len(recordings_to_delete) / max(1, recordings_count) > 0.5:
             logger.debug(
-                f"Deleting {(len(recordings_to_delete) / recordings.count()):2f}% of recordings could be due to configuration error. Aborting..."
+                f"Deleting {(len(recordings_to_delete) / recordings_count):2f}% of recordings could be due to configuration error. Aborting..."
             )
-            return
+            return False
 
         logger.debug(
             f"Deleting {len(recordings_to_delete)} recordings with missing files"
@@ -205,7 +243,9 @@ class RecordingCleanup(threading.Thread):
         # insert ids to the temporary table
         max_inserts = 1000
         for batch in chunked(recordings_to_delete, max_inserts):
-            RecordingsToDelete.insert_many(batch).execute()
+            RecordingsToDelete.insert_many(
+                [{"id": recording_id} for recording_id in batch]
+            ).execute()
 
         try:
             # delete records in the main table that exist in the temporary table
@@ -216,7 +256,7 @@ class RecordingCleanup(threading.Thread):
         except DatabaseError as e:
             logger.error(f"Database error during delete: {e}")
 
-        logger.debug("End sync recordings.")
+        return True
 
     def run(self) -> None:
         # on startup sync recordings with disk if enabled
@@ -1,6 +1,7 @@
 """Maintain recording segments in cache."""
 
 import asyncio
+import bisect
 import datetime
 import logging
 import multiprocessing as mp
@@ -10,13 +11,11 @@ import random
 import string
 import threading
 from collections import defaultdict
+from multiprocessing.sharedctypes import Synchronized
 from multiprocessing.synchronize import Event as MpEvent
 from pathlib import Path
 from typing import Any, Optional, Tuple
 
-import numpy as np
-import psutil
-
 from frigate.config import FrigateConfig, RetainModeEnum
 from frigate.const import (
     CACHE_DIR,
@@ -24,13 +23,22 @@ from frigate.const import (
     MAX_SEGMENT_DURATION,
     RECORD_DIR,
 )
+from frigate.frame_results import FrameResultRing
 from frigate.models import Event, Recordings
+from frigate.record.mp4 import faststart, get_duration
+from frigate.record.watcher import SegmentWatcher
 from frigate.types import FeatureMetricsTypes
-from frigate.util.image import area
 from frigate.util.services import get_video_properties
 
 logger = logging.getLogger(__name__)
 
+# seconds a finished segment waits for the frames it covers to be processed
+SEGMENT_FRAMES_TIMEOUT = 5
+# most recent segments of a camera kept in the cache when falling behind
+MAX_CACHED_SEGMENTS = 5
+# seconds of frame info kept for a camera, covers every segment the cache keeps
+RECORDING_INFO_MAX_AGE = MAX_CACHED_SEGMENTS * MAX_SEGMENT_DURATION
+
 
 class SegmentInfo:
     def __init__(
@@ -51,6 +59,58 @@ class SegmentInfo:
         )
 
 
+class RecordingInfoBuffer:
+    """Values of the frames of a camera indexed by their frame time.
+
+    Frames are appended in time order and each value is kept as a running
+    total, so the totals over a segment are two bisect lookups no matter how
+    many frames it covers. Frames are dropped from the front by moving the
+    start index and the lists are only compacted once half of them is unused.
+    """
+
+    def __init__(self, columns: int, max_age: float = RECORDING_INFO_MAX_AGE) -> None:
+        self.max_age = max_age
+        self.start = 0
+        self.times: list[float] = []
+        # totals[column][i] is the total of the frames before times[i]
+        self.totals: list[list[float]] = [[0] for _ in range(columns)]
+
+    def __len__(self) -> int:
+        return len(self.times) - self.start
+
+    def append(self, frame_time: float, *values: float) -> None:
+        self.times.append(frame_time)
+
+        for totals, value in zip(self.totals, values):
+            totals.append(totals[-1] + value)
+
+        # stay bounded however far behind the segments are
+        if self.times[self.start] < frame_time - self.max_age:
+            self.trim(frame_time - self.max_age)
+
+    def latest(self) -> Optional[float]:
+        """Time of the most recent frame."""
+        return self.times[-1] if len(self) > 0 else None
+
+    def trim(self, before: float) -> None:
+        """Drop the frames before the given time."""
+        self.start = bisect.bisect_left(self.times, before, self.start)
+
+        if self.start > 1024 and self.start * 2 > len(self.times):
+            del self.times[: self.start]
+
+            for totals in self.totals:
+                del totals[: self.start]
+
+            self.start = 0
+
+    def sum(self, start_time: float, end_time: float) -> tuple[int, list[float]]:
+        """Number of frames between the times and the totals of their values."""
+        lo = bisect.bisect_left(self.times, start_time, self.start)
+        hi = bisect.bisect_right(self.times, end_time, lo)
+        return hi - lo, [totals[hi] - totals[lo] for totals in self.totals]
+
+
 class RecordingMaintainer(threading.Thread):
     def __init__(
         self,
@@ -58,7 +118,9 @@ class RecordingMaintainer(threading.Thread):
         inter_process_queue: mp.Queue,
         object_recordings_info_queue: mp.Queue,
         audio_recordings_info_queue: Optional[mp.Queue],
+        frame_results: FrameResultRing,
         process_info: dict[str, FeatureMetricsTypes],
+        record_pids: dict[str, Synchronized],
         stop_event: MpEvent,
     ):
         threading.Thread.__init__(self)
@@ -67,11 +129,19 @@ class RecordingMaintainer(threading.Thread):
         self.inter_process_queue = inter_process_queue
         self.object_recordings_info_queue = object_recordings_info_queue
         self.audio_recordings_info_queue = audio_recordings_info_queue
+        self.frame_results = frame_results
         self.process_info = process_info
         self.stop_event = stop_event
-        self.object_recordings_info: dict[str, list] = defaultdict(list)
-        self.audio_recordings_info: dict[str, list] = defaultdict(list)
+        # (frame time, active object count, motion area) of each frame
+        self.object_recordings_info: dict[str, RecordingInfoBuffer] = defaultdict(
+            lambda: RecordingInfoBuffer(2)
+        )
+        # (frame time, dBFS) of each audio chunk
+        self.audio_recordings_info: dict[str, RecordingInfoBuffer] = defaultdict(
+            lambda: RecordingInfoBuffer(1)
+        )
         self.end_time_cache: dict[str, Tuple[datetime.datetime, float]] = {}
+        self.segment_watcher = SegmentWatcher(CACHE_DIR, record_pids)
 
     async def move_files(self) -> None:
         cache_files = sorted(
@@ -84,18 +154,7 @@ class RecordingMaintainer(threading.Thread):
             ]
         )
 
-        files_in_use = []
-        for process in psutil.process_iter():
-            try:
-                if process.name() != "ffmpeg":
-                    continue
-                flist = process.open_files()
-                if flist:
-                    for nt in flist:
-                        if nt.path.startswith(CACHE_DIR):
-                            files_in_use.append(nt.path.split("/")[-1])
-            except psutil.Error:
-                continue
+        files_in_use = self.segment_watcher.files_in_use(cache_files)
 
         # group recordings by camera
         grouped_recordings: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
@@ -116,8 +175,8 @@ class RecordingMaintainer(threading.Thread):
                 }
             )
 
-        # delete all cached files past the most recent 5
-        keep_count = 5
+        # delete all cached files past the most recent few
+        keep_count = MAX_CACHED_SEGMENTS
         for camera in grouped_recordings.keys():
             segment_count = len(grouped_recordings[camera])
             if segment_count > keep_count:
@@ -133,21 +192,13 @@ class RecordingMaintainer(threading.Thread):
 
         tasks = []
         for camera, recordings in grouped_recordings.items():
-            # clear out all the object recording info for old frames
-            while (
-                len(self.object_recordings_info[camera]) > 0
-                and self.object_recordings_info[camera][0][0]
-                < recordings[0]["start_time"].timestamp()
-            ):
-                self.object_recordings_info[camera].pop(0)
-
-            # clear out all the audio recording info for old frames
-            while (
-                len(self.audio_recordings_info[camera]) > 0
-                and self.audio_recordings_info[camera][0][0]
-                < recordings[0]["start_time"].timestamp()
-            ):
-                self.audio_recordings_info[camera].pop(0)
+            # clear out all the object and audio recording info for old frames
+            self.object_recordings_info[camera].trim(
+                recordings[0]["start_time"].timestamp()
+            )
+            self.audio_recordings_info[camera].trim(
+                recordings[0]["start_time"].timestamp()
+            )
 
             # get all events with the end time after the start of the oldest cache file
             # or with end_time None
@@ -191,12 +242,18 @@ class RecordingMaintainer(threading.Thread):
         if cache_path in self.end_time_cache:
             end_time, duration = self.end_time_cache[cache_path]
         else:
-            segment_info = await get_video_properties(cache_path, get_duration=True)
+            # read from the moov box, probe the segment if that fails
+            duration = get_duration(cache_path)
 
-            if segment_info["duration"]:
-                duration = float(segment_info["duration"])
-            else:
-                duration = -1
+            if duration is None:
+                segment_info = await get_video_properties(
+                    cache_path, get_duration=True
+                )
+
+                if segment_info["duration"]:
+                    duration = float(segment_info["duration"])
+                else:
+                    duration = -1
 
             # ensure duration is within expected length
             if 0 < duration < MAX_SEGMENT_DURATION:
@@ -210,6 +267,15 @@ class RecordingMaintainer(threading.Thread):
                 Path(cache_path).unlink(missing_ok=True)
                 return
 
+        # segments are picked up as soon as ffmpeg closes them, wait for the
+        # frames they cover unless the camera stopped sending frames
+        latest_frame_time = self.object_recordings_info[camera].latest() or 0
+        if latest_frame_time < end_time.timestamp() and (
+            datetime.datetime.now().timestamp() - end_time.timestamp()
+            < SEGMENT_FRAMES_TIMEOUT
+        ):
+            return None
+
         # if cached file's start_time is earlier than the retain days for the camera
         if start_time <= (
             (
@@ -251,10 +317,7 @@ class RecordingMaintainer(threading.Thread):
             # if it ends more than the configured pre_capture for the camera
             else:
                 pre_capture = self.config.cameras[camera].record.events.pre_capture
-                most_recently_processed_frame_time = self.object_recordings_info[
-                    camera
-                ][-1][0]
-                retain_cutoff = most_recently_processed_frame_time - pre_capture
+                retain_cutoff = latest_frame_time - pre_capture
                 if end_time.timestamp() < retain_cutoff:
                     Path(cache_path).unlink(missing_ok=True)
                     self.end_time_cache.pop(cache_path, None)
@@ -268,39 +331,13 @@ class RecordingMaintainer(threading.Thread):
     def segment_stats(
         self, camera: str, start_time: datetime.datetime, end_time: datetime.datetime
     ) -> SegmentInfo:
-        active_count = 0
-        motion_count = 0
-        for frame in self.object_recordings_info[camera]:
-            # frame is after end time of segment
-            if frame[0] > end_time.timestamp():
-                break
-            # frame is before start time of segment
-            if frame[0] < start_time.timestamp():
-                continue
-
-            active_count += len(
-                [
-                    o
-                    for o in frame[1]
-                    if not o["false_positive"] and o["motionless_count"] == 0
-                ]
-            )
-
-            motion_count += sum([area(box) for box in frame[2]])
-
-        audio_values = []
-        for frame in self.audio_recordings_info[camera]:
-            # frame is after end time of segment
-            if frame[0] > end_time.timestamp():
-                break
-
-            # frame is before start time of segment
-            if frame[0] < start_time.timestamp():
-                continue
-
-            audio_values.append(frame[1])
-
-        average_dBFS = 0 if not audio_values else np.average(audio_values)
+        _, (active_count, motion_count) = self.object_recordings_info[camera].sum(
+            start_time.timestamp(), end_time.timestamp()
+        )
+        audio_count, (total_dBFS,) = self.audio_recordings_info[camera].sum(
+            start_time.timestamp(), end_time.timestamp()
+        )
+        average_dBFS = 0 if not audio_count else total_dBFS / audio_count
 
         return SegmentInfo(motion_count, active_count, round(average_dBFS))
 
@@ -340,29 +377,31 @@ class RecordingMaintainer(threading.Thread):
                 start_frame = datetime.datetime.now().timestamp()
 
                 # add faststart to kept segments to improve metadata reading
-                p = await asyncio.create_subprocess_exec(
-                    "ffmpeg",
-                    "-hide_banner",
-                    "-y",
-                    "-i",
-                    cache_path,
-                    "-c",
-                    "copy",
-                    "-movflags",
-                    "+faststart",
-                    file_path,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                await p.wait()
-
-                if p.returncode != 0:
-                    logger.error(f"Unable to convert {cache_path} to {file_path}")
-                    logger.error((await p.stderr.read()).decode("ascii"))
-                    return None
-                else:
-                    logger.debug(
-                        f"Copied {file_path} in {datetime.datetime.now().timestamp()-start_frame} seconds."
+                # segments the remuxer doesn't support are converted by ffmpeg
+                if not await asyncio.to_thread(faststart, cache_path, file_path):
+                    p = await asyncio.create_subprocess_exec(
+                        "ffmpeg",
+                        "-hide_banner",
+                        "-y",
+                        "-i",
+                        cache_path,
+                        "-c",
+                        "copy",
+                        "-movflags",
+                        "+faststart",
+                        file_path,
+                        stderr=asyncio.subprocess.PIPE,
                     )
+                    await p.wait()
+
+                    if p.returncode != 0:
+                        logger.error(f"Unable to convert {cache_path} to {file_path}")
+                        logger.error((await p.stderr.read()).decode("ascii"))
+                        return None
+
+                logger.debug(
+                    f"Copied {file_path} in {datetime.datetime.now().timestamp()-start_frame} seconds."
+                )
 
                 try:
                     # get the segment size of the cache file
@@ -402,9 +441,14 @@ class RecordingMaintainer(threading.Thread):
         return None
 
     def run(self) -> None:
-        # Check for new files every 5 seconds
+        # Check for new files as soon as a segment is finished or every 5 seconds
         wait_time = 0.0
-        while not self.stop_event.wait(wait_time):
+        while not self.stop_event.is_set():
+            self.segment_watcher.wait(wait_time, self.stop_event)
+
+            if self.stop_event.is_set():
+                break
+
             run_start = datetime.datetime.now().timestamp()
 
             # empty the object recordings info queue
@@ -413,19 +457,22 @@ class RecordingMaintainer(threading.Thread):
                     (
                         camera,
                         frame_time,
-                        current_tracked_objects,
-                        motion_boxes,
-                        regions,
+                        result_ref,
                     ) = self.object_recordings_info_queue.get(False)
 
                     if self.process_info[camera]["record_enabled"].value:
-                        self.object_recordings_info[camera].append(
-                            (
-                                frame_time,
-                                current_tracked_objects,
-                                motion_boxes,
-                                regions,
+                        counts = self.frame_results.get_counts(camera, result_ref)
+
+                        if counts is None:
+                            logger.warning(
+                                f"{camera}: result of frame {frame_time} was reused before it was recorded, keeping its segment."
                             )
+                            active_count, motion_area = 1, 1
+                        else:
+                            _, motion_area, active_count, _ = counts
+
+                        self.object_recordings_info[camera].append(
+                            frame_time, active_count, motion_area
                         )
                 except queue.Empty:
                     break
@@ -442,10 +489,7 @@ class RecordingMaintainer(threading.Thread):
 
                         if self.process_info[camera]["record_enabled"].value:
                             self.audio_recordings_info[camera].append(
-                                (
-                                    frame_time,
-                                    dBFS,
-                                )
+                                frame_time, dBFS
                             )
                     except queue.Empty:
                         break
@@ -460,4 +504,5 @@ class RecordingMaintainer(threading.Thread):
             duration = datetime.datetime.now().timestamp() - run_start
             wait_time = max(0, 5 - duration)
 
+        self.segment_watcher.close()
         logger.info("Exiting recording maintenance...")
@@ -0,0 +1,237 @@
+"""Read and rewrite the boxes of mp4 recording segments."""
+
+import logging
+import os
+import struct
+from typing import BinaryIO, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# boxes on the path to the chunk offset tables
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+# bytes copied at a time when writing a segment
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class Box:
+    def __init__(self, type: bytes, offset: int, size: int, header_size: int) -> None:
+        self.type = type
+        self.offset = offset
+        self.size = size
+        self.header_size = header_size
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+
+def iter_boxes(data, start: int, end: int) -> Iterator[Box]:
+    """Boxes in the bytes between start and end."""
+    offset = start
+
+    while offset + 8 <= end:
+        size, type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", data, offset + 8)
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+
+        if size < header_size or offset + size > end:
+            raise ValueError(f"invalid {type} box at {offset}")
+
+        yield Box(type, offset, size, header_size)
+        offset += size
+
+
+def read_top_level_boxes(file: BinaryIO) -> list[Box]:
+    """Top level boxes of a file, only their headers are read."""
+    file_size = os.fstat(file.fileno()).st_size
+    boxes = []
+    offset = 0
+
+    while offset + 8 <= file_size:
+        file.seek(offset)
+        header = file.read(16)
+        size, type = struct.unpack_from(">I4s", header)
+        header_size = 8
+
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", header, 8)
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+
+        if size < header_size or offset + size > file_size:
+            raise ValueError(f"invalid {type} box at {offset}")
+
+        boxes.append(Box(type, offset, size, header_size))
+        offset += size
+
+    return boxes
+
+
+def read_moov(file: BinaryIO, boxes: list[Box]) -> tuple[Box, bytearray]:
+    moov = [box for box in boxes if box.type == b"moov"]
+
+    if len(moov) != 1:
+        raise ValueError("expected a single moov box")
+
+    if any(box.type in (b"moof", b"mfra") for box in boxes):
+        raise ValueError("fragmented files are not supported")
+
+    file.seek(moov[0].offset)
+    return moov[0], bytearray(file.read(moov[0].size))
+
+
+def find_boxes(data, box: Box, types: set[bytes]) -> Iterator[Box]:
+    """Boxes of the given types in a box, looking into the containers on the way."""
+    for child in iter_boxes(data, box.offset + box.header_size, box.end):
+        if child.type in types:
+            yield child
+
+        if child.type in CONTAINER_BOXES:
+            yield from find_boxes(data, child, types)
+
+
+def parse_duration(data, box: Box) -> tuple[int, int]:
+    """Timescale and duration of a mvhd or mdhd box."""
+    offset = box.offset + box.header_size
+    version = data[offset]
+
+    if version == 1:
+        return struct.unpack_from(">IQ", data, offset + 20)
+
+    return struct.unpack_from(">II", data, offset + 12)
+
+
+def get_duration(path: str) -> Optional[float]:
+    """Duration in seconds from the movie header, None if it can't be read."""
+    try:
+        with open(path, "rb") as file:
+            moov, data = read_moov(file, read_top_level_boxes(file))
+
+        moov = Box(moov.type, 0, moov.size, moov.header_size)
+        headers = list(find_boxes(data, moov, {b"mvhd", b"mdhd"}))
+        durations = [
+            (box.type, duration / timescale)
+            for box in headers
+            for timescale, duration in [parse_duration(data, box)]
+            if timescale > 0
+        ]
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Unable to read the duration of {path}: {e}")
+        return None
+
+    movie = [duration for type, duration in durations if type == b"mvhd"]
+
+    if movie and movie[0] > 0:
+        return movie[0]
+
+    # fall back to the longest track
+    tracks = [duration for type, duration in durations if type == b"mdhd"]
+    return max(tracks) if tracks and max(tracks) > 0 else None
+
+
+def patch_chunk_offsets(data: bytearray, moov: Box, shift) -> None:
+    """Move every chunk offset in the moov box with the shift function."""
+    for box in find_boxes(data, moov, {b"stco", b"co64"}):
+        offset = box.offset + box.header_size + 4
+        (count,) = struct.unpack_from(">I", data, offset)
+        offset += 4
+        entry_format = ">I" if box.type == b"stco" else ">Q"
+        entry_size = struct.calcsize(entry_format)
+
+        if offset + count * entry_size > box.end:
+            raise ValueError(f"invalid {box.type} box")
+
+        for i in range(count):
+            entry = offset + i * entry_size
+            (chunk_offset,) = struct.unpack_from(entry_format, data, entry)
+            chunk_offset = shift(chunk_offset)
+
+            if box.type == b"stco" and chunk_offset > 0xFFFFFFFF:
+                raise ValueError("chunk offset does not fit in stco")
+
+            struct.pack_into(entry_format, data, entry, chunk_offset)
+
+
+def copy_range(src: BinaryIO, dst: BinaryIO, offset: int, size: int) -> None:
+    src.seek(offset)
+
+    while size > 0:
+        chunk = src.read(min(size, COPY_BUFFER_SIZE))
+
+        if not chunk:
+            raise ValueError("file ended early")
+
+        dst.write(chunk)
+        size -= len(chunk)
+
+
+def faststart(src_path: str, dst_path: str) -> bool:
+    """Copy a segment with its moov box in front of the media data.
+
+    The chunk offsets of the tracks are moved along with the media data so
+    the result is the same as ffmpeg -c copy -movflags +faststart without
+    decoding anything. Returns False if the file is not supported, like
+    fragmented files, or can't be read or written, without leaving anything
+    at dst_path.
+    """
+    written = False
+
+    try:
+        with open(src_path, "rb") as src:
+            boxes = read_top_level_boxes(src)
+            moov, data = read_moov(src, boxes)
+            mdats = [box for box in boxes if box.type == b"mdat"]
+
+            if not mdats:
+                raise ValueError("no mdat box")
+
+            # moov goes right before the first mdat, everything else keeps its order
+            first_mdat = boxes.index(mdats[0])
+            order = [box for box in boxes[:first_mdat] if box is not moov] + [moov]
+            order += [box for box in boxes[first_mdat:] if box is not moov]
+
+            new_offsets = {}
+            offset = 0
+
+            for box in order:
+                new_offsets[box.offset] = offset
+                offset += box.size
+
+            def shift(chunk_offset):
+                for box in boxes:
+                    if box.offset <= chunk_offset < box.end:
+                        return chunk_offset - box.offset + new_offsets[box.offset]
+
+                raise ValueError(f"chunk offset {chunk_offset} is outside the file")
+
+            patch_chunk_offsets(
+                data, Box(moov.type, 0, moov.size, moov.header_size), shift
+            )
+
+            written = True
+
+            with open(dst_path, "wb") as dst:
+                for box in order:
+                    if box is moov:
+                        dst.write(data)
+                    else:
+                        copy_range(src, dst, box.offset, box.size)
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Unable to faststart {src_path}: {e}")
+
+        # don't leave a partial segment behind, like after a failed write
+        if written:
+            try:
+                os.remove(dst_path)
+            except OSError:
+                pass
+
+        return False
+
+    return True
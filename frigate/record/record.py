@@ -4,6 +4,7 @@ import logging
 import multiprocessing as mp
 import signal
 import threading
+from multiprocessing.sharedctypes import Synchronized
 from types import FrameType
 from typing import Optional
 
@@ -11,6 +12,7 @@ from playhouse.sqliteq import SqliteQueueDatabase
 from setproctitle import setproctitle
 
 from frigate.config import FrigateConfig
+from frigate.frame_results import FrameResultRing
 from frigate.models import Event, Recordings
 from frigate.record.maintainer import RecordingMaintainer
 from frigate.types import FeatureMetricsTypes
@@ -24,7 +26,9 @@ def manage_recordings(
     inter_process_queue: mp.Queue,
     object_recordings_info_queue: mp.Queue,
     audio_recordings_info_queue: mp.Queue,
+    frame_results: FrameResultRing,
     process_info: dict[str, FeatureMetricsTypes],
+    record_pids: dict[str, Synchronized],
 ) -> None:
     stop_event = mp.Event()
 
@@ -55,7 +59,9 @@ def manage_recordings(
         inter_process_queue,
         object_recordings_info_queue,
         audio_recordings_info_queue,
+        frame_results,
         process_info,
+        record_pids,
         stop_event,
     )
     maintainer.start()
@@ -0,0 +1,130 @@
+"""Find and delete the recordings that are past their retention."""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from peewee import chunked
+
+from frigate.config import RetainModeEnum
+from frigate.const import MAX_SEGMENT_DURATION
+from frigate.models import Recordings
+
+logger = logging.getLogger(__name__)
+
+# recordings unlinked and deleted from the db at a time
+RETENTION_BATCH_SIZE = 10000
+# threads unlinking the files of a batch
+RETENTION_UNLINK_WORKERS = 8
+
+# recordings of a camera that ended before the expire date and don't overlap a
+# clip of any event, or do but are not kept by the event retain mode. the
+# events drive the join and a recording can't end more than the max segment
+# duration after the end of an event it overlaps, so every event only looks
+# at a small range of the recordings end time index.
+EXPIRED_RECORDINGS_QUERY = """
+with kept as (
+  select r.id
+  from event e
+  cross join recordings r
+  where e.camera = ?
+    and e.has_clip
+    and e.start_time < ?
+    and r.end_time >= e.start_time
+    and r.end_time <= coalesce(e.end_time, ?) + ?
+    and r.start_time <= coalesce(e.end_time, ?)
+    and +r.camera = e.camera
+)
+select r.id, r.path, r.segment_size
+from recordings r
+where r.camera = ?
+  and r.end_time < ?
+  and (r.id not in (select id from kept) or {mode_filter})
+"""
+
+# recordings of cameras that were removed from the config
+REMOVED_CAMERA_RECORDINGS_QUERY = """
+select r.id, r.path, r.segment_size
+from recordings r
+where r.camera not in ({cameras})
+  and r.end_time < ?
+"""
+
+MODE_FILTERS = {
+    RetainModeEnum.all: "0",
+    RetainModeEnum.motion: "r.motion = 0",
+    RetainModeEnum.active_objects: "r.objects = 0",
+}
+
+
+def get_expired_recordings(
+    camera: str, expire_date: float, retain_mode: RetainModeEnum
+) -> tuple[str, list]:
+    """Query and parameters of the expired recordings of a camera."""
+    return (
+        EXPIRED_RECORDINGS_QUERY.format(mode_filter=MODE_FILTERS[retain_mode]),
+        [
+            camera,
+            expire_date,
+            expire_date,
+            MAX_SEGMENT_DURATION,
+            expire_date,
+            camera,
+            expire_date,
+        ],
+    )
+
+
+def get_removed_camera_recordings(
+    cameras: list[str], expire_date: float
+) -> tuple[str, list]:
+    """Query and parameters of the expired recordings of removed cameras."""
+    return (
+        REMOVED_CAMERA_RECORDINGS_QUERY.format(
+            cameras=", ".join("?" for _ in cameras) or "null"
+        ),
+        [*cameras, expire_date],
+    )
+
+
+def iter_recordings(query: tuple[str, list]) -> Iterator[tuple[str, str, float]]:
+    """Stream the id, path and size of the recordings from a cursor."""
+    sql, params = query
+    return Recordings.raw(sql, *params).tuples().iterator()
+
+
+def summarize_recordings(query: tuple[str, list]) -> dict[str, int]:
+    """Number of recordings and bytes they take up, without deleting them."""
+    sql, params = query
+    count, size = (
+        Recordings.raw(
+            f"select count(*), total(segment_size) from ({sql})",
+            *params,
+        )
+        .tuples()
+        .get()
+    )
+    # segment size is stored in MB
+    return {"recordings": count, "bytes": int(size * pow(2, 20))}
+
+
+def delete_recordings(
+    recordings: Iterable[tuple[str, str, float]], executor: ThreadPoolExecutor
+) -> int:
+    """Unlink and delete the recordings in batches, returns how many there were."""
+    deleted = 0
+
+    for batch in chunked(recordings, RETENTION_BATCH_SIZE):
+        list(
+            executor.map(
+                lambda path: Path(path).unlink(missing_ok=True),
+                [path for _, path, _ in batch],
+            )
+        )
+        Recordings.delete().where(
+            Recordings.id << [id for id, _, _ in batch]
+        ).execute()
+        deleted += len(batch)
+
+    return deleted
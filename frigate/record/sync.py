@@ -0,0 +1,104 @@
+"""Keep track of the recording directories that changed since the last sync."""
+
+import datetime
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# directories seen by the last sync, kept next to the database
+RECORDINGS_MANIFEST = "recordings_manifest.json"
+# threads listing the recording directories
+SYNC_SCAN_WORKERS = 8
+# directories modified this close to a scan are listed again on the next sync,
+# coarse mtimes on network storage could hide a change made right after it
+MANIFEST_SETTLE_SECONDS = 2
+MANIFEST_VERSION = 1
+
+
+def get_hour_start(directory: str) -> Optional[float]:
+    """Start of the hour of a date/hour/camera directory, None if it's not one."""
+    try:
+        date, hour, _ = directory.split(os.sep)
+        return (
+            datetime.datetime.strptime(f"{date} {hour}", "%Y-%m-%d %H")
+            .replace(tzinfo=datetime.timezone.utc)
+            .timestamp()
+        )
+    except ValueError:
+        return None
+
+
+def load_manifest(path: str) -> Optional[dict[str, dict[str, int]]]:
+    """Directories of the last sync, None if there is no usable manifest."""
+    try:
+        with open(path) as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unable to read the recordings manifest {path}: {e}")
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+
+    return manifest["directories"]
+
+
+def save_manifest(path: str, directories: dict[str, dict[str, int]]) -> None:
+    tmp_path = f"{path}.tmp"
+
+    try:
+        with open(tmp_path, "w") as file:
+            json.dump({"version": MANIFEST_VERSION, "directories": directories}, file)
+
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Unable to write the recordings manifest {path}: {e}")
+
+
+def list_directories(path: str) -> list[os.DirEntry]:
+    try:
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+
+def find_hour_directories(
+    record_dir: str, executor: ThreadPoolExecutor
+) -> dict[str, int]:
+    """Mtime of every date/hour/camera directory, by path relative to record_dir."""
+
+    def find_in_date(date: os.DirEntry) -> dict[str, int]:
+        return {
+            os.path.join(date.name, hour.name, camera.name): camera.stat().st_mtime_ns
+            for hour in list_directories(date.path)
+            for camera in list_directories(hour.path)
+        }
+
+    directories = {}
+
+    for found in executor.map(find_in_date, list_directories(record_dir)):
+        directories.update(found)
+
+    return directories
+
+
+def scan_directory(path: str) -> dict[str, int]:
+    """Size of every file in a directory by its path."""
+    files = {}
+
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    files[entry.path] = entry.stat().st_size
+    except FileNotFoundError:
+        pass
+
+    return files
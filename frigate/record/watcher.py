@@ -0,0 +1,201 @@
+"""Watch the cache for recording segments that ffmpeg finished writing."""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+from multiprocessing.sharedctypes import Synchronized
+from typing import Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks from sys/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+# wd, mask, cookie and length of the name that follows
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def is_segment(file: str) -> bool:
+    return file.endswith(".mp4") and not file.startswith("clip_")
+
+
+def init_inotify(path: str) -> Optional[int]:
+    """inotify file descriptor watching the directory, None if unsupported."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        inotify_init1 = libc.inotify_init1
+        inotify_add_watch = libc.inotify_add_watch
+    except (AttributeError, OSError):
+        return None
+
+    fd = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+    if fd < 0:
+        logger.debug(f"Unable to init inotify: {os.strerror(ctypes.get_errno())}")
+        return None
+
+    if (
+        inotify_add_watch(
+            fd,
+            os.fsencode(path),
+            IN_CREATE | IN_CLOSE_WRITE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO,
+        )
+        < 0
+    ):
+        logger.debug(
+            f"Unable to watch {path} with inotify: {os.strerror(ctypes.get_errno())}"
+        )
+        os.close(fd)
+        return None
+
+    return fd
+
+
+class SegmentWatcher:
+    """Tells which recording segments in the cache ffmpeg is still writing.
+
+    With inotify a segment is written from when it is created until it is
+    closed, and wait returns as soon as one is closed. Segments that were
+    there before the watch started and every segment when inotify is not
+    available are checked against the files the recording ffmpeg processes
+    of the cameras have open. A camera without a running recording process
+    is assumed to still be writing its newest segment.
+    """
+
+    def __init__(self, cache_dir: str, record_pids: dict[str, Synchronized]) -> None:
+        self.cache_dir = cache_dir
+        self.record_pids = record_pids
+        self.fd = init_inotify(cache_dir)
+        # segments being written and segments from before the watch started
+        self.writing: set[str] = set()
+        self.unknown: set[str] = set()
+
+        if self.fd is None:
+            logger.info(
+                "Unable to watch the recording cache, checking it for new segments periodically."
+            )
+        else:
+            self.unknown = {f for f in os.listdir(cache_dir) if is_segment(f)}
+
+    def read_events(self) -> list[str]:
+        """Handle the queued inotify events and return the closed segments."""
+        closed = []
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+
+            while offset < len(data):
+                _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost, check everything against the processes
+                    logger.debug("Recording cache inotify queue overflowed.")
+                    self.unknown |= self.writing | {
+                        f for f in os.listdir(self.cache_dir) if is_segment(f)
+                    }
+                    self.writing.clear()
+                    continue
+
+                if not is_segment(name):
+                    continue
+
+                if mask & IN_CREATE:
+                    self.writing.add(name)
+                    self.unknown.discard(name)
+                elif mask & IN_CLOSE_WRITE:
+                    self.writing.discard(name)
+                    self.unknown.discard(name)
+                    closed.append(name)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.writing.discard(name)
+                    self.unknown.discard(name)
+                elif mask & IN_MOVED_TO:
+                    # moved in whole
+                    closed.append(name)
+
+        return closed
+
+    def wait(self, timeout: float, stop_event: threading.Event) -> list[str]:
+        """Wait until a segment is closed or the timeout, return the closed ones."""
+        if self.fd is None:
+            stop_event.wait(timeout)
+            return []
+
+        closed = self.read_events()
+
+        while not closed and timeout > 0 and not stop_event.is_set():
+            # wake up every second to check the stop event
+            interval = min(timeout, 1.0)
+            timeout -= interval
+
+            if select.select([self.fd], [], [], interval)[0]:
+                closed = self.read_events()
+
+        return closed
+
+    def get_open_files(self, pid: int) -> Optional[set[str]]:
+        """Cache files the process has open, None if it is not running."""
+        if pid == 0:
+            return None
+
+        try:
+            return {
+                os.path.basename(f.path)
+                for f in psutil.Process(pid).open_files()
+                if f.path.startswith(self.cache_dir)
+            }
+        except psutil.Error:
+            return None
+
+    def files_in_use(self, cache_files: list[str]) -> set[str]:
+        """Which of the segments in the cache are still being written."""
+        if self.fd is not None:
+            self.read_events()
+            self.unknown &= set(cache_files)
+
+            if not self.unknown:
+                return set(self.writing)
+
+        in_use = set()
+
+        for camera, pid in self.record_pids.items():
+            open_files = self.get_open_files(pid.value)
+
+            if open_files is None:
+                camera_files = [f for f in cache_files if f.rsplit("-", 1)[0] == camera]
+
+                if camera_files:
+                    in_use.add(max(camera_files))
+            else:
+                in_use |= open_files
+
+        if self.fd is not None:
+            return self.writing | (self.unknown & in_use)
+
+        return in_use
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
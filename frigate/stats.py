@@ -17,6 +17,7 @@ from frigate.config import FrigateConfig
 from frigate.const import CACHE_DIR, CLIPS_DIR, DRIVER_AMD, DRIVER_ENV_VAR, RECORD_DIR
 from frigate.object_detection import ObjectDetectProcess
 from frigate.types import CameraMetricsTypes, StatsTrackingTypes
+from frigate.util.image import RingFrameManager
 from frigate.util.services import (
     get_amd_gpu_stats,
     get_bandwidth_stats,
@@ -56,11 +57,13 @@ def stats_init(
     detectors: dict[str, ObjectDetectProcess],
     facedetectors: dict[str, ObjectDetectProcess],
     processes: dict[str, int],
+    frame_ring: Optional[RingFrameManager] = None,
 ) -> StatsTrackingTypes:
     stats_tracking: StatsTrackingTypes = {
         "camera_metrics": camera_metrics,
         "detectors": detectors,
         "facedetectors": facedetectors,
+        "frame_ring": frame_ring,
         "started": int(time.time()),
         "latest_frigate_version": get_latest_version(config),
         "last_updated": int(time.time()),
@@ -244,6 +247,7 @@ def stats_snapshot(
 ) -> dict[str, Any]:
     """Get a snapshot of the current stats that are being tracked."""
     camera_metrics = stats_tracking["camera_metrics"]
+    frame_ring = stats_tracking.get("frame_ring")
     stats: dict[str, Any] = {}
 
     total_detection_fps = 0
@@ -261,13 +265,22 @@ def stats_snapshot(
             if camera_stats["capture_process"]
             else None
         )
+        # disabled cameras have no frame slots
+        in_ring = frame_ring is not None and name in frame_ring.ref_counts
         stats[name] = {
             "camera_fps": round(camera_stats["camera_fps"].value, 2),
             "process_fps": round(camera_stats["process_fps"].value, 2),
             "skipped_fps": round(camera_stats["skipped_fps"].value, 2),
             "detection_fps": round(camera_stats["detection_fps"].value, 2),
+            "detection_wait": round(camera_stats["detection_wait"].value * 1000, 2),
+            "detection_dropped": camera_stats["detection_dropped"].value,
+            "detection_skip_ratio": round(
+                camera_stats["detection_skip_ratio"].value, 2
+            ),
             "facedetection_fps": round(camera_stats["facedetection_fps"].value, 2),
             "detection_enabled": camera_stats["detection_enabled"].value,
+            "frame_slots_in_use": frame_ring.in_use(name) if in_ring else 0,
+            "frame_slot_drops": frame_ring.dropped(name) if in_ring else 0,
             "pid": pid,
             "capture_pid": cpid,
             "ffmpeg_pid": ffmpeg_pid,
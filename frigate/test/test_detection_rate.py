@@ -0,0 +1,141 @@
+import multiprocessing as mp
+from unittest import TestCase, main
+
+from frigate.config import FrigateConfig
+from frigate.track.detection_rate import DetectionRate
+from frigate.track.norfair_tracker import NorfairTracker
+
+
+def tracked_object(**kwargs):
+    obj = {
+        "id": "a",
+        "score": 0.9,
+        "box": (10, 20, 110, 220),
+        "estimate": (10, 20, 110, 220),
+        "frame_time": 5.0,
+        "start_time": 1.0,
+    }
+    obj.update(kwargs)
+    return obj
+
+
+class TestDetectionRate(TestCase):
+    def setUp(self):
+        self.config = FrigateConfig(
+            **{
+                "mqtt": {"host": "mqtt"},
+                "cameras": {
+                    "front": {
+                        "ffmpeg": {
+                            "inputs": [
+                                {
+                                    "path": "rtsp://10.0.0.1:554/video",
+                                    "roles": ["detect"],
+                                }
+                            ]
+                        },
+                        "detect": {
+                            "height": 720,
+                            "width": 1280,
+                            "fps": 10,
+                            "adaptive": {"enabled": True, "min_fps": 2},
+                        },
+                    }
+                },
+            }
+        ).runtime_config()
+        self.detect_config = self.config.cameras["front"].detect
+
+    def detected_frames(self, tracked_objects, disappeared={"a": 0}, new_motion=False):
+        self.detection_rate = DetectionRate(self.detect_config)
+        return [
+            self.detection_rate.should_detect(
+                i / 10, tracked_objects, disappeared, new_motion
+            )
+            for i in range(10, 20)
+        ]
+
+    def test_stable_tracks_are_detected_at_the_min_fps(self):
+        detected = self.detected_frames([tracked_object()])
+
+        assert detected == [True, False, False, False, False] * 2
+        assert self.detection_rate.skip_ratio == 0.8
+
+    def test_new_motion_is_detected_at_the_max_fps(self):
+        assert all(self.detected_frames([tracked_object()], new_motion=True))
+
+        self.detect_config.adaptive.max_fps = 5
+
+        assert self.detected_frames([], new_motion=True) == [True, False] * 5
+
+    def test_uncertain_tracks_are_detected_at_the_max_fps(self):
+        assert all(self.detected_frames([tracked_object(score=0.5)]))
+        assert all(self.detected_frames([tracked_object()], disappeared={"a": 1}))
+        # new track
+        assert all(self.detected_frames([tracked_object(start_time=4.5)]))
+        # estimate moved away from the detections
+        assert all(
+            self.detected_frames([tracked_object(estimate=(40, 60, 140, 260))])
+        )
+
+    def test_every_frame_is_detected_when_disabled(self):
+        self.detect_config.adaptive.enabled = False
+
+        assert all(self.detected_frames([tracked_object()]))
+        assert self.detection_rate.skip_ratio == 0.0
+
+
+class TestNorfairTrackerPredict(TestCase):
+    def setUp(self):
+        config = FrigateConfig(
+            **{
+                "mqtt": {"host": "mqtt"},
+                "cameras": {
+                    "front": {
+                        "ffmpeg": {
+                            "inputs": [
+                                {
+                                    "path": "rtsp://10.0.0.1:554/video",
+                                    "roles": ["detect"],
+                                }
+                            ]
+                        },
+                        "detect": {"height": 720, "width": 1280, "fps": 5},
+                    }
+                },
+            }
+        ).runtime_config()
+        self.tracker = NorfairTracker(
+            config.cameras["front"],
+            {"ptz_autotracker_enabled": mp.Value("i", False)},
+        )
+
+    def detect(self, frame_time, box):
+        self.tracker.match_and_update(
+            frame_time,
+            [("person", 0.9, box, 20000, 0.5, (0, 0, 320, 320))],
+            None,
+        )
+
+    def test_predicted_objects_are_not_missed(self):
+        for i in range(5):
+            self.detect(1 + i / 5, (10 + i * 10, 20, 110 + i * 10, 220))
+
+        (obj,) = self.tracker.tracked_objects.values()
+        self.tracker.predict(2.2)
+
+        assert self.tracker.disappeared[obj["id"]] == 0
+        assert obj["frame_time"] == 2.2
+        assert obj["box"] == obj["estimate"]
+        # keeps moving right
+        assert obj["box"][0] > 50
+
+        self.detect(2.4, (70, 20, 170, 220))
+
+        assert list(self.tracker.tracked_objects.values()) == [obj]
+        assert self.tracker.disappeared[obj["id"]] == 0
+        assert obj["box"] == (70, 20, 170, 220)
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -0,0 +1,81 @@
+import threading
+import time
+from unittest import TestCase, main
+
+from frigate.encoded_frames import EncodedFrameCache
+
+
+class TestEncodedFrameCache(TestCase):
+    def setUp(self):
+        self.cache = EncodedFrameCache(max_entries_per_camera=2)
+        self.encodes = 0
+
+    def encode(self, image=b"jpg", frame_time=1.0):
+        def encode():
+            self.encodes += 1
+            return None if image is None else (frame_time, image)
+
+        return encode
+
+    def test_frame_is_encoded_once_per_options(self):
+        assert self.cache.get("front", (360, 70), 1.0, self.encode()) == b"jpg"
+        assert self.cache.get("front", (360, 70), 1.0, self.encode()) == b"jpg"
+        assert self.encodes == 1
+
+        self.cache.get("front", (720, 70), 1.0, self.encode())
+        self.cache.get("back", (360, 70), 1.0, self.encode())
+        assert self.encodes == 3
+
+    def test_new_frame_is_encoded_again(self):
+        self.cache.get("front", (360, 70), 1.0, self.encode(b"first"))
+
+        image = self.cache.get("front", (360, 70), 1.2, self.encode(b"second", 1.2))
+        assert image == b"second"
+        assert self.encodes == 2
+
+    def test_frame_is_cached_under_the_time_it_was_encoded_from(self):
+        # a newer frame came in between reading the frame time and encoding
+        self.cache.get("front", (360, 70), 1.0, self.encode(b"newer", 1.2))
+
+        assert self.cache.lookup("front", (360, 70), 1.0) is None
+        assert self.cache.lookup("front", (360, 70), 1.2) == b"newer"
+
+    def test_failed_encode_is_not_cached(self):
+        assert self.cache.get("front", (360, 70), 1.0, self.encode(None)) is None
+        assert self.cache.get("front", (360, 70), 1.0, self.encode()) == b"jpg"
+
+    def test_least_recently_used_options_are_evicted(self):
+        self.cache.get("front", (360, 70), 1.0, self.encode())
+        self.cache.get("front", (720, 70), 1.0, self.encode())
+        self.cache.get("front", (360, 70), 1.0, self.encode())
+        self.cache.get("front", (1080, 70), 1.0, self.encode())
+
+        assert list(self.cache.entries["front"].keys()) == [(360, 70), (1080, 70)]
+
+    def test_concurrent_clients_share_one_encode(self):
+        def slow_encode():
+            time.sleep(0.1)
+            return self.encode()()
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    self.cache.get("front", (360, 70), 1.0, slow_encode)
+                )
+            )
+            for _ in range(10)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert results == [b"jpg"] * 10
+        assert self.encodes == 1
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
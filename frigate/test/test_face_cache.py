@@ -0,0 +1,67 @@
+from unittest import TestCase, main
+
+from frigate.face_cache import FaceRecognitionCache
+
+
+class TestFaceRecognitionCache(TestCase):
+    def setUp(self):
+        self.cache = FaceRecognitionCache(0.8, 5.0, 1.2)
+
+    def test_unknown_object_needs_recognition(self):
+        assert self.cache.needs_recognition("a", 1000, lambda: 10.0)
+
+    def test_low_score_keeps_recognizing(self):
+        self.cache.update("a", 1, "bob", 0.6, 1000, 10.0, 1.0)
+        assert self.cache.needs_recognition("a", 1000, lambda: 10.0)
+
+    def test_confident_result_is_reused(self):
+        self.cache.update("a", 1, "bob", 0.9, 1000, 10.0, 1.0)
+        assert not self.cache.needs_recognition("a", 1000, lambda: 10.0)
+        assert not self.cache.needs_recognition("a", 1100, lambda: 11.0)
+
+    def test_larger_or_sharper_face_is_recognized_again(self):
+        self.cache.update("a", 1, "bob", 0.9, 1000, 10.0, 1.0)
+        assert self.cache.needs_recognition("a", 1500, lambda: 10.0)
+        assert self.cache.needs_recognition("a", 1000, lambda: 15.0)
+
+    def test_sharpness_is_only_computed_for_faces_that_are_not_larger(self):
+        def sharpness():
+            raise AssertionError("sharpness should not be computed")
+
+        assert self.cache.needs_recognition("a", 1000, sharpness)
+
+        self.cache.update("a", 1, "bob", 0.9, 1000, 10.0, 1.0)
+        assert self.cache.needs_recognition("a", 1500, sharpness)
+
+    def test_confident_object_is_checked_again_after_the_interval(self):
+        assert self.cache.check_due("a", None, 1.0)
+
+        self.cache.update("a", 1, "bob", 0.9, 1000, 10.0, 1.0)
+        self.cache.checked("a", 1.0)
+        assert not self.cache.check_due("a", None, 2.0)
+        assert self.cache.check_due("a", None, 6.0)
+
+        # a confident sub label counts the same as a cached result
+        self.cache.checked("b", 1.0)
+        assert self.cache.check_due("b", 0.5, 2.0)
+        assert not self.cache.check_due("b", 0.9, 2.0)
+
+    def test_worse_result_keeps_best_label(self):
+        self.cache.update("a", 1, "bob", 0.9, 1000, 10.0, 1.0)
+        self.cache.update("a", 2, "alice", 0.85, 1500, 12.0, 2.0)
+        entry = self.cache.get("a")
+        assert entry["label"] == "bob"
+        assert entry["area"] == 1500
+        assert not self.cache.needs_recognition("a", 1500, lambda: 12.0)
+
+    def test_evict(self):
+        self.cache.update("a", 1, "bob", 0.9, 1000, 10.0, 1.0)
+        self.cache.checked("a", 1.0)
+        self.cache.evict("a")
+        self.cache.evict("missing")
+        assert len(self.cache) == 0
+        assert self.cache.check_times == {}
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -0,0 +1,159 @@
+import logging
+import os
+import queue
+from unittest import TestCase, main
+
+import numpy as np
+from peewee_migrate import Router
+from playhouse.sqlite_ext import SqliteExtDatabase
+
+from frigate.face_index import (
+    FaceEmbeddingIndex,
+    FaceUpdateTypeEnum,
+    embeddings_to_blob,
+    load_face_embeddings,
+)
+from frigate.models import Face
+from frigate.test.const import TEST_DB, TEST_DB_CLEANUPS
+from frigate.util.image import compare_eu_distance, cos_similarity
+
+
+class TestFaceEmbeddingIndex(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(50, 128)).astype(np.float32)
+        self.label_ids = [(i % 5) - 1 for i in range(50)]
+        self.index = FaceEmbeddingIndex()
+
+        for i, (embeddings, label_id) in enumerate(
+            zip(self.embeddings, self.label_ids)
+        ):
+            self.index.upsert(f"face-{i}", label_id, embeddings)
+
+        self.query = rng.normal(size=128).astype(np.float32)
+
+    def brute_force(self, query):
+        min_eu, min_eu_label_id, max_cos, max_cos_label_id = 1000000, -1, 0, -1
+
+        for embeddings, label_id in zip(self.embeddings, self.label_ids):
+            if label_id < 0:
+                continue
+
+            eu_score = compare_eu_distance(embeddings, query)
+            cos_score = cos_similarity(embeddings, query)
+
+            if eu_score < min_eu:
+                min_eu, min_eu_label_id = eu_score, label_id
+
+            if cos_score > max_cos:
+                max_cos, max_cos_label_id = cos_score, label_id
+
+        return min_eu_label_id, min_eu, max_cos_label_id, max_cos
+
+    def test_search_matches_brute_force(self):
+        expected = self.brute_force(self.query)
+        result = self.index.search(self.query)
+        assert result[0] == expected[0]
+        assert result[2] == expected[2]
+        self.assertAlmostEqual(result[1], expected[1], places=3)
+        self.assertAlmostEqual(result[3], expected[3], places=4)
+
+    def test_exact_match(self):
+        assert self.index.search(self.embeddings[3])[2] == self.label_ids[3]
+
+    def test_unlabelled_faces_are_ignored(self):
+        # face-0 has a label of -1 (Not Set)
+        assert self.index.search(self.embeddings[0])[2] != -1
+        assert self.index.search(self.embeddings[0])[3] < 0.999
+
+    def test_refresh_applies_updates(self):
+        updates = queue.Queue()
+        index = FaceEmbeddingIndex(updates)
+        updates.put((FaceUpdateTypeEnum.face, "a", -1, self.embeddings[0]))
+        updates.put((FaceUpdateTypeEnum.face, "b", 2, self.embeddings[1]))
+        assert index.refresh() == 2
+        assert index.search(self.embeddings[0])[2] == 2
+
+        updates.put((FaceUpdateTypeEnum.label, "a", 4, None))
+        index.refresh()
+        assert index.search(self.embeddings[0])[2] == 4
+
+        updates.put((FaceUpdateTypeEnum.delete, "a", None, None))
+        index.refresh()
+        assert len(index) == 1
+        assert index.search(self.embeddings[0])[2] == 2
+
+    def test_empty_index(self):
+        assert FaceEmbeddingIndex().search(self.query) == (-1, 1000000.0, -1, 0.0)
+
+
+class TestFaceEmbeddingStorage(TestCase):
+    def setUp(self):
+        self.db = SqliteExtDatabase(TEST_DB)
+        del logging.getLogger("peewee_migrate").handlers[:]
+        self.router = Router(self.db)
+        self.db.bind([Face])
+
+    def tearDown(self):
+        if not self.db.is_closed():
+            self.db.close()
+
+        try:
+            for file in TEST_DB_CLEANUPS:
+                os.remove(file)
+        except OSError:
+            pass
+
+    def test_migration_converts_text_embeddings(self):
+        self.router.run("019_create_faces_table")
+        embeddings = np.arange(128, dtype=np.float32) / 100
+        self.db.execute_sql(
+            "INSERT INTO face (id, label_id, capture_time, data) VALUES (?, ?, ?, ?)",
+            (
+                "face-1",
+                3,
+                1.0,
+                '{"embeddings": "' + " ".join(str(e) for e in embeddings) + '"}',
+            ),
+        )
+        self.router.run()
+
+        face = Face.get(Face.id == "face-1")
+        assert face.data == {}
+        assert np.allclose(np.frombuffer(face.embeddings, dtype=np.float32), embeddings)
+        self.assertAlmostEqual(
+            face.embeddings_norm, float(np.linalg.norm(embeddings)), places=4
+        )
+
+    def test_bulk_load(self):
+        self.router.run()
+        rng = np.random.default_rng(1)
+        embeddings = rng.normal(size=(10, 128)).astype(np.float32)
+
+        for i, e in enumerate(embeddings):
+            blob, norm = embeddings_to_blob(e)
+            Face.insert(
+                {
+                    Face.id: f"face-{i}",
+                    Face.label_id: i,
+                    Face.capture_time: i,
+                    Face.embeddings: blob,
+                    Face.embeddings_norm: norm,
+                    Face.data: {},
+                }
+            ).execute()
+
+        face_ids, label_ids, loaded, norms = load_face_embeddings()
+        assert face_ids == [f"face-{i}" for i in range(10)]
+        assert list(label_ids) == list(range(10))
+        assert np.array_equal(loaded, embeddings)
+        assert np.allclose(norms, np.linalg.norm(embeddings, axis=1))
+
+        index = FaceEmbeddingIndex()
+        index.load()
+        assert len(index) == 10
+        assert index.search(embeddings[7])[2] == 7
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import numpy as np
+
+from frigate.face_samples import SAMPLE_BYTES, FaceSampleCache, prepare_face_sample
+
+
+class TestFaceSampleCache(TestCase):
+    def setUp(self):
+        self.faces_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = f"{self.faces_dir.name}/cache"
+        rng = np.random.default_rng(0)
+
+        for i in range(5):
+            np.save(
+                f"{self.faces_dir.name}/face-{i}",
+                rng.integers(0, 255, (96, 64), dtype=np.uint8),
+            )
+
+    def tearDown(self):
+        self.faces_dir.cleanup()
+
+    def load_crop(self, face_id):
+        try:
+            return np.load(f"{self.faces_dir.name}/{face_id}.npy")
+        except OSError:
+            return None
+
+    def create_cache(self):
+        return FaceSampleCache(
+            0.7, 0.7, cache_dir=self.cache_dir, load_crop=self.load_crop
+        )
+
+    def test_samples_match_direct_preparation(self):
+        face_ids, samples = self.create_cache().load(["face-3", "face-1"])
+        assert face_ids == ["face-3", "face-1"]
+
+        for face_id, sample in zip(face_ids, samples):
+            expected = prepare_face_sample(self.load_crop(face_id), 0.7, 0.7)
+            assert sample.shape == (360, 360)
+            assert np.array_equal(sample, expected)
+
+    def test_cached_samples_are_not_prepared_again(self):
+        self.create_cache().load([f"face-{i}" for i in range(5)])
+
+        with patch("frigate.face_samples.prepare_face_sample") as prepare:
+            cache = self.create_cache()
+            face_ids, _ = cache.load([f"face-{i}" for i in range(5)])
+            prepare.assert_not_called()
+
+        assert len(face_ids) == 5
+
+    def test_missing_face_is_skipped(self):
+        face_ids, samples = self.create_cache().load(["face-0", "missing"])
+        assert face_ids == ["face-0"]
+        assert len(samples) == 1
+
+    def test_prune_removes_unused_samples(self):
+        cache = self.create_cache()
+        cache.load([f"face-{i}" for i in range(5)])
+        _, samples = cache.load(["face-4", "face-2"], prune=True)
+        assert len(cache) == 2
+        assert os.path.getsize(cache.samples_path) == 2 * SAMPLE_BYTES
+        assert np.array_equal(samples[0], self.create_cache().load(["face-4"])[1][0])
+
+    def test_partial_write_is_ignored(self):
+        cache = self.create_cache()
+        cache.load(["face-0"])
+
+        # a sample written without its id
+        with open(cache.samples_path, "ab") as f:
+            f.write(b"\0" * 100)
+
+        cache = self.create_cache()
+        assert len(cache) == 1
+        cache.load(["face-1"])
+        assert len(self.create_cache()) == 2
+        assert os.path.getsize(cache.samples_path) == 2 * SAMPLE_BYTES
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -0,0 +1,174 @@
+import logging
+import os
+import tempfile
+from unittest import TestCase, main
+
+import numpy as np
+from peewee_migrate import Router
+from playhouse.sqlite_ext import SqliteExtDatabase
+
+from frigate.face_store import FaceCropStore
+from frigate.models import Face
+from frigate.test.const import TEST_DB, TEST_DB_CLEANUPS
+
+
+class TestFaceCropStore(TestCase):
+    def setUp(self):
+        self.db = SqliteExtDatabase(TEST_DB)
+        del logging.getLogger("peewee_migrate").handlers[:]
+        Router(self.db).run()
+        self.db.bind([Face])
+
+        self.faces_dir = tempfile.TemporaryDirectory()
+        self.store_dir = f"{self.faces_dir.name}/store"
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.faces_dir.cleanup()
+
+        if not self.db.is_closed():
+            self.db.close()
+
+        try:
+            for file in TEST_DB_CLEANUPS:
+                os.remove(file)
+        except OSError:
+            pass
+
+    def create_store(self, segment_size=1024 * 1024):
+        return FaceCropStore(
+            store_dir=self.store_dir,
+            segment_size=segment_size,
+            faces_dir=self.faces_dir.name,
+        )
+
+    def crop(self):
+        return self.rng.integers(0, 255, (96, 64), dtype=np.uint8)
+
+    def insert_face(self, face_id, location=None):
+        Face.insert(
+            {
+                Face.id: face_id,
+                Face.label_id: -1,
+                Face.capture_time: 0,
+                Face.data: {},
+                **(location or {}),
+            }
+        ).execute()
+
+    def test_read_returns_appended_crops(self):
+        store = self.create_store()
+        crops = [self.crop() for _ in range(3)]
+        locations = [store.append(crop) for crop in crops]
+
+        for crop, location in zip(crops, locations):
+            image = store.read(*location.values())
+            assert np.array_equal(image, crop)
+            assert not image.flags.writeable
+
+        store.close()
+
+    def test_reader_sees_crops_written_after_it_mapped_the_segment(self):
+        writer = self.create_store()
+        reader = self.create_store()
+        first = writer.append(self.crop())
+        reader.read(*first.values())
+
+        crop = self.crop()
+        second = writer.append(crop)
+        assert np.array_equal(reader.read(*second.values()), crop)
+
+        writer.close()
+        reader.close()
+
+    def test_full_segment_starts_a_new_one(self):
+        store = self.create_store(segment_size=96 * 64 * 2)
+        locations = [store.append(self.crop()) for _ in range(3)]
+        store.close()
+
+        assert [location[Face.crop_segment] for location in locations] == [0, 0, 1]
+        assert locations[2][Face.crop_offset] == 0
+
+        # a restarted writer appends to the last segment
+        store = self.create_store(segment_size=96 * 64 * 2)
+        assert store.append(self.crop())[Face.crop_segment] == 1
+        store.close()
+
+    def test_import_moves_npy_faces_into_the_store(self):
+        crop = self.crop()
+        np.save(f"{self.faces_dir.name}/old", crop)
+        self.insert_face("old")
+        store = self.create_store()
+
+        assert np.array_equal(store.load_id("old"), crop)
+        assert store.import_npy_faces() == 1
+        assert not os.path.exists(f"{self.faces_dir.name}/old.npy")
+        assert Face.get(Face.id == "old").crop_segment == 0
+        assert np.array_equal(store.load_id("old"), crop)
+        assert store.import_npy_faces() == 0
+
+        store.close()
+
+    def test_compaction_moves_faces_out_of_deleted_segments(self):
+        # two crops per segment
+        store = self.create_store(segment_size=96 * 64 * 2)
+        crops = {}
+
+        for face_id in ["a", "b", "c", "d", "e"]:
+            crops[face_id] = self.crop()
+            self.insert_face(face_id, store.append(crops[face_id]))
+
+        # segment 0 has one face left, segment 1 is still full
+        Face.delete().where(Face.id == "b").execute()
+        reader = self.create_store()
+        assert np.array_equal(reader.load_id("a"), crops["a"])
+
+        assert store.compact() == 96 * 64
+        assert not os.path.exists(store.segment_path(0))
+        assert os.path.exists(store.segment_path(1))
+        assert Face.get(Face.id == "a").crop_segment == 2
+
+        for face_id in ["a", "c", "d", "e"]:
+            assert np.array_equal(store.load_id(face_id), crops[face_id])
+            assert np.array_equal(reader.load_id(face_id), crops[face_id])
+
+        # the reader let go of the removed segment once it mapped the new one
+        assert 0 not in reader.maps
+        assert store.compact() == 0
+
+        store.close()
+        reader.close()
+
+    def test_face_read_before_compaction_is_loaded_from_where_it_moved(self):
+        store = self.create_store(segment_size=96 * 64 * 2)
+        crops = {}
+
+        for face_id in ["a", "b", "c"]:
+            crops[face_id] = self.crop()
+            self.insert_face(face_id, store.append(crops[face_id]))
+
+        Face.delete().where(Face.id == "b").execute()
+        reader = self.create_store()
+        stale = Face.get(Face.id == "a")
+
+        store.compact()
+        assert stale.crop_segment == 0
+        assert not os.path.exists(store.segment_path(0))
+        assert np.array_equal(reader.load(stale), crops["a"])
+
+        # a face that is gone for good still loads nothing
+        Face.delete().where(Face.id == "a").execute()
+        assert reader.load(stale) is None
+
+        store.close()
+        reader.close()
+
+    def test_missing_face_loads_nothing(self):
+        store = self.create_store()
+        self.insert_face("gone")
+        assert store.load_id("gone") is None
+        assert store.load_id("unknown") is None
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
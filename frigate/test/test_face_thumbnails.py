@@ -0,0 +1,71 @@
+import os
+import tempfile
+from unittest import TestCase, main
+
+from frigate.face_thumbnails import FaceThumbnailCache
+
+
+class TestFaceThumbnailCache(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def create_cache(self, max_memory_bytes=1000, max_disk_bytes=1000):
+        return FaceThumbnailCache(
+            cache_dir=self.cache_dir.name,
+            max_memory_bytes=max_memory_bytes,
+            max_disk_bytes=max_disk_bytes,
+        )
+
+    def test_get_returns_put_image_and_etag(self):
+        cache = self.create_cache()
+        assert cache.get("face", "thumbnail", "ios") is None
+
+        etag, image = cache.put("face", "thumbnail", "ios", b"jpg")
+        assert image == b"jpg"
+        assert cache.get("face", "thumbnail", "ios") == (etag, b"jpg")
+        assert cache.get("face", "thumbnail", "android") is None
+
+    def test_disk_entries_survive_restart(self):
+        etag, _ = self.create_cache().put("face", "picture", "png", b"png")
+        assert self.create_cache().get("face", "picture", "png") == (etag, b"png")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.create_cache(max_memory_bytes=250, max_disk_bytes=250)
+        cache.put("a", "thumbnail", "ios", b"a" * 100)
+        cache.put("b", "thumbnail", "ios", b"b" * 100)
+        cache.get("a", "thumbnail", "ios")
+        cache.put("c", "thumbnail", "ios", b"c" * 100)
+
+        assert cache.memory_bytes <= 250
+        assert cache.disk_bytes <= 250
+        assert cache.get("b", "thumbnail", "ios") is None
+        assert cache.get("a", "thumbnail", "ios") is not None
+        assert len(os.listdir(self.cache_dir.name)) == 2
+
+    def test_disk_hit_is_promoted_to_memory(self):
+        cache = self.create_cache(max_memory_bytes=100)
+        cache.put("a", "thumbnail", "ios", b"a" * 100)
+        cache.put("b", "thumbnail", "ios", b"b" * 100)
+        assert "a.thumbnail.ios" not in cache.memory
+
+        cache.get("a", "thumbnail", "ios")
+        assert "a.thumbnail.ios" in cache.memory
+
+    def test_invalidate_removes_every_variant_of_a_face(self):
+        cache = self.create_cache()
+        cache.put("a", "thumbnail", "ios", b"1")
+        cache.put("a", "picture", "png", b"2")
+        cache.put("ab", "picture", "png", b"3")
+        cache.invalidate("a")
+
+        assert cache.get("a", "thumbnail", "ios") is None
+        assert cache.get("a", "picture", "png") is None
+        assert cache.get("ab", "picture", "png") is not None
+        assert os.listdir(self.cache_dir.name) == ["ab.picture.png"]
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
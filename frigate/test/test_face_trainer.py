@@ -0,0 +1,131 @@
+import logging
+import os
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import Mock, patch
+
+import numpy as np
+from peewee_migrate import Router
+from playhouse.sqlite_ext import SqliteExtDatabase
+
+from frigate.config import ModelConfig
+from frigate.face_index import FaceUpdateTypeEnum
+from frigate.face_samples import FaceSampleCache
+from frigate.face_store import FaceCropStore
+from frigate.face_trainer import FaceTrainer, read_face_recognizer
+from frigate.models import Face
+from frigate.test.const import TEST_DB, TEST_DB_CLEANUPS
+
+
+class TestFaceTrainer(TestCase):
+    def setUp(self):
+        self.db = SqliteExtDatabase(TEST_DB)
+        del logging.getLogger("peewee_migrate").handlers[:]
+        Router(self.db).run()
+        self.db.bind([Face])
+
+        self.faces_dir = tempfile.TemporaryDirectory()
+        self.face_store = FaceCropStore(
+            store_dir=f"{self.faces_dir.name}/store", faces_dir=self.faces_dir.name
+        )
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.face_store.close()
+        self.faces_dir.cleanup()
+
+        if not self.db.is_closed():
+            self.db.close()
+
+        try:
+            for file in TEST_DB_CLEANUPS:
+                os.remove(file)
+        except OSError:
+            pass
+
+    def create_trainer(self, model="LBPH"):
+        config = Mock(model=ModelConfig(face_recognition_model=model))
+        samples = FaceSampleCache(
+            config.model.face_recognition_width_crop,
+            config.model.face_recognition_height_crop,
+            cache_dir=f"{self.faces_dir.name}/cache",
+            load_crop=self.face_store.load_id,
+        )
+        return FaceTrainer(config, samples)
+
+    def add_face(self, face_id, label_id):
+        # 64x64 I420 frame
+        crop = self.rng.integers(0, 255, (96, 64), dtype=np.uint8)
+        Face.insert(
+            {
+                Face.id: face_id,
+                Face.label_id: label_id,
+                Face.capture_time: len(face_id),
+                Face.data: {},
+                **self.face_store.append(crop),
+            }
+        ).execute()
+
+    def test_train_uses_labelled_faces(self):
+        self.add_face("a", 1)
+        self.add_face("b", 2)
+        self.add_face("c", -1)
+        trainer = self.create_trainer()
+        trainer.train()
+        assert trainer.trained == {"a": 1, "b": 2}
+
+    def test_lbph_learns_new_faces_without_retraining(self):
+        self.add_face("a", 1)
+        trainer = self.create_trainer()
+        trainer.train()
+        self.add_face("b", 2)
+
+        with patch.object(trainer, "train") as train:
+            assert trainer.apply_updates([(FaceUpdateTypeEnum.label, "b", 2)])
+            train.assert_not_called()
+
+        assert trainer.trained == {"a": 1, "b": 2}
+
+    def test_relabel_retrains(self):
+        self.add_face("a", 1)
+        trainer = self.create_trainer()
+        trainer.train()
+
+        with patch.object(trainer, "train") as train:
+            assert trainer.apply_updates([(FaceUpdateTypeEnum.label, "a", 3)])
+            train.assert_called_once()
+
+    def test_fisher_retrains_for_new_faces(self):
+        self.add_face("a", 1)
+        self.add_face("b", 2)
+        trainer = self.create_trainer("Fisher")
+        trainer.train()
+        assert trainer.model == "Fisher"
+
+        with patch.object(trainer, "train") as train:
+            assert trainer.apply_updates([(FaceUpdateTypeEnum.label, "c", 2)])
+            train.assert_called_once()
+
+    def test_unlabelled_update_is_ignored(self):
+        trainer = self.create_trainer()
+        trainer.train()
+        assert not trainer.apply_updates([(FaceUpdateTypeEnum.face, "x", -1)])
+
+    def test_written_model_is_read_back_with_its_type(self):
+        self.add_face("a", 1)
+        self.add_face("b", 2)
+        trainer = self.create_trainer("Eigen")
+        trainer.train()
+
+        with patch(
+            "frigate.face_trainer.face_model_path",
+            lambda version: f"{self.faces_dir.name}/model_{version}.yml",
+        ):
+            trainer.write(1)
+            recognizer = read_face_recognizer(f"{self.faces_dir.name}/model_1.yml")
+
+        assert recognizer.getDefaultName() == "opencv_eigenfaces"
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -0,0 +1,123 @@
+import multiprocessing as mp
+from unittest import TestCase, main
+
+from frigate.const import FRAME_RESULT_MAX_OBJECTS
+from frigate.frame_results import FrameResultReader, FrameResultRing, FrameResultWriter
+
+
+def tracked_object(object_id, label="person", **kwargs):
+    obj = {
+        "id": object_id,
+        "label": label,
+        "score": 0.8,
+        "box": (10, 20, 110, 220),
+        "area": 20000,
+        "ratio": 0.5,
+        "region": (0, 0, 320, 320),
+        "frame_time": 1.5,
+        "start_time": 1.0,
+        "centroid": (60, 120),
+        "estimate": (11, 21, 111, 221),
+        "motionless_count": 0,
+        "position_changes": 1,
+        "attributes": [],
+    }
+    obj.update(kwargs)
+    return obj
+
+
+def write_result(frame_results, tracked_objects, result_queue):
+    writer = FrameResultWriter(frame_results, "front")
+    result_queue.put(writer.write(2.0, tracked_objects, [(0, 0, 10, 10)]))
+
+
+class TestFrameResults(TestCase):
+    def setUp(self):
+        self.frame_results = FrameResultRing(["front", "back"], 4)
+        self.writer = FrameResultWriter(self.frame_results, "front")
+        self.reader = FrameResultReader(self.frame_results, "front")
+
+    def tearDown(self):
+        self.frame_results.unlink()
+
+    def round_trip(self, tracked_objects, motion_boxes=[]):
+        return self.reader.read(*self.writer.write(1.5, tracked_objects, motion_boxes))
+
+    def test_objects_round_trip(self):
+        tracked_objects = {
+            "a": tracked_object("a"),
+            "b": tracked_object(
+                "b",
+                label="car",
+                sub_label="bob",
+                sub_label_score=0.9,
+                attributes=[{"label": "face", "score": 0.7, "box": (1, 2, 3, 4)}],
+            ),
+        }
+
+        assert self.round_trip(tracked_objects) == tracked_objects
+
+    def test_only_changed_fields_are_sent(self):
+        obj = tracked_object("a")
+        _, changes, _ = self.writer.write(1.5, {"a": obj}, [])
+        assert changes == {0: {"id": "a", "label": "person", "attributes": []}}
+
+        obj = {**obj, "score": 0.9, "box": (12, 22, 112, 222)}
+        _, changes, _ = self.writer.write(1.6, {"a": obj}, [])
+        assert changes == {}
+
+        obj = {**obj, "sub_label": "bob"}
+        _, changes, _ = self.writer.write(1.7, {"a": obj}, [])
+        assert changes == {0: {"sub_label": "bob"}}
+
+    def test_reused_row_starts_over(self):
+        self.round_trip({"a": tracked_object("a", sub_label="bob")})
+        tracked_objects = {"b": tracked_object("b", label="car")}
+
+        assert self.round_trip(tracked_objects) == tracked_objects
+
+    def test_objects_that_do_not_fit_are_sent_whole(self):
+        tracked_objects = {
+            str(i): tracked_object(str(i)) for i in range(FRAME_RESULT_MAX_OBJECTS + 2)
+        }
+        _, _, overflow = self.writer.write(1.5, tracked_objects, [])
+
+        assert list(overflow.keys()) == [
+            str(FRAME_RESULT_MAX_OBJECTS),
+            str(FRAME_RESULT_MAX_OBJECTS + 1),
+        ]
+
+    def test_counts_are_shared(self):
+        result_ref, _, _ = self.writer.write(
+            1.5, {"a": tracked_object("a")}, [(0, 0, 10, 10), (0, 0, 5, 2)]
+        )
+        self.frame_results.set_counts("front", result_ref, 1, 2)
+
+        assert self.frame_results.get_counts("front", result_ref) == (2, 139, 1, 2)
+
+    def test_reused_slot_rejects_old_references(self):
+        result = self.writer.write(1.5, {"a": tracked_object("a")}, [])
+
+        for _ in range(4):
+            self.writer.write(1.5, {}, [])
+
+        assert self.reader.read(*result) is None
+        assert self.frame_results.get_counts("front", result[0]) is None
+
+    def test_results_are_shared_with_child_processes(self):
+        tracked_objects = {"a": tracked_object("a")}
+        result_queue = mp.Queue()
+        process = mp.Process(
+            target=write_result,
+            args=(self.frame_results, tracked_objects, result_queue),
+        )
+        process.start()
+        result = result_queue.get(timeout=10)
+        process.join()
+
+        assert self.reader.read(*result) == tracked_objects
+        assert self.frame_results.get_counts("front", result[0]) == (1, 121, 0, 0)
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -0,0 +1,106 @@
+import multiprocessing as mp
+from unittest import TestCase, main
+
+import cv2
+import numpy as np
+
+from frigate.config import RuntimeMotionConfig
+from frigate.motion.improved_motion import (
+    ImprovedMotionDetector,
+    get_histogram_percentile,
+)
+
+
+def generate_frames(rng, frame_shape, count):
+    """Noisy yuv frames of a textured background with a bright box moving over
+    it after the first half."""
+    background = cv2.GaussianBlur(
+        rng.integers(0, 256, frame_shape, dtype=np.uint8), (15, 15), 5
+    )
+    frames = []
+
+    for i in range(count):
+        frame = background.copy()
+
+        if i >= count // 2:
+            x = 20 + i * 10
+            frame[150:190, x : x + 40] = 240
+
+        frame = cv2.add(frame, rng.integers(0, 6, frame_shape, dtype=np.uint8))
+        yuv = np.full((frame_shape[0] * 3 // 2, frame_shape[1]), 128, np.uint8)
+        yuv[0 : frame_shape[0]] = frame
+        frames.append(yuv)
+
+    return frames
+
+
+class TestImprovedMotionDetector(TestCase):
+    def setUp(self):
+        self.frame_shape = (360, 640)
+        self.config = RuntimeMotionConfig(
+            frame_shape=self.frame_shape,
+            mask="0,0,100,0,100,100,0,100",
+        )
+
+    def create_detector(self, fast_path):
+        return ImprovedMotionDetector(
+            self.frame_shape,
+            self.config,
+            5,
+            mp.Value("i", 1),
+            mp.Value("i", self.config.threshold),
+            mp.Value("i", self.config.contour_area),
+            fast_path=fast_path,
+        )
+
+    def test_histogram_percentiles_match_numpy(self):
+        rng = np.random.default_rng(0)
+
+        for _ in range(200):
+            shape = rng.integers(1, 120, 2)
+            low, high = sorted(rng.integers(0, 256, 2))
+            frame = rng.integers(low, high + 1, shape, dtype=np.uint8)
+            cumulative = np.cumsum(
+                cv2.calcHist([frame], [0], None, [256], [0, 256])
+                .ravel()
+                .astype(np.int64)
+            )
+
+            for percentile in [4, 96]:
+                assert get_histogram_percentile(cumulative, percentile) == (
+                    np.percentile(frame, percentile).astype(np.uint8)
+                )
+
+    def test_contrast_lut_matches_numpy(self):
+        detector = self.create_detector(True)
+        frame = np.arange(256, dtype=np.uint8).reshape(16, 16)
+
+        for avg_min, avg_max in [(0.0, 255.0), (12.34, 200.5), (100.0, 101.0)]:
+            expected = (
+                ((np.clip(frame, avg_min, avg_max) - avg_min) / (avg_max - avg_min))
+                * 255
+            ).astype(np.uint8)
+
+            assert np.array_equal(
+                cv2.LUT(frame, detector.get_contrast_lut(avg_min, avg_max)),
+                expected,
+            )
+
+    def test_fast_path_detects_the_same_motion(self):
+        current = self.create_detector(False)
+        fast = self.create_detector(True)
+        rng = np.random.default_rng(0)
+
+        motion_frames = 0
+
+        for frame in generate_frames(rng, self.frame_shape, 60):
+            motion_boxes = current.detect(frame)
+            assert fast.detect(frame) == motion_boxes
+            assert np.array_equal(current.avg_frame, fast.avg_frame)
+            motion_frames += len(motion_boxes) > 0
+
+        assert motion_frames > 10
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
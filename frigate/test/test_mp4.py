@@ -0,0 +1,196 @@
+import asyncio
+import datetime
+import errno
+import multiprocessing as mp
+import os
+import shutil
+import struct
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import AsyncMock, patch
+
+import cv2
+import numpy as np
+
+from frigate.config import FrigateConfig, RetainModeEnum
+from frigate.record import mp4
+from frigate.record.maintainer import RecordingMaintainer, SegmentInfo
+from frigate.record.mp4 import faststart, get_duration, read_top_level_boxes
+
+
+def box(type, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), type) + payload
+
+
+def full_box(type, version, payload):
+    return box(type, struct.pack(">I", version << 24) + payload)
+
+
+def read_frames(path):
+    video = cv2.VideoCapture(path)
+    frames = []
+
+    while True:
+        ret, frame = video.read()
+
+        if not ret:
+            return frames
+
+        frames.append(frame)
+
+
+class TestMp4(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.dir, "front-20231001120000.mp4")
+        self.dst = os.path.join(self.dir, "00.00.mp4")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_segment(self):
+        writer = cv2.VideoWriter(
+            self.src, cv2.VideoWriter_fourcc(*"mp4v"), 10, (320, 240)
+        )
+
+        for i in range(30):
+            frame = np.zeros((240, 320, 3), np.uint8)
+            frame[:, i * 8 : i * 8 + 40] = 255
+            writer.write(frame)
+
+        writer.release()
+
+    def box_types(self, path):
+        with open(path, "rb") as file:
+            return [box.type for box in read_top_level_boxes(file)]
+
+    def test_moov_is_moved_in_front_of_the_media(self):
+        self.write_segment()
+        types = self.box_types(self.src)
+        assert types.index(b"moov") > types.index(b"mdat")
+
+        assert faststart(self.src, self.dst)
+
+        types = self.box_types(self.dst)
+        assert types.index(b"moov") < types.index(b"mdat")
+        assert os.path.getsize(self.dst) == os.path.getsize(self.src)
+
+        frames = read_frames(self.dst)
+        assert len(frames) == 30
+        assert all(np.array_equal(a, b) for a, b in zip(read_frames(self.src), frames))
+
+    def test_duration_is_read_from_the_movie_header(self):
+        self.write_segment()
+
+        assert get_duration(self.src) == 3.0
+        assert get_duration(os.path.join(self.dir, "missing.mp4")) is None
+
+    def test_co64_offsets_and_version_1_headers(self):
+        media = b"0123456789"
+        mvhd = full_box(b"mvhd", 1, struct.pack(">QQIQ", 0, 0, 1000, 9500))
+        co64 = full_box(b"co64", 0, struct.pack(">IQQ", 2, 16 + 8, 16 + 8 + 5))
+        moov = box(
+            b"moov",
+            mvhd
+            + box(b"trak", box(b"mdia", box(b"minf", box(b"stbl", co64)))),
+        )
+
+        with open(self.src, "wb") as file:
+            file.write(box(b"ftyp", b"isom" * 2) + box(b"mdat", media) + moov)
+
+        assert get_duration(self.src) == 9.5
+        assert faststart(self.src, self.dst)
+
+        with open(self.dst, "rb") as data:
+            data = data.read()
+
+        entries = data.index(b"co64") + 12
+        offsets = struct.unpack_from(">QQ", data, entries)
+        assert [data[offset : offset + 5] for offset in offsets] == [b"01234", b"56789"]
+
+    def test_fragmented_segments_are_left_to_ffmpeg(self):
+        with open(self.src, "wb") as file:
+            file.write(
+                box(b"ftyp", b"isom" * 2)
+                + box(b"moov", box(b"mvex"))
+                + box(b"moof")
+                + box(b"mdat", b"data")
+            )
+
+        assert not faststart(self.src, self.dst)
+        assert not os.path.exists(self.dst)
+
+    def fail_writing(self):
+        copy_range = mp4.copy_range
+
+        def copy_part(src, dst, offset, size):
+            copy_range(src, dst, offset, size // 2)
+            raise OSError(errno.EIO, "Input/output error")
+
+        return patch("frigate.record.mp4.copy_range", side_effect=copy_part)
+
+    def test_write_errors_remove_the_partial_segment(self):
+        self.write_segment()
+
+        with self.fail_writing():
+            assert not faststart(self.src, self.dst)
+
+        assert not os.path.exists(self.dst)
+        assert os.path.exists(self.src)
+
+    def test_write_errors_fall_back_to_ffmpeg(self):
+        self.write_segment()
+        config = FrigateConfig(
+            **{
+                "mqtt": {"host": "mqtt"},
+                "cameras": {
+                    "front": {
+                        "ffmpeg": {
+                            "inputs": [
+                                {
+                                    "path": "rtsp://10.0.0.1:554/video",
+                                    "roles": ["detect"],
+                                }
+                            ]
+                        },
+                        "detect": {"height": 1080, "width": 1920, "fps": 5},
+                    }
+                },
+            }
+        ).runtime_config()
+        maintainer = RecordingMaintainer(
+            config, mp.Queue(), mp.Queue(), None, None, {}, {}, mp.Event()
+        )
+        maintainer.segment_watcher.close()
+        ffmpeg = AsyncMock()
+        ffmpeg.return_value.returncode = 0
+        start_time = datetime.datetime(2023, 10, 1, 12)
+
+        with self.fail_writing(), patch(
+            "frigate.record.maintainer.RECORD_DIR", self.dir
+        ), patch.object(
+            maintainer, "segment_stats", return_value=SegmentInfo(1, 1, 0)
+        ), patch(
+            "asyncio.create_subprocess_exec", ffmpeg
+        ):
+            recording = asyncio.run(
+                maintainer.move_segment(
+                    "front",
+                    start_time,
+                    start_time + datetime.timedelta(seconds=3),
+                    3,
+                    self.src,
+                    RetainModeEnum.all,
+                )
+            )
+
+        file_path = os.path.join(self.dir, "2023-10-01", "12", "front", "00.00.mp4")
+        assert ffmpeg.call_args.args[-1] == file_path
+        assert recording is not None
+        # ffmpeg is mocked, the partial remux must not have been left in its place
+        assert not os.path.exists(file_path)
+        assert not os.path.exists(self.src)
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -1,4 +1,8 @@
+import datetime
+import queue
+import threading
 import unittest
+from multiprocessing import shared_memory
 from unittest.mock import Mock, patch
 
 import numpy as np
@@ -136,3 +140,253 @@ class TestLocalObjectDetector(unittest.TestCase):
             == np.zeros((1, 32, 32, 3)).shape
         )
         assert test_result == TEST_DETECT_RESULT
+
+    @patch.dict(
+        "frigate.detectors.api_types",
+        {det_type: Mock() for det_type in DetectorTypeEnum},
+    )
+    def test_detect_raw_batch_should_loop_when_api_does_not_support_batch(self):
+        mock_cputfl = detectors.api_types[DetectorTypeEnum.cpu]
+
+        TEST_DATA = np.zeros((3, 32, 32, 3), np.uint8)
+        TEST_DETECT_RESULT = np.ones((20, 6), np.float32)
+
+        test_obj_detect = frigate.object_detection.LocalObjectDetector(
+            detector_config=parse_obj_as(DetectorConfig, {"type": "cpu", "model": {}})
+        )
+
+        mock_det_api = mock_cputfl.return_value
+        mock_det_api.supports_batch = False
+        mock_det_api.detect_raw.return_value = (TEST_DETECT_RESULT, False)
+
+        detections, timeout = test_obj_detect.detect_raw_batch(TEST_DATA)
+
+        assert mock_det_api.detect_raw.call_count == 3
+        assert (
+            mock_det_api.detect_raw.call_args.kwargs["tensor_input"].shape
+            == (1, 32, 32, 3)
+        )
+        assert detections.shape == (3, 20, 6)
+        assert (detections == 1).all()
+        assert not timeout
+
+    @patch.dict(
+        "frigate.detectors.api_types",
+        {det_type: Mock() for det_type in DetectorTypeEnum},
+    )
+    def test_detect_raw_batch_should_run_once_when_api_supports_batch(self):
+        mock_cputfl = detectors.api_types[DetectorTypeEnum.cpu]
+
+        TEST_DATA = np.zeros((4, 32, 32, 3), np.uint8)
+        TEST_DETECT_RESULT = np.zeros((4, 20, 6), np.float32)
+
+        test_cfg = parse_obj_as(DetectorConfig, {"type": "cpu", "model": {}})
+        test_cfg.model.input_tensor = InputTensorEnum.nchw
+        test_obj_detect = frigate.object_detection.LocalObjectDetector(
+            detector_config=test_cfg
+        )
+
+        mock_det_api = mock_cputfl.return_value
+        mock_det_api.supports_batch = True
+        mock_det_api.detect_raw_batch.return_value = (TEST_DETECT_RESULT, False)
+
+        detections, _ = test_obj_detect.detect_raw_batch(TEST_DATA)
+
+        mock_det_api.detect_raw.assert_not_called()
+        mock_det_api.detect_raw_batch.assert_called_once()
+        assert mock_det_api.detect_raw_batch.call_args.kwargs[
+            "tensor_input"
+        ].shape == (4, 3, 32, 32)
+        assert detections is TEST_DETECT_RESULT
+
+
+class TestRemoteObjectDetector(unittest.TestCase):
+    def setUp(self):
+        self.model_config = ModelConfig(width=32, height=32)
+        self.shm_in = shared_memory.SharedMemory(
+            name="test_batch", create=True, size=32 * 32 * 3 * 4
+        )
+        self.shm_out = shared_memory.SharedMemory(
+            name="out-test_batch", create=True, size=4 * 20 * 6 * 4
+        )
+
+    def tearDown(self):
+        for shm in [self.shm_in, self.shm_out]:
+            shm.close()
+            shm.unlink()
+
+    def test_detect_batch_splits_regions_into_batches(self):
+        detection_queue = queue.Queue()
+        result_event = threading.Event()
+        requests = []
+
+        def fake_detector():
+            inputs = np.ndarray((4, 32, 32, 3), dtype=np.uint8, buffer=self.shm_in.buf)
+            outputs = np.ndarray((4, 20, 6), dtype=np.float32, buffer=self.shm_out.buf)
+
+            while len(requests) < 2:
+                connection_id, batch_size, _ = detection_queue.get(timeout=5)
+                requests.append((connection_id, batch_size))
+                outputs[:] = 0
+                # echo the value of each input slot back as the label
+                for i in range(batch_size):
+                    outputs[i][0] = [inputs[i][0][0][0], 0.9, 0.1, 0.1, 0.5, 0.5]
+                result_event.set()
+
+        detector_thread = threading.Thread(target=fake_detector)
+        detector_thread.start()
+
+        remote_detector = frigate.object_detection.RemoteObjectDetector(
+            "test_batch",
+            {i: f"label-{i}" for i in range(10)},
+            detection_queue,
+            result_event,
+            self.model_config,
+            threading.Event(),
+            max_batch=4,
+        )
+        tensor_inputs = [np.full((1, 32, 32, 3), i, np.uint8) for i in range(6)]
+        detections = remote_detector.detect_batch(tensor_inputs)
+        detector_thread.join()
+        remote_detector.shm.close()
+        remote_detector.out_shm.close()
+
+        assert requests == [("test_batch", 4), ("test_batch", 2)]
+        assert [d[0][0] for d in detections] == [f"label-{i}" for i in range(6)]
+
+
+class TestFairRequestQueue(unittest.TestCase):
+    def test_weights_share_regions(self):
+        requests = frigate.object_detection.FairRequestQueue({"front": 2.0})
+
+        for i in range(6):
+            requests.put("front", 1, i)
+            requests.put("back", 1, i)
+
+        served = [requests.pop()[0] for _ in range(6)]
+        assert served.count("front") == 4
+        assert served.count("back") == 2
+
+    def test_large_batches_do_not_starve_other_cameras(self):
+        requests = frigate.object_detection.FairRequestQueue()
+        requests.put("busy", 8, 0)
+        requests.put("busy", 8, 0)
+        requests.put("quiet", 1, 0)
+
+        assert [requests.pop()[0] for _ in range(3)] == ["busy", "quiet", "busy"]
+
+    def test_idle_camera_does_not_bank_credit(self):
+        requests = frigate.object_detection.FairRequestQueue()
+
+        for i in range(10):
+            requests.put("busy", 1, i)
+            requests.pop()
+
+        requests.put("busy", 1, 10)
+        requests.put("busy", 1, 10)
+        requests.put("idle", 1, 10)
+        requests.put("idle", 1, 10)
+        requests.put("idle", 1, 10)
+
+        served = [requests.pop()[0] for _ in range(4)]
+        assert served.count("busy") == 2
+
+    def test_pop_stale(self):
+        requests = frigate.object_detection.FairRequestQueue(
+            max_queue_ages={"front": 0.5}, default_max_queue_age=2.0
+        )
+        requests.put("front", 1, 0.0)
+        requests.put("front", 2, 0.8)
+        requests.put("back", 1, 0.0)
+
+        assert requests.pop_stale(1.0) == [("front", 1, 0.0)]
+        assert len(requests) == 2
+
+
+class TestDetectionScheduler(unittest.TestCase):
+    def create_detector(self, speed, pending_regions):
+        detector = Mock()
+        detector.pending_requests = Mock(value=0)
+        detector.estimated_finish = lambda batch_size: (
+            pending_regions + batch_size
+        ) * speed
+        return detector
+
+    def test_dispatch_picks_least_loaded_detector(self):
+        fast = self.create_detector(0.01, 4)
+        slow = self.create_detector(0.05, 0)
+        scheduler = frigate.object_detection.DetectionScheduler(
+            Mock(cameras={}),
+            queue.Queue(),
+            {"fast": fast, "slow": slow},
+            {},
+            {},
+            threading.Event(),
+        )
+        scheduler.requests.put("front", 2, 0.0)
+        scheduler.dispatch(0.0)
+
+        fast.dispatch.assert_called_once_with("front", 2)
+        slow.dispatch.assert_not_called()
+
+    def test_dispatch_waits_for_detector_capacity(self):
+        detector = self.create_detector(0.01, 0)
+        detector.pending_requests.value = 2
+        scheduler = frigate.object_detection.DetectionScheduler(
+            Mock(cameras={}),
+            queue.Queue(),
+            {"cpu": detector},
+            {},
+            {},
+            threading.Event(),
+        )
+        scheduler.requests.put("front", 1, 0.0)
+        scheduler.dispatch(0.0)
+
+        detector.dispatch.assert_not_called()
+        assert len(scheduler.requests) == 1
+
+    def test_requests_are_aged_from_when_they_were_queued(self):
+        detection_queue = queue.Queue()
+        camera = Mock(detect=Mock(weight=1.0, max_queue_age=1.0))
+        scheduler = frigate.object_detection.DetectionScheduler(
+            Mock(cameras={"front": camera}),
+            detection_queue,
+            {},
+            {},
+            {},
+            threading.Event(),
+        )
+        now = datetime.datetime.now().timestamp()
+        detection_queue.put(("front", 2, now - 5))
+        detection_queue.put(("front", 1, now))
+        scheduler.receive(timeout=0)
+
+        assert scheduler.requests.pop_stale(now) == [("front", 2, now - 5)]
+        assert len(scheduler.requests) == 1
+
+    def test_shutdown_answers_pending_requests_with_no_detections(self):
+        shm = shared_memory.SharedMemory(
+            name="out-test_shutdown", create=True, size=2 * 20 * 6 * 4
+        )
+        outputs = np.ndarray((2, 20, 6), dtype=np.float32, buffer=shm.buf)
+        outputs[:] = 1
+        out_event = threading.Event()
+        stop_event = threading.Event()
+        stop_event.set()
+        scheduler = frigate.object_detection.DetectionScheduler(
+            Mock(cameras={}),
+            queue.Queue(),
+            {},
+            {"test_shutdown": out_event},
+            {},
+            stop_event,
+        )
+        scheduler.requests.put("test_shutdown", 2, 0.0)
+        scheduler.run()
+
+        assert out_event.is_set()
+        assert not outputs.any()
+        del outputs
+        shm.close()
+        shm.unlink()
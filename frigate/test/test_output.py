@@ -0,0 +1,206 @@
+import threading
+from unittest import TestCase, main
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from frigate.config import FrigateConfig
+from frigate.output import BirdsEyeFrameManager, JsmpegConverters, JsmpegSubscribers
+from frigate.util.image import RingFrameManager
+
+
+def create_converter(*args):
+    converter = MagicMock()
+    converter.read.return_value = b""
+    converter.process.poll.return_value = 0
+    return converter
+
+
+class TestJsmpegSubscribers(TestCase):
+    def setUp(self):
+        self.subscribers = JsmpegSubscribers()
+
+    def test_websockets_are_kept_by_camera(self):
+        front, back = MagicMock(), MagicMock()
+        self.subscribers.add("front", front)
+        self.subscribers.add("back", back)
+
+        assert self.subscribers.has("front")
+        assert self.subscribers.get("front") == [front]
+        assert self.subscribers.get("side") == []
+
+    def test_camera_is_idle_once_the_last_viewer_left(self):
+        first, second = MagicMock(), MagicMock()
+        self.subscribers.add("front", first)
+        self.subscribers.add("front", second)
+        self.subscribers.remove("front", first)
+
+        assert self.subscribers.has("front")
+        assert self.subscribers.idle_for("front") == 0
+
+        self.subscribers.remove("front", second)
+        # removing a websocket twice is ignored
+        self.subscribers.remove("front", second)
+
+        assert not self.subscribers.has("front")
+        assert 0 < self.subscribers.idle_for("front") < 10
+
+
+@patch("frigate.output.FFMpegConverter", side_effect=create_converter)
+class TestJsmpegConverters(TestCase):
+    def setUp(self):
+        self.config = FrigateConfig(
+            **{
+                "mqtt": {"host": "mqtt"},
+                "birdseye": {"enabled": True, "restream": False},
+                "cameras": {
+                    "front": {
+                        "ffmpeg": {
+                            "inputs": [
+                                {
+                                    "path": "rtsp://10.0.0.1:554/video",
+                                    "roles": ["detect"],
+                                }
+                            ]
+                        },
+                        "detect": {"height": 1080, "width": 1920, "fps": 5},
+                    }
+                },
+            }
+        ).runtime_config()
+        self.subscribers = JsmpegSubscribers()
+        self.stop_event = MagicMock()
+        self.stop_event.is_set.return_value = False
+
+    def test_converter_starts_with_the_first_viewer(self, converter):
+        converters = JsmpegConverters(self.config, self.subscribers, self.stop_event)
+
+        assert converters.converters == {}
+        assert not converters.is_active("front")
+
+        self.subscribers.add("front", MagicMock())
+        assert converters.is_active("front")
+
+        converters.write("front", b"frame")
+        converters.write("front", b"frame")
+
+        assert converter.call_count == 1
+        assert converters.converters["front"].write.call_count == 2
+
+    def test_idle_converter_is_stopped(self, converter):
+        converters = JsmpegConverters(
+            self.config, self.subscribers, self.stop_event, idle_timeout=0
+        )
+        websocket = MagicMock()
+        self.subscribers.add("front", websocket)
+        converters.write("front", b"frame")
+        front = converters.converters["front"]
+
+        converters.stop_idle()
+        assert "front" in converters.converters
+
+        self.subscribers.remove("front", websocket)
+        converters.stop_idle()
+
+        assert converters.converters == {}
+        front.exit.assert_called_once()
+
+    def test_restreamed_birdseye_is_always_on(self, converter):
+        self.config.birdseye.restream = True
+        converters = JsmpegConverters(
+            self.config, self.subscribers, self.stop_event, idle_timeout=0
+        )
+        converters.stop_idle()
+
+        assert converters.is_active("birdseye")
+        assert list(converters.converters.keys()) == ["birdseye"]
+        converters.exit()
+
+
+class TestBirdsEyeFrameManager(TestCase):
+    def setUp(self):
+        camera = {
+            "ffmpeg": {
+                "inputs": [{"path": "rtsp://10.0.0.1:554/video", "roles": ["detect"]}]
+            },
+            "detect": {"height": 180, "width": 320, "fps": 5},
+        }
+        self.config = FrigateConfig(
+            **{
+                "mqtt": {"host": "mqtt"},
+                "birdseye": {"mode": "continuous", "width": 640, "height": 360},
+                "cameras": {"front": camera, "back": camera},
+            }
+        ).runtime_config()
+        self.frame_ring = RingFrameManager(
+            {
+                name: camera.frame_shape_yuv
+                for name, camera in self.config.cameras.items()
+            },
+            3,
+        )
+        self.birdseye = BirdsEyeFrameManager(
+            self.config, self.frame_ring, threading.Event()
+        )
+
+    def tearDown(self):
+        self.frame_ring.unlink()
+
+    def add_frame(self, camera, frame_time, value):
+        frame_ref = self.frame_ring.acquire(camera)
+        self.frame_ring.buffer(camera, frame_ref)[:] = bytes([value]) * (
+            self.frame_ring.get(camera, frame_ref).size
+        )
+        cam_data = self.birdseye.cameras[camera]
+
+        if cam_data["current_frame_ref"] is not None:
+            self.frame_ring.release(camera, cam_data["current_frame_ref"])
+
+        cam_data["current_frame"] = frame_time
+        cam_data["current_frame_ref"] = frame_ref
+        cam_data["last_active_frame"] = frame_time
+
+    @patch("frigate.output.copy_yuv_to_position")
+    def test_only_changed_tiles_are_copied(self, copy_yuv_to_position):
+        self.add_frame("front", 1.0, 50)
+        self.add_frame("back", 1.0, 100)
+        assert self.birdseye.update_frame()
+        assert copy_yuv_to_position.call_count == 2
+
+        # nothing changed
+        assert not self.birdseye.update_frame()
+        assert copy_yuv_to_position.call_count == 2
+
+        self.add_frame("back", 1.2, 150)
+        assert self.birdseye.update_frame()
+        assert copy_yuv_to_position.call_count == 3
+        assert copy_yuv_to_position.call_args[0][3][0, 0] == 150
+
+    def test_layout_is_kept_until_the_active_cameras_change(self):
+        self.add_frame("front", 1.0, 50)
+        self.birdseye.update_frame()
+        single_layout = self.birdseye.camera_layout
+
+        self.add_frame("back", 1.0, 100)
+        self.birdseye.update_frame()
+        layout = self.birdseye.camera_layout
+        assert layout != single_layout
+
+        self.add_frame("front", 1.2, 60)
+        self.birdseye.update_frame()
+        assert self.birdseye.camera_layout is layout
+
+    def test_frame_buffer_shares_the_canvas(self):
+        self.add_frame("front", 1.0, 200)
+        self.birdseye.update_frame()
+
+        assert self.birdseye.frame_buffer.nbytes == self.birdseye.frame.nbytes
+        assert np.array_equal(
+            np.frombuffer(self.birdseye.frame_buffer, dtype=np.uint8),
+            self.birdseye.frame.ravel(),
+        )
+        assert 200 in self.birdseye.frame
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
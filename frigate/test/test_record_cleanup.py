@@ -0,0 +1,342 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from peewee_migrate import Router
+from playhouse.sqlite_ext import SqliteExtDatabase
+from playhouse.sqliteq import SqliteQueueDatabase
+
+from frigate.config import FrigateConfig
+from frigate.models import Event, Recordings, RecordingsToDelete
+from frigate.record.cleanup import RecordingCleanup
+from frigate.record.sync import scan_directory
+from frigate.test.const import TEST_DB, TEST_DB_CLEANUPS
+
+
+class TestExpireRecordings(unittest.TestCase):
+    def setUp(self):
+        # setup clean database for each test run
+        migrate_db = SqliteExtDatabase("test.db")
+        del logging.getLogger("peewee_migrate").handlers[:]
+        router = Router(migrate_db)
+        router.run()
+        migrate_db.close()
+        self.db = SqliteQueueDatabase(TEST_DB)
+        models = [Event, Recordings]
+        self.db.bind(models)
+
+        self.record_dir = tempfile.mkdtemp()
+        self.now = datetime.datetime.now().timestamp()
+        self.old = self.now - 30 * 86400
+
+    def tearDown(self):
+        if not self.db.is_closed():
+            self.db.close()
+
+        try:
+            for file in TEST_DB_CLEANUPS:
+                os.remove(file)
+        except OSError:
+            pass
+
+        for file in os.listdir(self.record_dir):
+            os.remove(os.path.join(self.record_dir, file))
+
+        os.rmdir(self.record_dir)
+
+    def get_cleanup(self, mode="motion"):
+        config = FrigateConfig(
+            **{
+                "mqtt": {"host": "mqtt"},
+                "record": {
+                    "enabled": True,
+                    "retain": {"days": 7},
+                    "events": {"retain": {"default": 10, "mode": mode}},
+                },
+                "cameras": {
+                    "front_door": {
+                        "ffmpeg": {
+                            "inputs": [
+                                {
+                                    "path": "rtsp://10.0.0.1:554/video",
+                                    "roles": ["detect"],
+                                }
+                            ]
+                        },
+                        "detect": {"height": 1080, "width": 1920, "fps": 5},
+                    }
+                },
+            }
+        )
+        return RecordingCleanup(config.runtime_config(), None)
+
+    def insert_event(self, id, start, end):
+        Event.insert(
+            id=id,
+            label="person",
+            camera="front_door",
+            start_time=start,
+            end_time=end,
+            top_score=100,
+            false_positive=False,
+            zones=list(),
+            thumbnail="",
+            region=[],
+            box=[],
+            area=0,
+            has_clip=True,
+            has_snapshot=True,
+        ).execute()
+
+    def insert_recording(self, id, start, camera="front_door", motion=1, objects=1):
+        path = os.path.join(self.record_dir, f"{id}.mp4")
+        open(path, "wb").close()
+        Recordings.insert(
+            id=id,
+            camera=camera,
+            path=path,
+            start_time=start,
+            end_time=start + 10,
+            duration=10,
+            motion=motion,
+            objects=objects,
+            segment_size=2,
+        ).execute()
+
+    def remaining(self):
+        return {recording.id for recording in Recordings.select(Recordings.id)}
+
+    def test_recordings_overlapping_events_are_kept(self):
+        self.insert_event("in_progress", self.old + 100, None)
+        self.insert_event("ended", self.old, self.old + 15)
+        self.insert_recording("before", self.old - 20)
+        self.insert_recording("start", self.old - 5)
+        self.insert_recording("end", self.old + 10)
+        self.insert_recording("between", self.old + 30)
+        self.insert_recording("later", self.old + 200)
+        self.insert_recording("recent", self.now - 60, motion=0)
+
+        self.get_cleanup("all").expire_recordings()
+
+        assert self.remaining() == {"start", "end", "later", "recent"}
+        assert sorted(os.listdir(self.record_dir)) == [
+            "end.mp4",
+            "later.mp4",
+            "recent.mp4",
+            "start.mp4",
+        ]
+
+    def test_retain_mode_filters_kept_recordings(self):
+        self.insert_event("event", self.old, self.old + 100)
+        self.insert_recording("both", self.old)
+        self.insert_recording("motion", self.old + 10, objects=0)
+        self.insert_recording("none", self.old + 20, motion=0, objects=0)
+        self.insert_recording("unknown", self.old + 30, motion=None, objects=None)
+
+        self.get_cleanup("motion").expire_recordings()
+        assert self.remaining() == {"both", "motion", "unknown"}
+
+        self.get_cleanup("active_objects").expire_recordings()
+        assert self.remaining() == {"both", "unknown"}
+
+    def test_removed_cameras_are_expired(self):
+        self.insert_recording("removed", self.old, camera="back_door")
+        self.insert_recording("removed_recent", self.now - 60, camera="back_door")
+
+        self.get_cleanup().expire_recordings()
+
+        assert self.remaining() == {"removed_recent"}
+
+    def test_dry_run_reports_without_deleting(self):
+        self.insert_event("event", self.old, self.old + 5)
+        self.insert_recording("kept", self.old)
+        self.insert_recording("expired", self.old + 30)
+        self.insert_recording("removed", self.old, camera="back_door")
+
+        summary = self.get_cleanup().expire_recordings(dry_run=True)
+
+        assert summary == {
+            "removed cameras": {"recordings": 1, "bytes": 2 * pow(2, 20)},
+            "front_door": {"recordings": 1, "bytes": 2 * pow(2, 20)},
+        }
+        assert self.remaining() == {"kept", "expired", "removed"}
+        assert len(os.listdir(self.record_dir)) == 3
+
+
+class TestSyncRecordings(unittest.TestCase):
+    def setUp(self):
+        migrate_db = SqliteExtDatabase("test.db")
+        del logging.getLogger("peewee_migrate").handlers[:]
+        router = Router(migrate_db)
+        router.run()
+        migrate_db.close()
+        self.db = SqliteQueueDatabase(TEST_DB)
+        models = [Recordings, RecordingsToDelete]
+        self.db.bind(models)
+
+        self.config_dir = tempfile.mkdtemp()
+        self.record_dir = tempfile.mkdtemp()
+        self.record_dir_patch = patch(
+            "frigate.record.cleanup.RECORD_DIR", self.record_dir
+        )
+        self.record_dir_patch.start()
+        # an hour that has settled, directories are written with an older mtime
+        self.hour = datetime.datetime(2023, 10, 1, 12, tzinfo=datetime.timezone.utc)
+
+    def tearDown(self):
+        self.record_dir_patch.stop()
+
+        if not self.db.is_closed():
+            self.db.close()
+
+        try:
+            for file in TEST_DB_CLEANUPS:
+                os.remove(file)
+        except OSError:
+            pass
+
+        shutil.rmtree(self.config_dir)
+        shutil.rmtree(self.record_dir)
+
+    def get_cleanup(self, mode="incremental"):
+        config = FrigateConfig(
+            **{
+                "mqtt": {"host": "mqtt"},
+                "database": {"path": os.path.join(self.config_dir, "frigate.db")},
+                "record": {"sync_on_startup": True, "sync_mode": mode},
+                "cameras": {
+                    camera: {
+                        "ffmpeg": {
+                            "inputs": [
+                                {
+                                    "path": "rtsp://10.0.0.1:554/video",
+                                    "roles": ["detect"],
+                                }
+                            ]
+                        },
+                        "detect": {"height": 1080, "width": 1920, "fps": 5},
+                    }
+                    for camera in ["front_door", "back_door"]
+                },
+            }
+        )
+        return RecordingCleanup(config.runtime_config(), None)
+
+    def directory(self, hour, camera):
+        return os.path.join(
+            self.record_dir,
+            (self.hour + datetime.timedelta(hours=hour)).strftime("%Y-%m-%d/%H"),
+            camera,
+        )
+
+    def insert_recording(self, id, hour, minute, camera="front_door"):
+        directory = self.directory(hour, camera)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{minute:02d}.00.mp4")
+
+        with open(path, "wb") as file:
+            file.write(b"data")
+
+        start = (self.hour + datetime.timedelta(hours=hour, minutes=minute)).timestamp()
+        Recordings.insert(
+            id=id,
+            camera=camera,
+            path=path,
+            start_time=start,
+            end_time=start + 10,
+            duration=10,
+            motion=1,
+            objects=1,
+            segment_size=0,
+        ).execute()
+        self.settle(directory)
+        return path
+
+    def settle(self, directory):
+        mtime = self.hour.timestamp()
+        os.utime(directory, (mtime, mtime))
+
+    def remaining(self):
+        return {recording.id for recording in Recordings.select(Recordings.id)}
+
+    def manifest(self):
+        with open(os.path.join(self.config_dir, "recordings_manifest.json")) as file:
+            return json.load(file)["directories"]
+
+    def test_only_changed_directories_are_checked(self):
+        paths = {
+            id: self.insert_recording(id, hour, minute, camera)
+            for id, hour, minute, camera in [
+                ("a", 0, 0, "front_door"),
+                ("b", 0, 1, "front_door"),
+                ("c", 0, 0, "back_door"),
+                ("d", 1, 0, "front_door"),
+                ("e", 2, 0, "front_door"),
+                ("f", 2, 1, "front_door"),
+            ]
+        }
+        for id in range(4):
+            self.insert_recording(f"keep{id}", 3, id)
+
+        # the first sync checks everything and writes the manifest
+        self.get_cleanup().sync_recordings()
+        assert self.remaining() == set(paths) | {f"keep{id}" for id in range(4)}
+        assert self.manifest()[os.path.join("2023-10-01", "12", "front_door")] == {
+            "mtime": int(self.hour.timestamp()) * 1000000000,
+            "files": 2,
+            "bytes": 8,
+        }
+
+        # a removed file, a removed hour and a file removed without the mtime
+        # changing, which is not noticed until a full sync
+        os.remove(paths["a"])
+        shutil.rmtree(os.path.dirname(paths["d"]))
+        os.remove(paths["e"])
+        self.settle(os.path.dirname(paths["e"]))
+
+        with patch(
+            "frigate.record.cleanup.scan_directory", wraps=scan_directory
+        ) as scanned:
+            self.get_cleanup().sync_recordings()
+
+        assert scanned.call_count == 1
+        assert self.remaining() == {"b", "c", "e", "f"} | {
+            f"keep{id}" for id in range(4)
+        }
+        assert os.path.join("2023-10-01", "13", "front_door") not in self.manifest()
+
+        self.get_cleanup("full").sync_recordings()
+        assert self.remaining() == {"b", "c", "f"} | {f"keep{id}" for id in range(4)}
+
+    def test_recently_modified_directories_are_scanned_again(self):
+        path = self.insert_recording("a", 0, 0)
+        os.utime(os.path.dirname(path))
+
+        self.get_cleanup().sync_recordings()
+        assert self.manifest() == {}
+
+    def test_unreadable_manifest_falls_back_to_full_sync(self):
+        path = self.insert_recording("a", 0, 0)
+        self.insert_recording("b", 0, 1)
+        self.insert_recording("c", 0, 2)
+        self.get_cleanup().sync_recordings()
+
+        os.remove(path)
+        self.settle(os.path.dirname(path))
+
+        manifest_path = os.path.join(self.config_dir, "recordings_manifest.json")
+
+        with open(manifest_path, "w") as file:
+            file.write("{")
+
+        self.get_cleanup().sync_recordings()
+        assert self.remaining() == {"b", "c"}
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
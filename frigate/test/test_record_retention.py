@@ -1,7 +1,7 @@
 import unittest
 
 from frigate.config import RetainModeEnum
-from frigate.record.maintainer import SegmentInfo
+from frigate.record.maintainer import RecordingInfoBuffer, SegmentInfo
 
 
 class TestRecordRetention(unittest.TestCase):
@@ -31,3 +31,43 @@ class TestRecordRetention(unittest.TestCase):
         )
         assert not segment_info.should_discard_segment(RetainModeEnum.motion)
         assert segment_info.should_discard_segment(RetainModeEnum.active_objects)
+
+
+class TestRecordingInfoBuffer(unittest.TestCase):
+    def setUp(self):
+        self.frames = [(1 + i / 5, i % 3, i * 10) for i in range(100)]
+        self.buffer = RecordingInfoBuffer(2)
+
+        for frame in self.frames:
+            self.buffer.append(*frame)
+
+    def scan(self, start_time, end_time):
+        frames = [f for f in self.frames if start_time <= f[0] <= end_time]
+        return len(frames), [sum(f[1] for f in frames), sum(f[2] for f in frames)]
+
+    def test_sum_matches_a_scan(self):
+        for start_time, end_time in [(0, 100), (2, 4), (2.1, 3.9), (3, 3), (50, 60)]:
+            assert self.buffer.sum(start_time, end_time) == self.scan(
+                start_time, end_time
+            )
+
+    def test_trimmed_frames_are_not_counted(self):
+        self.buffer.trim(5)
+
+        assert len(self.buffer) == 80
+        assert self.buffer.sum(0, 100) == self.scan(5, 100)
+        assert self.buffer.latest() == self.frames[-1][0]
+
+    def test_buffer_stays_bounded(self):
+        buffer = RecordingInfoBuffer(1, max_age=10)
+
+        for i in range(10000):
+            buffer.append(i / 5, -40)
+
+        assert len(buffer) == 51
+        assert len(buffer.times) < 2048
+        assert buffer.sum(0, 10000) == (51, [-40 * 51])
+
+        buffer.trim(3000)
+        assert len(buffer) == 0
+        assert buffer.latest() is None
@@ -0,0 +1,94 @@
+import multiprocessing as mp
+from unittest import TestCase, main
+
+import numpy as np
+
+from frigate.util.image import RingFrameManager
+
+
+def write_frame(frame_ring, value, frame_queue):
+    frame_ref = frame_ring.acquire("front")
+    frame_ring.buffer("front", frame_ref)[:] = bytes([value]) * 12
+    frame_queue.put(frame_ref)
+
+
+class TestRingFrameManager(TestCase):
+    def setUp(self):
+        self.frame_ring = RingFrameManager({"front": (3, 4), "back": (6, 8)}, 3)
+
+    def tearDown(self):
+        self.frame_ring.unlink()
+
+    def test_slots_are_reused_once_released(self):
+        refs = [self.frame_ring.acquire("front") for _ in range(3)]
+        assert [ref[0] for ref in refs] == [0, 1, 2]
+        assert self.frame_ring.acquire("front") is None
+
+        self.frame_ring.release("front", refs[1])
+        assert self.frame_ring.acquire("front") == (1, 2)
+
+    def test_slot_is_held_until_every_consumer_released_it(self):
+        frame_ref = self.frame_ring.acquire("front")
+        assert self.frame_ring.retain("front", frame_ref)
+        self.frame_ring.release("front", frame_ref)
+        assert self.frame_ring.in_use("front") == 1
+
+        self.frame_ring.release("front", frame_ref)
+        assert self.frame_ring.in_use("front") == 0
+
+    def test_reused_slot_rejects_old_references(self):
+        frame_ref = self.frame_ring.acquire("front")
+        self.frame_ring.release("front", frame_ref)
+
+        for _ in range(3):
+            self.frame_ring.acquire("front")
+
+        assert self.frame_ring.get("front", frame_ref) is None
+        assert not self.frame_ring.retain("front", frame_ref)
+
+        # releasing a stale reference must not free the new frame
+        self.frame_ring.release("front", frame_ref)
+        assert self.frame_ring.in_use("front") == 3
+
+    def test_slots_that_are_never_released_are_reclaimed(self):
+        self.frame_ring.reclaim_after = 5
+        refs = [self.frame_ring.acquire("front") for _ in range(3)]
+
+        assert self.frame_ring.acquire("front") is None
+        assert self.frame_ring.acquire("front") is None
+        assert self.frame_ring.dropped("front") == 2
+
+        # the oldest slot is taken back, its holder's reference is stale
+        assert self.frame_ring.acquire("front") == (0, 2)
+        assert self.frame_ring.get("front", refs[0]) is None
+        self.frame_ring.release("front", refs[0])
+        assert self.frame_ring.in_use("front") == 3
+
+        # the other stale slots go next, the reclaimed frame is too recent
+        assert self.frame_ring.acquire("front") == (1, 2)
+        assert self.frame_ring.acquire("front") == (2, 2)
+        assert self.frame_ring.acquire("front") is None
+
+    def test_cameras_have_separate_rings(self):
+        front = self.frame_ring.acquire("front")
+        back = self.frame_ring.acquire("back")
+        self.frame_ring.buffer("front", front)[:] = b"\x01" * 12
+        self.frame_ring.buffer("back", back)[:] = b"\x02" * 48
+
+        assert self.frame_ring.get("front", front).shape == (3, 4)
+        assert np.all(self.frame_ring.get("front", front) == 1)
+        assert np.all(self.frame_ring.get("back", back) == 2)
+
+    def test_frames_are_shared_with_child_processes(self):
+        frame_queue = mp.Queue()
+        process = mp.Process(target=write_frame, args=(self.frame_ring, 7, frame_queue))
+        process.start()
+        frame_ref = frame_queue.get(timeout=10)
+        process.join()
+
+        assert np.all(self.frame_ring.get("front", frame_ref) == 7)
+        assert self.frame_ring.in_use("front") == 1
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
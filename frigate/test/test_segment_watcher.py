@@ -0,0 +1,76 @@
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+from unittest import TestCase, main
+
+from frigate.record.watcher import SegmentWatcher
+
+
+class TestSegmentWatcher(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.record_pids = {"front": mp.Value("i", 0)}
+        self.stop_event = threading.Event()
+
+    def tearDown(self):
+        for file in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, file))
+
+        os.rmdir(self.cache_dir)
+
+    def path(self, file):
+        return os.path.join(self.cache_dir, file)
+
+    def test_closed_segments_are_reported(self):
+        watcher = SegmentWatcher(self.cache_dir, self.record_pids)
+
+        if watcher.fd is None:
+            self.skipTest("inotify is not available")
+
+        segment = open(self.path("front-20231001120000.mp4"), "wb")
+        segment.write(b"data")
+
+        assert watcher.files_in_use(["front-20231001120000.mp4"]) == {
+            "front-20231001120000.mp4"
+        }
+        assert watcher.wait(0, self.stop_event) == []
+
+        segment.close()
+        open(self.path("clip_front.mp4"), "wb").close()
+
+        assert watcher.wait(1, self.stop_event) == ["front-20231001120000.mp4"]
+        assert watcher.files_in_use(["front-20231001120000.mp4"]) == set()
+        watcher.close()
+
+    def test_segments_from_before_the_watch_are_checked_with_the_process(self):
+        open(self.path("front-20231001120000.mp4"), "wb").close()
+
+        with open(self.path("front-20231001120010.mp4"), "wb"):
+            watcher = SegmentWatcher(self.cache_dir, self.record_pids)
+            files = sorted(os.listdir(self.cache_dir))
+
+            # the recording process is not known, its newest segment is held
+            assert watcher.files_in_use(files) == {"front-20231001120010.mp4"}
+
+            self.record_pids["front"].value = os.getpid()
+            assert watcher.files_in_use(files) == {"front-20231001120010.mp4"}
+
+        assert watcher.files_in_use(files) == set()
+        watcher.close()
+
+    def test_polling_fallback(self):
+        watcher = SegmentWatcher(self.cache_dir, self.record_pids)
+        watcher.close()
+
+        with open(self.path("front-20231001120010.mp4"), "wb"):
+            self.record_pids["front"].value = os.getpid()
+            open(self.path("front-20231001120000.mp4"), "wb").close()
+            files = sorted(os.listdir(self.cache_dir))
+
+            assert watcher.files_in_use(files) == {"front-20231001120010.mp4"}
+            assert watcher.wait(0.1, self.stop_event) == []
+
+
+if __name__ == "__main__":
+    main(verbosity=2)
@@ -1,15 +1,36 @@
 import unittest
+from collections import defaultdict
+from types import SimpleNamespace
 
 import cv2
 import numpy as np
 from norfair.drawing.color import Palette
 from norfair.drawing.drawer import Drawer
 
-from frigate.util.image import intersection
+from frigate.config import DetectConfig, ModelConfig
+from frigate.const import ATTRIBUTE_LABEL_MAP
+from frigate.face_cache import FaceRecognitionCache
+from frigate.util.image import area, intersection
 from frigate.video import (
+    box_inside,
+    box_overlaps,
+    boxes_inside,
+    boxes_overlap,
+    consolidate_detection_records,
+    get_attribute_indexes,
+    get_box_array,
+    get_cluster_boundaries,
     get_cluster_boundary,
     get_cluster_candidates,
     get_cluster_region,
+    get_detection_filters,
+    get_detection_tuples,
+    get_face_detection_regions,
+    get_region_detection_records,
+    get_region_detections,
+    get_seed_detection_records,
+    get_sweep_tiles,
+    suppress_detection_records,
 )
 
 
@@ -51,6 +72,242 @@ def save_clusters_image(name, boxes, candidates, regions=[]):
     )
 
 
+def get_cluster_candidates_reference(frame_shape, min_region, boxes):
+    """The pure python clustering get_cluster_candidates has to match."""
+    cluster_candidates = []
+    used_boxes = []
+    for current_index, b in enumerate(boxes):
+        if current_index in used_boxes:
+            continue
+        cluster = [current_index]
+        used_boxes.append(current_index)
+        cluster_boundary = get_cluster_boundary(b, min_region)
+        for compare_index, compare_box in enumerate(boxes):
+            if compare_index in used_boxes:
+                continue
+
+            if not box_inside(cluster_boundary, compare_box):
+                continue
+
+            potential_cluster = cluster + [compare_index]
+            cluster_region = get_cluster_region(
+                frame_shape, min_region, potential_cluster, boxes
+            )
+            should_cluster = True
+            if (cluster_region[2] - cluster_region[0]) > min_region:
+                for b in potential_cluster:
+                    box = boxes[b]
+                    if area(box) / area(cluster_region) < 0.05:
+                        should_cluster = False
+                        break
+
+            if should_cluster:
+                cluster.append(compare_index)
+                used_boxes.append(compare_index)
+        cluster_candidates.append(cluster)
+
+    unique = {tuple(sorted(c)) for c in cluster_candidates}
+    return [list(tup) for tup in unique]
+
+
+def generate_motion_boxes(rng, frame_shape, count):
+    """Motion boxes bunched together like the ones moving foliage produces."""
+    centers = rng.integers(0, [frame_shape[1], frame_shape[0]], (max(1, count // 10), 2))
+    boxes = []
+
+    for i in range(count):
+        center = centers[i % len(centers)] + rng.normal(0, 80, 2)
+        width, height = rng.integers(4, 160, 2)
+        x = int(np.clip(center[0], 0, frame_shape[1] - width))
+        y = int(np.clip(center[1], 0, frame_shape[0] - height))
+        boxes.append((x, y, x + int(width), y + int(height)))
+
+    return boxes
+
+
+def get_consolidated_object_detections_reference(detections):
+    """The per label tuple merging get_consolidated_object_detections has to match."""
+    detected_object_groups = defaultdict(lambda: [])
+    for detection in detections:
+        detected_object_groups[detection[0]].append(detection)
+
+    selected_objects = []
+    for group in detected_object_groups.values():
+        boxes = [
+            (
+                o[2][0],
+                o[2][1],
+                o[2][2] - o[2][0],
+                o[2][3] - o[2][1],
+            )
+            for o in group
+        ]
+        confidences = [o[1] for o in group]
+        idxs = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
+
+        for index in idxs:
+            index = index if isinstance(index, np.int32) else index[0]
+            selected_objects.append(group[index])
+
+    detected_object_groups = defaultdict(lambda: [])
+    for detection in selected_objects:
+        detected_object_groups[detection[0]].append(detection)
+
+    consolidated_detections = []
+    for group in detected_object_groups.values():
+        if len(group) == 1:
+            consolidated_detections.append(group[0])
+            continue
+
+        sorted_by_area = sorted(group, key=lambda g: g[3])
+
+        for current_detection_idx in range(0, len(sorted_by_area)):
+            current_detection = sorted_by_area[current_detection_idx][2]
+            overlap = 0
+            for to_check_idx in range(
+                min(current_detection_idx + 1, len(sorted_by_area)),
+                len(sorted_by_area),
+            ):
+                to_check = sorted_by_area[to_check_idx][2]
+                intersect_box = intersection(current_detection, to_check)
+                if (
+                    intersect_box is not None
+                    and area(intersect_box) / area(current_detection) > 0.9
+                ):
+                    overlap = 1
+                    break
+            if overlap == 0:
+                consolidated_detections.append(sorted_by_area[current_detection_idx])
+
+    return consolidated_detections
+
+
+def get_frame_detections_reference(
+    detect_config, regions, raw_detections, labels, seeds, objects_to_track, object_filters
+):
+    """The tuple based detection stage of process_frames for one frame."""
+    detections = list(seeds)
+
+    for region, region_raw_detections in zip(regions, raw_detections):
+        parsed = []
+        for d in region_raw_detections:
+            if d[1] < 0.4:
+                break
+            parsed.append((labels[int(d[0])], float(d[1]), (d[2], d[3], d[4], d[5])))
+
+        detections.extend(
+            get_region_detections(
+                detect_config, region, parsed, objects_to_track, object_filters
+            )
+        )
+
+    return get_consolidated_object_detections_reference(detections)
+
+
+def get_frame_detections(
+    detect_config, regions, raw_detections, labels, seeds, objects_to_track, object_filters
+):
+    """The record based detection stage of process_frames for one frame."""
+    detection_filters = get_detection_filters(labels, objects_to_track, object_filters)
+    records = np.concatenate(
+        (
+            get_seed_detection_records(seeds, detection_filters),
+            get_region_detection_records(
+                detect_config, regions, raw_detections, detection_filters
+            ),
+        )
+    )
+    return get_detection_tuples(
+        consolidate_detection_records(suppress_detection_records(records)),
+        detection_filters,
+        regions,
+        seeds,
+    )
+
+
+def get_attribute_indexes_reference(tracked_objects, detections):
+    """The per object attribute matching get_attribute_indexes has to match."""
+    indexes = []
+
+    for obj in tracked_objects:
+        indexes.append(
+            [
+                i
+                for i, d in enumerate(detections)
+                if d[0] in ATTRIBUTE_LABEL_MAP.get(obj["label"], [])
+                and box_inside(obj["box"], d[2])
+            ]
+        )
+
+    return indexes
+
+
+def generate_detections(rng, frame_shape, count):
+    """Detections of a frame, objects seen by several overlapping regions."""
+    labels = ["person", "car", "dog", "face", "license_plate"]
+    detections = []
+
+    while len(detections) < count:
+        label = labels[rng.integers(len(labels))]
+        width, height = rng.integers(30, 400, 2)
+        x = int(rng.integers(0, frame_shape[1] - width))
+        y = int(rng.integers(0, frame_shape[0] - height))
+
+        # the same object as found by the regions it is in
+        for _ in range(rng.integers(1, 5)):
+            x_min, y_min = np.clip(
+                [x, y] + rng.integers(-10, 10, 2), 0, None
+            ).tolist()
+            x_max = min(frame_shape[1] - 1, x_min + int(width) + int(rng.integers(-20, 20)))
+            y_max = min(frame_shape[0] - 1, y_min + int(height) + int(rng.integers(-20, 20)))
+            region = (x_min, y_min, x_min + 320, y_min + 320)
+            detections.append(
+                (
+                    label,
+                    round(float(rng.uniform(0.3, 1.0)), 2),
+                    (x_min, y_min, x_max, y_max),
+                    (x_max - x_min) * (y_max - y_min),
+                    (x_max - x_min) / max(1, y_max - y_min),
+                    region,
+                )
+            )
+
+    return detections[:count]
+
+
+def generate_raw_detections(rng, frame_shape, region_count, count):
+    """Detector output of the regions of a frame, sorted by score like a model."""
+    regions = []
+    raw_detections = np.zeros((region_count, 20, 6), np.float32)
+
+    for region_index in range(region_count):
+        size = int(rng.integers(160, 640)) // 4 * 4
+        x = int(rng.integers(0, frame_shape[1] - size))
+        y = int(rng.integers(0, frame_shape[0] - size))
+        regions.append([x, y, x + size, y + size])
+
+        # the model finds the same object several times, a little shifted
+        rows = []
+
+        while len(rows) < count:
+            label = rng.integers(0, 6)
+            ymin, xmin = rng.uniform(0, 0.8, 2)
+            height, width = rng.uniform(0.05, 0.6, 2)
+
+            for _ in range(rng.integers(1, 4)):
+                box = np.clip(
+                    [ymin, xmin, ymin + height, xmin + width] + rng.normal(0, 0.01, 4),
+                    0,
+                    1,
+                )
+                rows.append([label, rng.uniform(0.2, 1.0), *box])
+
+        rows.sort(key=lambda r: -r[1])
+        raw_detections[region_index, : len(rows)] = rows[:20]
+
+    return regions, raw_detections
+
+
 def save_cluster_boundary_image(name, boxes, bounding_boxes):
     canvas = np.zeros((1000, 2000, 3), np.uint8)
     color = Palette.choose_color(np.random.rand())
@@ -179,6 +436,149 @@ class TestRegion(unittest.TestCase):
         assert len(regions) == 2
 
 
+class TestClusterCandidatesEquivalence(unittest.TestCase):
+    def setUp(self):
+        self.frame_shape = (1080, 1920)
+        self.rng = np.random.default_rng(0)
+
+    def assert_same_clusters(self, min_region, boxes):
+        assert sorted(
+            get_cluster_candidates(self.frame_shape, min_region, boxes)
+        ) == sorted(
+            get_cluster_candidates_reference(self.frame_shape, min_region, boxes)
+        )
+
+    def test_boundaries_match(self):
+        boxes = generate_motion_boxes(self.rng, self.frame_shape, 200)
+        boundaries = get_cluster_boundaries(np.array(boxes, dtype=np.float64), 320)
+
+        for box, boundary in zip(boxes, boundaries):
+            assert list(boundary) == get_cluster_boundary(box, 320)
+
+    def test_clusters_match(self):
+        for count in [0, 1, 2, 5, 20, 31, 32, 60, 150]:
+            for min_region in [160, 320, 640]:
+                with self.subTest(count=count, min_region=min_region):
+                    boxes = generate_motion_boxes(
+                        self.rng, self.frame_shape, count
+                    )
+                    self.assert_same_clusters(min_region, boxes)
+
+    def test_clusters_match_with_numpy_boxes(self):
+        boxes = [
+            tuple(np.int64(v) for v in box)
+            for box in generate_motion_boxes(self.rng, self.frame_shape, 50)
+        ]
+        self.assert_same_clusters(320, boxes)
+
+
+class TestDetectionMergingEquivalence(unittest.TestCase):
+    def setUp(self):
+        self.frame_shape = (1080, 1920)
+        self.rng = np.random.default_rng(0)
+
+    def test_frame_detections_match(self):
+        detect_config = DetectConfig(width=1920, height=1080)
+        labels = {0: "person", 1: "car", 2: "dog", 3: "unknown", 4: "unknown", 5: "cat"}
+        mask = np.full(self.frame_shape, 255, np.uint8)
+        mask[:, :600] = 0
+        object_filters = {
+            "person": SimpleNamespace(
+                min_area=400,
+                max_area=200000,
+                min_score=0.5,
+                min_ratio=0.2,
+                max_ratio=3.0,
+                mask=None,
+            ),
+            "car": SimpleNamespace(
+                min_area=0,
+                max_area=24000000,
+                min_score=0.6,
+                min_ratio=0,
+                max_ratio=24000000,
+                mask=mask,
+            ),
+        }
+        objects_to_track = ["person", "car", "dog", "unknown"]
+
+        for region_count in [0, 1, 3, 10]:
+            for _ in range(20):
+                with self.subTest(region_count=region_count):
+                    regions, raw_detections = generate_raw_detections(
+                        self.rng, self.frame_shape, region_count, 12
+                    )
+                    seeds = get_frame_detections_reference(
+                        detect_config,
+                        regions,
+                        raw_detections,
+                        labels,
+                        [],
+                        objects_to_track,
+                        object_filters,
+                    )[:3]
+                    args = (
+                        detect_config,
+                        regions,
+                        raw_detections,
+                        labels,
+                        seeds,
+                        objects_to_track,
+                        object_filters,
+                    )
+                    assert get_frame_detections(*args) == get_frame_detections_reference(
+                        *args
+                    )
+
+    def test_merged_detections_match(self):
+        detection_filters = get_detection_filters(
+            {0: "person", 1: "car", 2: "dog", 3: "face"}, [], {}
+        )
+
+        for count in [0, 1, 2, 5, 20, 60, 150]:
+            for _ in range(10):
+                with self.subTest(count=count):
+                    detections = generate_detections(
+                        self.rng, self.frame_shape, count
+                    )
+                    records = get_seed_detection_records(detections, detection_filters)
+                    assert get_detection_tuples(
+                        consolidate_detection_records(
+                            suppress_detection_records(records)
+                        ),
+                        detection_filters,
+                        [],
+                        detections,
+                    ) == get_consolidated_object_detections_reference(detections)
+
+    def test_attribute_indexes_match(self):
+        for count in [0, 1, 20, 60]:
+            detections = generate_detections(self.rng, self.frame_shape, count)
+            tracked_objects = [
+                {"label": d[0], "box": d[2]}
+                for d in generate_detections(self.rng, self.frame_shape, 30)
+            ]
+            assert [
+                list(indexes)
+                for indexes in get_attribute_indexes(tracked_objects, detections)
+            ] == get_attribute_indexes_reference(tracked_objects, detections)
+
+    def test_pairwise_box_checks_match(self):
+        boxes = generate_motion_boxes(self.rng, self.frame_shape, 60)
+        others = generate_motion_boxes(self.rng, self.frame_shape, 40)
+        overlap = boxes_overlap(get_box_array(boxes), get_box_array(others))
+        inside = boxes_inside(get_box_array(boxes), get_box_array(others))
+
+        for i, box in enumerate(boxes):
+            for j, other in enumerate(others):
+                assert overlap[i, j] == box_overlaps(box, other)
+                assert inside[i, j] == box_inside(box, other)
+
+    def test_no_boxes(self):
+        assert boxes_overlap(get_box_array([]), get_box_array([(0, 0, 1, 1)])).shape == (0, 1)
+        assert get_attribute_indexes([{"label": "person", "box": (0, 0, 9, 9)}], [])[0].size == 0
+
+
 class TestObjectBoundingBoxes(unittest.TestCase):
     def setUp(self) -> None:
         pass
@@ -190,3 +590,100 @@ class TestObjectBoundingBoxes(unittest.TestCase):
 
         assert intersection(box_a, box_b) == None
         assert intersection(box_b, box_c) == (899, 128, 985, 151)
+
+
+class TestSweepTiles(unittest.TestCase):
+    def test_tiles_cover_the_frame(self):
+        tiles = get_sweep_tiles((2160, 3840), 320, 0.1)
+        covered = np.zeros((2160, 3840), dtype=bool)
+
+        for xmin, ymin, xmax, ymax in tiles:
+            assert xmax - xmin == ymax - ymin == 320
+            assert xmin >= 0 and ymin >= 0 and xmax <= 3840 and ymax <= 2160
+            covered[ymin:ymax, xmin:xmax] = True
+
+        assert covered.all()
+        assert len(tiles) == 8 * 14
+
+    def test_tiles_overlap(self):
+        tiles = get_sweep_tiles((720, 1280), 320, 0.25)
+        xmins = sorted({tile[0] for tile in tiles})
+
+        assert xmins[0] == 0 and xmins[-1] == 1280 - 320
+        assert all(b - a <= 240 for a, b in zip(xmins, xmins[1:]))
+
+    def test_tile_larger_than_the_frame(self):
+        assert get_sweep_tiles((300, 500), 640, 0.1) == [
+            (0, 0, 300, 300),
+            (200, 0, 500, 300),
+        ]
+
+
+class TestFaceDetectionRegions(unittest.TestCase):
+    def setUp(self):
+        self.frame_shape = (1000, 2000)
+        self.region = (0, 0, 320, 320)
+        self.tracked_objects = {
+            "a": {
+                "id": "a",
+                "label": "person",
+                "box": (10, 10, 100, 200),
+                "frame_time": 1.0,
+            },
+            "b": {
+                "id": "b",
+                "label": "person",
+                "box": (150, 10, 250, 200),
+                "frame_time": 1.0,
+            },
+        }
+
+    def get_regions(self, model_config, face_recognition_cache=None, frame_time=1.0):
+        for obj in self.tracked_objects.values():
+            obj["frame_time"] = frame_time
+
+        if face_recognition_cache is None:
+            face_recognition_cache = FaceRecognitionCache.from_model_config(
+                model_config
+            )
+
+        return get_face_detection_regions(
+            self.frame_shape,
+            model_config,
+            [self.region, self.region],
+            self.tracked_objects,
+            face_recognition_cache,
+            frame_time,
+            160,
+        )
+
+    def test_region_with_several_people_is_checked_once(self):
+        regions = self.get_regions(ModelConfig(face_recognition_area="Regions"))
+        assert regions == [self.region]
+
+    def test_tracked_gets_a_region_per_person(self):
+        regions = self.get_regions(ModelConfig(face_recognition_area="Tracked"))
+        assert len(regions) == 2
+
+    def test_confident_person_is_skipped_until_recheck(self):
+        model_config = ModelConfig(
+            face_recognition_area="Tracked",
+            face_recognition_skip_score=0.8,
+            face_recognition_recheck_interval=5.0,
+        )
+        face_recognition_cache = FaceRecognitionCache.from_model_config(model_config)
+        self.tracked_objects["a"]["sub_label_score"] = 0.9
+
+        assert len(self.get_regions(model_config, face_recognition_cache, 1.0)) == 2
+        assert len(self.get_regions(model_config, face_recognition_cache, 2.0)) == 1
+        assert len(self.get_regions(model_config, face_recognition_cache, 6.0)) == 2
+
+    def test_people_are_checked_until_evicted(self):
+        face_recognition_cache = FaceRecognitionCache(0.8, 5.0, 1.2)
+        self.get_regions(
+            ModelConfig(face_recognition_area="Regions"), face_recognition_cache
+        )
+        assert set(face_recognition_cache.check_times.keys()) == {"a", "b"}
+
+        face_recognition_cache.evict("a")
+        assert set(face_recognition_cache.check_times.keys()) == {"b"}
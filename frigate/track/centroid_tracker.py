@@ -128,14 +128,14 @@ class CentroidTracker(ObjectTracker):
 
         self.tracked_objects[id].update(new_obj)
 
-    def update_frame_times(self, frame_time):
+    def update_frame_times(self, frame_time, frame=None):
         for id in list(self.tracked_objects.keys()):
             self.tracked_objects[id]["frame_time"] = frame_time
             self.tracked_objects[id]["motionless_count"] += 1
             if self.is_expired(id):
                 self.deregister(id)
 
-    def match_and_update(self, frame_time, detections):
+    def match_and_update(self, frame_time, detections, frame=None):
         # group by name
         detection_groups = defaultdict(lambda: [])
         for obj in detections:
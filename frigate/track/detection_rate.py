@@ -0,0 +1,85 @@
+"""Adaptive rate of the frames a camera sends to the detector."""
+
+from collections import deque
+
+from frigate.config import DetectConfig
+from frigate.util.image import intersection_over_union
+
+# seconds a track has to be followed before it can be considered stable
+STABLE_TRACK_AGE = 1.0
+# minimum overlap of the kalman estimate and the detected box of a stable track
+STABLE_ESTIMATE_IOU = 0.8
+# seconds of frames the skip ratio is computed over
+SKIP_RATIO_WINDOW = 10.0
+
+
+class DetectionRate:
+    """Decides which frames of a camera are sent to the detector.
+
+    While every track is stable, followed for a while with a high score and
+    a kalman estimate that agrees with its detections, frames are only
+    detected at the minimum rate and the tracker predicts the objects on the
+    frames in between. Motion away from the tracked objects or an uncertain
+    track brings detection back up to the maximum rate.
+    """
+
+    def __init__(self, config: DetectConfig) -> None:
+        self.config = config.adaptive
+        self.frame_interval = 1 / config.fps
+        self.min_interval = 1 / self.config.min_fps
+        self.max_interval = 1 / (self.config.max_fps or config.fps)
+        self.last_detection = 0.0
+        # (frame time, detected) of the frames with something to detect
+        self.frames: deque[tuple[float, bool]] = deque()
+
+    def is_stable(self, obj: dict, disappeared: int) -> bool:
+        return (
+            disappeared == 0
+            and obj["score"] >= self.config.min_score
+            and obj["frame_time"] - obj["start_time"] >= STABLE_TRACK_AGE
+            and intersection_over_union(obj["estimate"], obj["box"])
+            >= STABLE_ESTIMATE_IOU
+        )
+
+    def should_detect(
+        self,
+        frame_time: float,
+        tracked_objects: list[dict],
+        disappeared: dict[str, int],
+        new_motion: bool,
+    ) -> bool:
+        """Whether a frame with regions to detect is sent to the detector.
+
+        new_motion is whether there is motion that does not overlap any of
+        the tracked objects.
+        """
+        if not self.config.enabled:
+            return True
+
+        uncertain = new_motion or not all(
+            self.is_stable(obj, disappeared[obj["id"]]) for obj in tracked_objects
+        )
+        interval = self.max_interval if uncertain else self.min_interval
+
+        # frame times jitter, allow half a frame early
+        detect = (
+            frame_time - self.last_detection + self.frame_interval / 2 >= interval
+        )
+
+        if detect:
+            self.last_detection = frame_time
+
+        self.frames.append((frame_time, detect))
+
+        while self.frames and self.frames[0][0] < frame_time - SKIP_RATIO_WINDOW:
+            self.frames.popleft()
+
+        return detect
+
+    @property
+    def skip_ratio(self) -> float:
+        """Share of the recent frames with regions that were not detected."""
+        if not self.frames:
+            return 0.0
+
+        return sum(not detected for _, detected in self.frames) / len(self.frames)
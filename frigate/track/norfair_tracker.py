@@ -1,11 +1,13 @@
 import random
 import string
+from typing import Optional
 
 import numpy as np
 from norfair import Detection, Drawable, Tracker, draw_boxes
 from norfair.drawing.drawer import Drawer
 
 from frigate.config import CameraConfig
+from frigate.face_cache import FaceRecognitionCache
 from frigate.ptz.autotrack import PtzMotionEstimator
 from frigate.track import ObjectTracker
 from frigate.types import PTZMetricsTypes
@@ -60,6 +62,7 @@ class NorfairTracker(ObjectTracker):
         self,
         config: CameraConfig,
         ptz_metrics: PTZMetricsTypes,
+        face_recognition_cache: Optional[FaceRecognitionCache] = None,
     ):
         self.tracked_objects = {}
         self.disappeared = {}
@@ -72,6 +75,7 @@ class NorfairTracker(ObjectTracker):
         self.ptz_motion_estimator = {}
         self.camera_name = config.name
         self.track_id_map = {}
+        self.face_recognition_cache = face_recognition_cache
         # TODO: could also initialize a tracker per object class if there
         #       was a good reason to have different distance calculations
         self.tracker = Tracker(
@@ -114,6 +118,9 @@ class NorfairTracker(ObjectTracker):
         ]
         del self.track_id_map[track_id]
 
+        if self.face_recognition_cache is not None:
+            self.face_recognition_cache.evict(id)
+
     # tracks the current position of the object based on the last N bounding boxes
     # returns False if the object has moved outside its previous position
     def update_position(self, id, box):
@@ -201,7 +208,7 @@ class NorfairTracker(ObjectTracker):
 
         self.tracked_objects[id].update(obj)
 
-    def update_frame_times(self, frame_time):
+    def update_frame_times(self, frame_time, frame):
         # if the object was there in the last frame, assume it's still there
         detections = [
             (
@@ -215,9 +222,52 @@ class NorfairTracker(ObjectTracker):
             for id, obj in self.tracked_objects.items()
             if self.disappeared[id] == 0
         ]
-        self.match_and_update(frame_time, detections=detections)
+        self.match_and_update(frame_time, detections=detections, frame=frame)
+
+    def predict(self, frame_time):
+        # move the objects to their kalman estimates for a frame that was not
+        # sent to the detector, stepping the filters keeps their velocities
+        # per frame without counting the frame as a miss
+        for t in list(self.tracker.tracked_objects):
+            t.filter.predict()
+
+            if t.global_id not in self.track_id_map:
+                continue
+
+            estimate = tuple(t.estimate.flatten().astype(int))
+            estimate = (
+                max(0, estimate[0]),
+                max(0, estimate[1]),
+                min(self.detect_config.width - 1, estimate[2]),
+                min(self.detect_config.height - 1, estimate[3]),
+            )
+            id = self.track_id_map[t.global_id]
+
+            # only objects that were there in the last frame are predicted
+            if self.disappeared[id] != 0 or not (
+                estimate[0] < estimate[2] and estimate[1] < estimate[3]
+            ):
+                continue
+
+            width = estimate[2] - estimate[0]
+            height = estimate[3] - estimate[1]
+            self.update(
+                t.global_id,
+                {
+                    **self.tracked_objects[id],
+                    "box": estimate,
+                    "estimate": estimate,
+                    "area": width * height,
+                    "ratio": width / max(1, height),
+                    "centroid": (
+                        int((estimate[0] + estimate[2]) / 2.0),
+                        int((estimate[1] + estimate[3]) / 2.0),
+                    ),
+                    "frame_time": frame_time,
+                },
+            )
 
-    def match_and_update(self, frame_time, detections):
+    def match_and_update(self, frame_time, detections, frame):
         norfair_detections = []
 
         for obj in detections:
@@ -255,7 +305,7 @@ class NorfairTracker(ObjectTracker):
                 )
 
             coord_transformations = self.ptz_motion_estimator.motion_estimator(
-                detections, frame_time, self.camera_name
+                detections, frame_time, self.camera_name, frame
             )
 
         tracked_objects = self.tracker.update(
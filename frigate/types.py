@@ -5,6 +5,7 @@ from multiprocessing.synchronize import Event
 from typing import Optional, TypedDict
 
 from frigate.object_detection import ObjectDetectProcess
+from frigate.util.image import RingFrameManager
 
 
 class CameraMetricsTypes(TypedDict):
@@ -12,10 +13,15 @@ class CameraMetricsTypes(TypedDict):
     capture_process: Optional[Process]
     detection_enabled: Synchronized
     detection_fps: Synchronized
+    detection_dropped: Synchronized
+    detection_skip_ratio: Synchronized
+    detection_wait: Synchronized
     facedetection_fps: Synchronized
     facerecognition_fps: Synchronized
     detection_frame: Synchronized
     ffmpeg_pid: Synchronized
+    face_index_queue: Queue
+    face_model_version: Synchronized
     frame_queue: Queue
     motion_enabled: Synchronized
     improve_contrast_enabled: Synchronized
@@ -24,6 +30,7 @@ class CameraMetricsTypes(TypedDict):
     process: Optional[Process]
     process_fps: Synchronized
     read_start: Synchronized
+    record_ffmpeg_pid: Synchronized
     skipped_fps: Synchronized
 
 
@@ -45,6 +52,7 @@ class StatsTrackingTypes(TypedDict):
     detectors: dict[str, ObjectDetectProcess]
     facedetectors: dict[str, ObjectDetectProcess]
     facerecognisers: dict[str, ObjectDetectProcess]
+    frame_ring: Optional[RingFrameManager]
     started: int
     latest_frigate_version: str
     last_updated: int
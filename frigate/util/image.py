@@ -2,6 +2,7 @@
 
 import datetime
 import logging
+import multiprocessing as mp
 from abc import ABC, abstractmethod
 from multiprocessing import shared_memory
 from string import printable
@@ -11,6 +12,8 @@ import math
 import cv2
 import numpy as np
 
+from frigate.const import FRAME_RING_RECLAIM_FRAMES
+
 logger = logging.getLogger(__name__)
 
 
@@ -242,6 +245,19 @@ def calculate_face_region(xmin, ymin, xmax, ymax):
 
     return (x_min, y_min, x_max, y_max)
 
+
+def get_face_sharpness(frame, box) -> float:
+    """Variance of the laplacian of the luma plane inside the face box."""
+    height = frame.shape[0] // 3 * 2
+    x_min, y_min, x_max, y_max = [int(v) for v in box]
+    luma = frame[max(0, y_min) : min(height, y_max), max(0, x_min) : x_max]
+
+    if luma.size == 0:
+        return 0.0
+
+    return float(cv2.Laplacian(luma, cv2.CV_64F).var())
+
+
 def get_yuv_crop(frame_shape, crop):
     # crop should be (x1,y1,x2,y2)
     frame_height = frame_shape[0] // 3 * 2
@@ -833,6 +849,163 @@ class SharedMemoryFrameManager(FrameManager):
             del self.shm_store[name]
 
 
+class RingFrameManager:
+    """Preallocated ring of shared memory frame slots for each camera.
+
+    The segments are created once by the app and inherited by the camera,
+    output and object processing processes. A frame is passed between them
+    as its slot index and the generation the slot was written with, and
+    every slot counts the consumers holding it so it is only written again
+    once all of them released it.
+
+    A consumer that dies or misses a release would hold its slots forever,
+    so once every slot is in use the one written longest ago is taken back
+    if reclaim_after frames were captured since. Frames dropped because no
+    slot was free are counted for the stats.
+    """
+
+    def __init__(
+        self,
+        frame_shapes: dict[str, tuple[int, int]],
+        slots: int,
+        reclaim_after: int = FRAME_RING_RECLAIM_FRAMES,
+    ) -> None:
+        self.frame_shapes = frame_shapes
+        self.slots = slots
+        self.reclaim_after = reclaim_after
+        self.shms: dict[str, shared_memory.SharedMemory] = {}
+        self.frames: dict[str, np.ndarray] = {}
+        self.ref_counts = {}
+        self.generations = {}
+        # frame number each slot was written at and the frames captured so far
+        self.written_at = {}
+        self.frame_numbers = {}
+        self.dropped_frames = {}
+        self.cursors: dict[str, int] = {}
+
+        for camera, shape in frame_shapes.items():
+            name = f"{camera}-frames"
+            size = slots * shape[0] * shape[1]
+
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # left behind by a previous run that did not exit cleanly
+                shm = shared_memory.SharedMemory(name=name)
+
+                if shm.size < size:
+                    shm.close()
+                    shm.unlink()
+                    shm = shared_memory.SharedMemory(
+                        name=name, create=True, size=size
+                    )
+
+            self.shms[camera] = shm
+            self.frames[camera] = np.ndarray(
+                (slots, shape[0], shape[1]), dtype=np.uint8, buffer=shm.buf
+            )
+            # the generations are guarded by the lock of the ref counts
+            self.ref_counts[camera] = mp.Array("i", slots)
+            self.generations[camera] = mp.RawArray("q", slots)
+            self.written_at[camera] = mp.RawArray("q", slots)
+            self.frame_numbers[camera] = mp.RawValue("q", 0)
+            self.dropped_frames[camera] = mp.RawValue("q", 0)
+            self.cursors[camera] = 0
+
+    def acquire(self, camera: str) -> Optional[tuple[int, int]]:
+        """Claim a free slot for a new frame, None if every slot is in use."""
+        ref_counts = self.ref_counts[camera]
+        generations = self.generations[camera]
+        written_at = self.written_at[camera]
+        frame_number = self.frame_numbers[camera]
+
+        with ref_counts.get_lock():
+            frame_number.value += 1
+
+            for i in range(self.slots):
+                slot = (self.cursors[camera] + i) % self.slots
+
+                if ref_counts[slot] == 0:
+                    break
+            else:
+                slot = min(range(self.slots), key=lambda s: written_at[s])
+
+                if frame_number.value - written_at[slot] < self.reclaim_after:
+                    self.dropped_frames[camera].value += 1
+                    return None
+
+                # the old references no longer match and their releases are ignored
+                logger.warning(
+                    f"{camera}: Frame slot {slot} was not released after {frame_number.value - written_at[slot]} frames, reclaiming it"
+                )
+
+            ref_counts[slot] = 1
+            generations[slot] += 1
+            written_at[slot] = frame_number.value
+            self.cursors[camera] = slot + 1
+            return (slot, generations[slot])
+
+    def buffer(self, camera: str, frame_ref: tuple[int, int]) -> memoryview:
+        """Writable bytes of a slot claimed with acquire."""
+        return memoryview(self.frames[camera][frame_ref[0]].reshape(-1))
+
+    def get(self, camera: str, frame_ref: tuple[int, int]) -> Optional[np.ndarray]:
+        slot, generation = frame_ref
+
+        if self.generations[camera][slot] != generation:
+            return None
+
+        return self.frames[camera][slot]
+
+    def retain(self, camera: str, frame_ref: tuple[int, int]) -> bool:
+        """Hold a frame for one more consumer, False if it was already reused."""
+        slot, generation = frame_ref
+        ref_counts = self.ref_counts[camera]
+
+        with ref_counts.get_lock():
+            if (
+                self.generations[camera][slot] != generation
+                or ref_counts[slot] == 0
+            ):
+                return False
+
+            ref_counts[slot] += 1
+            return True
+
+    def release(self, camera: str, frame_ref: tuple[int, int]) -> None:
+        slot, generation = frame_ref
+        ref_counts = self.ref_counts[camera]
+
+        with ref_counts.get_lock():
+            if self.generations[camera][slot] == generation and ref_counts[slot] > 0:
+                ref_counts[slot] -= 1
+
+    def in_use(self, camera: str) -> int:
+        return sum(1 for count in self.ref_counts[camera][:] if count > 0)
+
+    def dropped(self, camera: str) -> int:
+        """Frames dropped so far because every slot was in use."""
+        return self.dropped_frames[camera].value
+
+    def close(self) -> None:
+        self.frames = {}
+
+        for shm in self.shms.values():
+            try:
+                shm.close()
+            except BufferError:
+                # a frame is still in use, it is unmapped when the process exits
+                pass
+
+    def unlink(self) -> None:
+        self.close()
+
+        for shm in self.shms.values():
+            shm.unlink()
+
+        self.shms = {}
+
+
 def create_mask(frame_shape, mask):
     mask_img = np.zeros(frame_shape, np.uint8)
     mask_img[:] = 255
@@ -0,0 +1 @@
+VERSION = "0.13.0-local"
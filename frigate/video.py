@@ -10,7 +10,6 @@ import string
 import subprocess as sp
 import threading
 import time
-from collections import defaultdict
 
 import cv2
 import numpy as np
@@ -20,24 +19,27 @@ from frigate.config import CameraConfig, DetectConfig, ModelConfig, FrigateConfi
 from frigate.const import ALL_ATTRIBUTE_LABELS, ATTRIBUTE_LABEL_MAP, CACHE_DIR, FACES_DIR
 from frigate.detectors.detector_config import PixelFormatEnum
 from frigate.log import LogPipe
-from frigate.models import Face, FaceLabel
+from frigate.models import FaceLabel
 from frigate.motion import MotionDetector
 from frigate.motion.improved_motion import ImprovedMotionDetector
 from frigate.object_detection import RemoteObjectDetector
 from frigate.face_detection import RemoteFaceDetector
+from frigate.face_cache import FaceRecognitionCache
+from frigate.face_index import FaceEmbeddingIndex
+from frigate.face_trainer import face_model_path, read_face_recognizer
+from frigate.frame_results import FrameResultRing, FrameResultWriter
 from frigate.ptz.autotrack import ptz_moving_at_frame_time
 from frigate.track import ObjectTracker
+from frigate.track.detection_rate import DetectionRate
 from frigate.track.norfair_tracker import NorfairTracker
 from frigate.types import PTZMetricsTypes
 from frigate.util.builtin import EventsPerSecond
 from frigate.util.image import (
-    FrameManager,
-    SharedMemoryFrameManager,
+    RingFrameManager,
     area,
     calculate_region,
     calculate_face_region,
     draw_box_with_label,
-    intersection,
     intersection_over_union,
     yuv_region_2_bgr,
     yuv_region_2_rgb,
@@ -47,8 +49,7 @@ from frigate.util.image import (
     yuv_region_2_yuv_face,
     yuv_crop_and_resize_face,
     calculate_gray_face_region,
-    compare_eu_distance,
-    cos_similarity,
+    get_face_sharpness,
 )
 from frigate.util.services import listen
 from frigate.face_detection import RemoteFaceDetector
@@ -56,6 +57,9 @@ from frigate.face_detection import RemoteFaceDetector
 
 logger = logging.getLogger(__name__)
 
+# motion box count from which clustering uses the pairwise numpy masks
+CLUSTER_VECTORIZE_MIN_BOXES = 32
+
 
 def filtered(obj, objects_to_track, object_filters):
     object_name = obj[0]
@@ -129,6 +133,24 @@ def get_min_face_detection_region_size(model_config: ModelConfig) -> int:
 
     return int((half + 3) / 4) * 4
 
+
+def get_sweep_tiles(frame_shape, tile_size: int, overlap: float) -> list:
+    """Square tiles covering the frame that overlap by at least the given share."""
+    height, width = frame_shape[0], frame_shape[1]
+    # tiles have to fit in the frame and be divisible by 4
+    size = min(tile_size, height, width) // 4 * 4
+    step = size * (1 - overlap)
+
+    def offsets(length):
+        count = max(1, math.ceil((length - size) / step) + 1)
+        # spread the tiles evenly with the last one at the edge of the frame
+        return [int(offset) for offset in np.linspace(0, length - size, count)]
+
+    return [
+        (x, y, x + size, y + size) for y in offsets(height) for x in offsets(width)
+    ]
+
+
 def create_tensor_input(frame, model_config: ModelConfig, region):
     if model_config.input_pixel_format == PixelFormatEnum.rgb:
         cropped_frame = yuv_region_2_rgb(frame, region)
@@ -211,7 +233,7 @@ def capture_frames(
     ffmpeg_process,
     camera_name,
     frame_shape,
-    frame_manager: FrameManager,
+    frame_ring: RingFrameManager,
     frame_queue,
     fps: mp.Value,
     skipped_fps: mp.Value,
@@ -223,16 +245,37 @@ def capture_frames(
     frame_rate.start()
     skipped_eps = EventsPerSecond()
     skipped_eps.start()
+    ring_full = False
     while True:
         fps.value = frame_rate.eps()
         skipped_fps.value = skipped_eps.eps()
 
         current_frame.value = datetime.datetime.now().timestamp()
-        frame_name = f"{camera_name}{current_frame.value}"
-        frame_buffer = frame_manager.create(frame_name, frame_size)
+        frame_ref = frame_ring.acquire(camera_name)
+
         try:
-            frame_buffer[:] = ffmpeg_process.stdout.read(frame_size)
+            if frame_ref is None:
+                # every slot is still in use downstream, drop the frame
+                if not ring_full:
+                    logger.warning(
+                        f"{camera_name}: Every frame slot is in use, dropping frames until one is released."
+                    )
+                    ring_full = True
+
+                if len(ffmpeg_process.stdout.read(frame_size)) == frame_size:
+                    skipped_eps.update()
+                    continue
+
+                raise EOFError()
+
+            ring_full = False
+            frame_ring.buffer(camera_name, frame_ref)[:] = ffmpeg_process.stdout.read(
+                frame_size
+            )
         except Exception:
+            if frame_ref is not None:
+                frame_ring.release(camera_name, frame_ref)
+
             # shutdown has been initiated
             if stop_event.is_set():
                 break
@@ -242,7 +285,6 @@ def capture_frames(
                 logger.error(
                     f"{camera_name}: ffmpeg process is not running. exiting capture thread..."
                 )
-                frame_manager.delete(frame_name)
                 break
             continue
 
@@ -250,14 +292,12 @@ def capture_frames(
 
         # don't lock the queue to check, just try since it should rarely be full
         try:
-            # add to the queue
-            frame_queue.put(current_frame.value, False)
-            # close the frame
-            frame_manager.close(frame_name)
+            # add to the queue, the slot is now held by process_frames
+            frame_queue.put((current_frame.value, frame_ref), False)
         except queue.Full:
             # if the queue is full, skip this frame
             skipped_eps.update()
-            frame_manager.delete(frame_name)
+            frame_ring.release(camera_name, frame_ref)
 
 
 class CameraWatchdog(threading.Thread):
@@ -265,10 +305,12 @@ class CameraWatchdog(threading.Thread):
         self,
         camera_name,
         config: CameraConfig,
+        frame_ring: RingFrameManager,
         frame_queue,
         camera_fps,
         skipped_fps,
         ffmpeg_pid,
+        record_ffmpeg_pid,
         stop_event,
     ):
         threading.Thread.__init__(self)
@@ -282,6 +324,9 @@ class CameraWatchdog(threading.Thread):
         self.camera_fps = camera_fps
         self.skipped_fps = skipped_fps
         self.ffmpeg_pid = ffmpeg_pid
+        # the recording maintainer checks which segments this process has open
+        self.record_ffmpeg_pid = record_ffmpeg_pid
+        self.frame_ring = frame_ring
         self.frame_queue = frame_queue
         self.frame_shape = self.config.frame_shape_yuv
         self.frame_size = self.frame_shape[0] * self.frame_shape[1]
@@ -305,6 +350,7 @@ class CameraWatchdog(threading.Thread):
                     "process": start_or_restart_ffmpeg(c["cmd"], self.logger, logpipe),
                 }
             )
+            self.set_record_pid(self.ffmpeg_other_processes[-1])
 
         time.sleep(self.sleeptime)
         while not self.stop_event.wait(self.sleeptime):
@@ -369,6 +415,7 @@ class CameraWatchdog(threading.Thread):
                             p["logpipe"],
                             ffmpeg_process=p["process"],
                         )
+                        self.set_record_pid(p)
                         continue
                     else:
                         p["latest_segment_time"] = latest_segment_time
@@ -380,6 +427,7 @@ class CameraWatchdog(threading.Thread):
                 p["process"] = start_or_restart_ffmpeg(
                     p["cmd"], self.logger, p["logpipe"], ffmpeg_process=p["process"]
                 )
+                self.set_record_pid(p)
 
         stop_ffmpeg(self.ffmpeg_detect_process, self.logger)
         for p in self.ffmpeg_other_processes:
@@ -387,18 +435,24 @@ class CameraWatchdog(threading.Thread):
             p["logpipe"].close()
         self.logpipe.close()
 
+    def set_record_pid(self, p) -> None:
+        if "record" in p["roles"]:
+            self.record_ffmpeg_pid.value = p["process"].pid
+
     def start_ffmpeg_detect(self):
-        ffmpeg_cmd = [
-            c["cmd"] for c in self.config.ffmpeg_cmds if "detect" in c["roles"]
-        ][0]
+        ffmpeg_cmd = [c for c in self.config.ffmpeg_cmds if "detect" in c["roles"]][0]
         self.ffmpeg_detect_process = start_or_restart_ffmpeg(
-            ffmpeg_cmd, self.logger, self.logpipe, self.frame_size
+            ffmpeg_cmd["cmd"], self.logger, self.logpipe, self.frame_size
         )
         self.ffmpeg_pid.value = self.ffmpeg_detect_process.pid
+        self.set_record_pid(
+            {"roles": ffmpeg_cmd["roles"], "process": self.ffmpeg_detect_process}
+        )
         self.capture_thread = CameraCapture(
             self.camera_name,
             self.ffmpeg_detect_process,
             self.frame_shape,
+            self.frame_ring,
             self.frame_queue,
             self.camera_fps,
             self.skipped_fps,
@@ -436,6 +490,7 @@ class CameraCapture(threading.Thread):
         camera_name,
         ffmpeg_process,
         frame_shape,
+        frame_ring: RingFrameManager,
         frame_queue,
         fps,
         skipped_fps,
@@ -445,11 +500,11 @@ class CameraCapture(threading.Thread):
         self.name = f"capture:{camera_name}"
         self.camera_name = camera_name
         self.frame_shape = frame_shape
+        self.frame_ring = frame_ring
         self.frame_queue = frame_queue
         self.fps = fps
         self.stop_event = stop_event
         self.skipped_fps = skipped_fps
-        self.frame_manager = SharedMemoryFrameManager()
         self.ffmpeg_process = ffmpeg_process
         self.current_frame = mp.Value("d", 0.0)
         self.last_frame = 0
@@ -459,7 +514,7 @@ class CameraCapture(threading.Thread):
             self.ffmpeg_process,
             self.camera_name,
             self.frame_shape,
-            self.frame_manager,
+            self.frame_ring,
             self.frame_queue,
             self.fps,
             self.skipped_fps,
@@ -468,7 +523,9 @@ class CameraCapture(threading.Thread):
         )
 
 
-def capture_camera(name, config: CameraConfig, process_info):
+def capture_camera(
+    name, config: CameraConfig, frame_ring: RingFrameManager, process_info
+):
     stop_event = mp.Event()
 
     def receiveSignal(signalNumber, frame):
@@ -484,10 +541,12 @@ def capture_camera(name, config: CameraConfig, process_info):
     camera_watchdog = CameraWatchdog(
         name,
         config,
+        frame_ring,
         frame_queue,
         process_info["camera_fps"],
         process_info["skipped_fps"],
         process_info["ffmpeg_pid"],
+        process_info["record_ffmpeg_pid"],
         stop_event,
     )
     camera_watchdog.start()
@@ -505,6 +564,8 @@ def track_camera(
     facedetection_queue,
     faceresult_connection,
     detected_objects_queue,
+    frame_ring: RingFrameManager,
+    frame_results: FrameResultRing,
     process_info,
     ptz_metrics,
     face_queue,
@@ -539,29 +600,39 @@ def track_camera(
         improve_contrast_enabled,
         motion_threshold,
         motion_contour_area,
+        fast_path=config.motion.fast_path,
     )
     object_detector = RemoteObjectDetector(
-        name, labelmap, detection_queue, result_connection, model_config, stop_event
+        name,
+        labelmap,
+        detection_queue,
+        result_connection,
+        model_config,
+        stop_event,
+        config.detect.max_regions_per_batch,
     )
 
     face_detector = RemoteFaceDetector(
-        name, facelabelmap, facedetection_queue, faceresult_connection, model_config, stop_event
+        name,
+        facelabelmap,
+        facedetection_queue,
+        faceresult_connection,
+        model_config,
+        stop_event,
+        config.detect.max_regions_per_batch,
     )
 
-    if "DOODS" in model_config.face_recognition_model:
-        face_recognizer = None
-    else:
-        if model_config.face_recognition_model == "LBPH":
-            face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-        if model_config.face_recognition_model == "Fisher":
-            face_recognizer = cv2.face.FisherFaceRecognizer_create()
-        if model_config.face_recognition_model == "Eigen":
-            face_recognizer = cv2.face.EigenFaceRecognizer_create()
-        face_recognizer.read('/facerecognition_default.yml')
+    face_index = None
+    # the opencv recognizers are loaded by process_frames once the face
+    # trainer has written a model
+    face_recognizer = None
 
-    object_tracker = NorfairTracker(config, ptz_metrics)
+    if "DOODS" in model_config.face_recognition_model:
+        face_index = FaceEmbeddingIndex(process_info["face_index_queue"])
+        face_index.load()
 
-    frame_manager = SharedMemoryFrameManager()
+    face_recognition_cache = FaceRecognitionCache.from_model_config(model_config)
+    object_tracker = NorfairTracker(config, ptz_metrics, face_recognition_cache)
 
     process_frames(
         name,
@@ -569,13 +640,14 @@ def track_camera(
         frame_shape,
         model_config,
         config.detect,
-        frame_manager,
+        frame_ring,
         motion_detector,
         object_detector,
         face_detector,
         face_recognizer,
         object_tracker,
         detected_objects_queue,
+        FrameResultWriter(frame_results, name),
         process_info,
         objects_to_track,
         object_filters,
@@ -584,6 +656,8 @@ def track_camera(
         stop_event,
         ptz_metrics,
         face_queue,
+        face_index,
+        face_recognition_cache,
     )
 
     logger.info(f"{name}: exiting subprocess")
@@ -628,6 +702,30 @@ def intersects_any(box_a, boxes):
     return False
 
 
+def get_box_array(boxes) -> np.ndarray:
+    return np.array(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def boxes_overlap(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """box_overlaps for every pair, overlap[i, j] is boxes[i] against others[j]."""
+    return ~(
+        (boxes[:, None, 2] < others[None, :, 0])
+        | (boxes[:, None, 0] > others[None, :, 2])
+        | (boxes[:, None, 1] > others[None, :, 3])
+        | (boxes[:, None, 3] < others[None, :, 1])
+    )
+
+
+def boxes_inside(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """box_inside for every pair, inside[i, j] is others[j] inside boxes[i]."""
+    return (
+        (others[None, :, 0] >= boxes[:, None, 0])
+        & (others[None, :, 1] >= boxes[:, None, 1])
+        & (others[None, :, 2] <= boxes[:, None, 2])
+        & (others[None, :, 3] <= boxes[:, None, 3])
+    )
+
+
 def detect(
     detect_config: DetectConfig,
     object_detector,
@@ -639,8 +737,42 @@ def detect(
 ):
     tensor_input = create_tensor_input(frame, model_config, region)
 
-    detections = []
     region_detections = object_detector.detect(tensor_input)
+    return get_region_detections(
+        detect_config, region, region_detections, objects_to_track, object_filters
+    )
+
+
+def detect_batch(
+    detect_config: DetectConfig,
+    object_detector,
+    frame,
+    model_config,
+    regions,
+    detection_filters,
+):
+    """Detect objects in every region with batched detector requests."""
+    tensor_inputs = [
+        create_tensor_input(frame, model_config, region) for region in regions
+    ]
+
+    return get_region_detection_records(
+        detect_config,
+        regions,
+        object_detector.detect_batch_raw(tensor_inputs),
+        detection_filters,
+    )
+
+
+def get_region_detections(
+    detect_config: DetectConfig,
+    region,
+    region_detections,
+    objects_to_track,
+    object_filters,
+):
+    """Convert detections relative to a region into filtered frame detections."""
+    detections = []
     for d in region_detections:
         box = d[2]
         size = region[2] - region[0]
@@ -682,8 +814,48 @@ def face_detect(
 ):
     tensor_input = create_face_detection_tensor_input(frame, model_config, region)
 
-    detections = []
     region_detections = object_detector.detect(tensor_input)
+    return get_face_region_detections(
+        detect_config, region, region_detections, objects_to_track, object_filters
+    )
+
+
+def face_detect_batch(
+    detect_config: DetectConfig,
+    face_detector,
+    frame,
+    model_config,
+    regions,
+    objects_to_track,
+    object_filters,
+):
+    """Detect faces in every region with batched face detector requests."""
+    if not regions:
+        return []
+
+    tensor_inputs = [
+        create_face_detection_tensor_input(frame, model_config, region)
+        for region in regions
+    ]
+
+    batch_detections = face_detector.detect_batch(tensor_inputs)
+    return [
+        get_face_region_detections(
+            detect_config, region, region_detections, objects_to_track, object_filters
+        )
+        for region, region_detections in zip(regions, batch_detections)
+    ]
+
+
+def get_face_region_detections(
+    detect_config: DetectConfig,
+    region,
+    region_detections,
+    objects_to_track,
+    object_filters,
+):
+    """Convert face detections relative to a region into filtered frame detections."""
+    detections = []
     for d in region_detections:
         box = d[2]
         size = region[2] - region[0]
@@ -765,6 +937,59 @@ def import_face_detect(
     return detections
 
 
+def get_face_detection_regions(
+    frame_shape,
+    model_config,
+    person_regions,
+    tracked_objects,
+    face_recognition_cache: FaceRecognitionCache,
+    frame_time,
+    face_detection_region_min_size,
+):
+    """Get the unique regions to detect faces in for this frame.
+
+    In Regions mode every detection region with a person is checked once no
+    matter how many people are in it, in Tracked mode a region is built
+    around each person. People whose face does not need checking again are
+    left out and the check time of everyone else is updated.
+    """
+    persons = [
+        obj
+        for obj in tracked_objects.values()
+        if obj["label"] == "person"
+        and obj["frame_time"] == frame_time
+        and face_recognition_cache.check_due(
+            obj["id"], obj.get("sub_label_score"), frame_time
+        )
+    ]
+
+    face_regions = {}
+
+    if model_config.face_recognition_area == "Tracked":
+        for obj in persons:
+            face_region = calculate_region(
+                frame_shape,
+                obj["box"][0],
+                obj["box"][1],
+                obj["box"][2],
+                obj["box"][3],
+                face_detection_region_min_size,
+                multiplier=1.0,
+            )
+            face_regions[tuple(face_region)] = face_region
+    elif model_config.face_recognition_area == "Regions":
+        person_boxes = [obj["box"] for obj in persons]
+
+        for region in person_regions:
+            if intersects_any(region, person_boxes):
+                face_regions[tuple(region)] = region
+
+    for obj in persons:
+        face_recognition_cache.checked(obj["id"], frame_time)
+
+    return list(face_regions.values())
+
+
 def get_cluster_boundary(box, min_region):
     # compute the max region size for the current box (box is 10% of region)
     box_width = box[2] - box[0]
@@ -785,49 +1010,142 @@ def get_cluster_boundary(box, min_region):
     ]
 
 
+def get_cluster_boundaries(boxes: np.ndarray, min_region) -> np.ndarray:
+    """get_cluster_boundary for an (n, 4) array of boxes."""
+    box_width = boxes[:, 2] - boxes[:, 0]
+    box_height = boxes[:, 3] - boxes[:, 1]
+    max_region_area = np.abs(box_width * box_height) / 0.1
+    max_region_size = np.maximum(
+        min_region, np.trunc(np.sqrt(max_region_area))
+    )
+
+    centroid_x = box_width / 2 + boxes[:, 0]
+    centroid_y = box_height / 2 + boxes[:, 1]
+
+    max_x_dist = np.trunc(max_region_size - box_width / 2 * 1.1)
+    max_y_dist = np.trunc(max_region_size - box_height / 2 * 1.1)
+
+    return np.trunc(
+        np.stack(
+            [
+                centroid_x - max_x_dist,
+                centroid_y - max_y_dist,
+                centroid_x + max_x_dist,
+                centroid_y + max_y_dist,
+            ],
+            axis=1,
+        )
+    )
+
+
+def get_cluster_region_sizes(min_region, min_x, min_y, max_x, max_y):
+    """Size of the calculate_region square around the given corners."""
+    size = np.floor_divide(np.maximum(max_x - min_x, max_y - min_y) * 1.2, 4) * 4
+    return np.maximum(size, min_region)
+
+
 def get_cluster_candidates(frame_shape, min_region, boxes):
     # and create a cluster of other boxes using it's max region size
     # only include boxes where the region is an appropriate(except the region could possibly be smaller?)
     # size in the cluster. in order to be in the cluster, the furthest corner needs to be within x,y offset
     # determined by the max_region size minus half the box + 20%
-    # TODO: see if we can do this with numpy
+    if len(boxes) == 0:
+        return []
+
+    # numpy only pays off once the pairwise masks are worth building
+    if len(boxes) < CLUSTER_VECTORIZE_MIN_BOXES:
+        box_list = [list(box) for box in boxes]
+        area_list = [area(box) for box in boxes]
+        candidates = []
+
+        for box in box_list:
+            boundary = get_cluster_boundary(box, min_region)
+            candidates.append(
+                [i for i, other in enumerate(box_list) if box_inside(boundary, other)]
+            )
+
+        return cluster_boxes(min_region, box_list, area_list, candidates, False)
+
+    box_array = get_box_array(boxes)
+    boundaries = get_cluster_boundaries(box_array, min_region)
+    box_areas = (box_array[:, 2] - box_array[:, 0] + 1) * (
+        box_array[:, 3] - box_array[:, 1] + 1
+    )
+
+    # inside[i, j] is True when box j is inside the boundary of box i
+    inside = boxes_inside(boundaries, box_array)
+
+    # whether box j can join a cluster that only holds box i, a region that
+    # could be smaller can not have a box under 5% of its area
+    pair_sizes = get_cluster_region_sizes(
+        min_region,
+        np.minimum(box_array[:, None, 0], box_array[None, :, 0]),
+        np.minimum(box_array[:, None, 1], box_array[None, :, 1]),
+        np.maximum(box_array[:, None, 2], box_array[None, :, 2]),
+        np.maximum(box_array[:, None, 3], box_array[None, :, 3]),
+    )
+    pair_joins = (pair_sizes <= min_region) | (
+        np.minimum(box_areas[:, None], box_areas[None, :]) / ((pair_sizes + 1) ** 2)
+        >= 0.05
+    )
+
+    candidates = [[] for _ in range(len(box_array))]
+
+    for seed_index, candidate_index in zip(*np.nonzero(inside & pair_joins)):
+        candidates[seed_index].append(int(candidate_index))
+
+    return cluster_boxes(
+        min_region, box_array.tolist(), box_areas.tolist(), candidates, True
+    )
+
+
+def cluster_boxes(min_region, box_list, area_list, candidates, pairs_checked):
+    """Greedily grow a cluster from each unused box in order.
+
+    candidates[i] lists the boxes inside the boundary of box i in order, when
+    pairs_checked is set they are already known to fit a cluster of box i alone.
+    """
     cluster_candidates = []
-    used_boxes = []
-    # loop over each box
-    for current_index, b in enumerate(boxes):
-        if current_index in used_boxes:
+    used = [False] * len(box_list)
+
+    for current_index in range(len(box_list)):
+        if used[current_index]:
             continue
+
         cluster = [current_index]
-        used_boxes.append(current_index)
-        cluster_boundary = get_cluster_boundary(b, min_region)
-        # find all other boxes that fit inside the boundary
-        for compare_index, compare_box in enumerate(boxes):
-            if compare_index in used_boxes:
-                continue
+        used[current_index] = True
+        min_x, min_y, max_x, max_y = box_list[current_index]
+        min_area = area_list[current_index]
 
-            # if the box is not inside the potential cluster area, cluster them
-            if not box_inside(cluster_boundary, compare_box):
+        for compare_index in candidates[current_index]:
+            if used[compare_index]:
                 continue
 
-            # get the region if you were to add this box to the cluster
-            potential_cluster = cluster + [compare_index]
-            cluster_region = get_cluster_region(
-                frame_shape, min_region, potential_cluster, boxes
-            )
-            # if region could be smaller and either box would be too small
-            # for the resulting region, dont cluster
-            should_cluster = True
-            if (cluster_region[2] - cluster_region[0]) > min_region:
-                for b in potential_cluster:
-                    box = boxes[b]
-                    # boxes should be more than 5% of the area of the region
-                    if area(box) / area(cluster_region) < 0.05:
-                        should_cluster = False
-                        break
-
-            if should_cluster:
-                cluster.append(compare_index)
-                used_boxes.append(compare_index)
+            # once the cluster grew the region has to be checked again
+            if len(cluster) > 1 or not pairs_checked:
+                box = box_list[compare_index]
+                size = max(
+                    max(max_x, box[2]) - min(min_x, box[0]),
+                    max(max_y, box[3]) - min(min_y, box[1]),
+                )
+                size = max((size * 1.2) // 4 * 4, min_region)
+
+                if (
+                    size > min_region
+                    and min(min_area, area_list[compare_index]) / ((size + 1) ** 2)
+                    < 0.05
+                ):
+                    continue
+
+            cluster.append(compare_index)
+            used[compare_index] = True
+            box = box_list[compare_index]
+            min_x = min(min_x, box[0])
+            min_y = min(min_y, box[1])
+            max_x = max(max_x, box[2])
+            max_y = max(max_y, box[3])
+            min_area = min(min_area, area_list[compare_index])
+
         cluster_candidates.append(cluster)
 
     # return the unique clusters only
@@ -850,38 +1168,260 @@ def get_cluster_region(frame_shape, min_region, cluster, boxes):
     )
 
 
-def get_consolidated_object_detections(detected_object_groups):
-    """Drop detections that overlap too much"""
-    consolidated_detections = []
-    for group in detected_object_groups.values():
-        # if the group only has 1 item, skip
-        if len(group) == 1:
-            consolidated_detections.append(group[0])
+# detections of a frame, region is the index of the detection region and seed
+# the index of the stationary object the detection came from, -1 if not
+DETECTION_DTYPE = np.dtype(
+    [
+        ("label", np.int32),
+        ("score", np.float64),
+        ("box", np.float64, (4,)),
+        ("area", np.float64),
+        ("ratio", np.float64),
+        ("region", np.int32),
+        ("seed", np.int32),
+    ]
+)
+
+
+def get_detection_filters(labels, objects_to_track, object_filters) -> dict:
+    """Lookup tables of the object filters by label id for filtering records.
+
+    Every name in the labelmap gets the first id it has, so labels that are
+    listed more than once (like "unknown") are grouped as one.
+    """
+    label_ids = {}
+
+    for label_id, label in sorted(labels.items()):
+        label_ids.setdefault(label, label_id)
+
+    size = max(labels.keys(), default=-1) + 1
+    filters = {
+        "labels": labels,
+        "label_ids": label_ids,
+        "label": np.full(size, -1, dtype=np.int32),
+        "min_area": np.full(size, -np.inf),
+        "max_area": np.full(size, np.inf),
+        "min_score": np.full(size, -np.inf),
+        "min_ratio": np.full(size, -np.inf),
+        "max_ratio": np.full(size, np.inf),
+        "masks": {},
+    }
+
+    for label_id, label in labels.items():
+        if label not in objects_to_track:
             continue
 
-        # sort smallest to largest by area
-        sorted_by_area = sorted(group, key=lambda g: g[3])
+        filters["label"][label_id] = label_ids[label]
+
+        if label not in object_filters:
+            continue
+
+        obj_settings = object_filters[label]
+        filters["min_area"][label_id] = obj_settings.min_area
+        filters["max_area"][label_id] = obj_settings.max_area
+        filters["min_score"][label_id] = obj_settings.min_score
+        filters["min_ratio"][label_id] = obj_settings.min_ratio
+        filters["max_ratio"][label_id] = obj_settings.max_ratio
+
+        if obj_settings.mask is not None:
+            filters["masks"][label_ids[label]] = obj_settings.mask
+
+    return filters
+
+
+def get_region_detection_records(
+    detect_config: DetectConfig,
+    regions,
+    raw_detections: np.ndarray,
+    detection_filters: dict,
+    threshold=0.4,
+) -> np.ndarray:
+    """Convert raw detections of every region into filtered frame detections.
+
+    This is get_region_detections for the (regions, 20, 6) output of the
+    detector, rows of a region are read until the first one under threshold.
+    """
+    raw_detections = raw_detections.reshape(-1, 20, 6)
+    valid = np.cumprod(raw_detections[:, :, 1] >= threshold, axis=1).astype(bool)
+    region_index, row = np.nonzero(valid)
+    raw = raw_detections[region_index, row].astype(np.float64)
+
+    region_array = get_box_array(regions)[region_index]
+    size = region_array[:, 2] - region_array[:, 0]
+    x_min = np.trunc(np.maximum(0, raw[:, 3] * size + region_array[:, 0]))
+    y_min = np.trunc(np.maximum(0, raw[:, 2] * size + region_array[:, 1]))
+    x_max = np.trunc(
+        np.minimum(detect_config.width - 1, raw[:, 5] * size + region_array[:, 0])
+    )
+    y_max = np.trunc(
+        np.minimum(detect_config.height - 1, raw[:, 4] * size + region_array[:, 1])
+    )
+
+    class_ids = raw[:, 0].astype(np.int64)
+    known = (class_ids >= 0) & (class_ids < len(detection_filters["label"]))
+    class_ids[~known] = 0
+    labels = np.where(known, detection_filters["label"][class_ids], -1)
+
+    width = x_max - x_min
+    height = y_max - y_min
+    area = width * height
+    ratio = width / np.maximum(1, height)
+    score = raw[:, 1]
+
+    keep = (
+        # ignore objects that were detected outside the frame
+        (x_min < detect_config.width - 1)
+        & (y_min < detect_config.height - 1)
+        # apply object filters
+        & (labels >= 0)
+        & (detection_filters["min_area"][class_ids] <= area)
+        & (detection_filters["max_area"][class_ids] >= area)
+        & (detection_filters["min_score"][class_ids] <= score)
+        & (detection_filters["min_ratio"][class_ids] <= ratio)
+        & (detection_filters["max_ratio"][class_ids] >= ratio)
+    )
+
+    for label, mask in detection_filters["masks"].items():
+        check = np.flatnonzero(keep & (labels == label))
+
+        if len(check) == 0:
+            continue
+
+        # if the object is in a masked location, don't add it to detected objects
+        y_location = np.minimum(y_max[check].astype(np.int64), len(mask) - 1)
+        x_location = np.minimum(
+            ((x_max[check] + x_min[check]) / 2.0).astype(np.int64), len(mask[0]) - 1
+        )
+        keep[check[mask[y_location, x_location] == 0]] = False
+
+    records = np.empty(np.count_nonzero(keep), dtype=DETECTION_DTYPE)
+    records["label"] = labels[keep]
+    records["score"] = score[keep]
+    records["box"] = np.column_stack((x_min, y_min, x_max, y_max))[keep]
+    records["area"] = area[keep]
+    records["ratio"] = ratio[keep]
+    records["region"] = region_index[keep]
+    records["seed"] = -1
+    return records
+
+
+def get_seed_detection_records(detections, detection_filters: dict) -> np.ndarray:
+    """Pack the detection tuples of stationary objects into records."""
+    records = np.empty(len(detections), dtype=DETECTION_DTYPE)
+
+    if len(detections) == 0:
+        return records
+
+    label_ids = detection_filters["label_ids"]
+    records["label"] = [label_ids.get(d[0], -1) for d in detections]
+    records["score"] = [d[1] for d in detections]
+    records["box"] = [d[2] for d in detections]
+    records["area"] = [d[3] for d in detections]
+    records["ratio"] = [d[4] for d in detections]
+    records["region"] = -1
+    records["seed"] = np.arange(len(detections))
+    return records
+
+
+def get_detection_tuples(
+    records: np.ndarray, detection_filters: dict, regions, seeds
+) -> list:
+    """Turn records back into the detection tuples the tracker takes."""
+    labels = detection_filters["labels"]
+
+    return [
+        seeds[seed]
+        if seed >= 0
+        else (labels[label], score, tuple(box), int(area), ratio, regions[region])
+        for label, score, box, area, ratio, region, seed in zip(
+            records["label"].tolist(),
+            records["score"].tolist(),
+            records["box"].astype(int).tolist(),
+            records["area"].tolist(),
+            records["ratio"].tolist(),
+            records["region"].tolist(),
+            records["seed"].tolist(),
+        )
+    ]
 
-        for current_detection_idx in range(0, len(sorted_by_area)):
-            current_detection = sorted_by_area[current_detection_idx][2]
-            overlap = 0
-            for to_check_idx in range(
-                min(current_detection_idx + 1, len(sorted_by_area)),
-                len(sorted_by_area),
-            ):
-                to_check = sorted_by_area[to_check_idx][2]
-                intersect_box = intersection(current_detection, to_check)
-                # if 90% of smaller detection is inside of another detection, consolidate
-                if (
-                    intersect_box is not None
-                    and area(intersect_box) / area(current_detection) > 0.9
-                ):
-                    overlap = 1
-                    break
-            if overlap == 0:
-                consolidated_detections.append(sorted_by_area[current_detection_idx])
 
-    return consolidated_detections
+def get_label_order(labels: np.ndarray) -> np.ndarray:
+    """Rank of each label by first appearance, the order grouping by name gives."""
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first))[inverse]
+
+
+def suppress_detection_records(records: np.ndarray) -> np.ndarray:
+    """Non-maxima suppression of weak, overlapping boxes of the same label."""
+    if len(records) == 0:
+        return records
+
+    boxes = records["box"]
+    # NMSBoxesBatched takes xmin, ymin, width, height
+    xywh = np.column_stack(
+        (
+            boxes[:, 0],
+            boxes[:, 1],
+            boxes[:, 2] - boxes[:, 0],
+            boxes[:, 3] - boxes[:, 1],
+        )
+    )
+    idxs = np.asarray(
+        cv2.dnn.NMSBoxesBatched(xywh, records["score"], records["label"], 0.5, 0.4),
+        dtype=np.int64,
+    ).reshape(-1)
+
+    # the selection is ordered by score, group it by label again
+    label_order = get_label_order(records["label"])
+    return records[idxs[np.argsort(label_order[idxs], kind="stable")]]
+
+
+def consolidate_detection_records(records: np.ndarray) -> np.ndarray:
+    """Drop detections that overlap too much"""
+    if len(records) < 2:
+        return records
+
+    # sort smallest to largest by area within each label
+    records = records[
+        np.lexsort((records["area"], get_label_order(records["label"])))
+    ]
+
+    # size of the intersection of every pair, boxes overlap when it is not negative
+    x_min, y_min, x_max, y_max = records["box"].T
+    width = np.minimum.outer(x_max, x_max) - np.maximum.outer(x_min, x_min)
+    height = np.minimum.outer(y_max, y_max) - np.maximum.outer(y_min, y_min)
+    box_areas = (x_max - x_min + 1) * (y_max - y_min + 1)
+
+    # if 90% of smaller detection is inside of a larger detection, consolidate
+    labels = records["label"]
+    order = np.arange(len(records))
+    overlap = (
+        (order[:, None] < order)
+        & np.equal.outer(labels, labels)
+        & (width >= 0)
+        & (height >= 0)
+        & ((width + 1) * (height + 1) / box_areas[:, None] > 0.9)
+    )
+    return records[~overlap.any(axis=1)]
+
+
+def get_attribute_indexes(tracked_objects, detections) -> list[np.ndarray]:
+    """Indexes of the attribute detections inside each tracked object."""
+    labels = np.array([d[0] for d in detections])
+    inside = boxes_inside(
+        get_box_array([obj["box"] for obj in tracked_objects]),
+        get_box_array([d[2] for d in detections]),
+    )
+    attribute_masks = {
+        label: np.isin(labels, attribute_labels)
+        for label, attribute_labels in ATTRIBUTE_LABEL_MAP.items()
+    }
+    no_attributes = np.zeros(len(detections), dtype=bool)
+
+    return [
+        np.flatnonzero(attribute_masks.get(obj["label"], no_attributes) & object_inside)
+        for obj, object_inside in zip(tracked_objects, inside)
+    ]
 
 
 def process_frames(
@@ -890,13 +1430,14 @@ def process_frames(
     frame_shape,
     model_config: ModelConfig,
     detect_config: DetectConfig,
-    frame_manager: FrameManager,
+    frame_ring: RingFrameManager,
     motion_detector: MotionDetector,
     object_detector: RemoteObjectDetector,
     face_detector: RemoteFaceDetector,
     face_recognizer,
     object_tracker: ObjectTracker,
     detected_objects_queue: mp.Queue,
+    frame_result_writer: FrameResultWriter,
     process_info: dict,
     objects_to_track: list[str],
     object_filters,
@@ -905,10 +1446,13 @@ def process_frames(
     stop_event,
     ptz_metrics: PTZMetricsTypes,
     face_queue: mp.Queue,
+    face_index: FaceEmbeddingIndex = None,
+    face_recognition_cache: FaceRecognitionCache = None,
     exit_on_empty: bool = False,
 ):
     fps = process_info["process_fps"]
     detection_fps = process_info["detection_fps"]
+    detection_skip_ratio = process_info["detection_skip_ratio"]
     facedetection_fps = process_info["facedetection_fps"]
     current_frame_time = process_info["detection_frame"]
 
@@ -916,16 +1460,43 @@ def process_frames(
     fps_tracker.start()
 
     startup_scan_counter = 0
+    detection_rate = DetectionRate(detect_config)
+    sweep_tiles = (
+        get_sweep_tiles(
+            frame_shape,
+            detect_config.sweep.tile_size
+            or max(model_config.height, model_config.width),
+            detect_config.sweep.overlap,
+        )
+        if detect_config.sweep.enabled
+        else []
+    )
+    sweep_counter = 0
+    last_sweep_time = 0.0
 
     region_min_size = get_min_region_size(model_config)
     face_detection_region_min_size = get_min_face_detection_region_size(model_config)
 
+    if face_recognition_cache is None:
+        face_recognition_cache = FaceRecognitionCache.from_model_config(model_config)
+
+    detection_filters = get_detection_filters(
+        object_detector.labels, objects_to_track, object_filters
+    )
+    person_label = detection_filters["label_ids"].get("person", -2)
+    face_model_version = (
+        None
+        if face_index is not None
+        else process_info.get("face_model_version")
+    )
+    loaded_face_model_version = 0
+
     while not stop_event.is_set():
         try:
             if exit_on_empty:
-                frame_time = frame_queue.get(False)
+                frame_time, frame_ref = frame_queue.get(False)
             else:
-                frame_time = frame_queue.get(True, 1)
+                frame_time, frame_ref = frame_queue.get(True, 1)
         except queue.Empty:
             if exit_on_empty:
                 logger.info("Exiting track_objects...")
@@ -934,9 +1505,26 @@ def process_frames(
 
         current_frame_time.value = frame_time
 
-        frame = frame_manager.get(
-            f"{camera_name}{frame_time}", (frame_shape[0] * 3 // 2, frame_shape[1])
-        )
+        # swap in the face recognizer when the face trainer wrote a new model
+        if (
+            face_model_version is not None
+            and face_model_version.value != loaded_face_model_version
+        ):
+            loaded_face_model_version = face_model_version.value
+
+            try:
+                face_recognizer = read_face_recognizer(
+                    face_model_path(loaded_face_model_version)
+                )
+                logger.debug(
+                    f"{camera_name}: loaded face recognition model {loaded_face_model_version}"
+                )
+            except cv2.error as e:
+                logger.warning(
+                    f"{camera_name}: unable to load face recognition model {loaded_face_model_version}: {e}"
+                )
+
+        frame = frame_ring.get(camera_name, frame_ref)
 
         if frame is None:
             logger.info(f"{camera_name}: frame {frame_time} is not in memory store.")
@@ -961,15 +1549,20 @@ def process_frames(
 
         # if detection is disabled
         if not detection_enabled.value:
-            object_tracker.match_and_update(frame_time, [])
+            object_tracker.match_and_update(frame_time, [], frame)
         else:
             # get stationary object ids
             # check every Nth frame for stationary objects
             # disappeared objects are not stationary
             # also check for overlapping motion boxes
-            stationary_object_ids = [
+            tracked_objects = list(object_tracker.tracked_objects.values())
+            moving = boxes_overlap(
+                get_box_array([obj["box"] for obj in tracked_objects]),
+                get_box_array(motion_boxes),
+            ).any(axis=1)
+            stationary_object_ids = {
                 obj["id"]
-                for obj in object_tracker.tracked_objects.values()
+                for obj, in_motion in zip(tracked_objects, moving)
                 # if it has exceeded the stationary threshold
                 if obj["motionless_count"] >= detect_config.stationary.threshold
                 # and it isn't due for a periodic check
@@ -980,13 +1573,13 @@ def process_frames(
                 # and it hasn't disappeared
                 and object_tracker.disappeared[obj["id"]] == 0
                 # and it doesn't overlap with any current motion boxes
-                and not intersects_any(obj["box"], motion_boxes)
-            ]
+                and not in_motion
+            }
 
             # get tracked object boxes that aren't stationary
             tracked_object_boxes = [
                 obj["estimate"]
-                for obj in object_tracker.tracked_objects.values()
+                for obj in tracked_objects
                 if obj["id"] not in stationary_object_ids
             ]
 
@@ -1003,6 +1596,30 @@ def process_frames(
                 for candidate in cluster_candidates
             ]
 
+            # skip detection while every track is stable, the tracker predicts
+            # the objects until the next detected frame
+            skip_detection = (
+                detect_config.adaptive.enabled
+                and len(regions) > 0
+                and startup_scan_counter >= 9
+                and not ptz_metrics["ptz_autotracker_enabled"].value
+                and not detection_rate.should_detect(
+                    frame_time,
+                    tracked_objects,
+                    object_tracker.disappeared,
+                    # motion that isn't on any of the tracked objects
+                    not boxes_overlap(
+                        get_box_array(motion_boxes),
+                        get_box_array([obj["estimate"] for obj in tracked_objects]),
+                    )
+                    .any(axis=1)
+                    .all(),
+                )
+            )
+
+            if skip_detection:
+                regions = []
+
             # if starting up, get the next startup scan region
             if startup_scan_counter < 9:
                 ymin = int((frame_shape[0] / 3) * (startup_scan_counter % 3))
@@ -1021,11 +1638,22 @@ def process_frames(
                 regions.append(region)
                 #logger.info(f"Startup Scan Region {startup_scan_counter}:{frame_shape[1]}:{frame_shape[0]}:{xmin}.{ymin}:{xmax}.{ymax}:{region}")
                 startup_scan_counter += 1
+            # after that, sweep the frame one tile at a time on top of the
+            # other regions, waiting for a detected frame when it is skipped
+            elif (
+                sweep_tiles
+                and not skip_detection
+                and frame_time - last_sweep_time + 1 / detect_config.fps / 2
+                >= 1 / detect_config.sweep.fps
+            ):
+                regions.append(sweep_tiles[sweep_counter % len(sweep_tiles)])
+                sweep_counter += 1
+                last_sweep_time = frame_time
 
 
             # resize regions and detect
             # seed with stationary objects
-            detections = [
+            stationary_detections = [
                 (
                     obj["label"],
                     obj["score"],
@@ -1034,85 +1662,44 @@ def process_frames(
                     obj["ratio"],
                     obj["region"],
                 )
-                for obj in object_tracker.tracked_objects.values()
+                for obj in tracked_objects
                 if obj["id"] in stationary_object_ids
             ]
 
-            face_detections = []
-
-            for region in regions:
-                raw_detections = detect(
+            # all regions are sent to the detector in as few requests as possible
+            detections = np.concatenate(
+                (
+                    get_seed_detection_records(
+                        stationary_detections, detection_filters
+                    ),
+                    detect_batch(
                         detect_config,
                         object_detector,
                         frame,
                         model_config,
-                        region,
-                        objects_to_track,
-                        object_filters,
-                    )
-                detections.extend( raw_detections )
-
-                if "face" in objects_to_track:
-                    if model_config.face_recognition_area == "Regions":
-                        for raw_detection in raw_detections:
-                            if raw_detection[0] == "person":
-                                raw_face_detections = face_detect(
-                                        detect_config,
-                                        face_detector,
-                                        frame,
-                                        model_config,
-                                        region,
-                                        objects_to_track,
-                                        object_filters,
-                                    )
-
-                                for raw_face_detection in raw_face_detections:
-                                    if raw_face_detection[0] == "face":
-                                        face_detections.append( raw_face_detection )
-
-            #########
-            # merge objects
-            #########
-            # group by name
-            detected_object_groups = defaultdict(lambda: [])
-            for detection in detections:
-                detected_object_groups[detection[0]].append(detection)
-
-            selected_objects = []
-            for group in detected_object_groups.values():
-                # apply non-maxima suppression to suppress weak, overlapping bounding boxes
-                # o[2] is the box of the object: xmin, ymin, xmax, ymax
-                # apply max/min to ensure values do not exceed the known frame size
-                boxes = [
-                    (
-                        o[2][0],
-                        o[2][1],
-                        o[2][2] - o[2][0],
-                        o[2][3] - o[2][1],
-                    )
-                    for o in group
-                ]
-                confidences = [o[1] for o in group]
-                idxs = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
-
-                # add objects
-                for index in idxs:
-                    index = index if isinstance(index, np.int32) else index[0]
-                    obj = group[index]
-                    selected_objects.append(obj)
+                        regions,
+                        detection_filters,
+                    ),
+                )
+            )
 
-            # set the detections list to only include top objects
-            detections = selected_objects
+            person_regions = [
+                regions[region]
+                for region in np.unique(
+                    detections["region"][detections["label"] == person_label]
+                )
+                if region >= 0
+            ]
 
             # if detection was run on this frame, consolidate
             if len(regions) > 0:
-                # group by name
-                detected_object_groups = defaultdict(lambda: [])
-                for detection in detections:
-                    detected_object_groups[detection[0]].append(detection)
-
-                consolidated_detections = get_consolidated_object_detections(
-                    detected_object_groups
+                consolidated_detections = get_detection_tuples(
+                    consolidate_detection_records(
+                        suppress_detection_records(detections)
+                    ),
+                    detection_filters,
+                    regions,
+                    stationary_detections,
                 )
                 tracked_detections = [
                     d
@@ -1120,239 +1707,228 @@ def process_frames(
                     if d[0] not in ALL_ATTRIBUTE_LABELS
                 ]
 
+                # now that we have refined our detections, we need to track objects
+                object_tracker.match_and_update(frame_time, tracked_detections, frame)
+
                 if "face" in objects_to_track:
-                    if model_config.face_recognition_area == "Tracked":
-                        for tracked_detection in tracked_detections:
-                            if tracked_detection[0] == "person":
-                                face_region = calculate_region(
-                                        frame_shape,
-                                        tracked_detection[2][0],
-                                        tracked_detection[2][1],
-                                        tracked_detection[2][2],
-                                        tracked_detection[2][3],
-                                        face_detection_region_min_size,
-                                        multiplier=1.0,
-                                )
-
-                                raw_face_detections = face_detect(
-                                        detect_config,
-                                        face_detector,
-                                        frame,
-                                        model_config,
-                                        face_region,
-                                        objects_to_track,
-                                        object_filters,
-                                    )
-
-                                for raw_face_detection in raw_face_detections:
-                                    if raw_face_detection[0] == "face":
-                                        consolidated_detections.append(raw_face_detection)
-
-                    if model_config.face_recognition_area == "Regions":
-                        for face_detection in face_detections:
-                            consolidated_detections.append(face_detection)
+                    # faces are detected after tracking so people that were
+                    # recognized recently can be skipped
+                    face_regions = get_face_detection_regions(
+                        frame_shape,
+                        model_config,
+                        person_regions,
+                        object_tracker.tracked_objects,
+                        face_recognition_cache,
+                        frame_time,
+                        face_detection_region_min_size,
+                    )
 
-                # now that we have refined our detections, we need to track objects
-                object_tracker.match_and_update(frame_time, tracked_detections)
+                    # all face crops are sent to the face detector together
+                    for raw_face_detections in face_detect_batch(
+                        detect_config,
+                        face_detector,
+                        frame,
+                        model_config,
+                        face_regions,
+                        objects_to_track,
+                        object_filters,
+                    ):
+                        for raw_face_detection in raw_face_detections:
+                            if raw_face_detection[0] == "face":
+                                consolidated_detections.append(raw_face_detection)
+            elif skip_detection:
+                object_tracker.predict(frame_time)
             # else, just update the frame times for the stationary objects
             else:
-                object_tracker.update_frame_times(frame_time)
+                object_tracker.update_frame_times(frame_time, frame)
 
-        # group the attribute detections based on what label they apply to
-        attribute_detections = {}
-        for label, attribute_labels in ATTRIBUTE_LABEL_MAP.items():
-            attribute_detections[label] = [
-                d for d in consolidated_detections if d[0] in attribute_labels
-            ]
+        # pick up faces that were captured or labelled since the last frame
+        if face_index is not None:
+            face_index.refresh()
 
         # build detections and add attributes
+        tracked_objects = list(object_tracker.tracked_objects.values())
         detections = {}
-        for obj in object_tracker.tracked_objects.values():
+        for obj, attribute_indexes in zip(
+            tracked_objects,
+            get_attribute_indexes(tracked_objects, consolidated_detections),
+        ):
             attributes = []
             # if the objects label has associated attribute detections
-            if obj["label"] in attribute_detections.keys():
+            if obj["label"] in ATTRIBUTE_LABEL_MAP:
                 max_face_area = 0
                 max_face_label_id = -1
                 max_face_confidence = -10000
+                max_face_box = None
 
                 # add them to attributes if they intersect
-                for attribute_detection in attribute_detections[obj["label"]]:
-                    if box_inside(obj["box"], (attribute_detection[2])):
-                        attributes.append(
-                            {
-                                "label": attribute_detection[0],
-                                "score": attribute_detection[1],
-                                "box": attribute_detection[2],                               
-                            }
+                for attribute_index in attribute_indexes:
+                    attribute_detection = consolidated_detections[attribute_index]
+
+                    attributes.append(
+                        {
+                            "label": attribute_detection[0],
+                            "score": attribute_detection[1],
+                            "box": attribute_detection[2],                               
+                        }
+                    )
+
+                    attribute_area = area(attribute_detection[2])
+
+                    # skip recognition while the cached result for this
+                    # object is confident and no better face has appeared
+                    if attribute_detection[0] == "face" and (
+                        not face_recognition_cache.needs_recognition(
+                            obj["id"],
+                            attribute_area,
+                            lambda: get_face_sharpness(frame, attribute_detection[2]),
                         )
+                    ):
+                        continue
 
-                        attribute_area = area(attribute_detection[2])
-
-                        if face_recognizer is not None:
-
-                            if (attribute_area >= model_config.face_recognition_min_area) and (attribute_area <= model_config.face_recognition_max_area):
-                                face_region = calculate_face_region(
-                                        attribute_detection[2][0],
-                                        attribute_detection[2][1],
-                                        attribute_detection[2][2],
-                                        attribute_detection[2][3],
-                                )
-
-                                cropped = yuv_crop_and_resize_face(frame, face_region)
-
-                                gray_frame = cv2.cvtColor(cropped, cv2.COLOR_YUV2GRAY_I420)
-
-                                height, width = gray_frame.shape
-
-                                x_min, y_min, x_max, y_max = calculate_gray_face_region(width, height, model_config.face_recognition_width_crop, model_config.face_recognition_height_crop)
-
-                                # [rows,columns] [ymin:ymax,xmin:xmax]
-                                gray_face = cv2.resize(gray_frame[y_min:y_max,x_min:x_max],
-                                                    dsize=(360, 360),
-                                                    interpolation=cv2.INTER_CUBIC,
-                                                    )
-                                gray_face = cv2.equalizeHist(gray_face)
-                            
-                                start = time.monotonic_ns()
-                                try:
-                                    id, confidence = face_recognizer.predict(gray_face)
-                                except:
-                                    id, confidence = -1, 10000
-                                stop = time.monotonic_ns()
-                                elapsed = round((stop - start) / 1000000, 0)
-                                logger.info(f"Face Recognition Time: {elapsed}ms")
-                                logger.info(f"Face id:{id} rawconfidence:{round(confidence, 2)} camera:{camera_name}")
-
-                                # Check if confidence is less them 100 ==> "0" is perfect match 
-                                if (id >= 0 and confidence <= 10000):                                   
-                                    confidence = round(((model_config.face_recognition_max_score_conversion - confidence) / model_config.face_recognition_max_score_conversion) * 100.00) / 100.0
-
-                                    #if model_config.face_recognition_model == "LBPH":
-                                    #    confidence = round(100 - confidence) / 100.0
-                                    #if model_config.face_recognition_model == "Fisher":
-                                    #    confidence = round(500 - confidence) / 100.0
-                                    #if model_config.face_recognition_model == "Eigen":
-                                    #    confidence = round(5000 - confidence) / 100.0
-
-                                    if id > 0 and confidence >= model_config.face_recognition_min_score:
-                                        logger.info(f"OpenCV Face Recognized:{id} confidence:{confidence} camera:{camera_name} Accepted")
-                                        if attribute_area > max_face_area:
-                                            max_face_area = attribute_area
-                                            max_face_label_id = id
-                                            max_face_confidence = confidence
-                                    else:
-                                        logger.info(f"OpenCV Face Recognized:{id} confidence:{confidence} camera:{camera_name} Rejected")
-
-                                if os.path.exists(FACES_DIR + "/captureenabled"):
-                                    if ("Any" in model_config.face_training_camera) or (camera_name in model_config.face_training_camera):
-                                        if (model_config.face_training_unknown_only == False) or (id <= 0):
-                                            now = datetime.datetime.now().timestamp()
-                                            rand_id = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
-                                            face_id = f"{now}-{rand_id}"
-
-                                            face_queue.put(
-                                                (
-                                                    "face",
-                                                    face_id,
-                                                    -1,
-                                                    now,
-                                                    attribute_detection[6],
-                                                )
-                                            )
+                    if face_recognizer is not None:
 
-                                            np.save(FACES_DIR + "/" + face_id, cropped);
-
-                        if "DOODS" in model_config.face_recognition_model:
-                            if (attribute_area >= model_config.face_recognition_min_area) and (attribute_area <= model_config.face_recognition_max_area):
-                                selected_columns = [
-                                    Face.id,
-                                    Face.label_id,
-                                    Face.capture_time,
-                                    Face.data,
-                                ]
-
-                                faces = (
-                                    Face.select(*selected_columns)
-                                )
-
-                                id = -1
-                                min_eu = 1000000
-                                min_eu_label_id = -1
-                                max_cos = 0
-                                max_cos_label_id = -1
-
-                                start = time.monotonic_ns()
-                                for f in faces:
-                                    if f.label_id >= 0:
-                                        if f.data.get("embeddings") is not None:
-                                            embeddingsstr = f.data["embeddings"]
-                                            embeddings = np.fromstring(embeddingsstr, dtype=float, sep=' ')
-                                            eu_score = compare_eu_distance(embeddings, attribute_detection[6])
-                                            cos_score = cos_similarity(embeddings, attribute_detection[6])
-
-                                            if (eu_score < min_eu):
-                                                min_eu = eu_score
-                                                min_eu_label_id = f.label_id
-                                            if (cos_score > max_cos):
-                                                max_cos = cos_score
-                                                max_cos_label_id = f.label_id
-                                stop = time.monotonic_ns()
-                                elapsed = round((stop - start) / 1000000, 0)
-                                logger.info(f"Face Recognition Time: {elapsed}ms")
-
-                                if ("DOODS_EU" in model_config.face_recognition_model) and (min_eu_label_id >= 0):
-                                    id = min_eu_label_id
-                                    confidence = (2 - min_eu) / 2
-
-                                    if min_eu_label_id > 0 and confidence >= model_config.face_recognition_min_score:
-                                        logger.info(f"FaceNet eu Face Recognized:{min_eu_label_id} confidence:{confidence} camera:{camera_name} Accepted")
-                                        if attribute_area > max_face_area:
-                                            max_face_area = attribute_area
-                                            max_face_label_id = id
-                                            max_face_confidence = confidence
-                                    else:
-                                        logger.info(f"FaceNet eu Face Recognized:{min_eu_label_id} confidence:{confidence} camera:{camera_name} Rejected")
-
-                                if ("DOODS_COS" in model_config.face_recognition_model) and (max_cos_label_id >= 0):
-                                    id = max_cos_label_id
-                                    confidence = max_cos
-
-                                    if max_cos_label_id > 0 and confidence >= model_config.face_recognition_min_score:
-                                        logger.info(f"FaceNet cos Face Recognized:{max_cos_label_id} confidence:{confidence} camera:{camera_name} Accepted")
-                                        if attribute_area > max_face_area:
-                                            max_face_area = attribute_area
-                                            max_face_label_id = id
-                                            max_face_confidence = confidence
-                                    else:
-                                        logger.info(f"FaceNet cos Face Recognized:{max_cos_label_id} confidence:{confidence} camera:{camera_name} Rejected")
-
-                                if os.path.exists(FACES_DIR + "/captureenabled"):
-                                    if ("Any" in model_config.face_training_camera) or (camera_name in model_config.face_training_camera):
-                                        if (model_config.face_training_unknown_only == False) or (id <= 0):
-                                            face_region = calculate_face_region(
-                                                    attribute_detection[2][0],
-                                                    attribute_detection[2][1],
-                                                    attribute_detection[2][2],
-                                                    attribute_detection[2][3],
-                                            )
+                        if (attribute_area >= model_config.face_recognition_min_area) and (attribute_area <= model_config.face_recognition_max_area):
+                            face_region = calculate_face_region(
+                                    attribute_detection[2][0],
+                                    attribute_detection[2][1],
+                                    attribute_detection[2][2],
+                                    attribute_detection[2][3],
+                            )
 
-                                            cropped = yuv_crop_and_resize_face(frame, face_region)
+                            cropped = yuv_crop_and_resize_face(frame, face_region)
 
-                                            now = datetime.datetime.now().timestamp()
-                                            rand_id = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
-                                            face_id = f"{now}-{rand_id}"
+                            gray_frame = cv2.cvtColor(cropped, cv2.COLOR_YUV2GRAY_I420)
 
-                                            face_queue.put(
-                                                (
-                                                    "face",
-                                                    face_id,
-                                                    -1,
-                                                    now,
-                                                    attribute_detection[6],
+                            height, width = gray_frame.shape
+
+                            x_min, y_min, x_max, y_max = calculate_gray_face_region(width, height, model_config.face_recognition_width_crop, model_config.face_recognition_height_crop)
+
+                            # [rows,columns] [ymin:ymax,xmin:xmax]
+                            gray_face = cv2.resize(gray_frame[y_min:y_max,x_min:x_max],
+                                                dsize=(360, 360),
+                                                interpolation=cv2.INTER_CUBIC,
                                                 )
+                            gray_face = cv2.equalizeHist(gray_face)
+                        
+                            start = time.monotonic_ns()
+                            try:
+                                id, confidence = face_recognizer.predict(gray_face)
+                            except:
+                                id, confidence = -1, 10000
+                            stop = time.monotonic_ns()
+                            elapsed = round((stop - start) / 1000000, 0)
+                            logger.info(f"Face Recognition Time: {elapsed}ms")
+                            logger.info(f"Face id:{id} rawconfidence:{round(confidence, 2)} camera:{camera_name}")
+
+                            # Check if confidence is less them 100 ==> "0" is perfect match 
+                            if (id >= 0 and confidence <= 10000):                                   
+                                confidence = round(((model_config.face_recognition_max_score_conversion - confidence) / model_config.face_recognition_max_score_conversion) * 100.00) / 100.0
+
+                                #if model_config.face_recognition_model == "LBPH":
+                                #    confidence = round(100 - confidence) / 100.0
+                                #if model_config.face_recognition_model == "Fisher":
+                                #    confidence = round(500 - confidence) / 100.0
+                                #if model_config.face_recognition_model == "Eigen":
+                                #    confidence = round(5000 - confidence) / 100.0
+
+                                if id > 0 and confidence >= model_config.face_recognition_min_score:
+                                    logger.info(f"OpenCV Face Recognized:{id} confidence:{confidence} camera:{camera_name} Accepted")
+                                    if attribute_area > max_face_area:
+                                        max_face_area = attribute_area
+                                        max_face_label_id = id
+                                        max_face_confidence = confidence
+                                        max_face_box = attribute_detection[2]
+                                else:
+                                    logger.info(f"OpenCV Face Recognized:{id} confidence:{confidence} camera:{camera_name} Rejected")
+
+                            if os.path.exists(FACES_DIR + "/captureenabled"):
+                                if ("Any" in model_config.face_training_camera) or (camera_name in model_config.face_training_camera):
+                                    if (model_config.face_training_unknown_only == False) or (id <= 0):
+                                        now = datetime.datetime.now().timestamp()
+                                        rand_id = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+                                        face_id = f"{now}-{rand_id}"
+
+                                        face_queue.put(
+                                            (
+                                                "face",
+                                                face_id,
+                                                -1,
+                                                now,
+                                                attribute_detection[6],
+                                                cropped,
                                             )
-
-                                            np.save(FACES_DIR + "/" + face_id, cropped);
+                                        )
+
+                    if "DOODS" in model_config.face_recognition_model:
+                        if (attribute_area >= model_config.face_recognition_min_area) and (attribute_area <= model_config.face_recognition_max_area):
+                            id = -1
+
+                            start = time.monotonic_ns()
+                            (
+                                min_eu_label_id,
+                                min_eu,
+                                max_cos_label_id,
+                                max_cos,
+                            ) = face_index.search(attribute_detection[6])
+                            stop = time.monotonic_ns()
+                            elapsed = round((stop - start) / 1000000, 0)
+                            logger.info(f"Face Recognition Time: {elapsed}ms")
+
+                            if ("DOODS_EU" in model_config.face_recognition_model) and (min_eu_label_id >= 0):
+                                id = min_eu_label_id
+                                confidence = (2 - min_eu) / 2
+
+                                if min_eu_label_id > 0 and confidence >= model_config.face_recognition_min_score:
+                                    logger.info(f"FaceNet eu Face Recognized:{min_eu_label_id} confidence:{confidence} camera:{camera_name} Accepted")
+                                    if attribute_area > max_face_area:
+                                        max_face_area = attribute_area
+                                        max_face_label_id = id
+                                        max_face_confidence = confidence
+                                        max_face_box = attribute_detection[2]
+                                else:
+                                    logger.info(f"FaceNet eu Face Recognized:{min_eu_label_id} confidence:{confidence} camera:{camera_name} Rejected")
+
+                            if ("DOODS_COS" in model_config.face_recognition_model) and (max_cos_label_id >= 0):
+                                id = max_cos_label_id
+                                confidence = max_cos
+
+                                if max_cos_label_id > 0 and confidence >= model_config.face_recognition_min_score:
+                                    logger.info(f"FaceNet cos Face Recognized:{max_cos_label_id} confidence:{confidence} camera:{camera_name} Accepted")
+                                    if attribute_area > max_face_area:
+                                        max_face_area = attribute_area
+                                        max_face_label_id = id
+                                        max_face_confidence = confidence
+                                        max_face_box = attribute_detection[2]
+                                else:
+                                    logger.info(f"FaceNet cos Face Recognized:{max_cos_label_id} confidence:{confidence} camera:{camera_name} Rejected")
+
+                            if os.path.exists(FACES_DIR + "/captureenabled"):
+                                if ("Any" in model_config.face_training_camera) or (camera_name in model_config.face_training_camera):
+                                    if (model_config.face_training_unknown_only == False) or (id <= 0):
+                                        face_region = calculate_face_region(
+                                                attribute_detection[2][0],
+                                                attribute_detection[2][1],
+                                                attribute_detection[2][2],
+                                                attribute_detection[2][3],
+                                        )
+
+                                        cropped = yuv_crop_and_resize_face(frame, face_region)
+
+                                        now = datetime.datetime.now().timestamp()
+                                        rand_id = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+                                        face_id = f"{now}-{rand_id}"
+
+                                        face_queue.put(
+                                            (
+                                                "face",
+                                                face_id,
+                                                -1,
+                                                now,
+                                                attribute_detection[6],
+                                                cropped,
+                                            )
+                                        )
 
                 if (max_face_label_id != -1) and (max_face_confidence != -10000):
                     found = True
@@ -1369,6 +1945,16 @@ def process_frames(
                         obj["sub_label_cur"] = facelabel.label
                         obj["sub_label_cur_score"] = max_face_confidence
 
+                        face_recognition_cache.update(
+                            obj["id"],
+                            max_face_label_id,
+                            facelabel.label,
+                            max_face_confidence,
+                            max_face_area,
+                            get_face_sharpness(frame, max_face_box),
+                            frame_time,
+                        )
+
             detections[obj["id"]] = {**obj, "attributes": attributes}
 
         # debug object tracking
@@ -1444,20 +2030,29 @@ def process_frames(
             )
         # add to the queue if not full
         if detected_objects_queue.full():
-            frame_manager.delete(f"{camera_name}{frame_time}")
+            frame_ring.release(camera_name, frame_ref)
             continue
         else:
             fps_tracker.update()
             fps.value = fps_tracker.eps()
+            # the objects go in the result ring, only the fields that changed
+            # since the previous frame are sent with it
+            result_ref, changes, overflow = frame_result_writer.write(
+                frame_time, detections, motion_boxes
+            )
+            # the slot is now held by the tracked object processor
             detected_objects_queue.put(
                 (
                     camera_name,
                     frame_time,
-                    detections,
+                    frame_ref,
+                    result_ref,
+                    changes,
+                    overflow,
                     motion_boxes,
                     regions,
                 )
             )
             detection_fps.value = object_detector.fps.eps()
+            detection_skip_ratio.value = detection_rate.skip_ratio
             facedetection_fps.value = face_detector.fps.eps()
-            frame_manager.close(f"{camera_name}{frame_time}")
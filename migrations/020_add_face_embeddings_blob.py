@@ -0,0 +1,65 @@
+"""Peewee migrations -- 020_add_face_embeddings_blob.py.
+
+Some examples (model - class or model name)::
+
+    > Model = migrator.orm['model_name']            # Return model in current state by name
+
+    > migrator.sql(sql)                             # Run custom SQL
+    > migrator.python(func, *args, **kwargs)        # Run python code
+    > migrator.create_model(Model)                  # Create a model (could be used as decorator)
+    > migrator.remove_model(model, cascade=True)    # Remove a model
+    > migrator.add_fields(model, **fields)          # Add fields to a model
+    > migrator.change_fields(model, **fields)       # Change fields
+    > migrator.remove_fields(model, *field_names, cascade=True)
+    > migrator.rename_field(model, old_field_name, new_field_name)
+    > migrator.rename_table(model, new_table_name)
+    > migrator.add_index(model, *col_names, unique=False)
+    > migrator.drop_index(model, *col_names)
+    > migrator.add_not_null(model, *field_names)
+    > migrator.drop_not_null(model, *field_names)
+    > migrator.add_default(model, field_name, default)
+
+"""
+
+import numpy as np
+import peewee as pw
+
+from frigate.models import Face
+
+SQL = pw.SQL
+
+
+def convert_text_embeddings(database, batch_size=1000):
+    """Move the space separated embeddings out of data into the blob column."""
+    rows = database.execute_sql(
+        "SELECT id, json_extract(data, '$.embeddings') FROM face "
+        "WHERE json_extract(data, '$.embeddings') IS NOT NULL"
+    ).fetchall()
+
+    for start in range(0, len(rows), batch_size):
+        updates = []
+
+        for face_id, text in rows[start : start + batch_size]:
+            embeddings = np.fromstring(text, dtype=np.float32, sep=" ")
+            norm = float(np.linalg.norm(embeddings))
+            updates.append((embeddings.tobytes(), norm, face_id))
+
+        with database.atomic():
+            database.cursor().executemany(
+                "UPDATE face SET embeddings = ?, embeddings_norm = ?, "
+                "data = json_remove(data, '$.embeddings') WHERE id = ?",
+                updates,
+            )
+
+
+def migrate(migrator, database, fake=False, **kwargs):
+    migrator.add_fields(
+        Face,
+        embeddings=pw.BlobField(null=True),
+        embeddings_norm=pw.FloatField(null=True),
+    )
+    migrator.python(convert_text_embeddings, database)
+
+
+def rollback(migrator, database, fake=False, **kwargs):
+    migrator.remove_fields(Face, ["embeddings", "embeddings_norm"])